@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+评估数据列式分析归档
+开发人员：LIUYING
+功能：与评估记录存储并行维护一份扁平化的列式归档（每条评估一行），
+      供pandas直接分析，无需逐个读取JSON记录或先导出Excel
+"""
+
+import json
+import os
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow  # noqa: F401  仅用于判断是否可写Parquet
+    HAS_PYARROW = True
+except ImportError:
+    HAS_PYARROW = False
+
+# 固定列及其类型；各条目评分展开为 resp_<条目> 数值列
+STRING_COLUMNS = ['record_id', 'scale_type', 'patient_name', 'gender', 'assessment_date',
+                  'level', 'risk_level', 'assessor']
+NUMERIC_COLUMNS = ['age', 'total_score', 'max_score', 'percentage']
+TIME_COLUMNS = ['assessment_time']
+BASE_COLUMNS = ['record_id', 'scale_type', 'assessment_time', 'assessment_date', 'patient_name', 'gender',
+                'age', 'total_score', 'max_score', 'percentage', 'level', 'risk_level', 'assessor']
+RESPONSE_PREFIX = 'resp_'
+# 增量文件中的删除标记
+DELETED_FLAG = '__deleted__'
+
+
+def _to_number(value) -> Optional[float]:
+    """转换为数值，无法转换时返回None"""
+    if isinstance(value, bool):
+        return float(value)
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return float(str(value).strip())
+    except (TypeError, ValueError):
+        return None
+
+
+def flatten_record(record_id: str, record: Dict) -> Dict[str, Any]:
+    """将一条v2评估记录展开为归档中的一行"""
+    patient_info = record.get('patient_info', {})
+    score_result = record.get('score_result', {})
+    row = {
+        'record_id': record_id,
+        'scale_type': record.get('scale_type', ''),
+        'assessment_time': record.get('assessment_time', ''),
+        'assessment_date': str(patient_info.get('assessment_date', '')),
+        'patient_name': patient_info.get('name', ''),
+        'gender': patient_info.get('gender', ''),
+        'age': _to_number(patient_info.get('age')),
+        'total_score': _to_number(score_result.get('total_score')),
+        'max_score': _to_number(score_result.get('max_score')),
+        'percentage': _to_number(score_result.get('percentage')),
+        'level': score_result.get('level', ''),
+        'risk_level': score_result.get('risk_level', ''),
+        'assessor': record.get('assessor', '')
+    }
+    for item, value in record.get('responses', {}).items():
+        number = _to_number(value)
+        if number is not None:
+            row[f"{RESPONSE_PREFIX}{item}"] = number
+    return row
+
+
+def _to_datetime(values: pd.Series) -> pd.Series:
+    """解析评估时间；历史记录中带/不带微秒、'T'或空格分隔的格式混杂"""
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values
+    try:
+        return pd.to_datetime(values, errors='coerce', format='ISO8601')
+    except (TypeError, ValueError):
+        # pandas 2.0之前不支持format='ISO8601'，逐个解析
+        return pd.to_datetime(values.map(lambda v: pd.to_datetime(v, errors='coerce')), errors='coerce')
+
+
+def _typed_frame(rows) -> pd.DataFrame:
+    """统一列顺序与类型：文本列为str，分数与条目列为float（缺失为NaN），时间列为datetime64"""
+    df = rows if isinstance(rows, pd.DataFrame) else pd.DataFrame(list(rows))
+    for column in BASE_COLUMNS:
+        if column not in df.columns:
+            df[column] = np.nan if column not in STRING_COLUMNS else ''
+
+    response_columns = sorted(c for c in df.columns if c.startswith(RESPONSE_PREFIX))
+    df = df[BASE_COLUMNS + response_columns].copy()
+    for column in STRING_COLUMNS:
+        df[column] = df[column].fillna('').astype(str)
+    for column in NUMERIC_COLUMNS + response_columns:
+        df[column] = pd.to_numeric(df[column], errors='coerce').astype('float64')
+    for column in TIME_COLUMNS:
+        df[column] = _to_datetime(df[column])
+    return df.reset_index(drop=True)
+
+
+class AnalyticsArchive:
+    """列式分析归档
+
+    主文件为 <路径>.parquet（安装了pyarrow时）或 <路径>.npz；新保存的记录先追加到
+    <路径>.delta.jsonl，累计fold_rows行后再合并进主文件，因此每次保存只写一行；
+    删除同样以删除标记行写入增量文件，合并时才从主文件中去掉。
+    """
+
+    def __init__(self, base_path: str, fold_rows: int = 256, file_format: str = None):
+        self.file_format = file_format or ('parquet' if HAS_PYARROW else 'npz')
+        self.path = f"{base_path}.{self.file_format}"
+        self.delta_path = f"{base_path}.delta.jsonl"
+        self.fold_rows = max(fold_rows, 1)
+        self._base = None
+        self._delta = None
+        self._lock = threading.RLock()
+
+        directory = os.path.dirname(base_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    # ---------- 文件读写 ----------
+
+    def _read_base(self) -> pd.DataFrame:
+        """读取主文件（读取失败时视为空归档，可用sync/rebuild重建）"""
+        if self._base is not None:
+            return self._base
+
+        self._base = _typed_frame([])
+        if os.path.exists(self.path):
+            try:
+                if self.file_format == 'parquet':
+                    self._base = _typed_frame(pd.read_parquet(self.path))
+                else:
+                    with np.load(self.path, allow_pickle=False) as archive:
+                        columns = [str(c) for c in archive['__columns__']]
+                        self._base = _typed_frame(pd.DataFrame(
+                            {column: archive[f"c{i}"] for i, column in enumerate(columns)}))
+            except Exception as e:
+                print(f"读取分析归档时出错，将重新生成: {e}")
+        return self._base
+
+    def _write_base(self, df: pd.DataFrame):
+        """写入主文件（先写临时文件再替换）"""
+        tmp_path = self.path + '.tmp'
+        if self.file_format == 'parquet':
+            df.to_parquet(tmp_path, index=False)
+        else:
+            arrays = {'__columns__': np.array(df.columns, dtype=str)}
+            for i, column in enumerate(df.columns):
+                values = df[column]
+                if column in STRING_COLUMNS:
+                    arrays[f"c{i}"] = values.to_numpy(dtype=str)
+                elif column in TIME_COLUMNS:
+                    arrays[f"c{i}"] = values.to_numpy(dtype='datetime64[ns]')
+                else:
+                    arrays[f"c{i}"] = values.to_numpy(dtype='float64')
+            with open(tmp_path, 'wb') as f:
+                np.savez(f, **arrays)
+        os.replace(tmp_path, self.path)
+        self._base = df
+
+    def _read_delta(self) -> List[Dict]:
+        """读取尚未合并的增量行（忽略写入中断留下的不完整尾行）"""
+        if self._delta is not None:
+            return self._delta
+
+        self._delta = []
+        if os.path.exists(self.delta_path):
+            with open(self.delta_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        self._delta.append(json.loads(line))
+                    except ValueError:
+                        break
+        return self._delta
+
+    def _fold(self, df: pd.DataFrame = None):
+        """把增量行（含删除标记）合并进主文件并清空增量文件"""
+        self._write_base(self.to_dataframe() if df is None else df)
+        if os.path.exists(self.delta_path):
+            os.remove(self.delta_path)
+        self._delta = []
+
+    def _append_delta(self, rows: List[Dict]):
+        """向增量文件追加若干行，累计达到fold_rows行时合并进主文件"""
+        if not rows:
+            return
+        delta = self._read_delta()
+        with open(self.delta_path, 'a', encoding='utf-8') as f:
+            for row in rows:
+                f.write(json.dumps(row, ensure_ascii=False) + '\n')
+        delta.extend(rows)
+        if len(delta) >= self.fold_rows:
+            self._fold()
+
+    # ---------- 对外接口 ----------
+
+    def append(self, record_id: str, record: Dict):
+        """追加一条新保存的评估记录"""
+        with self._lock:
+            self._append_delta([flatten_record(record_id, record)])
+
+    def remove(self, record_ids: Iterable[str]):
+        """从归档中移除记录（只在增量文件中写删除标记，合并时才从主文件中去掉）"""
+        with self._lock:
+            self._append_delta([{'record_id': record_id, DELETED_FLAG: True} for record_id in record_ids])
+
+    def to_dataframe(self) -> pd.DataFrame:
+        """返回归档内容（主文件+增量行，同一记录以最新的一行或删除标记为准）"""
+        with self._lock:
+            base = self._read_base()
+            delta = self._read_delta()
+            if not delta:
+                return base.copy()
+
+            latest = {}
+            for row in delta:
+                latest.pop(row['record_id'], None)
+                latest[row['record_id']] = row
+            df = base[~base['record_id'].isin(latest)]
+            rows = [row for row in latest.values() if not row.get(DELETED_FLAG)]
+            if rows:
+                df = _typed_frame(pd.concat([df, _typed_frame(rows)], ignore_index=True))
+        return df.reset_index(drop=True)
+
+    def record_ids(self) -> Set[str]:
+        """归档中已有的记录编号"""
+        return set(self.to_dataframe()['record_id'])
+
+    def sync(self, store) -> Dict[str, int]:
+        """与存储后端对齐：补充缺少的记录（如外部程序写入的文件），移除已不存在的记录
+
+        store需提供record_ids()和get(record_id)；JSON引擎下只检查文件修改时间，
+        不会重新解析未变化的文件。差异以增量行写入，不重写主文件。
+        """
+        store_ids = store.record_ids()
+        with self._lock:
+            existing = self.record_ids()
+            added = store_ids - existing
+            removed = existing - store_ids
+
+            rows = []
+            for record_id in added:
+                record = store.get(record_id)
+                if record:
+                    rows.append(flatten_record(record_id, record))
+            added_count = len(rows)
+            rows.extend({'record_id': record_id, DELETED_FLAG: True} for record_id in removed)
+            self._append_delta(rows)
+        return {'added': added_count, 'removed': len(removed)}
+
+    def rebuild(self, store) -> int:
+        """清空后按存储后端重新生成归档，返回行数"""
+        with self._lock:
+            self._fold(_typed_frame([]))
+            self.sync(store)
+            return len(self.to_dataframe())
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+评估记录组合查询
+开发人员：LIUYING
+功能：按量表、风险等级、严重程度、总分/年龄范围、性别、评估者、患者姓名、评估日期、全文关键词组合筛选，
+      由各字段索引求交集得到记录编号（先用命中最少的条件），并可用explain查看执行过程
+"""
+
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from assessment_store import to_time_bound
+from record_index import is_pinyin_query, to_epoch
+
+# 查询条件：
+#   scale_type   量表（按量表目录归一，如 HAMD 匹配 HAMD-17，不匹配 HAMA）
+#   patient      患者姓名（子串，字母时也按拼音/首字母前缀）
+#   risk_level   风险等级        level     严重程度
+#   gender       性别            assessor  评估者
+#   score_min / score_max  总分范围（含两端）
+#   age_min / age_max      年龄范围（含两端）
+#   since / until          评估时间（since含、until不含；datetime/date/字符串，字符串可只到年或月，
+#                          如 2025、2025-08；无法解析时抛出ValueError）
+#   text         解释、建议、备注全文（空格分隔的多个关键词须同时出现）
+QUERY_FIELDS = ('scale_type', 'patient', 'risk_level', 'level', 'gender', 'assessor',
+                'score_min', 'score_max', 'age_min', 'age_max', 'since', 'until', 'text')
+
+# 分页查询可用的排序字段 -> 评分系统中对应的排序索引
+SORT_KEYS = {
+    'assessment_time': 'time_index',
+    'total_score': 'score_index',
+    'age': 'age_index',
+}
+
+
+class QueryStep:
+    """一个查询条件：估算命中数、取出命中集合、对单条候选核对"""
+
+    def __init__(self, label: str, index_name: str, estimate: int,
+                 fetch: Callable[[], Set[str]], matches: Callable[[str], bool]):
+        self.label = label
+        self.index_name = index_name
+        self.estimate = estimate
+        self.fetch = fetch
+        self.matches = matches
+
+
+class QueryEngine:
+    """基于评分系统二级索引的组合查询"""
+
+    def __init__(self, scoring_system):
+        self.system = scoring_system
+
+    def _steps(self, filters: Dict[str, Any]) -> List[QueryStep]:
+        """把查询条件转换为查询步骤"""
+        system = self.system
+        steps = []
+
+        field_filters = [
+            ('scale_type', system.scale_index, False, "量表"),
+            ('risk_level', system.risk_index, False, "风险等级"),
+            ('level', system.level_index, False, "严重程度"),
+            ('gender', system.gender_index, False, "性别"),
+            ('assessor', system.assessor_index, False, "评估者"),
+        ]
+        for key, index, prefix, title in field_filters:
+            value = filters.get(key)
+            if value:
+                steps.append(QueryStep(
+                    f"{title}{'以' if prefix else '='}{value}{'开头' if prefix else ''}", index.name,
+                    index.count(value, prefix),
+                    lambda index=index, value=value, prefix=prefix: index.lookup(value, prefix),
+                    lambda record_id, index=index, value=value, prefix=prefix: index.matches(record_id, value, prefix)))
+
+        range_filters = [
+            ('score_min', 'score_max', system.score_index, True, "总分"),
+            ('age_min', 'age_max', system.age_index, True, "年龄"),
+        ]
+        for low_key, high_key, index, include_high, title in range_filters:
+            low, high = filters.get(low_key), filters.get(high_key)
+            if low is None and high is None:
+                continue
+            steps.append(QueryStep(
+                f"{title}在[{'' if low is None else low}, {'' if high is None else high}]", index.name,
+                index.count_range(low, high, include_high),
+                lambda index=index, low=low, high=high: set(index.range(low, high, False, True)),
+                lambda record_id, index=index, low=low, high=high: index.in_range(record_id, low, high, True)))
+
+        since, until = to_time_bound(filters.get('since')), to_time_bound(filters.get('until'))
+        if since or until:
+            low, high = to_epoch(since), to_epoch(until)
+            # 无法解析的时间条件直接报错，不能当作没有条件
+            for bound, epoch in ((since, low), (until, high)):
+                if bound and epoch is None:
+                    raise ValueError(f"无法解析的时间条件：{bound}")
+            index = system.time_index
+            steps.append(QueryStep(
+                f"评估时间在[{since or ''}, {until or ''})", index.name,
+                index.count_range(low, high),
+                lambda: set(index.range(low, high, False)),
+                lambda record_id: index.in_range(record_id, low, high)))
+
+        patient = (filters.get('patient') or '').strip()
+        if patient:
+            # 姓名匹配集合由索引直接算出，估算值即为实际命中数
+            matched = system.name_index.search(patient)
+            if is_pinyin_query(patient):
+                matched |= system.pinyin_index.search(patient)
+            steps.append(QueryStep(f"患者姓名含{patient}", system.name_index.name, len(matched),
+                                   lambda: matched, lambda record_id: record_id in matched))
+
+        text = (filters.get('text') or '').strip()
+        if text:
+            # 全文匹配集合同样由索引直接算出
+            text_matched = system.text_index.search(text)
+            steps.append(QueryStep(f"全文含{text}", system.text_index.name, len(text_matched),
+                                   lambda: text_matched, lambda record_id: record_id in text_matched))
+
+        return steps
+
+    def _filter(self, filters: Dict[str, Any]) -> Tuple[Optional[Set[str]], List[Dict[str, Any]]]:
+        """按条件求出候选记录编号，返回 (候选集合, 执行记录)；没有筛选条件时候选为None（即全部记录）
+
+        条件按估算命中数从少到多执行：第一步取出命中集合，之后若候选数少于该条件的命中数，
+        对候选逐条核对索引值，否则与该条件的命中集合求交集；候选为空时提前结束。
+        """
+        unknown = set(filters) - set(QUERY_FIELDS)
+        if unknown:
+            raise ValueError(f"未知的查询条件：{', '.join(sorted(unknown))}")
+
+        self.system.sync_indexes()
+        steps = sorted(self._steps(filters), key=lambda step: step.estimate)
+        plan = []
+        candidates = None
+        for step in steps:
+            if candidates is None:
+                candidates = step.fetch()
+                method = '取索引'
+            elif len(candidates) < step.estimate:
+                candidates = {record_id for record_id in candidates if step.matches(record_id)}
+                method = '逐条核对'
+            else:
+                candidates &= step.fetch()
+                method = '求交集'
+            plan.append({'step': step.label, 'index': step.index_name, 'method': method,
+                         'estimate': step.estimate, 'candidates': len(candidates)})
+            if not candidates:
+                break
+        return candidates, plan
+
+    def execute(self, **filters) -> Tuple[List[str], List[Dict[str, Any]]]:
+        """执行查询，返回 (按评估时间倒序的记录编号, 执行记录)"""
+        candidates, plan = self._filter(filters)
+        if candidates is None:
+            candidates = set(self.system.time_index.entries)
+            plan.append({'step': "无筛选条件", 'index': self.system.time_index.name, 'method': '全部记录',
+                         'estimate': len(candidates), 'candidates': len(candidates)})
+
+        times = self.system.time_index.entries
+        ordered = sorted(candidates, key=lambda record_id: times.get(record_id) or 0, reverse=True)
+        return ordered, plan
+
+    def page(self, filters: Dict[str, Any] = None, sort_key: str = 'assessment_time', after: tuple = None,
+             page_size: int = 50, descending: bool = True) -> Tuple[List[Tuple[str, Dict]], Optional[tuple]]:
+        """键集分页查询，返回 (本页的 (记录编号, 记录) 列表, 下一页游标)
+
+        sort_key为排序字段（见SORT_KEYS），after为上一页返回的游标（None为第一页）；
+        游标是最后一行的 (排序值, 记录编号)，与行号无关，翻页期间新增或删除记录不会造成重复或遗漏。
+        只读取本页的记录；没有更多记录时下一页游标为None。
+        """
+        if sort_key not in SORT_KEYS:
+            raise ValueError(f"不支持的排序字段：{sort_key}")
+        index = getattr(self.system, SORT_KEYS[sort_key])
+        candidates, _ = self._filter(filters or {})
+        accept = None if candidates is None else candidates.__contains__
+
+        items = []
+        cursor = tuple(after) if after is not None else None
+        # 记录可能已被其他窗口删除（索引尚未同步），读不到时继续向后取
+        while len(items) < page_size:
+            wanted = page_size - len(items)
+            rows = index.page_after(cursor, wanted, descending, accept)
+            for value, record_id in rows:
+                record = self.system.store.get(record_id)
+                if record:
+                    items.append((record_id, record))
+                cursor = (value, record_id)
+            if len(rows) < wanted:
+                return items, None
+        return items, cursor
+
+    def search(self, limit: Optional[int] = None, **filters) -> List[Tuple[str, Dict]]:
+        """执行查询并读取记录，返回按评估时间倒序的 (记录编号, 记录) 列表"""
+        record_ids, _ = self.execute(**filters)
+        items = []
+        for record_id in record_ids:
+            if limit is not None and len(items) >= limit:
+                break
+            record = self.system.store.get(record_id)
+            if record:
+                items.append((record_id, record))
+        return items
+
+    def explain(self, **filters) -> str:
+        """以文本说明查询使用了哪些索引、每一步后剩余多少候选"""
+        record_ids, plan = self.execute(**filters)
+        lines = ["查询计划（按估算命中数从少到多）："]
+        for i, step in enumerate(plan, 1):
+            lines.append(f"{i}. {step['step']}：索引 {step['index']}，{step['method']}，"
+                         f"估算 {step['estimate']} 条，剩余候选 {step['candidates']} 条")
+        lines.append(f"结果：{len(record_ids)} 条记录")
+        return '\n'.join(lines)
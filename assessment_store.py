@@ -0,0 +1,1558 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+评估记录存储引擎
+开发人员：LIUYING
+功能：为评分系统提供可切换的存储后端（JSON文件 / SQLite数据库 / JSON Lines分段日志）
+"""
+
+import atexit
+import functools
+import itertools
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import date, datetime
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from record_writer import DurableWriter, get_durable_writer
+from scale_catalog import scale_matcher
+
+
+def time_key(value: str) -> str:
+    """统一评估时间的比较键：ISO格式的'T'分隔符替换为空格，使不同来源的时间可直接按字符串比较"""
+    return (value or '').replace('T', ' ', 1)
+
+
+# 只到年或月的日期，如 2025、2025-08
+PARTIAL_DATE = re.compile(r'^(\d{4})(?:-(\d{1,2}))?$')
+
+
+def to_time_bound(value) -> Optional[str]:
+    """将datetime/date/字符串转换为时间比较键；只到年（YYYY）或月（YYYY-MM）的日期按该年/月的第一天计"""
+    if value is None or value == '':
+        return None
+    if isinstance(value, datetime):
+        return value.strftime('%Y-%m-%d %H:%M:%S')
+    if isinstance(value, date):
+        return value.strftime('%Y-%m-%d')
+    value = str(value).strip()
+    match = PARTIAL_DATE.match(value)
+    if match:
+        return f"{match.group(1)}-{int(match.group(2) or 1):02d}-01"
+    return time_key(value)
+
+
+# 文件名中的时间戳，如 GCS_20250820_231139.json
+FILENAME_TIMESTAMP = re.compile(r'_(\d{4})(\d{2})\d{2}_\d{6}(?:_\d+)?\.json$')
+
+
+def shard_name(scale_type: str) -> str:
+    """量表类型转换为可用作目录名的分片名"""
+    name = re.sub(r'[\\/:*?"<>|]', '_', scale_type or '').strip().lstrip('.')
+    return name or 'Unknown'
+
+
+def record_summary(record: Dict) -> Dict[str, Any]:
+    """记录的筛选/排序/汇总字段（清单、段索引中保存这些字段，不保存记录正文）"""
+    score_result = record.get('score_result', {})
+    total_score = score_result.get('total_score')
+    return {
+        'scale_type': record.get('scale_type', ''),
+        'patient': record.get('patient_info', {}).get('name', ''),
+        'time': time_key(record.get('assessment_time', '')),
+        'assessment_time': record.get('assessment_time', ''),
+        'total_score': total_score if isinstance(total_score, (int, float)) else None,
+        'level': score_result.get('level', ''),
+        'risk_level': score_result.get('risk_level', '')
+    }
+
+
+def _summarize(normalizer: Callable[[Dict], Optional[Dict]], data: Dict) -> Optional[Dict]:
+    """格式化后只保留摘要字段（可随functools.partial传入进程池）"""
+    record = normalizer(data)
+    return record_summary(record) if record else None
+
+
+def _read_json_chunk(paths: List[str], normalizer: Callable[[Dict], Optional[Dict]]) -> List[Tuple]:
+    """读取并格式化一组文件（在线程池/进程池中执行），返回 (路径, 记录, 错误信息) 列表"""
+    results = []
+    for path in paths:
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                results.append((path, normalizer(json.load(f)), None))
+        except Exception as e:
+            results.append((path, None, str(e)))
+    return results
+
+
+def read_json_files(paths: List[str], normalizer: Callable[[Dict], Optional[Dict]],
+                    workers: int = 0, executor: str = 'thread',
+                    chunk_size: int = 256) -> Tuple[Dict[str, Optional[Dict]], List[Tuple[str, str]]]:
+    """批量读取JSON文件，返回 ({路径: 格式化记录}, [(路径, 错误信息)])
+
+    workers大于1且文件数超过一个分块时并行读取；executor为'process'时使用进程池，
+    此时normalizer必须是可序列化的模块级函数或静态方法。
+    """
+    chunk_size = max(chunk_size, 1)
+    chunks = [paths[i:i + chunk_size] for i in range(0, len(paths), chunk_size)]
+
+    if workers > 1 and len(chunks) > 1:
+        pool_class = ProcessPoolExecutor if executor == 'process' else ThreadPoolExecutor
+        with pool_class(max_workers=workers) as pool:
+            chunk_results = list(pool.map(_read_json_chunk, chunks, [normalizer] * len(chunks)))
+    else:
+        chunk_results = [_read_json_chunk(chunk, normalizer) for chunk in chunks]
+
+    records = {}
+    errors = []
+    for chunk in chunk_results:
+        for path, record, error in chunk:
+            records[path] = record
+            if error:
+                errors.append((path, error))
+    return records, errors
+
+
+def shard_dirs(root: str, since: str = None) -> List[str]:
+    """列出 root/<量表>/<YYYY>/<MM>/ 分片目录；给出since（time_key格式）时跳过月份早于它的分片"""
+    dirs = []
+    if not root or not os.path.isdir(root):
+        return dirs
+    first_month = since[:7] if since else None
+    with os.scandir(root) as scale_entries:
+        for scale_entry in scale_entries:
+            if not scale_entry.is_dir() or scale_entry.name.startswith('.'):
+                continue
+            with os.scandir(scale_entry.path) as year_entries:
+                for year_entry in year_entries:
+                    if not year_entry.is_dir() or not year_entry.name.isdigit():
+                        continue
+                    if first_month and year_entry.name < first_month[:4]:
+                        continue
+                    with os.scandir(year_entry.path) as month_entries:
+                        dirs.extend(month_entry.path for month_entry in month_entries
+                                    if month_entry.is_dir() and month_entry.name.isdigit()
+                                    and not (first_month and f"{year_entry.name}-{month_entry.name}" < first_month))
+    return dirs
+
+
+def _list_dir_json(directory: str) -> Dict[str, Tuple[int, int]]:
+    """单个目录中的JSON文件 -> (mtime_ns, 大小)"""
+    files = {}
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if entry.name.endswith('.json') and entry.is_file():
+                st = entry.stat()
+                files[os.path.join(directory, entry.name)] = (st.st_mtime_ns, st.st_size)
+    return files
+
+
+def list_json_files(flat_dirs: List[str], shard_root: str = None) -> Dict[str, Tuple[int, int]]:
+    """平铺目录及分片目录中的JSON文件 -> (mtime_ns, 大小)"""
+    files = {}
+    for directory in [d for d in flat_dirs if os.path.isdir(d)] + shard_dirs(shard_root):
+        files.update(_list_dir_json(directory))
+    return files
+
+
+def json_dirs_signature(flat_dirs: List[str], shard_root: str = None) -> List[List]:
+    """平铺目录及分片目录的修改时间（文件新增、删除、移动时随之变化；原地修改文件不变）"""
+    return [[directory, os.stat(directory).st_mtime_ns]
+            for directory in [d for d in flat_dirs if os.path.isdir(d)] + shard_dirs(shard_root)]
+
+
+def diff_json_sources(files: Dict[str, Tuple[int, int]],
+                      known: Dict[str, Optional[Tuple[int, int]]]) -> Dict[str, List]:
+    """比较磁盘上的JSON文件与已导入的来源文件
+
+    known为 来源路径 -> 导入时的 (mtime_ns, 大小)，未记录时为None（视为未修改）。返回：
+    new 新文件；changed 已修改的文件；moved (原路径, 新路径)，按文件名匹配消失的来源与新文件
+    （如迁移到分片目录）；removed 已删除的来源；restat 需要补记 (mtime, 大小) 的来源。
+    """
+    new = [path for path in files if path not in known]
+    vanished = [path for path in known if path not in files]
+    by_name = {}
+    for path in vanished:
+        by_name.setdefault(os.path.basename(path), []).append(path)
+
+    moved = []
+    unmatched = []
+    for path in new:
+        candidates = by_name.get(os.path.basename(path))
+        if candidates:
+            moved.append((candidates.pop(), path))
+        else:
+            unmatched.append(path)
+    moved_sources = {old for old, _ in moved}
+
+    return {
+        'new': unmatched,
+        'changed': [path for path, stat in known.items()
+                    if stat is not None and path in files and tuple(stat) != files[path]],
+        'moved': moved,
+        'removed': [path for path in vanished if path not in moved_sources],
+        'restat': [path for path, stat in known.items() if stat is None and path in files]
+    }
+
+
+class JSONFileStore:
+    """JSON文件存储：每条评估结果保存为一个独立的JSON文件
+
+    扫描清单只保存每个文件的 mtime、大小和摘要字段（见record_summary），记录正文按需从文件读取。
+    清单由主文件和追加写入的变更日志组成：每次保存、删除或扫描只向日志追加变化的条目，
+    日志行数超过清单条目数的一半时才合并重写主文件，单次写入的开销与记录总数无关。
+    """
+
+    # 清单格式版本，格式化逻辑或摘要字段变化时递增以触发重建
+    MANIFEST_VERSION = 4
+    # 变更日志合并的最小行数
+    JOURNAL_COMPACT_MIN = 256
+    # 修改时间距今不足该值（纳秒）的目录不记为已扫描：同一时间戳精度内的后续变化不会改变目录修改时间
+    DIR_SETTLE_NS = 2 * 10 ** 9
+
+    def __init__(self, data_dir: str, extra_dirs: List[str], normalizer: Callable[[Dict], Optional[Dict]],
+                 manifest_path: str = None, workers: int = 0, executor: str = 'thread', chunk_size: int = 256,
+                 layout: str = 'sharded', writer: DurableWriter = None):
+        self.data_dir = data_dir
+        self.layout = layout
+        self.writer = writer or get_durable_writer()
+        self.data_dirs = [data_dir] + [d for d in extra_dirs if d != data_dir]
+        self.normalizer = normalizer
+        self.manifest_path = manifest_path or os.path.join(data_dir, '.scan_manifest')
+        self.journal_path = self.manifest_path + '.journal'
+        self.manifest = None
+        self._lock = threading.RLock()   # 保存可在后台写入线程中进行，清单的修改与遍历需互斥
+        self._dir_mtimes = {}            # 目录 -> 上次列出其文件时的修改时间
+        self._journal_lines = 0
+        self._time_order = None
+        self.workers = workers
+        self.executor = executor
+        self.chunk_size = chunk_size
+        self.load_errors = []
+        self.last_scan_stats = {'hits': 0, 'misses': 0, 'removed': 0}
+        self.total_scan_stats = {'hits': 0, 'misses': 0, 'removed': 0}
+
+    def shard_dir(self, scale_type: str, when: datetime) -> str:
+        """分片目录：data/<量表>/<YYYY>/<MM>"""
+        return os.path.join(self.data_dir, shard_name(scale_type), when.strftime('%Y'), when.strftime('%m'))
+
+    def save(self, record: Dict) -> str:
+        """保存评估结果，返回文件路径
+
+        文件名精确到秒；同一秒内同一患者、同一量表的记录依次加 _1、_2 … 后缀，独占创建，不会互相覆盖。
+        """
+        now = datetime.now()
+        timestamp = now.strftime('%Y%m%d_%H%M%S')
+        scale_type = record.get('scale_type', '')
+        patient_name = record.get('patient_info', {}).get('name', 'Unknown')
+
+        if self.layout == 'sharded':
+            target_dir = self.shard_dir(scale_type, now)
+            os.makedirs(target_dir, exist_ok=True)
+        else:
+            target_dir = self.data_dir
+        filename = self.writer.write_new(
+            os.path.join(target_dir, f"{scale_type}_{patient_name}_{timestamp}.json"), record)
+        self._note_written(filename, record)
+        return filename
+
+    # ---------- 扫描清单 ----------
+
+    def _load_manifest(self) -> Dict[str, Dict]:
+        """读取扫描清单（主文件 + 变更日志）：文件路径 -> {mtime, size, summary}"""
+        if self.manifest is not None:
+            return self.manifest
+
+        self.manifest = {}
+        self._journal_lines = 0
+        if not os.path.exists(self.manifest_path):
+            return self.manifest
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') != self.MANIFEST_VERSION:
+                return self.manifest
+            self.manifest = data.get('files', {})
+        except Exception as e:
+            print(f"读取扫描清单时出错，将重新扫描: {e}")
+            return self.manifest
+
+        # 重放变更日志（忽略写入中断留下的不完整尾行）
+        if os.path.exists(self.journal_path):
+            with open(self.journal_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        change = json.loads(line)
+                    except ValueError:
+                        break
+                    if change.get('entry') is None:
+                        self.manifest.pop(change['path'], None)
+                    else:
+                        self.manifest[change['path']] = change['entry']
+                    self._journal_lines += 1
+        return self.manifest
+
+    def _record_changes(self, paths: Iterable[str]):
+        """把清单中这些路径的当前条目（已移除的记为删除）追加到变更日志，必要时合并"""
+        lines = []
+        for path in paths:
+            lines.append(json.dumps({'path': path, 'entry': self.manifest.get(path)}, ensure_ascii=False) + '\n')
+        if not lines:
+            return
+
+        self._time_order = None
+        if not os.path.exists(self.manifest_path):
+            self._save_manifest()
+            return
+        try:
+            with open(self.journal_path, 'a', encoding='utf-8') as f:
+                f.writelines(lines)
+            self._journal_lines += len(lines)
+        except Exception as e:
+            print(f"写入扫描清单变更日志时出错: {e}")
+        if self._journal_lines > max(self.JOURNAL_COMPACT_MIN, len(self.manifest) // 2):
+            self._save_manifest()
+
+    def _save_manifest(self):
+        """重写清单主文件并清空变更日志（先写临时文件再替换）"""
+        tmp_path = self.manifest_path + '.tmp'
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'version': self.MANIFEST_VERSION, 'files': self.manifest}, f, ensure_ascii=False)
+            os.replace(tmp_path, self.manifest_path)
+            if os.path.exists(self.journal_path):
+                os.remove(self.journal_path)
+            self._journal_lines = 0
+        except Exception as e:
+            print(f"保存扫描清单时出错: {e}")
+
+    def refresh(self) -> Dict[str, int]:
+        """完整扫描平铺目录和全部分片目录：逐个比较文件（包括原地修改、不改变目录修改时间的文件），
+        只解析新增或修改过的文件，并移除已删除文件的条目"""
+        return self._scan(force=True)
+
+    def _scan(self, since: str = None, force: bool = False) -> Dict[str, int]:
+        """增量扫描（查询前自动调用）
+
+        只重新列出修改时间与上次扫描不同的目录：新增、删除、移动或原子替换文件都会改变所在目录的修改时间。
+        给出since时跳过月份早于它的分片目录——分片按保存时间归档，保存不早于评估，其中没有评估时间不早于since的记录。
+        """
+        with self._lock:
+            manifest = self._load_manifest()
+            stats = {'hits': 0, 'misses': 0, 'removed': 0}
+            scan_dirs = [d for d in self.data_dirs if os.path.isdir(d)] + shard_dirs(self.data_dir, since)
+            files = {}
+            rescanned = set()
+            settled = time.time_ns() - self.DIR_SETTLE_NS
+            for directory in scan_dirs:
+                # 先取目录修改时间再列出文件：列出期间的变化留到下次扫描
+                mtime = os.stat(directory).st_mtime_ns
+                if not force and self._dir_mtimes.get(directory) == mtime:
+                    continue
+                files.update(_list_dir_json(directory))
+                rescanned.add(directory)
+                if mtime <= settled:
+                    self._dir_mtimes[directory] = mtime
+                else:
+                    self._dir_mtimes.pop(directory, None)
+
+            pending = []
+            for path, stat in files.items():
+                cached = manifest.get(path)
+                if cached and (cached['mtime'], cached['size']) == stat:
+                    stats['hits'] += 1
+                else:
+                    pending.append(path)
+            stats['misses'] = len(pending)
+
+            # 新增或修改的文件按分块读取（可并行），清单中只保存摘要字段
+            if pending:
+                summaries, self.load_errors = read_json_files(pending, functools.partial(_summarize, self.normalizer),
+                                                              self.workers, self.executor, self.chunk_size)
+                for path in pending:
+                    mtime, size = files[path]
+                    manifest[path] = {'mtime': mtime, 'size': size, 'summary': summaries.get(path)}
+                if self.load_errors:
+                    print(f"{len(self.load_errors)} 个文件加载失败，详见 load_errors")
+            elif rescanned:
+                self.load_errors = []
+
+            # 重新列出的目录中已不存在的文件，以及（未按时间裁剪时）已不存在的目录中的文件
+            existing = set(scan_dirs)
+            removed = [path for path in manifest
+                       if path not in files and (os.path.dirname(path) in rescanned
+                                                 or (since is None and os.path.dirname(path) not in existing))]
+            for path in removed:
+                del manifest[path]
+            stats['removed'] = len(removed)
+            if since is None:
+                self._dir_mtimes = {d: mtime for d, mtime in self._dir_mtimes.items() if d in existing}
+
+            self._record_changes(pending + removed)
+
+            self.last_scan_stats = stats
+            for key, value in stats.items():
+                self.total_scan_stats[key] += value
+            return stats
+
+    def list_files(self) -> List[str]:
+        """列出平铺目录和全部分片目录中的JSON文件"""
+        return list(list_json_files(self.data_dirs, self.data_dir))
+
+    def migrate_to_shards(self, dry_run: bool = False) -> Dict[str, Any]:
+        """将平铺目录（data/、results/）中的文件移动到分片目录，返回迁移报告"""
+        manifest = self._load_manifest()
+        report = {'moved': [], 'skipped': [], 'errors': []}
+        changed = []
+
+        for data_dir in self.data_dirs:
+            if not os.path.exists(data_dir):
+                continue
+
+            for filename in sorted(os.listdir(data_dir)):
+                source = os.path.join(data_dir, filename)
+                if not filename.endswith('.json') or not os.path.isfile(source):
+                    continue
+
+                try:
+                    entry = manifest.get(source)
+                    summary = entry['summary'] if entry else None
+                    if summary is None:
+                        with open(source, 'r', encoding='utf-8') as f:
+                            summary = _summarize(self.normalizer, json.load(f))
+                    if not summary:
+                        report['skipped'].append(source)
+                        continue
+
+                    # 优先使用文件名中的时间戳，其次使用记录中的评估时间
+                    match = FILENAME_TIMESTAMP.search(filename)
+                    if match:
+                        year, month = match.group(1), match.group(2)
+                    else:
+                        key = summary['time']
+                        if not re.match(r'\d{4}-\d{2}', key):
+                            report['skipped'].append(source)
+                            continue
+                        year, month = key[:4], key[5:7]
+
+                    target_dir = os.path.join(self.data_dir, shard_name(summary['scale_type']), year, month)
+                    target = os.path.join(target_dir, filename)
+                    suffix = 1
+                    while os.path.exists(target):
+                        target = os.path.join(target_dir, f"{filename[:-5]}_{suffix}.json")
+                        suffix += 1
+
+                    report['moved'].append((source, target))
+                    if dry_run:
+                        continue
+
+                    os.makedirs(target_dir, exist_ok=True)
+                    os.replace(source, target)
+                    # 移动不改变mtime和大小，直接迁移清单条目避免重新解析
+                    if entry:
+                        manifest[target] = manifest.pop(source)
+                        changed += [source, target]
+
+                except Exception as e:
+                    report['errors'].append((source, str(e)))
+
+        self._record_changes(changed)
+        return report
+
+    def scan_stats(self) -> Dict[str, Dict[str, int]]:
+        """返回最近一次及累计的清单命中/未命中统计"""
+        return {'last': dict(self.last_scan_stats), 'total': dict(self.total_scan_stats)}
+
+    def _ordered_paths(self) -> List[str]:
+        """按评估时间倒序排列的文件路径（清单变化后重建）"""
+        with self._lock:
+            if self._time_order is None:
+                manifest = self.manifest
+                self._time_order = sorted(
+                    (path for path, entry in manifest.items() if entry['summary']),
+                    key=lambda path: manifest[path]['summary']['time'],
+                    reverse=True)
+            return self._time_order
+
+    def _read_record(self, path: str) -> Optional[Dict]:
+        """从文件读取并格式化一条记录；文件已不存在或无法解析时返回None"""
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return self.normalizer(json.load(f))
+        except (OSError, ValueError) as e:
+            print(f"读取记录 {path} 时出错: {e}")
+            return None
+
+    def iter_items(self, scale_type: str = None, patient: str = None, since: str = None,
+                   until: str = None, limit: int = None) -> Iterator[Tuple[str, Dict]]:
+        """按评估时间倒序逐条返回 (记录编号, 记录)；since含、until不含，均为time_key格式
+
+        先按清单中的摘要筛选，再按块（可并行）读取命中的文件；给出since时只扫描不早于其月份的分片目录。
+        """
+        self._scan(since)
+
+        same_scale = scale_matcher(scale_type) if scale_type else None
+
+        def matching_paths():
+            for path in self._ordered_paths():
+                entry = self.manifest.get(path)
+                if not entry or not entry['summary']:
+                    continue
+                summary = entry['summary']
+                if same_scale and not same_scale(summary['scale_type']):
+                    continue
+                if since and summary['time'] < since:
+                    return
+                if until and summary['time'] >= until:
+                    continue
+                if patient and summary['patient'] != patient:
+                    continue
+                yield path
+
+        block_size = max(self.chunk_size, 1) * max(self.workers, 1)
+        count = 0
+        paths = matching_paths()
+        while limit is None or count < limit:
+            block = list(itertools.islice(paths, block_size if limit is None else min(block_size, limit - count)))
+            if not block:
+                return
+            records, _ = read_json_files(block, self.normalizer, self.workers, self.executor, self.chunk_size)
+            for path in block:
+                record = records.get(path)
+                if record:
+                    count += 1
+                    yield path, record
+
+    def iter_records(self, scale_type: str = None, patient: str = None, since: str = None,
+                     until: str = None, limit: int = None) -> Iterator[Dict]:
+        """按评估时间倒序逐条返回记录"""
+        for _, record in self.iter_items(scale_type, patient, since, until, limit):
+            yield record
+
+    def load(self, scale_type: str = None) -> List[Dict]:
+        """加载评估结果（按评估时间倒序）"""
+        return list(self.iter_records(scale_type))
+
+    def delete(self, record_id: str) -> bool:
+        """删除记录文件，返回是否删除成功"""
+        with self._lock:
+            manifest = self._load_manifest()
+            if record_id not in manifest or not os.path.exists(record_id):
+                return False
+            self.writer.remove(record_id)
+            del manifest[record_id]
+            self._record_changes([record_id])
+            return True
+
+    def replace(self, record_id: str, record: Dict) -> bool:
+        """原子改写一条记录（记录编号即文件路径，保持不变），返回是否存在该记录"""
+        with self._lock:
+            manifest = self._load_manifest()
+            if record_id not in manifest or not os.path.exists(record_id):
+                return False
+            self.writer.write(record_id, record)
+            self._note_written(record_id, record)
+            return True
+
+    def _note_written(self, path: str, record: Dict):
+        """把刚写入的文件记入扫描清单，下次扫描无需重新读取"""
+        with self._lock:
+            manifest = self._load_manifest()
+            st = os.stat(path)
+            manifest[path] = {'mtime': st.st_mtime_ns, 'size': st.st_size,
+                              'summary': _summarize(self.normalizer, record)}
+            self._record_changes([path])
+
+    def record_ids(self) -> set:
+        """所有有效记录的编号（即文件路径）"""
+        with self._lock:
+            self._scan()
+            return {path for path, entry in self.manifest.items() if entry['summary']}
+
+    def record_versions(self) -> Dict[str, List[int]]:
+        """所有有效记录的版本：文件路径 -> [mtime_ns, 大小]"""
+        with self._lock:
+            self._scan()
+            return {path: [entry['mtime'], entry['size']] for path, entry in self.manifest.items() if entry['summary']}
+
+    def change_token(self) -> Any:
+        """廉价的存储变化标志：平铺目录及分片目录的修改时间
+
+        文件新增、删除、移动时随之变化；原地修改的文件不会改变它，由refresh逐个比较文件发现。
+        """
+        return json_dirs_signature(self.data_dirs, self.data_dir)
+
+    def get(self, record_id: str) -> Optional[Dict]:
+        """按编号（文件路径）读取记录；不是有效记录文件时返回None"""
+        entry = self._load_manifest().get(record_id)
+        if entry is None:
+            if not os.path.exists(record_id):
+                return None
+            self._scan()
+            entry = self.manifest.get(record_id)
+        if not entry or not entry['summary']:
+            return None
+        return self._read_record(record_id)
+
+    def iter_summary_rows(self, patient_name: str = None) -> Iterator[Dict]:
+        """逐条返回汇总报告所需的字段（只读清单中的摘要，不读取记录文件）"""
+        self._scan()
+        for path in self._ordered_paths():
+            summary = self.manifest[path]['summary']
+            if patient_name and summary['patient'] != patient_name:
+                continue
+            yield {
+                'scale_type': summary['scale_type'] or 'Unknown',
+                'assessment_time': summary['assessment_time'],
+                'total_score': summary['total_score'] if summary['total_score'] is not None else 0,
+                'level': summary['level'] or '',
+                'risk_level': summary['risk_level'] or '低'
+            }
+
+
+class SQLiteStore:
+    """SQLite存储：所有评估结果保存在同一个WAL模式的数据库中"""
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS assessments (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            scale_type TEXT NOT NULL,
+            patient_name TEXT,
+            assessment_time TEXT,
+            total_score REAL,
+            level TEXT,
+            risk_level TEXT,
+            source TEXT UNIQUE,
+            payload TEXT NOT NULL,
+            version INTEGER NOT NULL DEFAULT 0
+        );
+        CREATE INDEX IF NOT EXISTS idx_assessments_scale_time ON assessments(scale_type, assessment_time);
+        CREATE INDEX IF NOT EXISTS idx_assessments_patient_time ON assessments(patient_name, assessment_time);
+        CREATE INDEX IF NOT EXISTS idx_assessments_time ON assessments(assessment_time);
+        CREATE INDEX IF NOT EXISTS idx_assessments_total_score ON assessments(total_score);
+        CREATE INDEX IF NOT EXISTS idx_assessments_level ON assessments(level);
+        CREATE INDEX IF NOT EXISTS idx_assessments_risk_level ON assessments(risk_level);
+        CREATE TABLE IF NOT EXISTS store_meta (
+            key TEXT PRIMARY KEY,
+            value TEXT
+        );
+        CREATE TABLE IF NOT EXISTS json_sources (
+            source TEXT PRIMARY KEY,
+            mtime INTEGER,
+            size INTEGER
+        );
+    """
+
+    # 持久化模式对应的synchronous级别
+    SYNCHRONOUS = {'strict': 'FULL', 'batched': 'NORMAL', 'relaxed': 'OFF'}
+
+    def __init__(self, db_path: str, json_dirs: List[str], normalizer: Callable[[Dict], Optional[Dict]],
+                 workers: int = 0, executor: str = 'thread', chunk_size: int = 256, durability: str = None,
+                 writer: DurableWriter = None):
+        self.db_path = db_path
+        # 改写、删除由JSON文件导入的记录时，来源文件经同一写入器处理；数据库的synchronous级别默认与之一致
+        self.writer = writer or get_durable_writer()
+        durability = durability or self.writer.mode
+        self.json_dirs = json_dirs
+        self.normalizer = normalizer
+        self.workers = workers
+        self.executor = executor
+        self.chunk_size = chunk_size
+        self.load_errors = []
+        self._lock = threading.Lock()
+
+        db_dir = os.path.dirname(db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute(f"PRAGMA synchronous={self.SYNCHRONOUS.get(durability, 'NORMAL')}")
+        self.conn.executescript(self.SCHEMA)
+        columns = {row[1] for row in self.conn.execute('PRAGMA table_info(assessments)')}
+        if 'version' not in columns:
+            # 早期数据库没有版本列
+            self.conn.execute('ALTER TABLE assessments ADD COLUMN version INTEGER NOT NULL DEFAULT 0')
+        self.conn.commit()
+
+    def close(self):
+        """关闭数据库连接"""
+        self.conn.close()
+
+    def _row_values(self, normalized: Dict, source: str = None) -> tuple:
+        """提取索引列"""
+        score_result = normalized.get('score_result', {})
+        total_score = score_result.get('total_score')
+        if not isinstance(total_score, (int, float)):
+            total_score = None
+        return (
+            normalized.get('scale_type', ''),
+            normalized.get('patient_info', {}).get('name', ''),
+            time_key(normalized.get('assessment_time', '')),
+            total_score,
+            score_result.get('level', ''),
+            score_result.get('risk_level', ''),
+            source,
+            json.dumps(normalized, ensure_ascii=False)
+        )
+
+    def save(self, record: Dict) -> str:
+        """保存评估结果，返回记录编号"""
+        normalized = self.normalizer(record)
+        if normalized is None:
+            raise ValueError("评估结果格式无效")
+
+        with self._lock:
+            cursor = self.conn.execute(
+                'INSERT INTO assessments (scale_type, patient_name, assessment_time, total_score, '
+                'level, risk_level, source, payload) VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                self._row_values(normalized))
+            self.conn.commit()
+
+        return f"{self.db_path}#{cursor.lastrowid}"
+
+    def _update_row(self, normalized: Dict, source: str) -> bool:
+        """用来源文件的新内容更新记录，返回是否存在该来源的记录（调用方持有锁）"""
+        values = self._row_values(normalized, source)
+        cursor = self.conn.execute(
+            'UPDATE assessments SET scale_type = ?, patient_name = ?, assessment_time = ?, total_score = ?, '
+            'level = ?, risk_level = ?, payload = ?, version = version + 1 WHERE source = ?',
+            values[:6] + values[7:] + (source,))
+        return cursor.rowcount > 0
+
+    def reconcile_json_files(self) -> Dict[str, int]:
+        """与JSON目录（平铺目录及分片目录）对齐：导入新文件、重新读取修改过的文件、
+        跟随移动到其他目录的文件（记录编号不变），并移除来源文件已删除的记录"""
+        files = list_json_files(self.json_dirs, self.json_dirs[0] if self.json_dirs else None)
+        known = {source: (mtime, size) for source, mtime, size in
+                 self.conn.execute('SELECT source, mtime, size FROM json_sources')}
+        for (source,) in self.conn.execute('SELECT source FROM assessments WHERE source IS NOT NULL'):
+            known.setdefault(source, None)
+        diff = diff_json_sources(files, known)
+
+        to_read = diff['new'] + diff['changed']
+        to_read += [new for old, new in diff['moved'] if known[old] is None or tuple(known[old]) != files[new]]
+        records, self.load_errors = read_json_files(to_read, self.normalizer,
+                                                    self.workers, self.executor, self.chunk_size)
+        if self.load_errors:
+            print(f"{len(self.load_errors)} 个文件导入失败，详见 load_errors")
+
+        with self._lock:
+            for old, new in diff['moved']:
+                self.conn.execute('UPDATE assessments SET source = ? WHERE source = ?', (new, old))
+            for source in diff['removed']:
+                self.conn.execute('DELETE FROM assessments WHERE source = ?', (source,))
+
+            imported = 0
+            for source in to_read:
+                record = records.get(source)
+                if record and not self._update_row(record, source):
+                    self.conn.execute(
+                        'INSERT INTO assessments (scale_type, patient_name, assessment_time, total_score, '
+                        'level, risk_level, source, payload) VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                        self._row_values(record, source))
+                    imported += 1
+
+            # 无法解析的文件同样记下 (mtime, 大小)，文件不变时不再重复读取
+            gone = diff['removed'] + [old for old, _ in diff['moved']]
+            self.conn.executemany('DELETE FROM json_sources WHERE source = ?', [(source,) for source in gone])
+            seen = to_read + diff['restat'] + [new for _, new in diff['moved']]
+            self.conn.executemany('INSERT OR REPLACE INTO json_sources (source, mtime, size) VALUES (?, ?, ?)',
+                                  [(source,) + files[source] for source in seen])
+            self.conn.commit()
+
+        return {'imported': imported, 'updated': len(diff['changed']), 'moved': len(diff['moved']),
+                'removed': len(diff['removed'])}
+
+    def relocate_sources(self, moves: List[Tuple[str, str]]):
+        """来源文件已被移动（如 migrate-layout）时更新记录的来源路径，记录编号不变"""
+        with self._lock:
+            for old, new in moves:
+                self.conn.execute('UPDATE assessments SET source = ? WHERE source = ?', (new, old))
+                self.conn.execute('UPDATE OR REPLACE json_sources SET source = ? WHERE source = ?', (new, old))
+            self.conn.commit()
+
+    def _sync_json_dirs(self, force: bool = False) -> Optional[Dict[str, int]]:
+        """量表模块仍直接写JSON文件：目录（含分片目录）的修改时间变化时与JSON文件对齐
+
+        原地修改的文件不会改变目录修改时间，由refresh（force）逐个比较文件的修改时间和大小发现。
+        """
+        signature = json.dumps(json_dirs_signature(self.json_dirs, self.json_dirs[0] if self.json_dirs else None),
+                               ensure_ascii=False)
+        row = self.conn.execute("SELECT value FROM store_meta WHERE key = 'json_dirs'").fetchone()
+        if not force and row and row[0] == signature:
+            return None
+
+        stats = self.reconcile_json_files()
+        with self._lock:
+            self.conn.execute("INSERT OR REPLACE INTO store_meta (key, value) VALUES ('json_dirs', ?)", (signature,))
+            self.conn.commit()
+        return stats
+
+    def refresh(self) -> Dict[str, int]:
+        """立即与JSON目录完整对齐（包括原地修改的文件），返回对齐统计"""
+        return self._sync_json_dirs(force=True)
+
+    def _where_clause(self, scale_type: str = None, patient: str = None,
+                      since: str = None, until: str = None) -> tuple:
+        """组合筛选条件
+
+        量表类型按量表目录归一（UPDRS与UPDRS-III为同一量表，同same_scale）：先由索引取出库中的各个量表名称，
+        再把与所查询量表相同的名称作为 IN 条件（仍可使用索引）。
+        """
+        conditions = []
+        params = []
+        if scale_type:
+            same_scale = scale_matcher(scale_type)
+            names = [name for (name,) in self.conn.execute('SELECT DISTINCT scale_type FROM assessments')
+                     if same_scale(name)]
+            conditions.append(f"scale_type IN ({', '.join('?' * len(names))})" if names else '0')
+            params.extend(names)
+        if patient:
+            conditions.append('patient_name = ?')
+            params.append(patient)
+        if since:
+            conditions.append('assessment_time >= ?')
+            params.append(since)
+        if until:
+            conditions.append('assessment_time < ?')
+            params.append(until)
+
+        if not conditions:
+            return '', ()
+        return ' WHERE ' + ' AND '.join(conditions), tuple(params)
+
+    def iter_items(self, scale_type: str = None, patient: str = None, since: str = None,
+                   until: str = None, limit: int = None) -> Iterator[Tuple[str, Dict]]:
+        """按评估时间倒序逐条返回 (记录编号, 记录)（游标逐行读取）；since含、until不含"""
+        self._sync_json_dirs()
+
+        clause, params = self._where_clause(scale_type, patient, since, until)
+        sql = f'SELECT id, payload FROM assessments{clause} ORDER BY assessment_time DESC'
+        if limit is not None:
+            sql += ' LIMIT ?'
+            params = params + (limit,)
+
+        for row_id, payload in self.conn.execute(sql, params):
+            yield f"{self.db_path}#{row_id}", json.loads(payload)
+
+    def iter_records(self, scale_type: str = None, patient: str = None, since: str = None,
+                     until: str = None, limit: int = None) -> Iterator[Dict]:
+        """按评估时间倒序逐条返回记录"""
+        for _, record in self.iter_items(scale_type, patient, since, until, limit):
+            yield record
+
+    def delete(self, record_id: str) -> bool:
+        """删除记录；由JSON文件导入的记录同时删除源文件，避免再次导入"""
+        row_id = int(record_id.rpartition('#')[2])
+        row = self.conn.execute('SELECT source FROM assessments WHERE id = ?', (row_id,)).fetchone()
+        if row is None:
+            return False
+        if row[0] and os.path.exists(row[0]):
+            self.writer.remove(row[0])
+        with self._lock:
+            self.conn.execute('DELETE FROM assessments WHERE id = ?', (row_id,))
+            if row[0]:
+                self.conn.execute('DELETE FROM json_sources WHERE source = ?', (row[0],))
+            self.conn.commit()
+        return True
+
+    def replace(self, record_id: str, record: Dict) -> bool:
+        """用新内容替换一条记录（记录编号不变、版本递增），返回是否存在该记录
+
+        由JSON文件导入的记录同时改写源文件，并记下其新的 (mtime, 大小)，对齐时不再重复读取。
+        """
+        normalized = self.normalizer(record)
+        if normalized is None:
+            raise ValueError("评估结果格式无效")
+        row_id = int(record_id.rpartition('#')[2])
+        row = self.conn.execute('SELECT source FROM assessments WHERE id = ?', (row_id,)).fetchone()
+        if row is None:
+            return False
+        source = row[0]
+        if source:
+            self.writer.write(source, normalized)
+        values = self._row_values(normalized, source)
+        with self._lock:
+            self.conn.execute(
+                'UPDATE assessments SET scale_type = ?, patient_name = ?, assessment_time = ?, total_score = ?, '
+                'level = ?, risk_level = ?, payload = ?, version = version + 1 WHERE id = ?',
+                values[:6] + values[7:] + (row_id,))
+            if source:
+                st = os.stat(source)
+                self.conn.execute('INSERT OR REPLACE INTO json_sources (source, mtime, size) VALUES (?, ?, ?)',
+                                  (source, st.st_mtime_ns, st.st_size))
+            self.conn.commit()
+        return True
+
+    def load(self, scale_type: str = None) -> List[Dict]:
+        """加载评估结果（按评估时间倒序）"""
+        return list(self.iter_records(scale_type))
+
+    def record_ids(self) -> set:
+        """所有记录的编号（与save返回值格式一致：<数据库路径>#<id>）"""
+        self._sync_json_dirs()
+        return {f"{self.db_path}#{row[0]}" for row in self.conn.execute('SELECT id FROM assessments')}
+
+    def record_versions(self) -> Dict[str, int]:
+        """所有记录的版本（记录内容每次更新时递增）：记录编号 -> 版本"""
+        self._sync_json_dirs()
+        return {f"{self.db_path}#{row_id}": version
+                for row_id, version in self.conn.execute('SELECT id, version FROM assessments')}
+
+    def change_token(self) -> Any:
+        """廉价的存储变化标志：先按目录修改时间与JSON文件对齐，再取其他连接提交的计数
+        （PRAGMA data_version）与本连接累计修改的行数"""
+        self._sync_json_dirs()
+        with self._lock:
+            return [self.conn.execute('PRAGMA data_version').fetchone()[0], self.conn.total_changes]
+
+    def get(self, record_id: str) -> Optional[Dict]:
+        """按编号取记录"""
+        row = self.conn.execute('SELECT payload FROM assessments WHERE id = ?',
+                                (int(record_id.rpartition('#')[2]),)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def iter_summary_rows(self, patient_name: str = None) -> Iterator[Dict]:
+        """逐条返回汇总报告所需的字段（索引列；评估时间取记录中的原始写法，索引列是比较用的time_key）"""
+        self._sync_json_dirs()
+
+        sql = ("SELECT scale_type, json_extract(payload, '$.assessment_time'), total_score, level, risk_level "
+               'FROM assessments')
+        params = ()
+        if patient_name:
+            sql += ' WHERE patient_name = ?'
+            params = (patient_name,)
+        sql += ' ORDER BY assessment_time DESC'
+
+        for scale_type, assessment_time, total_score, level, risk_level in self.conn.execute(sql, params):
+            yield {
+                'scale_type': scale_type or 'Unknown',
+                'assessment_time': assessment_time or '',
+                'total_score': total_score if total_score is not None else 0,
+                'level': level or '',
+                'risk_level': risk_level or '低'
+            }
+
+
+class SegmentLogStore:
+    """JSON Lines分段日志存储：评估结果追加写入滚动的段文件，避免每条记录一个文件
+
+    段文件 seg_<编号>.jsonl 每行一条记录 {"id", "seq", "record"} 或删除标记 {"delete": 记录编号}；
+    同一记录可追加多次（如JSON来源文件被修改），以序号seq最大的一行为准，与所在段的编号无关；
+    同名 .idx 文件逐行保存每行的偏移、长度及筛选/汇总字段，读取记录时按偏移直接定位。
+    当前段超过max_bytes后滚动到新段；整理（compact）把已封存的小段合并为一个新段，
+    并剔除已删除的记录。同一目录在一个进程内应共享一个实例（见get_segment_store）。
+    """
+
+    SEGMENT_PATTERN = re.compile(r'^seg_(\d{6})\.jsonl$')
+
+    def __init__(self, segment_dir: str, json_dirs: List[str], normalizer: Callable[[Dict], Optional[Dict]],
+                 max_bytes: int = 4 * 1024 * 1024, compact_interval: float = 0, workers: int = 0,
+                 executor: str = 'thread', chunk_size: int = 256, durability: str = None,
+                 batch_records: int = None, writer: DurableWriter = None):
+        self.segment_dir = segment_dir
+        # 改写、删除由JSON文件导入的记录时，来源文件经同一写入器处理；段文件的同步方式默认与之一致
+        self.writer = writer or get_durable_writer()
+        durability = durability or self.writer.mode
+        batch_records = batch_records or self.writer.batch_records
+        self.json_dirs = json_dirs
+        self.normalizer = normalizer
+        self.max_bytes = max_bytes
+        self.workers = workers
+        self.executor = executor
+        self.chunk_size = chunk_size
+        self.durability = durability
+        self.batch_records = max(batch_records, 1)
+        self.meta_path = os.path.join(segment_dir, '.import_state')
+        self.load_errors = []
+
+        self._lock = threading.RLock()
+        self._compact_lock = threading.Lock()
+        self._segments = {}     # 段编号 -> {'size', 'records': 记录编号集合, 'tombstones': 删除标记集合}
+        self._entries = {}      # 记录编号 -> 索引项（含所在段编号）
+        self._deleted = set()
+        self._readers = {}
+        self._appender = None
+        self._index_appender = None
+        self._active = None
+        self._unsynced = 0
+        self._time_order = None
+        self._seq = 0           # 已分配的最大记录序号
+        self._appended = 0      # 本实例追加的行数（记录与删除标记）
+
+        os.makedirs(segment_dir, exist_ok=True)
+        self._open()
+
+        self._stop = threading.Event()
+        self._compactor = None
+        if compact_interval > 0:
+            self._compactor = threading.Thread(target=self._compact_loop, args=(compact_interval,),
+                                               name='segment-compactor', daemon=True)
+            self._compactor.start()
+
+    # ---------- 段文件与索引 ----------
+
+    def _segment_path(self, number: int) -> str:
+        return os.path.join(self.segment_dir, f"seg_{number:06d}.jsonl")
+
+    def _index_path(self, number: int) -> str:
+        return os.path.join(self.segment_dir, f"seg_{number:06d}.idx")
+
+    @staticmethod
+    def _index_entry(item: Dict, offset: int, length: int) -> Dict[str, Any]:
+        """由段文件中的一行生成索引项"""
+        if 'delete' in item:
+            return {'delete': item['delete'], 'offset': offset, 'length': length}
+
+        return dict({'id': item['id'], 'seq': item.get('seq', 0), 'offset': offset, 'length': length},
+                    **record_summary(item['record']), source=item.get('source'))
+
+    def _read_index(self, number: int) -> Optional[List[Dict]]:
+        """读取段索引；索引缺失或损坏时返回None"""
+        try:
+            with open(self._index_path(number), 'r', encoding='utf-8') as f:
+                return [json.loads(line) for line in f if line.strip()]
+        except (OSError, ValueError):
+            return None
+
+    def _write_index(self, number: int, entries: List[Dict]):
+        """整体重写段索引（先写临时文件再替换）"""
+        tmp_path = self._index_path(number) + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for entry in entries:
+                f.write(json.dumps({k: v for k, v in entry.items() if k != 'segment'}, ensure_ascii=False) + '\n')
+        os.replace(tmp_path, self._index_path(number))
+
+    def _scan_segment(self, number: int) -> Tuple[List[Dict], int]:
+        """逐行扫描段文件重建索引，返回 (索引项, 有效长度)；遇到不完整的尾行即停止"""
+        entries = []
+        offset = 0
+        with open(self._segment_path(number), 'rb') as f:
+            for line in f:
+                if not line.endswith(b'\n'):
+                    break
+                try:
+                    entries.append(self._index_entry(json.loads(line), offset, len(line)))
+                except (ValueError, KeyError):
+                    break
+                offset += len(line)
+        return entries, offset
+
+    def _open(self):
+        """加载所有段的索引；索引与段文件不一致时（如写入中断）重新扫描并截掉不完整的尾部"""
+        numbers = sorted(int(match.group(1)) for match in
+                         (self.SEGMENT_PATTERN.match(name) for name in os.listdir(self.segment_dir)) if match)
+
+        for number in numbers:
+            size = os.path.getsize(self._segment_path(number))
+            entries = self._read_index(number)
+            indexed = max((e['offset'] + e['length'] for e in entries), default=0) if entries is not None else -1
+            if indexed != size:
+                entries, valid_size = self._scan_segment(number)
+                if valid_size < size:
+                    print(f"段文件 {self._segment_path(number)} 尾部不完整，已截断 {size - valid_size} 字节")
+                    with open(self._segment_path(number), 'r+b') as f:
+                        f.truncate(valid_size)
+                    size = valid_size
+                self._write_index(number, entries)
+
+            self._segments[number] = {'size': size, 'records': set(), 'tombstones': set()}
+            for entry in entries:
+                self._register(number, entry)
+
+        self._open_active(numbers[-1] if numbers else 1)
+
+    def _register(self, number: int, entry: Dict):
+        """把索引项登记到内存索引
+
+        同一记录出现多次时以序号大的为准（没有序号的旧数据以后登记的为准），
+        因此整理生成的新段即使编号更大，也不会覆盖之后在当前段追加的新内容。
+        """
+        segment = self._segments[number]
+        if 'delete' in entry:
+            segment['tombstones'].add(entry['delete'])
+            self._deleted.add(entry['delete'])
+            return
+
+        previous = self._entries.get(entry['id'])
+        self._seq = max(self._seq, entry.get('seq', 0))
+        if previous and previous.get('seq', 0) > entry.get('seq', 0):
+            return
+        if previous and previous['segment'] in self._segments:
+            self._segments[previous['segment']]['records'].discard(entry['id'])
+        entry['segment'] = number
+        self._entries[entry['id']] = entry
+        segment['records'].add(entry['id'])
+
+    def _open_active(self, number: int):
+        """打开当前追加写入的段"""
+        self._segments.setdefault(number, {'size': 0, 'records': set(), 'tombstones': set()})
+        self._active = number
+        self._appender = open(self._segment_path(number), 'ab')
+        self._index_appender = open(self._index_path(number), 'a', encoding='utf-8')
+
+    def _close_active(self):
+        """同步并关闭当前段"""
+        self.sync()
+        self._appender.close()
+        self._index_appender.close()
+
+    def _reader(self, number: int):
+        """按段缓存的只读文件句柄"""
+        reader = self._readers.get(number)
+        if reader is None:
+            reader = self._readers[number] = open(self._segment_path(number), 'rb')
+        return reader
+
+    def _append(self, item: Dict) -> Dict:
+        """追加一行到当前段（调用方持有锁），超过段大小上限时先滚动到新段；记录行分配新的序号"""
+        if 'record' in item:
+            item = dict(item, seq=self._seq + 1)
+        line = (json.dumps(item, ensure_ascii=False, separators=(',', ':')) + '\n').encode('utf-8')
+        segment = self._segments[self._active]
+        if segment['size'] and segment['size'] + len(line) > self.max_bytes:
+            self._close_active()
+            self._open_active(max(self._segments) + 1)
+            segment = self._segments[self._active]
+
+        entry = self._index_entry(item, segment['size'], len(line))
+        self._appender.write(line)
+        self._appender.flush()
+        self._index_appender.write(json.dumps(entry, ensure_ascii=False) + '\n')
+        self._index_appender.flush()
+        segment['size'] += len(line)
+        self._register(self._active, entry)
+        self._time_order = None
+        self._appended += 1
+
+        self._unsynced += 1
+        if self.durability == 'strict' or (self.durability == 'batched' and self._unsynced >= self.batch_records):
+            self.sync()
+        return entry
+
+    def sync(self):
+        """将当前段fsync到磁盘（索引可由段文件重建，不单独同步）"""
+        with self._lock:
+            if self._unsynced and self.durability != 'relaxed':
+                os.fsync(self._appender.fileno())
+            self._unsynced = 0
+
+    def close(self):
+        """停止后台整理线程，同步并关闭所有文件"""
+        self._stop.set()
+        if self._compactor is not None:
+            self._compactor.join()
+        with self._lock:
+            if self._appender is None:
+                return
+            self._close_active()
+            self._appender = None
+            for reader in self._readers.values():
+                reader.close()
+            self._readers.clear()
+
+    # ---------- 读写接口 ----------
+
+    def save(self, record: Dict) -> str:
+        """追加保存评估结果，返回记录编号"""
+        normalized = self.normalizer(record)
+        if normalized is None:
+            raise ValueError("评估结果格式无效")
+
+        record_id = uuid.uuid4().hex
+        with self._lock:
+            self._append({'id': record_id, 'record': normalized})
+        return f"{self.segment_dir}#{record_id}"
+
+    def get(self, record_id: str) -> Optional[Dict]:
+        """按偏移直接读取一条记录；记录不存在或已删除时返回None
+
+        record_id可以是save返回的 <目录>#<编号>，也可以只是编号。
+        """
+        record_id = record_id.rpartition('#')[2]
+        with self._lock:
+            entry = self._entries.get(record_id)
+            if entry is None or record_id in self._deleted:
+                return None
+            reader = self._reader(entry['segment'])
+            reader.seek(entry['offset'])
+            line = reader.read(entry['length'])
+        return json.loads(line)['record']
+
+    def delete(self, record_id: str) -> bool:
+        """追加删除标记（记录在整理时才真正移除），返回是否删除成功
+
+        由JSON文件导入的记录同时删除源文件。
+        """
+        record_id = record_id.rpartition('#')[2]
+        with self._lock:
+            entry = self._entries.get(record_id)
+            if entry is None or record_id in self._deleted:
+                return False
+            self._append({'delete': record_id})
+        if entry.get('source') and os.path.exists(entry['source']):
+            self.writer.remove(entry['source'])
+        return True
+
+    def replace(self, record_id: str, record: Dict) -> bool:
+        """追加同一记录编号的新内容（以序号最大的一行为准），返回是否存在该记录
+
+        由JSON文件导入的记录同时改写源文件，并记下其新的 (mtime, 大小)，对齐时不再重复读取。
+        """
+        normalized = self.normalizer(record)
+        if normalized is None:
+            raise ValueError("评估结果格式无效")
+        record_id = record_id.rpartition('#')[2]
+        with self._lock:
+            entry = self._entries.get(record_id)
+            if entry is None or record_id in self._deleted:
+                return False
+            source = entry.get('source')
+            if source:
+                self.writer.write(source, normalized)
+                self._append({'id': record_id, 'source': source, 'record': normalized})
+            else:
+                self._append({'id': record_id, 'record': normalized})
+            self.sync()
+        if source:
+            meta = self._load_meta()
+            st = os.stat(source)
+            meta['sources'][source] = [st.st_mtime_ns, st.st_size]
+            self._save_meta(meta)
+        return True
+
+    def reconcile_json_files(self) -> Dict[str, int]:
+        """与JSON目录（平铺目录及分片目录）对齐：追加新文件、追加修改过的文件的新内容、
+        跟随移动到其他目录的文件（记录编号不变），并为来源文件已删除的记录追加删除标记"""
+        files = list_json_files(self.json_dirs, self.json_dirs[0] if self.json_dirs else None)
+        meta = self._load_meta()
+        with self._lock:
+            by_source = {entry['source']: record_id for record_id, entry in self._entries.items()
+                         if entry.get('source') and record_id not in self._deleted}
+        known = {source: tuple(stat) if stat else None for source, stat in meta['sources'].items()}
+        for source in by_source:
+            known.setdefault(source, None)
+        diff = diff_json_sources(files, known)
+
+        to_read = diff['new'] + diff['changed']
+        to_read += [new for old, new in diff['moved'] if known[old] is None or known[old] != files[new]]
+        records, self.load_errors = read_json_files(to_read, self.normalizer,
+                                                    self.workers, self.executor, self.chunk_size)
+        if self.load_errors:
+            print(f"{len(self.load_errors)} 个文件导入失败，详见 load_errors")
+
+        moved_to = {new: by_source.get(old) for old, new in diff['moved']}
+        imported = 0
+        with self._lock:
+            for old, new in diff['moved']:
+                record_id = by_source.get(old)
+                if record_id and new not in records:
+                    record = self.get(record_id)
+                    if record:
+                        self._append({'id': record_id, 'source': new, 'record': record})
+            for source in diff['removed']:
+                record_id = by_source.get(source)
+                if record_id and record_id not in self._deleted:
+                    self._append({'delete': record_id})
+            for source in to_read:
+                record = records.get(source)
+                if not record:
+                    continue
+                record_id = moved_to.get(source) or by_source.get(source)
+                if record_id is None:
+                    record_id = uuid.uuid4().hex
+                    imported += 1
+                self._append({'id': record_id, 'source': source, 'record': record})
+            self.sync()
+
+        # 无法解析的文件同样记下 (mtime, 大小)，文件不变时不再重复读取
+        for source in diff['removed'] + [old for old, _ in diff['moved']]:
+            meta['sources'].pop(source, None)
+        for source in to_read + diff['restat'] + [new for _, new in diff['moved']]:
+            meta['sources'][source] = list(files[source])
+        self._save_meta(meta)
+        return {'imported': imported, 'updated': len(diff['changed']), 'moved': len(diff['moved']),
+                'removed': len(diff['removed'])}
+
+    def relocate_sources(self, moves: List[Tuple[str, str]]):
+        """来源文件已被移动（如 migrate-layout）时更新记录的来源路径，记录编号不变"""
+        meta = self._load_meta()
+        with self._lock:
+            by_source = {entry['source']: record_id for record_id, entry in self._entries.items()
+                         if entry.get('source') and record_id not in self._deleted}
+            for old, new in moves:
+                record_id = by_source.get(old)
+                record = self.get(record_id) if record_id else None
+                if record:
+                    self._append({'id': record_id, 'source': new, 'record': record})
+                if old in meta['sources']:
+                    meta['sources'][new] = meta['sources'].pop(old)
+            self.sync()
+        self._save_meta(meta)
+
+    def _load_meta(self) -> Dict[str, Any]:
+        """读取导入状态：JSON目录的修改时间及各来源文件导入时的 (mtime, 大小)"""
+        try:
+            with open(self.meta_path, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            meta = {}
+        if 'sources' not in meta:
+            # 旧格式只记录了已导入的文件，(mtime, 大小) 在下次对齐时补记
+            meta = {'json_dirs': None, 'sources': {source: None for source in meta.get('imported', [])}}
+        return meta
+
+    def _save_meta(self, meta: Dict[str, Any]):
+        tmp_path = self.meta_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False)
+        os.replace(tmp_path, self.meta_path)
+
+    def _sync_json_dirs(self, force: bool = False) -> Optional[Dict[str, int]]:
+        """量表模块仍直接写JSON文件：目录（含分片目录）的修改时间变化时与JSON文件对齐
+
+        原地修改的文件不会改变目录修改时间，由refresh（force）逐个比较文件的修改时间和大小发现。
+        """
+        signature = json_dirs_signature(self.json_dirs, self.json_dirs[0] if self.json_dirs else None)
+        if not force and self._load_meta().get('json_dirs') == signature:
+            return None
+
+        stats = self.reconcile_json_files()
+        meta = self._load_meta()
+        meta['json_dirs'] = signature
+        self._save_meta(meta)
+        return stats
+
+    def refresh(self) -> Dict[str, int]:
+        """立即与JSON目录完整对齐（包括原地修改的文件），返回对齐统计"""
+        return self._sync_json_dirs(force=True)
+
+    def _ordered_ids(self) -> List[str]:
+        """按评估时间倒序排列的有效记录编号（数据变化后重建）"""
+        with self._lock:
+            if self._time_order is None:
+                self._time_order = sorted(
+                    (record_id for record_id in self._entries if record_id not in self._deleted),
+                    key=lambda record_id: self._entries[record_id]['time'], reverse=True)
+            return self._time_order
+
+    def _iter_entries(self, scale_type: str = None, patient: str = None,
+                      since: str = None, until: str = None) -> Iterator[Tuple[str, Dict]]:
+        """按索引字段筛选（不读取记录内容）"""
+        self._sync_json_dirs()
+        same_scale = scale_matcher(scale_type) if scale_type else None
+        for record_id in self._ordered_ids():
+            entry = self._entries.get(record_id)
+            if entry is None:
+                continue
+            if same_scale and not same_scale(entry['scale_type']):
+                continue
+            if since and entry['time'] < since:
+                return
+            if until and entry['time'] >= until:
+                continue
+            if patient and entry['patient'] != patient:
+                continue
+            yield record_id, entry
+
+    def iter_items(self, scale_type: str = None, patient: str = None, since: str = None,
+                   until: str = None, limit: int = None) -> Iterator[Tuple[str, Dict]]:
+        """按评估时间倒序逐条返回 (记录编号, 记录)；since含、until不含"""
+        count = 0
+        for record_id, _ in self._iter_entries(scale_type, patient, since, until):
+            if limit is not None and count >= limit:
+                return
+            record = self.get(record_id)
+            if record is None:
+                continue
+            count += 1
+            yield f"{self.segment_dir}#{record_id}", record
+
+    def iter_records(self, scale_type: str = None, patient: str = None, since: str = None,
+                     until: str = None, limit: int = None) -> Iterator[Dict]:
+        """按评估时间倒序逐条返回记录"""
+        for _, record in self.iter_items(scale_type, patient, since, until, limit):
+            yield record
+
+    def load(self, scale_type: str = None) -> List[Dict]:
+        """加载评估结果（按评估时间倒序）"""
+        return list(self.iter_records(scale_type))
+
+    def record_ids(self) -> set:
+        """所有有效记录的编号（与save返回值格式一致：<目录>#<编号>）"""
+        self._sync_json_dirs()
+        return {f"{self.segment_dir}#{record_id}" for record_id in self._ordered_ids()}
+
+    def record_versions(self) -> Dict[str, int]:
+        """所有有效记录的版本（即最新一行的序号）：记录编号 -> 版本"""
+        self._sync_json_dirs()
+        with self._lock:
+            return {f"{self.segment_dir}#{record_id}": self._entries[record_id].get('seq', 0)
+                    for record_id in self._ordered_ids()}
+
+    def change_token(self) -> Any:
+        """廉价的存储变化标志：先按目录修改时间与JSON文件对齐，再取已追加的行数
+        （同一目录在一个进程内共享一个实例，所有写入都经过本实例）"""
+        self._sync_json_dirs()
+        with self._lock:
+            return [self._seq, self._appended]
+
+    def iter_summary_rows(self, patient_name: str = None) -> Iterator[Dict]:
+        """逐条返回汇总报告所需的字段（只读索引，不解析记录内容；早期的索引项没有原始评估时间，才读取记录）"""
+        for record_id, entry in self._iter_entries(patient=patient_name):
+            assessment_time = entry.get('assessment_time')
+            if assessment_time is None:
+                assessment_time = (self.get(record_id) or {}).get('assessment_time', '')
+            yield {
+                'scale_type': entry['scale_type'] or 'Unknown',
+                'assessment_time': assessment_time,
+                'total_score': entry['total_score'] if entry['total_score'] is not None else 0,
+                'level': entry['level'] or '',
+                'risk_level': entry['risk_level'] or '低'
+            }
+
+    # ---------- 整理 ----------
+
+    def _needs_compaction(self, number: int) -> bool:
+        """段是否为小段，或含有可清理的已删除记录/失效的删除标记"""
+        segment = self._segments[number]
+        return (segment['size'] < self.max_bytes // 2
+                or any(record_id in self._deleted for record_id in segment['records'])
+                or any(record_id not in self._entries for record_id in segment['tombstones']))
+
+    def compact(self) -> Dict[str, int]:
+        """合并已封存的小段并剔除已删除的记录，返回整理报告
+
+        新段先完整写入并fsync，再删除旧段；被剔除记录的删除标记随新段保留，
+        下一次整理时确认记录已不存在后才丢弃，因此任何时刻中断都不会让已删除的记录复现。
+        """
+        with self._compact_lock:
+            with self._lock:
+                candidates = sorted(number for number in self._segments
+                                    if number != self._active and self._needs_compaction(number))
+                dropped = [record_id for number in candidates for record_id in self._segments[number]['records']
+                           if record_id in self._deleted]
+                if not candidates or (len(candidates) == 1 and not dropped
+                                      and not self._segments[candidates[0]]['tombstones'] - set(self._entries)):
+                    return {'merged': 0, 'dropped_records': 0, 'dropped_tombstones': 0, 'bytes_before': 0,
+                            'bytes_after': 0}
+
+                keep = []
+                for number in candidates:
+                    for record_id in self._segments[number]['records']:
+                        if record_id not in self._deleted:
+                            keep.append(dict(self._entries[record_id]))
+                all_tombstones = {record_id for number in candidates
+                                  for record_id in self._segments[number]['tombstones']}
+                tombstones = {record_id for record_id in all_tombstones if record_id in self._entries}
+                bytes_before = sum(self._segments[number]['size'] for number in candidates)
+                target = max(self._segments) + 1
+                self._segments[target] = {'size': 0, 'records': set(), 'tombstones': set()}
+
+            # 旧段已封存、内容不再变化，复制时无需持有锁
+            entries = []
+            tmp_path = self._segment_path(target) + '.tmp'
+            offset = 0
+            with open(tmp_path, 'wb') as out:
+                for entry in sorted(keep, key=lambda e: (e['segment'], e['offset'])):
+                    with self._lock:
+                        reader = self._reader(entry['segment'])
+                        reader.seek(entry['offset'])
+                        line = reader.read(entry['length'])
+                    out.write(line)
+                    entry.update(offset=offset)
+                    entries.append(entry)
+                    offset += len(line)
+                for record_id in sorted(tombstones):
+                    line = (json.dumps({'delete': record_id}) + '\n').encode('utf-8')
+                    out.write(line)
+                    entries.append({'delete': record_id, 'offset': offset, 'length': len(line)})
+                    offset += len(line)
+                out.flush()
+                os.fsync(out.fileno())
+            os.replace(tmp_path, self._segment_path(target))
+            self._write_index(target, entries)
+
+            with self._lock:
+                for number in candidates:
+                    reader = self._readers.pop(number, None)
+                    if reader:
+                        reader.close()
+                    del self._segments[number]
+                for record_id in dropped:
+                    del self._entries[record_id]
+                self._segments[target]['size'] = offset
+                for entry in entries:
+                    self._register(target, entry)
+                self._time_order = None
+
+            for number in candidates:
+                os.remove(self._segment_path(number))
+                if os.path.exists(self._index_path(number)):
+                    os.remove(self._index_path(number))
+
+            return {
+                'merged': len(candidates),
+                'dropped_records': len(dropped),
+                'dropped_tombstones': len(all_tombstones) - len(tombstones),
+                'bytes_before': bytes_before,
+                'bytes_after': offset
+            }
+
+    def _compact_loop(self, interval: float):
+        """后台整理线程：每隔interval秒整理一次"""
+        while not self._stop.wait(interval):
+            try:
+                self.compact()
+            except Exception as e:
+                print(f"整理段文件时出错: {e}")
+
+
+_segment_stores = {}
+_segment_stores_lock = threading.Lock()
+
+
+def get_segment_store(segment_dir: str, *args, **kwargs) -> SegmentLogStore:
+    """获取目录对应的共享分段日志存储（进程退出时同步并关闭）"""
+    key = os.path.abspath(segment_dir)
+    with _segment_stores_lock:
+        store = _segment_stores.get(key)
+        if store is None:
+            store = _segment_stores[key] = SegmentLogStore(segment_dir, *args, **kwargs)
+            atexit.register(store.close)
+        return store
+
+
+def create_store(engine: str, data_dir: str, extra_dirs: List[str],
+                 normalizer: Callable[[Dict], Optional[Dict]], db_path: str = None,
+                 manifest_path: str = None, layout: str = 'sharded', writer: DurableWriter = None,
+                 segment_dir: str = None, segment_max_bytes: int = 4 * 1024 * 1024, compact_interval: float = 0,
+                 **load_options):
+    """根据存储引擎名称创建存储后端
+
+    layout: JSON引擎的保存布局，'sharded'（data/<量表>/<YYYY>/<MM>/）或 'flat'
+    writer: 原子写入器（决定持久化模式），默认按配置创建；JSON引擎用它保存记录，
+            SQLite、分段日志引擎用它改写、删除来源JSON文件，并按其模式设置数据库或段文件的同步方式
+    segment_dir / segment_max_bytes / compact_interval: 分段日志引擎的目录、段大小上限和后台整理间隔（秒，0为不整理）
+    load_options: workers / executor / chunk_size，控制JSON文件的并行读取
+    """
+    if engine == 'json':
+        return JSONFileStore(data_dir, extra_dirs, normalizer, manifest_path, layout=layout,
+                             writer=writer, **load_options)
+    elif engine == 'sqlite':
+        return SQLiteStore(db_path or os.path.join(data_dir, 'assessments.db'),
+                           [data_dir] + [d for d in extra_dirs if d != data_dir], normalizer,
+                           writer=writer, **load_options)
+    elif engine == 'segments':
+        return get_segment_store(segment_dir or os.path.join(data_dir, 'segments'),
+                                 [data_dir] + [d for d in extra_dirs if d != data_dir], normalizer,
+                                 max_bytes=segment_max_bytes, compact_interval=compact_interval,
+                                 writer=writer, **load_options)
+    raise ValueError(f"未知的存储引擎：{engine}")
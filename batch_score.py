@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+命令行批量评分
+开发人员：LIUYING
+功能：无需图形界面，从文件或标准输入逐行读取CSV/JSONL格式的条目得分，
+      按评分规则登记计算评分结果并输出评分后的JSONL，可选保存到评估数据存储；
+      多进程并行、分块流式处理，内存占用与输入规模无关（不导入tkinter、matplotlib）
+
+用法：
+    python batch_score.py [文件 ...] [--format csv|jsonl] [--scale 量表] [--workers N]
+                          [--chunk-size N] [--output 文件] [--save] [--engine json|sqlite|segments]
+
+输入（文件省略或为“-”时读取标准输入）：
+    JSONL  每行一个对象：{"scale_type": "MMSE", "patient_info": {...}, "responses": {"1": 1, ...}}；
+           没有responses时，除患者信息等字段外的其他键均视为条目得分；options为评分选项（如low_education）
+    CSV    首行为列名：scale_type、患者信息列（name、gender、age等）、assessor、assessment_time，
+           其余列为条目得分（列名为条目编号，也可带 resp_ 前缀，即分析归档的列名）；空单元格视为未作答
+输出：
+    每行一个对象：{"line": 行号, "source": 文件, "record": v2记录} 或 {"line": 行号, "source": 文件, "error": 错误信息}
+"""
+
+import argparse
+import csv
+import io
+import json
+import os
+import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from config import STORAGE_ENGINE
+from record_schema import build_record
+from scoring_engine import get_definition, score_scale
+
+# 输入中不属于条目得分的字段
+PATIENT_FIELDS = ('name', 'gender', 'age', 'birth_date', 'birth_year', 'education', 'duration',
+                  'assessment_date', 'patient_id')
+RECORD_FIELDS = ('scale_type', 'assessor', 'assessment_time', 'options', 'patient_info', 'responses')
+RESPONSE_PREFIX = 'resp_'
+
+DEFAULT_CHUNK_SIZE = 500
+
+
+# ---------- 读取输入 ----------
+
+def _open_input(path: str):
+    if path == '-':
+        return io.TextIOWrapper(sys.stdin.buffer, encoding='utf-8-sig')
+    return open(path, 'r', encoding='utf-8-sig', newline='')
+
+
+def _input_format(path: str, fmt: Optional[str]) -> str:
+    if fmt:
+        return fmt
+    return 'csv' if path.lower().endswith('.csv') else 'jsonl'
+
+
+def iter_rows(paths: List[str], fmt: str = None) -> Iterator[Tuple[str, int, Any]]:
+    """逐行读取输入，返回 (来源, 行号, 原始行)；JSONL的原始行为字符串，CSV为字典"""
+    for path in paths or ['-']:
+        source = 'stdin' if path == '-' else path
+        f = _open_input(path)
+        try:
+            if _input_format(path, fmt) == 'csv':
+                # 首行为列名，数据从第2行开始
+                for line, row in enumerate(csv.DictReader(f), 2):
+                    yield source, line, row
+            else:
+                for line, text in enumerate(f, 1):
+                    if text.strip():
+                        yield source, line, text
+        finally:
+            if path != '-':
+                f.close()
+
+
+def _chunks(items: Iterable, size: int) -> Iterator[List]:
+    iterator = iter(items)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+# ---------- 评分（在进程池中执行） ----------
+
+def _is_blank(value) -> bool:
+    return value is None or (isinstance(value, str) and not value.strip())
+
+
+def parse_row(raw: Any, default_scale: str = None) -> Tuple[str, Dict, Dict, Dict, Dict]:
+    """把一行输入拆分为 (量表, 患者信息, 条目得分, 评分选项, 其他记录字段)"""
+    data = json.loads(raw) if isinstance(raw, str) else dict(raw)
+    if not isinstance(data, dict):
+        raise ValueError("每行应为一个JSON对象")
+
+    scale = data.get('scale_type') or default_scale
+    if not scale:
+        raise ValueError("缺少scale_type（或使用 --scale 指定）")
+    definition = get_definition(scale)
+
+    patient_info = dict(data.get('patient_info') or {})
+    for field in PATIENT_FIELDS:
+        if not _is_blank(data.get(field)):
+            patient_info.setdefault(field, data[field])
+
+    option_names = [adjustment['option'] for adjustment in definition.get('adjustments', ())]
+    options = dict(data.get('options') or {})
+    for name in option_names:
+        if not _is_blank(data.get(name)):
+            options.setdefault(name, str(data[name]).strip().lower() in ('1', 'true', 'yes', 'y', '是'))
+
+    if 'responses' in data:
+        responses = dict(data['responses'] or {})
+    else:
+        skipped = set(PATIENT_FIELDS) | set(RECORD_FIELDS) | set(option_names)
+        responses = {}
+        for key, value in data.items():
+            if key in skipped or _is_blank(value):
+                continue
+            item = key[len(RESPONSE_PREFIX):] if key.startswith(RESPONSE_PREFIX) else key
+            responses[item] = value
+    extra = {field: data[field] for field in ('assessor', 'assessment_time') if not _is_blank(data.get(field))}
+    return definition['scale_type'], patient_info, responses, options, extra
+
+
+def _score_chunk(rows: List[Tuple[str, int, Any]], default_scale: str = None) -> List[Dict]:
+    """评分一块输入行，返回对应的输出对象"""
+    output = []
+    for source, line, raw in rows:
+        try:
+            scale_type, patient_info, responses, options, extra = parse_row(raw, default_scale)
+            score_result = score_scale(scale_type, responses, **options)
+            record = build_record(scale_type, patient_info, responses, score_result,
+                                  assessment_time=extra.get('assessment_time'), assessor=extra.get('assessor'))
+            output.append({'line': line, 'source': source, 'record': record})
+        except Exception as e:
+            output.append({'line': line, 'source': source, 'error': str(e)})
+    return output
+
+
+def score_stream(rows: Iterable[Tuple[str, int, Any]], default_scale: str = None, workers: int = 1,
+                 chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[Dict]:
+    """按输入顺序逐条返回评分结果
+
+    多进程时同时在途的块数不超过 workers×2，读取速度不会超过评分速度，内存占用保持有界。
+    """
+    chunks = _chunks(rows, chunk_size)
+    if workers <= 1:
+        for chunk in chunks:
+            yield from _score_chunk(chunk, default_scale)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(pool.submit(_score_chunk, chunk, default_scale))
+            if len(pending) >= workers * 2:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+
+# ---------- 命令行入口 ----------
+
+def main(argv=None) -> int:
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description="神经内科量表评估系统 - 命令行批量评分")
+    parser.add_argument('files', nargs='*', help="输入文件（CSV或JSONL），省略或为“-”时读取标准输入")
+    parser.add_argument('--format', choices=['csv', 'jsonl'], help="输入格式（默认按扩展名判断，标准输入为jsonl）")
+    parser.add_argument('--scale', help="输入中没有scale_type列时使用的量表")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="并行进程数")
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help="每个进程一次处理的行数")
+    parser.add_argument('--output', help="输出文件（默认输出到标准输出）")
+    parser.add_argument('--save', action='store_true', help="同时保存评分后的记录到评估数据存储")
+    parser.add_argument('--engine', choices=['json', 'sqlite', 'segments'], default=STORAGE_ENGINE,
+                        help="--save时使用的存储引擎")
+    args = parser.parse_args(argv)
+
+    system = None
+    if args.save:
+        # 批量保存不逐条fsync，由存储按批次落盘
+        from scoring_system import ScoringSystem
+        system = ScoringSystem(storage_engine=args.engine, durability='batched')
+
+    out = open(args.output, 'w', encoding='utf-8') if args.output else sys.stdout
+    counts = {'scored': 0, 'errors': 0, 'saved': 0}
+    try:
+        rows = iter_rows(args.files, args.format)
+        for result in score_stream(rows, args.scale, max(args.workers, 1), max(args.chunk_size, 1)):
+            if 'error' in result:
+                counts['errors'] += 1
+                print(f"{result['source']} 第{result['line']}行：{result['error']}", file=sys.stderr)
+            else:
+                counts['scored'] += 1
+                if system is not None:
+                    result['record_id'] = system.save_record(result['record'])
+                    counts['saved'] += 1
+            out.write(json.dumps(result, ensure_ascii=False) + '\n')
+    finally:
+        if out is not sys.stdout:
+            out.close()
+        if system is not None:
+            # 保存索引，落盘批量模式下尚未同步的记录
+            system.close()
+
+    print(f"评分 {counts['scored']} 行，出错 {counts['errors']} 行"
+          + (f"，已保存 {counts['saved']} 条" if args.save else ""), file=sys.stderr)
+    return 1 if counts['errors'] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -13,10 +13,55 @@ DEVELOPER = "LIUYING"
 DATA_DIR = "data"
 RESULTS_DIR = "results"
 
+# 存储引擎："json"（每条记录一个JSON文件）、"sqlite"（单一WAL数据库）或 "segments"（JSON Lines分段日志）
+STORAGE_ENGINE = "json"
+SQLITE_DB_PATH = "data/assessments.db"
+
+# 分段日志引擎：段文件目录、单段大小上限（字节）、后台整理间隔（秒，0为关闭，可用 maintenance.py compact-segments 手动整理）
+SEGMENT_DIR = "data/segments"
+SEGMENT_MAX_BYTES = 4 * 1024 * 1024
+SEGMENT_COMPACT_INTERVAL = 300
+
+# JSON引擎的保存布局："sharded"（data/<量表>/<YYYY>/<MM>/）或 "flat"（data/下平铺）
+# 旧的平铺文件可通过 python maintenance.py migrate-layout 迁移
+JSON_LAYOUT = "sharded"
+
+# JSON引擎的增量扫描清单（记录每个文件的mtime、大小和摘要字段；变化追加到 <清单>.journal，定期合并）
+SCAN_MANIFEST_PATH = "data/.scan_manifest"
+
+# 二级索引目录（按存储引擎分子目录）
+INDEX_DIR = "data/indexes"
+
+# 保存的视图定义（视图的记录编号集合保存在索引目录中）
+SAVED_VIEWS_PATH = "data/.saved_views"
+
+# 查询结果缓存的最大条数（LRU淘汰，数据保存或删除后旧结果自动失效）
+QUERY_CACHE_SIZE = 128
+
+# 列式分析归档（按存储引擎追加后缀，如 analytics_archive_json；
+# 自动追加扩展名：安装pyarrow时为.parquet，否则为.npz）
+ANALYTICS_ARCHIVE_PATH = "data/analytics_archive"
+
+# 写入持久化模式（所有写入均为临时文件+替换的原子写入）：
+# "strict" 每条记录fsync；"batched" 每DURABILITY_BATCH_RECORDS条或DURABILITY_BATCH_MS毫秒统一fsync；
+# "relaxed" 不主动fsync，适合批量导入
+DURABILITY_MODE = "strict"
+DURABILITY_BATCH_RECORDS = 32
+DURABILITY_BATCH_MS = 200
+
+# 冷加载并行读取：LOAD_WORKERS<=1时单线程；LOAD_EXECUTOR为"thread"或"process"
+# （JSON解析受GIL限制，大量文件时"process"更快；Windows打包版需在main中调用freeze_support）
+LOAD_WORKERS = 0
+LOAD_EXECUTOR = "thread"
+LOAD_CHUNK_SIZE = 256
+
 # UI配置
 WINDOW_SIZE = (1200, 800)
 MIN_WINDOW_SIZE = (1000, 700)
 
+# 数据管理表格每次加载的记录数（滚动到底部或按Page Down时加载下一页）
+DATA_PAGE_SIZE = 100
+
 # 颜色主题
 COLORS = {
     'primary': '#2E86AB',
@@ -7,7 +7,7 @@
 """
 
 import tkinter as tk
-from tkinter import ttk, messagebox, filedialog
+from tkinter import ttk, messagebox, filedialog, simpledialog
 import json
 import os
 from datetime import datetime, timedelta
@@ -18,6 +18,8 @@ import matplotlib.dates as mdates
 from matplotlib import font_manager
 import pandas as pd
 from scoring_system import ScoringSystem
+from scale_catalog import all_scales
+from config import DATA_PAGE_SIZE
 
 # 设置中文字体
 plt.rcParams['font.sans-serif'] = ['SimHei', 'Microsoft YaHei', 'DejaVu Sans']
@@ -29,8 +31,14 @@ class DataManager:
     def __init__(self, parent, main_app):
         self.parent = parent
         self.main_app = main_app
-        self.scoring_system = ScoringSystem()
+        # 与主界面共用评分系统（同一存储连接与索引）
+        self.scoring_system = getattr(main_app, 'scoring_system', None) or ScoringSystem()
         self.current_data = []
+        self.current_ids = []
+        # 键集分页状态：当前查询条件与下一页游标（None表示已加载完）
+        self.page_filters = {}
+        self.page_cursor = None
+        self.page_loading = False
         
     def show_data_management_interface(self):
         """显示数据管理界面"""
@@ -98,14 +106,99 @@ class DataManager:
         self.scale_type_var = tk.StringVar(value="全部")
         scale_combo = ttk.Combobox(filter_frame, 
                                   textvariable=self.scale_type_var,
-                                  values=["全部", "MMSE", "HAMD", "UPDRS"],
+                                  values=["全部"] + [scale['name'] for scale in all_scales()],
                                   width=10, state='readonly')
         scale_combo.pack(side='left', padx=(5, 20))
         
-        # 患者姓名筛选
+        # 患者姓名筛选（支持姓名片段、拼音或首字母，输入时下拉提示匹配的患者）
         ttk.Label(filter_frame, text="患者姓名:").pack(side='left')
         self.patient_name_var = tk.StringVar()
-        ttk.Entry(filter_frame, textvariable=self.patient_name_var, width=15).pack(side='left', padx=(5, 20))
+        self.patient_name_combo = ttk.Combobox(filter_frame, textvariable=self.patient_name_var, width=15)
+        self.patient_name_combo.pack(side='left', padx=(5, 20))
+        self.patient_name_combo.bind('<KeyRelease>', self.update_patient_suggestions)
+        self.patient_name_combo.bind('<Return>', lambda event: self.search_data())
+        self.patient_name_combo.bind('<<ComboboxSelected>>', lambda event: self.search_data())
+        
+        # 评估日期范围（YYYY-MM-DD，均含当天；可留空）
+        date_frame = ttk.Frame(control_frame)
+        date_frame.pack(fill='x', pady=(8, 0))
+        
+        ttk.Label(date_frame, text="评估日期:").pack(side='left')
+        self.date_from_var = tk.StringVar()
+        ttk.Entry(date_frame, textvariable=self.date_from_var, width=12).pack(side='left', padx=(5, 5))
+        ttk.Label(date_frame, text="至").pack(side='left')
+        self.date_to_var = tk.StringVar()
+        ttk.Entry(date_frame, textvariable=self.date_to_var, width=12).pack(side='left', padx=(5, 20))
+        
+        # 常用时间范围
+        self.date_range_var = tk.StringVar(value="全部时间")
+        range_combo = ttk.Combobox(date_frame,
+                                   textvariable=self.date_range_var,
+                                   values=["全部时间", "最近7天", "最近30天", "最近90天", "本月", "今年"],
+                                   width=10, state='readonly')
+        range_combo.pack(side='left')
+        range_combo.bind('<<ComboboxSelected>>', self.apply_date_range)
+        
+        # 其他筛选条件
+        extra_frame = ttk.Frame(control_frame)
+        extra_frame.pack(fill='x', pady=(8, 0))
+        
+        ttk.Label(extra_frame, text="风险等级:").pack(side='left')
+        self.risk_level_var = tk.StringVar(value="全部")
+        ttk.Combobox(extra_frame, textvariable=self.risk_level_var,
+                     values=["全部", "低", "中", "高", "极高"],
+                     width=6, state='readonly').pack(side='left', padx=(5, 15))
+        
+        ttk.Label(extra_frame, text="严重程度:").pack(side='left')
+        self.level_var = tk.StringVar()
+        ttk.Entry(extra_frame, textvariable=self.level_var, width=10).pack(side='left', padx=(5, 15))
+        
+        ttk.Label(extra_frame, text="性别:").pack(side='left')
+        self.gender_var = tk.StringVar(value="全部")
+        ttk.Combobox(extra_frame, textvariable=self.gender_var,
+                     values=["全部", "男", "女"],
+                     width=5, state='readonly').pack(side='left', padx=(5, 15))
+        
+        ttk.Label(extra_frame, text="总分:").pack(side='left')
+        self.score_min_var = tk.StringVar()
+        ttk.Entry(extra_frame, textvariable=self.score_min_var, width=5).pack(side='left', padx=(5, 2))
+        ttk.Label(extra_frame, text="-").pack(side='left')
+        self.score_max_var = tk.StringVar()
+        ttk.Entry(extra_frame, textvariable=self.score_max_var, width=5).pack(side='left', padx=(2, 15))
+        
+        ttk.Label(extra_frame, text="年龄:").pack(side='left')
+        self.age_min_var = tk.StringVar()
+        ttk.Entry(extra_frame, textvariable=self.age_min_var, width=5).pack(side='left', padx=(5, 2))
+        ttk.Label(extra_frame, text="-").pack(side='left')
+        self.age_max_var = tk.StringVar()
+        ttk.Entry(extra_frame, textvariable=self.age_max_var, width=5).pack(side='left', padx=(2, 15))
+        
+        ttk.Label(extra_frame, text="评估者:").pack(side='left')
+        self.assessor_var = tk.StringVar()
+        ttk.Entry(extra_frame, textvariable=self.assessor_var, width=10).pack(side='left', padx=(5, 15))
+        
+        ttk.Label(extra_frame, text="全文:").pack(side='left')
+        self.text_query_var = tk.StringVar()
+        text_entry = ttk.Entry(extra_frame, textvariable=self.text_query_var, width=16)
+        text_entry.pack(side='left', padx=(5, 15))
+        text_entry.bind('<Return>', lambda event: self.search_data())
+        
+        ttk.Button(extra_frame, text="查询说明", command=self.explain_search).pack(side='left')
+        
+        # 保存的视图（常用筛选条件，记录集合随保存、删除增量维护）
+        view_frame = ttk.Frame(control_frame)
+        view_frame.pack(fill='x', pady=(8, 0))
+        
+        ttk.Label(view_frame, text="视图:").pack(side='left')
+        self.saved_view_var = tk.StringVar()
+        self.saved_view_combo = ttk.Combobox(view_frame, textvariable=self.saved_view_var,
+                                             values=self.scoring_system.saved_view_names(),
+                                             width=24, state='readonly')
+        self.saved_view_combo.pack(side='left', padx=(5, 10))
+        self.saved_view_combo.bind('<<ComboboxSelected>>', lambda event: self.open_saved_view())
+        
+        ttk.Button(view_frame, text="保存为视图", command=self.save_current_view).pack(side='left', padx=5)
+        ttk.Button(view_frame, text="删除视图", command=self.delete_current_view).pack(side='left', padx=5)
         
         # 查询按钮
         search_btn = ttk.Button(filter_frame,
@@ -143,7 +236,8 @@ class DataManager:
         # 滚动条
         v_scrollbar = ttk.Scrollbar(table_frame, orient='vertical', command=self.data_tree.yview)
         h_scrollbar = ttk.Scrollbar(table_frame, orient='horizontal', command=self.data_tree.xview)
-        self.data_tree.configure(yscrollcommand=v_scrollbar.set, xscrollcommand=h_scrollbar.set)
+        self.data_tree.configure(yscrollcommand=lambda first, last: self.on_tree_scroll(v_scrollbar, first, last),
+                                 xscrollcommand=h_scrollbar.set)
         
         # 布局
         self.data_tree.pack(side='left', fill='both', expand=True)
@@ -153,6 +247,10 @@ class DataManager:
         # 双击查看详情
         self.data_tree.bind('<Double-1>', self.view_detail)
         
+        # 翻页（滚动到底部时自动加载下一页）
+        self.data_tree.bind('<Next>', lambda event: self.scroll_page(1))
+        self.data_tree.bind('<Prior>', lambda event: self.scroll_page(-1))
+        
         # 底部按钮
         button_frame = ttk.Frame(data_frame)
         button_frame.pack(fill='x', pady=10)
@@ -272,26 +370,181 @@ class DataManager:
         
     def search_data(self):
         """搜索数据"""
-        scale_type = self.scale_type_var.get()
-        patient_name = self.patient_name_var.get().strip()
+        filters = self.get_search_filters()
+        if filters is None:
+            return
+            
+        # 由各字段索引求交集得到记录编号，按页读取命中的记录
+        self.start_paging(filters)
         
-        # 加载所有数据
-        if scale_type == "全部":
-            all_data = self.scoring_system.load_assessment_results()
-        else:
-            all_data = self.scoring_system.load_assessment_results(scale_type)
+    def explain_search(self):
+        """显示当前查询条件使用的索引及每一步的候选数量"""
+        filters = self.get_search_filters()
+        if filters is None:
+            return
+        messagebox.showinfo("查询说明", self.scoring_system.explain_query(**filters))
+        
+    def get_search_filters(self):
+        """读取查询控制面板中的条件；输入有误时提示并返回None"""
+        try:
+            since, until = self.get_date_range()
+        except ValueError:
+            messagebox.showerror("错误", "日期格式应为 YYYY-MM-DD")
+            return None
             
-        # 按患者姓名筛选
-        if patient_name:
-            all_data = [data for data in all_data 
-                       if patient_name.lower() in data.get('patient_info', {}).get('name', '').lower()]
+        try:
+            numbers = {key: float(var.get()) if var.get().strip() else None
+                       for key, var in (('score_min', self.score_min_var), ('score_max', self.score_max_var),
+                                        ('age_min', self.age_min_var), ('age_max', self.age_max_var))}
+        except ValueError:
+            messagebox.showerror("错误", "总分和年龄范围应为数字")
+            return None
             
-        self.current_data = all_data
-        self.update_data_tree()
+        # 下拉框选"全部"表示不筛选
+        selected = {key: None if var.get() == "全部" else var.get()
+                    for key, var in (('scale_type', self.scale_type_var), ('risk_level', self.risk_level_var),
+                                     ('gender', self.gender_var))}
+        return dict(
+            patient=self.patient_name_var.get().strip() or None,
+            level=self.level_var.get().strip() or None,
+            assessor=self.assessor_var.get().strip() or None,
+            text=self.text_query_var.get().strip() or None,
+            since=since,
+            until=until,
+            **selected,
+            **numbers
+        )
+        
+    def save_current_view(self):
+        """把当前查询条件保存为视图；常用时间范围“最近N天”保存为相对天数"""
+        filters = self.get_search_filters()
+        if filters is None:
+            return
+        view_name = simpledialog.askstring("保存为视图", "视图名称：", parent=self.parent)
+        if not view_name or not view_name.strip():
+            return
+        days = {"最近7天": 7, "最近30天": 30, "最近90天": 90}.get(self.date_range_var.get())
+        if days:
+            filters.update(since=None, until=None, days=days)
+        try:
+            self.scoring_system.save_view(view_name, filters)
+        except Exception as e:
+            messagebox.showerror("错误", f"保存视图失败：{e}")
+            return
+        self.saved_view_combo['values'] = self.scoring_system.saved_view_names()
+        self.saved_view_var.set(view_name.strip())
+        
+    def open_saved_view(self):
+        """打开所选视图"""
+        view_name = self.saved_view_var.get()
+        if not view_name:
+            return
+        try:
+            items = self.scoring_system.open_saved_view(view_name)
+        except ValueError as e:
+            messagebox.showerror("错误", str(e))
+            return
+        # 视图结果一次性给出，不再分页
+        self.page_cursor = None
+        self.set_current_items(items)
+        
+    def delete_current_view(self):
+        """删除所选视图"""
+        view_name = self.saved_view_var.get()
+        if not view_name:
+            messagebox.showwarning("提示", "请选择要删除的视图")
+            return
+        if messagebox.askyesno("确认", f"确定要删除视图“{view_name}”吗？"):
+            self.scoring_system.delete_saved_view(view_name)
+            self.saved_view_combo['values'] = self.scoring_system.saved_view_names()
+            self.saved_view_var.set('')
+        
+    def get_date_range(self):
+        """读取日期范围输入，返回 (since, until)；截止日期含当天，因此until为次日零点"""
+        since = until = None
+        date_from = self.date_from_var.get().strip()
+        date_to = self.date_to_var.get().strip()
+        if date_from:
+            since = datetime.strptime(date_from, '%Y-%m-%d')
+        if date_to:
+            until = datetime.strptime(date_to, '%Y-%m-%d') + timedelta(days=1)
+        return since, until
+        
+    def apply_date_range(self, event=None):
+        """按所选常用时间范围填写日期并查询"""
+        today = datetime.now()
+        choice = self.date_range_var.get()
+        starts = {
+            "最近7天": today - timedelta(days=6),
+            "最近30天": today - timedelta(days=29),
+            "最近90天": today - timedelta(days=89),
+            "本月": today.replace(day=1),
+            "今年": today.replace(month=1, day=1)
+        }
+        if choice in starts:
+            self.date_from_var.set(starts[choice].strftime('%Y-%m-%d'))
+            self.date_to_var.set(today.strftime('%Y-%m-%d'))
+        else:
+            self.date_from_var.set('')
+            self.date_to_var.set('')
+        self.search_data()
+        
+    def update_patient_suggestions(self, event=None):
+        """根据已输入的姓名片段或拼音更新下拉候选"""
+        if event is not None and event.keysym in ('Return', 'Up', 'Down', 'Escape'):
+            return
+        self.patient_name_combo['values'] = self.scoring_system.suggest_patient_names(self.patient_name_var.get())
         
     def refresh_data(self):
-        """刷新数据"""
-        self.current_data = self.scoring_system.load_assessment_results()
+        """刷新数据：重新扫描存储（包括外部修改的记录）后从第一页重新加载"""
+        self.scoring_system.refresh()
+        self.start_paging({})
+        
+    def start_paging(self, filters):
+        """按新的查询条件从第一页开始加载"""
+        self.page_filters = filters
+        items, self.page_cursor = self.scoring_system.query_page(filters, page_size=DATA_PAGE_SIZE)
+        self.set_current_items(items)
+        
+    def load_next_page(self):
+        """在表格末尾追加下一页记录；已加载完时返回False"""
+        if self.page_cursor is None or self.page_loading:
+            return False
+        self.page_loading = True
+        try:
+            items, self.page_cursor = self.scoring_system.query_page(
+                self.page_filters, after=self.page_cursor, page_size=DATA_PAGE_SIZE)
+            start = len(self.current_data)
+            self.current_ids.extend(record_id for record_id, _ in items)
+            self.current_data.extend(record for _, record in items)
+            self.insert_tree_rows(start)
+        finally:
+            self.page_loading = False
+        return bool(items)
+        
+    def load_all_pages(self):
+        """加载剩余的全部页（统计、图表、导出针对整个查询结果）"""
+        while self.load_next_page():
+            pass
+        
+    def on_tree_scroll(self, scrollbar, first, last):
+        """表格滚动时同步滚动条，滚动到底部时加载下一页"""
+        scrollbar.set(first, last)
+        if float(last) >= 1.0 and self.page_cursor is not None:
+            self.data_tree.after_idle(self.load_next_page)
+            
+    def scroll_page(self, direction):
+        """Page Up / Page Down：按页滚动表格，向下翻到末尾时先加载下一页"""
+        if direction > 0 and self.data_tree.yview()[1] >= 1.0:
+            self.load_next_page()
+        self.data_tree.yview_scroll(direction, 'pages')
+        return 'break'
+        
+    def set_current_items(self, items):
+        """设置当前显示的 (记录编号, 记录) 并刷新表格"""
+        items = list(items)
+        self.current_ids = [record_id for record_id, _ in items]
+        self.current_data = [record for _, record in items]
         self.update_data_tree()
         
     def update_data_tree(self):
@@ -300,8 +553,11 @@ class DataManager:
         for item in self.data_tree.get_children():
             self.data_tree.delete(item)
             
-        # 插入新数据
-        for data in self.current_data:
+        self.insert_tree_rows(0)
+        
+    def insert_tree_rows(self, start):
+        """把current_data中从start开始的记录追加到表格（行号即在current_ids中的位置）"""
+        for row, data in enumerate(self.current_data[start:], start):
             patient_info = data.get('patient_info', {})
             score_result = data.get('score_result', {})
             
@@ -327,7 +583,7 @@ class DataManager:
                 score_result.get('risk_level', '')
             )
             
-            self.data_tree.insert('', 'end', values=values, tags=(data,))
+            self.data_tree.insert('', 'end', iid=str(row), values=values, tags=(data,))
             
     def view_detail(self, event):
         """双击查看详情"""
@@ -447,11 +703,25 @@ class DataManager:
             return
             
         if messagebox.askyesno("确认", "确定要删除选中的记录吗？此操作不可撤销。"):
-            # 这里应该实现删除文件的逻辑
-            messagebox.showinfo("提示", "删除功能正在开发中...")
+            deleted = set()
+            for row in selection:
+                try:
+                    if self.scoring_system.delete_assessment_result(self.current_ids[int(row)]):
+                        deleted.add(int(row))
+                except Exception as e:
+                    print(f"删除记录时出错: {e}")
+            failed = len(selection) - len(deleted)
+                    
+            # 从当前列表中移除已删除的记录
+            self.set_current_items((record_id, data)
+                                   for row, (record_id, data) in enumerate(zip(self.current_ids, self.current_data))
+                                   if row not in deleted)
+            if failed:
+                messagebox.showwarning("提示", f"{failed} 条记录删除失败")
             
     def generate_statistics(self):
         """生成统计报告"""
+        self.load_all_pages()
         if not self.current_data:
             messagebox.showwarning("提示", "没有可统计的数据")
             return
@@ -508,16 +778,12 @@ class DataManager:
         
     def patient_statistics(self):
         """按患者统计"""
+        self.load_all_pages()
         if not self.current_data:
             messagebox.showwarning("提示", "没有可统计的数据")
             return
             
-        patient_stats = {}
-        for data in self.current_data:
-            patient_name = data.get('patient_info', {}).get('name', '未知')
-            if patient_name not in patient_stats:
-                patient_stats[patient_name] = []
-            patient_stats[patient_name].append(data)
+        patient_stats = self.group_by_patient()
             
         report = f"""=== 按患者统计报告 ===
 生成时间：{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
@@ -538,8 +804,36 @@ class DataManager:
         self.stats_text.delete('1.0', 'end')
         self.stats_text.insert('1.0', report)
         
+    def group_by_patient(self):
+        """按患者登记的患者编号分组当前记录，返回 {患者: [记录, ...]}
+        
+        同名的不同患者以“姓名（患者编号）”区分；未登记的记录（如匿名患者）按姓名分组。
+        """
+        self.scoring_system.sync_indexes()
+        registry = self.scoring_system.patient_registry
+        groups = {}
+        for record_id, data in zip(self.current_ids, self.current_data):
+            patient_id = registry.patient_of(record_id)
+            key = (patient_id, None) if patient_id else (None, data.get('patient_info', {}).get('name', '未知'))
+            groups.setdefault(key, []).append(data)
+            
+        names = {}
+        for patient_id, _ in groups:
+            if patient_id:
+                name = registry.patient(patient_id)['name']
+                names.setdefault(name, []).append(patient_id)
+        labeled = {}
+        for (patient_id, name), assessments in groups.items():
+            if patient_id:
+                name = registry.patient(patient_id)['name']
+                if len(names[name]) > 1:
+                    name = f"{name}（{patient_id}）"
+            labeled.setdefault(name, []).extend(assessments)
+        return labeled
+        
     def scale_statistics(self):
         """按量表统计"""
+        self.load_all_pages()
         if not self.current_data:
             messagebox.showwarning("提示", "没有可统计的数据")
             return
@@ -574,6 +868,13 @@ class DataManager:
             for level, count in level_counts.items():
                 percentage = (count / len(assessments)) * 100
                 report += f"  {level}：{count}次 ({percentage:.1f}%)\n"
+                
+            domain_scores = pd.DataFrame(self.scoring_system.domain_scores(
+                [scale] * len(assessments), [a.get('responses', {}) for a in assessments]))
+            if not domain_scores.empty:
+                report += "维度平均得分：\n"
+                for domain, mean_score in domain_scores.mean().items():
+                    report += f"  {domain}：{mean_score:.1f}\n"
             report += "\n"
             
         self.stats_text.delete('1.0', 'end')
@@ -581,6 +882,7 @@ class DataManager:
         
     def generate_chart(self):
         """生成图表"""
+        self.load_all_pages()
         if not self.current_data:
             messagebox.showwarning("提示", "没有可显示的数据")
             return
@@ -724,16 +1026,12 @@ class DataManager:
         
         # 获取患者数据
         patient_data = {}
-        for data in self.current_data:
-            patient_name = data.get('patient_info', {}).get('name', '未知')
-            scale_type = data.get('scale_type', '')
-            score = data.get('score_result', {}).get('total_score', 0)
-            
-            if patient_name not in patient_data:
-                patient_data[patient_name] = {}
-            if scale_type not in patient_data[patient_name]:
-                patient_data[patient_name][scale_type] = []
-            patient_data[patient_name][scale_type].append(score)
+        for patient_name, assessments in self.group_by_patient().items():
+            patient_data[patient_name] = {}
+            for data in assessments:
+                scale_type = data.get('scale_type', '')
+                score = data.get('score_result', {}).get('total_score', 0)
+                patient_data[patient_name].setdefault(scale_type, []).append(score)
             
         # 计算平均分
         patient_avg_scores = {}
@@ -797,6 +1095,7 @@ class DataManager:
                 
     def export_data(self):
         """导出数据"""
+        self.load_all_pages()
         if not self.current_data:
             messagebox.showwarning("提示", "没有可导出的数据")
             return
@@ -845,6 +1144,12 @@ class DataManager:
                     '解释': score_result.get('interpretation', '')
                 })
                 
+            domain_scores = self.scoring_system.domain_scores(
+                [data.get('scale_type', '') for data in self.current_data],
+                [data.get('responses', {}) for data in self.current_data])
+            for row, scores in zip(csv_data, domain_scores):
+                row.update(scores)
+                
             df = pd.DataFrame(csv_data)
             df.to_csv(filename, index=False, encoding='utf-8-sig')
             self.export_status_text.insert('end', f"CSV文件已导出：{filename}\n")
@@ -867,6 +1172,7 @@ class DataManager:
         
     def generate_report(self):
         """生成综合报告"""
+        self.load_all_pages()
         if not self.current_data:
             messagebox.showwarning("提示", "没有可生成报告的数据")
             return
@@ -11,6 +11,7 @@ import tkinter as tk
 from tkinter import ttk, messagebox
 import json
 import os
+import multiprocessing
 from datetime import datetime
 from pathlib import Path
 
@@ -51,6 +52,9 @@ try:
 except ImportError:
     HelpSystem = None
 
+from record_writer import get_writer, shutdown_writer
+from scale_catalog import SCALES_BY_CATEGORY
+
 class NeurologicalScaleApp:
     def __init__(self, root):
         self.root = root
@@ -64,9 +68,24 @@ class NeurologicalScaleApp:
         self.motor_scales = None
         self.severity_scales = None
         
-        # 初始化数据管理和评分系统
-        self.data_manager = DataManager(self.root, self) if DataManager else None
+        # 初始化评分系统和数据管理（数据管理共用同一评分系统，只打开一次存储）
         self.scoring_system = ScoringSystem() if ScoringSystem else None
+        self.data_manager = DataManager(self.root, self) if DataManager else None
+        
+        # 定期分发后台写入的完成回调
+        self.poll_writer()
+        
+    def poll_writer(self):
+        """在主线程中执行后台保存的完成提示"""
+        get_writer().dispatch_completed()
+        self.root.after(100, self.poll_writer)
+        
+    def save_record(self, record, callback=None):
+        """由后台线程经评分系统保存一条评估结果（写入所配置的存储引擎并更新索引），
+        完成后在主线程中回调 callback(记录编号, 错误信息或None)"""
+        if self.scoring_system is None:
+            raise RuntimeError("评分系统不可用，无法保存评估结果")
+        get_writer().submit_record(self.scoring_system.save_record, record, callback)
         
     def setup_window(self):
         """设置主窗口"""
@@ -325,30 +344,7 @@ class NeurologicalScaleApp:
             
     def get_scales_by_category(self, category):
         """根据分类获取量表列表"""
-        scales_data = {
-            'cognitive': [
-                {'name': 'MMSE', 'id': 'mmse', 'full_name': '简易精神状态检查量表', 'items': 30, 'available': True},
-                {'name': 'MoCA', 'id': 'moca', 'full_name': '蒙特利尔认知评估量表', 'items': 30, 'available': True},
-                {'name': 'CDR', 'id': 'cdr', 'full_name': '临床痴呆评定量表', 'items': 6, 'available': True}
-            ],
-            'emotion': [
-                {'name': 'HAMD', 'id': 'hamd', 'full_name': '汉密尔顿抑郁量表', 'items': 17, 'available': True},
-                {'name': 'HAMA', 'id': 'hama', 'full_name': '汉密尔顿焦虑量表', 'items': 14, 'available': True},
-                {'name': 'SDS', 'id': 'sds', 'full_name': '抑郁自评量表', 'items': 20, 'available': True}
-            ],
-            'motor': [
-                {'name': 'UPDRS', 'id': 'updrs', 'full_name': '统一帕金森病评定量表', 'items': 42, 'available': True},
-                {'name': 'Berg', 'id': 'berg', 'full_name': 'Berg平衡量表', 'items': 14, 'available': True},
-                {'name': 'Tinetti', 'id': 'tinetti', 'full_name': 'Tinetti步态与平衡评估', 'items': 28, 'available': True}
-            ],
-            'severity': [
-                {'name': 'NIHSS', 'id': 'nihss', 'full_name': '美国国立卫生研究院卒中量表', 'items': 15, 'available': True},
-                {'name': 'GCS', 'id': 'gcs', 'full_name': '格拉斯哥昏迷量表', 'items': 3, 'available': True},
-                {'name': 'mRS', 'id': 'mrs', 'full_name': '改良Rankin量表', 'items': 7, 'available': True}
-            ]
-        }
-        
-        return scales_data.get(category, [])
+        return [dict(scale) for scale in SCALES_BY_CATEGORY.get(category, [])]
         
     def create_scale_card(self, parent, scale_info, category):
         """创建量表卡片"""
@@ -590,6 +586,10 @@ def main():
     # 设置关闭事件
     def on_closing():
         if messagebox.askokcancel("退出", "确定要退出神经内科量表评估系统吗？"):
+            # 写完后台队列中的评估结果，再保存索引、关闭存储后退出
+            shutdown_writer()
+            if app.scoring_system is not None:
+                app.scoring_system.close()
             root.destroy()
     
     root.protocol("WM_DELETE_WINDOW", on_closing)
@@ -598,4 +598,6 @@ def main():
     root.mainloop()
 
 if __name__ == "__main__":
+    # 打包版使用进程池并行加载时需要
+    multiprocessing.freeze_support()
     main()
\ No newline at end of file
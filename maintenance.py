@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+数据维护命令
+开发人员：LIUYING
+功能：评估数据的一次性迁移与维护（无需启动图形界面）
+
+用法：
+    python maintenance.py migrate-layout [--dry-run] [--engine 引擎]
+    python maintenance.py migrate-schema [--dry-run] [--workers N] [--engine 引擎]
+    python maintenance.py compact-segments
+    python maintenance.py rescore [--dry-run] [--workers N] [--report 文件.csv] [--engine 引擎]
+
+--engine 默认为 config.py 中的 STORAGE_ENGINE；索引与分析归档按该引擎更新。
+"""
+
+import argparse
+import csv
+import os
+import sys
+
+from config import STORAGE_ENGINE
+from record_schema import migrate_files
+from rescore import COMPARED_FIELDS, rescore_store
+from scoring_system import ScoringSystem
+
+STORAGE_ENGINES = ('json', 'sqlite', 'segments')
+
+
+def _json_file_store(system: ScoringSystem):
+    """管理JSON文件的存储：JSON引擎即其本身；SQLite、分段日志引擎从同样的JSON目录导入记录"""
+    if system.storage_engine == 'json':
+        return system.store
+    return ScoringSystem(storage_engine='json').store
+
+
+def cmd_migrate_layout(args) -> int:
+    """将data/、results/中的平铺文件迁移到 data/<量表>/<YYYY>/<MM>/ 分片目录"""
+    system = ScoringSystem(storage_engine=args.engine)
+    report = _json_file_store(system).migrate_to_shards(dry_run=args.dry_run)
+
+    action = "将移动" if args.dry_run else "已移动"
+    for source, target in report['moved']:
+        print(f"{action}：{source} -> {target}")
+    for source in report['skipped']:
+        print(f"跳过（无法识别量表或时间）：{source}")
+    for source, error in report['errors']:
+        print(f"出错：{source}：{error}")
+
+    if report['moved'] and not args.dry_run:
+        # SQLite、分段日志引擎跟随来源文件的新路径（记录编号不变）；JSON引擎的记录编号即路径，由对齐更新
+        if system.storage_engine != 'json':
+            system.store.relocate_sources(report['moved'])
+        system.sync_indexes(force=True)
+        system.archive.sync(system.store)
+
+    print(f"\n共{action} {len(report['moved'])} 个文件，跳过 {len(report['skipped'])} 个，"
+          f"出错 {len(report['errors'])} 个")
+    return 1 if report['errors'] else 0
+
+
+def cmd_migrate_schema(args) -> int:
+    """将所有历史格式的记录原地改写为v2标准格式
+
+    SQLite、分段日志引擎保存的记录已是v2格式，只需改写其导入的JSON文件，随后重新对齐。
+    """
+    system = ScoringSystem(storage_engine=args.engine)
+    paths = _json_file_store(system).list_files()
+    report = migrate_files(paths, dry_run=args.dry_run, workers=args.workers)
+
+    print("原始格式统计：")
+    for shape, count in sorted(report['shapes'].items()):
+        print(f"  {shape}：{count}")
+
+    action = "将转换" if args.dry_run else "已转换"
+    for path in report['converted']:
+        print(f"{action}：{path}")
+    for path, error in report['errors']:
+        print(f"出错：{path}：{error}")
+
+    if report['converted'] and not args.dry_run:
+        system.sync_indexes(force=True)
+
+    print(f"\n共 {len(paths)} 个文件：{action} {len(report['converted'])} 个，"
+          f"已是v2 {len(report['current'])} 个，出错 {len(report['errors'])} 个")
+    return 1 if report['errors'] else 0
+
+
+def cmd_compact_segments(args) -> int:
+    """整理分段日志：合并已封存的小段并剔除已删除的记录"""
+    store = ScoringSystem(storage_engine='segments').store
+    report = store.compact()
+    print(f"合并 {report['merged']} 个段，剔除已删除记录 {report['dropped_records']} 条、"
+          f"失效删除标记 {report['dropped_tombstones']} 条，"
+          f"{report['bytes_before']} 字节 -> {report['bytes_after']} 字节")
+    return 0
+
+
+def cmd_rescore(args) -> int:
+    """按当前评分规则重新计算所有记录的评分结果，输出分级/风险等级变化汇总"""
+    system = ScoringSystem(storage_engine=args.engine)
+    report = rescore_store(system.store, dry_run=args.dry_run, workers=args.workers)
+    total = sum(len(report[key]) for key in ('changed', 'updated', 'unchanged', 'skipped', 'errors'))
+
+    action = "将更新" if args.dry_run else "已更新"
+    for record_id, scale_type, old_values, new_values in report['changed']:
+        changes = "，".join(f"{field} {old} -> {new}" for field, old, new
+                           in zip(COMPARED_FIELDS, old_values, new_values) if old != new)
+        print(f"{action}：{record_id}（{scale_type}）：{changes}")
+    for record_id, reason in report['skipped']:
+        print(f"跳过：{record_id}：{reason}")
+    for record_id, error in report['errors']:
+        print(f"出错：{record_id}：{error}")
+
+    if report['transitions']:
+        print("\n风险等级变化：")
+        for (scale_type, old, new), count in sorted(report['transitions'].items(), key=lambda item: -item[1]):
+            print(f"  {scale_type}：{old} -> {new}：{count} 条")
+
+    if args.report:
+        with open(args.report, 'w', encoding='utf-8-sig', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['记录编号', '量表'] + [f"原{field}" for field in COMPARED_FIELDS]
+                            + [f"新{field}" for field in COMPARED_FIELDS])
+            for record_id, scale_type, old_values, new_values in report['changed']:
+                writer.writerow([record_id, scale_type, *old_values, *new_values])
+        print(f"变化明细已写入：{args.report}")
+
+    # 写回的记录按版本变化重新读入索引，并重建该引擎的分析归档
+    if (report['changed'] or report['updated']) and not args.dry_run:
+        system.sync_indexes(force=True)
+        system.archive.rebuild(system.store)
+
+    print(f"\n共 {total} 条记录：分级或风险等级变化 {len(report['changed'])} 条，"
+          f"仅补全字段 {len(report['updated'])} 条，无变化 {len(report['unchanged'])} 条，"
+          f"跳过 {len(report['skipped'])} 条，出错 {len(report['errors'])} 条")
+    return 1 if report['errors'] else 0
+
+
+def main(argv=None) -> int:
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description="神经内科量表评估系统 - 数据维护命令")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    layout_parser = subparsers.add_parser('migrate-layout', help="迁移到按量表/年/月分片的目录布局")
+    layout_parser.add_argument('--dry-run', action='store_true', help="只输出迁移计划，不移动文件")
+    layout_parser.add_argument('--engine', choices=STORAGE_ENGINES, default=STORAGE_ENGINE,
+                               help="更新哪个存储引擎的索引与分析归档")
+    layout_parser.set_defaults(func=cmd_migrate_layout)
+
+    schema_parser = subparsers.add_parser('migrate-schema', help="将历史记录原地改写为v2标准格式")
+    schema_parser.add_argument('--dry-run', action='store_true', help="只输出迁移报告，不改写文件")
+    schema_parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="并行进程数")
+    schema_parser.add_argument('--engine', choices=STORAGE_ENGINES, default=STORAGE_ENGINE,
+                               help="更新哪个存储引擎的记录与索引")
+    schema_parser.set_defaults(func=cmd_migrate_schema)
+
+    compact_parser = subparsers.add_parser('compact-segments', help="整理分段日志存储")
+    compact_parser.set_defaults(func=cmd_compact_segments)
+
+    rescore_parser = subparsers.add_parser('rescore', help="按当前评分规则重新计算所有记录的评分结果")
+    rescore_parser.add_argument('--dry-run', action='store_true', help="只输出变化汇总，不改写记录")
+    rescore_parser.add_argument('--engine', choices=STORAGE_ENGINES, default=STORAGE_ENGINE,
+                                help="重新评分哪个存储引擎中的记录")
+    rescore_parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="并行进程数")
+    rescore_parser.add_argument('--report', help="将分级/风险等级有变化的记录明细写入CSV文件")
+    rescore_parser.set_defaults(func=cmd_rescore)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+患者登记
+开发人员：LIUYING
+功能：为患者分配稳定的患者编号（姓名+性别+出生年份相同视为同一患者），
+      并按评估时间维护每位患者的记录编号，查询某位患者的全部评估只需一次查找
+"""
+
+import bisect
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from record_index import RecordIndex, to_epoch, to_number
+from record_schema import anonymous_patient_info
+
+ANONYMOUS_NAME = anonymous_patient_info()['name']
+
+# 按年龄推算的出生年份允许相差的年数（同一患者在生日前后评估时推算结果相差1年）
+BIRTH_YEAR_TOLERANCE = 1
+
+
+def _year_of(value) -> Optional[int]:
+    """从日期/时间字符串中取年份"""
+    try:
+        return datetime.fromisoformat(str(value).replace('Z', '+00:00')[:10]).year
+    except ValueError:
+        return None
+
+
+def birth_year(patient_info: Dict, assessment_time: str = '') -> Optional[int]:
+    """出生年份：优先使用出生日期，否则由评估日期（或评估时间）与年龄推算；无法确定时返回None"""
+    for key in ('birth_date', 'birth_year'):
+        value = patient_info.get(key)
+        if value:
+            year = _year_of(value) if key == 'birth_date' else to_number(value)
+            if year:
+                return int(year)
+    age = to_number(patient_info.get('age'))
+    year = _year_of(patient_info.get('assessment_date')) or _year_of(assessment_time)
+    if age is None or year is None:
+        return None
+    return year - int(age)
+
+
+class PatientRegistry(RecordIndex):
+    """患者登记索引
+
+    持久化 {记录编号: [患者编号, 评估时间戳]} 及患者表 {患者编号: {name, gender, birth_year}}。
+    患者编号一经分配不再改变（记录全部删除后患者仍保留在患者表中）；
+    匿名患者（未录入患者信息的量表）无法区分个人，不分配编号。
+    """
+
+    name = 'patient_registry'
+
+    def _reset(self):
+        self.patients = {}
+        self.by_name = {}
+        self.timelines = {}
+
+    def _dump_state(self) -> Dict:
+        return {'patients': self.patients}
+
+    def _load_state(self, data: Dict):
+        for patient_id, info in data.get('patients', {}).items():
+            self._register(patient_id, info)
+
+    def _register(self, patient_id: str, info: Dict):
+        """登记或更新患者（重放变更日志时同一患者可能出现多次）"""
+        if patient_id not in self.patients:
+            self.by_name.setdefault((info['name'].lower(), info['gender']), []).append(patient_id)
+        self.patients[patient_id] = info
+
+    # ---------- 患者识别 ----------
+
+    def _match(self, name: str, gender: str, year: Optional[int]) -> Optional[str]:
+        """在同名同性别的患者中找出生年份相符的患者；出生年份未知的一方与任一同名同性别患者视为同一人"""
+        candidates = self.by_name.get((name.lower(), gender), [])
+        if year is None:
+            return candidates[0] if candidates else None
+        known = [(abs(self.patients[pid]['birth_year'] - year), pid) for pid in candidates
+                 if self.patients[pid]['birth_year'] is not None]
+        known = [item for item in known if item[0] <= BIRTH_YEAR_TOLERANCE]
+        if known:
+            return min(known)[1]
+        for patient_id in candidates:
+            if self.patients[patient_id]['birth_year'] is None:
+                # 补全出生年份，之后同名同性别但年份不同的患者将分配新编号
+                self.patients[patient_id]['birth_year'] = year
+                self._log({'state': {'patients': {patient_id: self.patients[patient_id]}}})
+                return patient_id
+        return None
+
+    def resolve(self, patient_info: Dict, assessment_time: str = '', create: bool = True) -> Optional[str]:
+        """返回患者信息对应的患者编号；不存在时create为True则分配新编号，否则返回None"""
+        name = str(patient_info.get('name') or '').strip()
+        if not name or name == ANONYMOUS_NAME:
+            return None
+        gender = str(patient_info.get('gender') or '').strip()
+        year = birth_year(patient_info, assessment_time)
+        with self._lock:
+            patient_id = self._match(name, gender, year)
+            if patient_id is None and create:
+                patient_id = f"P{len(self.patients) + 1:06d}"
+                self._register(patient_id, {'name': name, 'gender': gender, 'birth_year': year})
+                self._log({'state': {'patients': {patient_id: self.patients[patient_id]}}})
+            return patient_id
+
+    # ---------- 索引维护 ----------
+
+    def extract(self, record: Dict) -> List:
+        assessment_time = record.get('assessment_time', '')
+        return [self.resolve(record.get('patient_info', {}), assessment_time), to_epoch(assessment_time)]
+
+    def _index_value(self, record_id: str, value: List):
+        patient_id, epoch = value
+        if patient_id is not None:
+            bisect.insort(self.timelines.setdefault(patient_id, []), (epoch or 0, record_id))
+
+    def _unindex_value(self, record_id: str, value: List):
+        patient_id, epoch = value
+        timeline = self.timelines.get(patient_id)
+        if timeline is None:
+            return
+        pos = bisect.bisect_left(timeline, (epoch or 0, record_id))
+        if pos < len(timeline) and timeline[pos] == (epoch or 0, record_id):
+            timeline.pop(pos)
+        if not timeline:
+            del self.timelines[patient_id]
+
+    # ---------- 查询 ----------
+
+    def patient_of(self, record_id: str) -> Optional[str]:
+        """记录所属的患者编号"""
+        value = self.entries.get(record_id)
+        return value[0] if value else None
+
+    def patient(self, patient_id: str) -> Optional[Dict[str, Any]]:
+        """患者信息 {name, gender, birth_year}"""
+        info = self.patients.get(patient_id)
+        return dict(info) if info else None
+
+    def find(self, name: str, gender: str = None) -> List[str]:
+        """按姓名（不区分大小写）查找患者编号，可同时指定性别"""
+        key = name.strip().lower()
+        with self._lock:
+            return sorted(patient_id for (patient_name, patient_gender), ids in self.by_name.items()
+                          if patient_name == key and (gender is None or patient_gender == gender)
+                          for patient_id in ids)
+
+    def timeline(self, patient_id: str, descending: bool = False) -> List[str]:
+        """患者的全部记录编号，按评估时间排序（默认从早到晚）"""
+        with self._lock:
+            record_ids = [record_id for _, record_id in self.timelines.get(patient_id, ())]
+        if descending:
+            record_ids.reverse()
+        return record_ids
+
+    def summary(self) -> List[Tuple[str, Dict[str, Any], int]]:
+        """有评估记录的患者：(患者编号, 患者信息, 评估次数)，按患者编号排序"""
+        with self._lock:
+            return [(patient_id, dict(self.patients[patient_id]), len(self.timelines[patient_id]))
+                    for patient_id in sorted(self.timelines)]
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+查询结果缓存
+开发人员：LIUYING
+功能：按规范化后的查询条件、数据版本与存储变化标志缓存查询结果（LRU淘汰），
+      数据未变化时重复切换视图不再重新查询；提供命中率统计
+"""
+
+import threading
+from collections import OrderedDict
+from datetime import date, datetime
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+from record_writer import writes_completed
+
+_version = 0
+_version_lock = threading.Lock()
+
+
+def bump_data_version():
+    """记录已保存或删除（经评分系统保存/删除时调用）"""
+    global _version
+    with _version_lock:
+        _version += 1
+
+
+def data_version() -> Tuple[int, int]:
+    """当前数据版本：评分系统的保存/删除次数 + 后台写入线程直接写入文件的次数
+
+    只反映本进程内的写入；其他程序对存储的修改由QueryCache的store_token发现。
+    """
+    return _version, writes_completed()
+
+
+def _normalize(value) -> Hashable:
+    if isinstance(value, datetime):
+        return value.isoformat(sep=' ')
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    if isinstance(value, (list, tuple)):
+        return tuple(_normalize(item) for item in value)
+    if isinstance(value, str):
+        return value.strip()
+    return value
+
+
+def normalize_params(params: Dict[str, Any]) -> Tuple:
+    """规范化查询参数：去掉空条件，统一时间与数值写法，按参数名排序"""
+    return tuple(sorted((key, _normalize(value)) for key, value in params.items()
+                        if value is not None and value != ''))
+
+
+class QueryCache:
+    """带版本的LRU查询结果缓存
+
+    缓存键为 (查询类型, 规范化参数, 数据版本, 存储变化标志)；store_token为返回存储变化标志的函数
+    （如store.change_token），用于发现其他程序新增、删除的记录。任一版本变化后旧结果自然失效，
+    不会再命中，并随LRU淘汰；原地修改的记录只能由显式刷新（clear）发现。结果由调用方共享，不应修改。
+    """
+
+    def __init__(self, max_entries: int = 128, store_token: Optional[Callable[[], Any]] = None):
+        self.max_entries = max(max_entries, 1)
+        self.store_token = store_token
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_compute(self, kind: str, params: Dict[str, Any], compute: Callable[[], Any]) -> Any:
+        """返回缓存的结果，未命中时调用compute计算并缓存"""
+        key = (kind, normalize_params(params), self._version())
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+
+        result = compute()
+        # 计算期间数据若有变化，结果可能混有新旧数据，不缓存
+        if key[2] == self._version():
+            with self._lock:
+                self._entries[key] = result
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return result
+
+    def _version(self) -> Tuple:
+        """本进程的数据版本与存储变化标志"""
+        token = _normalize(self.store_token()) if self.store_token else None
+        return data_version() + (token,)
+
+    def clear(self):
+        """清空缓存（显式刷新时调用）"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """命中次数、未命中次数、命中率与当前缓存条数"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.0,
+                'size': len(self._entries),
+                'max_entries': self.max_entries
+            }
@@ -0,0 +1,773 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+评估记录二级索引
+开发人员：LIUYING
+功能：以记录编号（存储后端save返回的编号）为键维护可持久化的查询索引，
+      保存、删除时增量更新，启动或查询前与存储对齐，查询无需逐条读取记录
+"""
+
+import atexit
+import bisect
+import json
+import os
+import re
+import threading
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set
+
+from scale_catalog import canonical_scale_id
+
+try:
+    from pypinyin import Style, lazy_pinyin
+    HAS_PYPINYIN = True
+except ImportError:
+    HAS_PYPINYIN = False
+
+
+class RecordIndex:
+    """索引基类
+
+    每个索引只持久化 {记录编号: 提取值} 及记录在存储中的版本（见存储的record_versions），
+    查询结构在加载时由提取值重建；子类实现 extract（从记录中提取值）、_index_value 与 _unindex_value（维护查询结构）。
+
+    持久化方式与JSON存储的扫描清单相同：索引文件之外有追加写入的变更日志，每次加入、移除只向日志追加变化的条目；
+    日志行数超过条目数的一半时，或进程退出时（save）才重写索引文件，单次写入的开销与记录总数无关。
+    """
+
+    name = 'index'
+    VERSION = 1
+    # 变更日志合并的最小行数
+    JOURNAL_COMPACT_MIN = 256
+
+    def __init__(self, index_dir: str):
+        # 绝对路径：进程退出时保存，此时的工作目录可能已经改变
+        index_dir = os.path.abspath(index_dir)
+        self.path = os.path.join(index_dir, f"{self.name}.json")
+        self.journal_path = self.path + '.journal'
+        self.entries = {}
+        self.versions = {}      # 记录编号 -> 加入索引时记录在存储中的版本
+        self.dirty = False      # 索引文件是否落后于内存（变化在日志中或尚未写出）
+        self._pending = []      # 尚未追加到日志的变更行
+        self._journal_lines = 0
+        self._lock = threading.RLock()
+        os.makedirs(index_dir, exist_ok=True)
+        self._reset()
+        self._load()
+
+    # ---------- 子类实现 ----------
+
+    def _reset(self):
+        """清空查询结构"""
+
+    def extract(self, record: Dict) -> Any:
+        """从记录中提取需要索引的值（须可JSON序列化）"""
+        raise NotImplementedError
+
+    def _index_value(self, record_id: str, value: Any):
+        """把一条记录加入查询结构"""
+        raise NotImplementedError
+
+    def _unindex_value(self, record_id: str, value: Any):
+        """把一条记录移出查询结构"""
+        raise NotImplementedError
+
+    def _dump_state(self) -> Dict:
+        """条目之外需要持久化的数据（写入索引文件的其他键）"""
+        return {}
+
+    def _load_state(self, data: Dict):
+        """读取_dump_state写入的数据（在加载条目之前调用）；变更日志中的 {"state": ...} 行也经此合并"""
+
+    # ---------- 持久化 ----------
+
+    def _load(self):
+        """读取索引文件并重放变更日志；版本不符或损坏时视为空索引，由sync重建"""
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') != self.VERSION:
+                return
+            self._load_state(data)
+            for record_id, value in data.get('entries', {}).items():
+                self.entries[record_id] = value
+                self._index_value(record_id, value)
+            self.versions = {record_id: version for record_id, version in data.get('versions', {}).items()
+                             if record_id in self.entries}
+            self._replay_journal()
+        except Exception as e:
+            print(f"读取索引 {self.path} 时出错，将重新生成: {e}")
+            self.entries = {}
+            self.versions = {}
+            self._reset()
+
+    def _replay_journal(self):
+        """按顺序重放变更日志；进程中断时写了一半的最后一行忽略"""
+        if not os.path.exists(self.journal_path):
+            return
+        with open(self.journal_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    change = json.loads(line)
+                except ValueError:
+                    continue
+                self._journal_lines += 1
+                if 'state' in change:
+                    self._load_state(change['state'])
+                elif change.get('removed'):
+                    self._remove_entry(change['id'])
+                elif 'value' in change:
+                    self._set_entry(change['id'], change['value'], change.get('version'))
+                elif change['id'] in self.entries:
+                    self.versions[change['id']] = change['version']
+        if self._journal_lines:
+            self.dirty = True
+
+    def _log(self, change: Dict):
+        """记下一条变更（调用方持有锁），由flush追加到日志"""
+        self._pending.append(json.dumps(change, ensure_ascii=False) + '\n')
+        self.dirty = True
+
+    def flush(self):
+        """把累计的变更追加到日志；日志过长或索引文件尚不存在时改为重写索引文件"""
+        with self._lock:
+            if not self._pending:
+                return
+            if not os.path.exists(self.path):
+                self.save()
+                return
+            try:
+                with open(self.journal_path, 'a', encoding='utf-8') as f:
+                    f.writelines(self._pending)
+                self._journal_lines += len(self._pending)
+                self._pending = []
+            except Exception as e:
+                print(f"写入索引变更日志 {self.journal_path} 时出错: {e}")
+                return
+            if self._journal_lines > max(self.JOURNAL_COMPACT_MIN, len(self.entries) // 2):
+                self.save()
+
+    def save(self):
+        """有变化时重写索引文件并清空变更日志（先写临时文件再替换）"""
+        with self._lock:
+            if not self.dirty:
+                return
+            tmp_path = self.path + '.tmp'
+            try:
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump(dict(self._dump_state(), version=self.VERSION, entries=self.entries,
+                                   versions=self.versions), f, ensure_ascii=False)
+                os.replace(tmp_path, self.path)
+                if os.path.exists(self.journal_path):
+                    os.remove(self.journal_path)
+                self._journal_lines = 0
+                self._pending = []
+                self.dirty = False
+            except Exception as e:
+                print(f"保存索引 {self.path} 时出错: {e}")
+
+    # ---------- 增量更新 ----------
+
+    def _set_entry(self, record_id: str, value: Any, version: Any = None):
+        if record_id in self.entries:
+            self._unindex_value(record_id, self.entries[record_id])
+        self.entries[record_id] = value
+        self._index_value(record_id, value)
+        if version is None:
+            self.versions.pop(record_id, None)
+        else:
+            self.versions[record_id] = version
+
+    def _remove_entry(self, record_id: str) -> bool:
+        if record_id not in self.entries:
+            return False
+        self._unindex_value(record_id, self.entries.pop(record_id))
+        self.versions.pop(record_id, None)
+        return True
+
+    def _add(self, record_id: str, record: Dict, version: Any = None):
+        value = self.extract(record)
+        with self._lock:
+            self._set_entry(record_id, value, version)
+            self._log({'id': record_id, 'value': value, 'version': version})
+
+    def _remove(self, record_ids: Iterable[str]):
+        with self._lock:
+            for record_id in record_ids:
+                if self._remove_entry(record_id):
+                    self._log({'id': record_id, 'removed': True})
+
+    def add(self, record_id: str, record: Dict, version: Any = None):
+        """加入（或更新）一条记录；version为记录在存储中的版本，未知时由下次sync补记"""
+        with self._lock:
+            self._add(record_id, record, version)
+            self.flush()
+
+    def remove(self, record_ids: Iterable[str]):
+        """移除记录（不存在的编号忽略）"""
+        with self._lock:
+            self._remove(record_ids)
+            self.flush()
+
+    def sync(self, store, versions: Dict[str, Any] = None) -> Dict[str, int]:
+        """与存储对齐：补入缺少的记录（如外部程序写入的文件），重新读取版本变化的记录
+        （如原地修改的文件），移除已不存在的记录
+
+        store需提供record_versions()和get(record_id)；versions可传入已取得的 {记录编号: 版本}，
+        避免重复扫描。索引中没有版本的条目（由save_record直接加入）只补记版本，不重新读取。
+        """
+        if versions is None:
+            versions = store.record_versions()
+        with self._lock:
+            added = [record_id for record_id in versions if record_id not in self.entries]
+            updated = [record_id for record_id, version in versions.items()
+                       if record_id in self.versions and self.versions[record_id] != version]
+            removed = [record_id for record_id in self.entries if record_id not in versions]
+            self._remove(removed)
+            for record_id in added + updated:
+                record = store.get(record_id)
+                if record:
+                    self._add(record_id, record, versions[record_id])
+                else:
+                    self._remove([record_id])
+            for record_id in self.entries:
+                if record_id not in self.versions:
+                    self.versions[record_id] = versions[record_id]
+                    self._log({'id': record_id, 'version': versions[record_id]})
+            self.flush()
+        return {'added': len(added), 'updated': len(updated), 'removed': len(removed)}
+
+
+def _grams(text: str, n: int) -> Set[str]:
+    """文本的n元字符片段"""
+    return {text[i:i + n] for i in range(len(text) - n + 1)}
+
+
+class PatientNameIndex(RecordIndex):
+    """患者姓名索引：精确匹配 + 字符n元片段（中文姓名按子串查询）
+
+    单字查询走单字片段，多字查询取各二元片段对应姓名集合的交集，再对少量候选姓名确认子串关系。
+    片段指向去重后的姓名而不是记录，姓名再映射到记录编号。
+    """
+
+    name = 'patient_names'
+
+    def _reset(self):
+        self.name_ids = {}      # 小写姓名 -> 记录编号集合
+        self.display_names = {} # 小写姓名 -> 原始姓名
+        self.grams = {}         # 1/2元片段 -> 小写姓名集合
+
+    def extract(self, record: Dict) -> str:
+        return str(record.get('patient_info', {}).get('name', '') or '')
+
+    def _index_value(self, record_id: str, value: str):
+        key = value.lower()
+        ids = self.name_ids.setdefault(key, set())
+        if not ids:
+            self.display_names[key] = value
+            for gram in _grams(key, 1) | _grams(key, 2):
+                self.grams.setdefault(gram, set()).add(key)
+        ids.add(record_id)
+
+    def _unindex_value(self, record_id: str, value: str):
+        key = value.lower()
+        ids = self.name_ids.get(key)
+        if ids is None:
+            return
+        ids.discard(record_id)
+        if not ids:
+            del self.name_ids[key]
+            del self.display_names[key]
+            for gram in _grams(key, 1) | _grams(key, 2):
+                names = self.grams.get(gram)
+                if names is not None:
+                    names.discard(key)
+                    if not names:
+                        del self.grams[gram]
+
+    def matching_names(self, keyword: str) -> Set[str]:
+        """包含关键字（不区分大小写）的姓名（小写）"""
+        keyword = keyword.strip().lower()
+        with self._lock:
+            if not keyword:
+                return set(self.name_ids)
+            if len(keyword) == 1:
+                return set(self.grams.get(keyword, ()))
+
+            candidates = None
+            for gram in sorted(_grams(keyword, 2), key=lambda g: len(self.grams.get(g, ()))):
+                names = self.grams.get(gram)
+                if not names:
+                    return set()
+                candidates = set(names) if candidates is None else candidates & names
+                if not candidates:
+                    return set()
+            return {name for name in candidates if keyword in name}
+
+    def search(self, keyword: str) -> Set[str]:
+        """姓名包含关键字的记录编号"""
+        with self._lock:
+            return {record_id for name in self.matching_names(keyword) for record_id in self.name_ids[name]}
+
+    def exact(self, name: str) -> Set[str]:
+        """姓名完全相同（不区分大小写）的记录编号"""
+        with self._lock:
+            return set(self.name_ids.get(name.strip().lower(), ()))
+
+
+def pinyin_keys(name: str) -> List[str]:
+    """姓名的全拼和首字母（小写、无分隔），如 张三 -> ['zhangsan', 'zs']
+
+    未安装pypinyin时只对纯字母姓名生成键；多音字取最常用读音。
+    """
+    name = ''.join(name.split())
+    if not name:
+        return []
+    if name.isascii():
+        letters = ''.join(c for c in name.lower() if c.isalnum())
+        return [letters] if letters else []
+    if not HAS_PYPINYIN:
+        return []
+    full = ''.join(lazy_pinyin(name)).lower()
+    initials = ''.join(lazy_pinyin(name, style=Style.FIRST_LETTER)).lower()
+    return [full, initials] if initials != full else [full]
+
+
+class PinyinNameIndex(RecordIndex):
+    """患者姓名拼音索引：全拼与首字母的前缀查询（如 zhangsan / zhangs / zs）
+
+    拼音键只在记录加入时计算一次并随索引持久化；查询时在排序后的键列表上二分定位前缀区间。
+    """
+
+    name = 'patient_pinyin'
+    # 是否安装pypinyin决定了生成的键，版本随之不同，安装后会自动重建
+    VERSION = 2 if HAS_PYPINYIN else 1
+
+    def _reset(self):
+        self.key_names = {}     # 拼音键 -> 姓名集合
+        self.name_ids = {}      # 姓名 -> 记录编号集合
+        self._sorted_keys = None
+
+    def extract(self, record: Dict) -> List[str]:
+        name = str(record.get('patient_info', {}).get('name', '') or '')
+        return [name] + pinyin_keys(name)
+
+    def _index_value(self, record_id: str, value: List[str]):
+        name, keys = value[0], value[1:]
+        ids = self.name_ids.setdefault(name, set())
+        if not ids:
+            for key in keys:
+                names = self.key_names.setdefault(key, set())
+                if not names and self._sorted_keys is not None:
+                    bisect.insort(self._sorted_keys, key)
+                names.add(name)
+        ids.add(record_id)
+
+    def _unindex_value(self, record_id: str, value: List[str]):
+        name, keys = value[0], value[1:]
+        ids = self.name_ids.get(name)
+        if ids is None:
+            return
+        ids.discard(record_id)
+        if ids:
+            return
+        del self.name_ids[name]
+        for key in keys:
+            names = self.key_names.get(key)
+            if names is None:
+                continue
+            names.discard(name)
+            if not names:
+                del self.key_names[key]
+                if self._sorted_keys is not None:
+                    self._sorted_keys.pop(bisect.bisect_left(self._sorted_keys, key))
+
+    def matching_names(self, prefix: str, limit: int = None) -> Set[str]:
+        """拼音（全拼或首字母）以prefix开头的姓名；limit限制返回数量（用于输入提示）"""
+        prefix = ''.join(prefix.split()).lower()
+        if not prefix:
+            return set()
+        with self._lock:
+            if self._sorted_keys is None:
+                self._sorted_keys = sorted(self.key_names)
+            keys = self._sorted_keys
+            lo = bisect.bisect_left(keys, prefix)
+            hi = bisect.bisect_left(keys, prefix + '\uffff', lo)
+            if limit is None:
+                return {name for key in keys[lo:hi] for name in self.key_names[key]}
+
+            names = set()
+            for i in range(lo, min(hi, lo + limit)):
+                names |= self.key_names[keys[i]]
+            return names
+
+    def search(self, prefix: str) -> Set[str]:
+        """拼音以prefix开头的记录编号"""
+        with self._lock:
+            return {record_id for name in self.matching_names(prefix) for record_id in self.name_ids[name]}
+
+
+def is_pinyin_query(keyword: str) -> bool:
+    """是否为拼音/首字母查询（只含字母和空格）"""
+    keyword = ''.join(keyword.split())
+    return bool(keyword) and keyword.isascii() and keyword.isalpha()
+
+
+def to_epoch(value: str) -> Optional[float]:
+    """评估时间（ISO格式或 'YYYY-MM-DD HH:MM:SS'）转换为时间戳；无法解析时返回None"""
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(str(value).replace('Z', '+00:00')).timestamp()
+    except ValueError:
+        return None
+
+
+def to_number(value) -> Optional[float]:
+    """转换为数值（如年龄 '65'），无法转换时返回None"""
+    if isinstance(value, bool):
+        return float(value)
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return float(str(value).strip())
+    except (TypeError, ValueError):
+        return None
+
+
+class SortedValueIndex(RecordIndex):
+    """数值排序索引：按值排序的 (值, 记录编号) 列表，二分查找区间
+
+    区间查询的开销只与命中的记录数有关；值为None的记录不进入排序列表。
+    子类只需实现extract。
+    """
+
+    def _reset(self):
+        self._sorted = None
+
+    def _index_value(self, record_id: str, value: Optional[float]):
+        if value is not None and self._sorted is not None:
+            bisect.insort(self._sorted, (value, record_id))
+
+    def _unindex_value(self, record_id: str, value: Optional[float]):
+        if value is not None and self._sorted is not None:
+            pos = bisect.bisect_left(self._sorted, (value, record_id))
+            if pos < len(self._sorted) and self._sorted[pos] == (value, record_id):
+                self._sorted.pop(pos)
+
+    def _ordered(self) -> List:
+        """排序列表（首次查询时由持久化的条目一次性排序生成）"""
+        if self._sorted is None:
+            self._sorted = sorted((value, record_id) for record_id, value in self.entries.items()
+                                  if value is not None)
+        return self._sorted
+
+    def _bounds(self, low: float = None, high: float = None, include_high: bool = False) -> tuple:
+        ordered = self._ordered()
+        lo = bisect.bisect_left(ordered, (low,)) if low is not None else 0
+        if high is None:
+            hi = len(ordered)
+        elif include_high:
+            hi = bisect.bisect_right(ordered, (high, '\U0010ffff'))
+        else:
+            hi = bisect.bisect_left(ordered, (high,))
+        return lo, max(hi, lo)
+
+    def count_range(self, low: float = None, high: float = None, include_high: bool = False) -> int:
+        """区间内的记录数（只做二分，不生成结果）"""
+        with self._lock:
+            lo, hi = self._bounds(low, high, include_high)
+            return hi - lo
+
+    def range(self, low: float = None, high: float = None, descending: bool = True,
+              include_high: bool = False) -> List[str]:
+        """值在 [low, high)（include_high时为 [low, high]）内的记录编号，默认按值倒序"""
+        with self._lock:
+            lo, hi = self._bounds(low, high, include_high)
+            record_ids = [record_id for _, record_id in self._ordered()[lo:hi]]
+        if descending:
+            record_ids.reverse()
+        return record_ids
+
+    def page_after(self, after: tuple = None, page_size: int = 50, descending: bool = True,
+                   accept: Callable[[str], bool] = None) -> List[tuple]:
+        """键集分页：按 (值, 记录编号) 顺序返回游标after之后的至多page_size个 (值, 记录编号)
+
+        after为上一页最后一行的 (值, 记录编号)，None表示从头开始；accept用于筛选记录编号。
+        值为None的记录排在最后（按记录编号排序），游标的值相应为None。
+        从游标位置二分定位后顺序扫描，开销与跳过的记录数有关，与总记录数无关。
+        """
+        page = []
+        with self._lock:
+            ordered = self._ordered()
+            if after is None or after[0] is not None:
+                if descending:
+                    start = len(ordered) - 1 if after is None else bisect.bisect_left(ordered, tuple(after)) - 1
+                    positions = range(start, -1, -1)
+                else:
+                    start = 0 if after is None else bisect.bisect_right(ordered, tuple(after))
+                    positions = range(start, len(ordered))
+                for pos in positions:
+                    if len(page) >= page_size:
+                        return page
+                    if accept is None or accept(ordered[pos][1]):
+                        page.append(ordered[pos])
+
+            missing = sorted((record_id for record_id, value in self.entries.items() if value is None),
+                             reverse=descending)
+            for record_id in missing:
+                if len(page) >= page_size:
+                    break
+                if after is not None and after[0] is None and \
+                        (record_id >= after[1] if descending else record_id <= after[1]):
+                    continue
+                if accept is None or accept(record_id):
+                    page.append((None, record_id))
+        return page
+
+    def in_range(self, record_id: str, low: float = None, high: float = None, include_high: bool = False) -> bool:
+        """单条记录的值是否在区间内（用于对少量候选逐条核对）"""
+        value = self.entries.get(record_id)
+        if value is None:
+            return False
+        if low is not None and value < low:
+            return False
+        if high is not None and (value > high if include_high else value >= high):
+            return False
+        return True
+
+
+class TimeIndex(SortedValueIndex):
+    """评估时间索引（时间戳）；range默认按时间倒序返回"""
+
+    name = 'assessment_time'
+
+    def extract(self, record: Dict) -> Optional[float]:
+        return to_epoch(record.get('assessment_time', ''))
+
+
+class TotalScoreIndex(SortedValueIndex):
+    """总分索引"""
+
+    name = 'total_score'
+
+    def extract(self, record: Dict) -> Optional[float]:
+        return to_number(record.get('score_result', {}).get('total_score'))
+
+
+class AgeIndex(SortedValueIndex):
+    """患者年龄索引"""
+
+    name = 'patient_age'
+
+    def extract(self, record: Dict) -> Optional[float]:
+        return to_number(record.get('patient_info', {}).get('age'))
+
+
+class FieldIndex(RecordIndex):
+    """取值有限的字段索引：字段值 -> 记录编号集合（量表类型、风险等级、性别等）
+
+    子类通过field指定字段在记录中的路径。
+    """
+
+    field = ()
+
+    def _reset(self):
+        self.value_ids = {}
+
+    def extract(self, record: Dict) -> str:
+        value = record
+        for key in self.field:
+            value = value.get(key) if isinstance(value, dict) else None
+        return '' if value is None else str(value)
+
+    def _index_value(self, record_id: str, value: str):
+        self.value_ids.setdefault(value, set()).add(record_id)
+
+    def _unindex_value(self, record_id: str, value: str):
+        ids = self.value_ids.get(value)
+        if ids is not None:
+            ids.discard(record_id)
+            if not ids:
+                del self.value_ids[value]
+
+    def lookup(self, value: str, prefix: bool = False) -> Set[str]:
+        """字段等于value（prefix为True时以value开头）的记录编号"""
+        with self._lock:
+            if not prefix:
+                return set(self.value_ids.get(value, ()))
+            return {record_id for key, ids in self.value_ids.items() if key.startswith(value) for record_id in ids}
+
+    def count(self, value: str, prefix: bool = False) -> int:
+        """匹配的记录数"""
+        with self._lock:
+            if not prefix:
+                return len(self.value_ids.get(value, ()))
+            return sum(len(ids) for key, ids in self.value_ids.items() if key.startswith(value))
+
+    def matches(self, record_id: str, value: str, prefix: bool = False) -> bool:
+        """单条记录是否匹配（用于对少量候选逐条核对）"""
+        current = self.entries.get(record_id)
+        if current is None:
+            return False
+        return current.startswith(value) if prefix else current == value
+
+
+class ScaleCatalogIndex(FieldIndex):
+    """量表目录索引：标准量表编号 -> 记录编号集合
+
+    记录中的量表名称（HAMD-17、UPDRS-III等）在入库时归一为标准编号（见scale_catalog），
+    查询时的量表名称同样先归一，因此 UPDRS 与 UPDRS-III 是同一量表，而 HAMD 不会命中 HAMA。
+    目录中没有的量表名称按原名索引，查询时按前缀匹配。
+    """
+
+    name = 'scale_catalog'
+    field = ('scale_type',)
+
+    def extract(self, record: Dict) -> str:
+        scale_type = super().extract(record)
+        return canonical_scale_id(scale_type) or scale_type
+
+    def lookup(self, value: str, prefix: bool = False) -> Set[str]:
+        scale_id = canonical_scale_id(value)
+        return super().lookup(scale_id, False) if scale_id else super().lookup(value, True)
+
+    def count(self, value: str, prefix: bool = False) -> int:
+        scale_id = canonical_scale_id(value)
+        return super().count(scale_id, False) if scale_id else super().count(value, True)
+
+    def matches(self, record_id: str, value: str, prefix: bool = False) -> bool:
+        scale_id = canonical_scale_id(value)
+        return super().matches(record_id, scale_id, False) if scale_id else super().matches(record_id, value, True)
+
+
+class RiskLevelIndex(FieldIndex):
+    name = 'risk_level'
+    field = ('score_result', 'risk_level')
+
+
+class SeverityLevelIndex(FieldIndex):
+    name = 'severity_level'
+    field = ('score_result', 'level')
+
+
+class GenderIndex(FieldIndex):
+    name = 'patient_gender'
+    field = ('patient_info', 'gender')
+
+
+class AssessorIndex(FieldIndex):
+    name = 'assessor'
+    field = ('assessor',)
+
+
+# 全文索引的文本字段：score_result中的解释、建议与备注，以及记录级备注
+TEXT_FIELDS = (
+    ('score_result', 'interpretation'),
+    ('score_result', 'recommendations'),
+    ('score_result', 'notes'),
+    ('score_result', 'note'),
+    ('score_result', 'remarks'),
+    ('notes',),
+)
+
+_WORD_PATTERN = re.compile(r'\w+')
+
+
+def _text_terms(text: str) -> List[str]:
+    """把文本按标点和空白切分为小写词段（中文连续文字为一个词段）"""
+    return _WORD_PATTERN.findall(text.lower())
+
+
+def record_text(record: Dict) -> str:
+    """记录中参与全文检索的文本（小写，各字段以换行分隔）"""
+    parts = []
+    for path in TEXT_FIELDS:
+        value = record
+        for key in path:
+            value = value.get(key) if isinstance(value, dict) else None
+        if isinstance(value, (list, tuple)):
+            parts.extend(str(item) for item in value if item)
+        elif value:
+            parts.append(str(value))
+    return '\n'.join(parts).lower()
+
+
+class FullTextIndex(RecordIndex):
+    """全文索引：对解释、建议、备注文本建立字符一元/二元片段倒排表（适合不分词的中文）
+
+    查询按空白切分为多个关键词（须同时出现），每个关键词取其二元片段的记录集合求交集，
+    再对候选记录确认关键词确实出现在文本中。条目中保存小写后的文本用于确认。
+    """
+
+    name = 'full_text'
+
+    def _reset(self):
+        self.postings = {}  # 1/2元片段 -> 记录编号集合
+
+    def extract(self, record: Dict) -> str:
+        return record_text(record)
+
+    @staticmethod
+    def _text_grams(text: str) -> Set[str]:
+        grams = set()
+        for term in _text_terms(text):
+            grams |= _grams(term, 1) | _grams(term, 2)
+        return grams
+
+    def _index_value(self, record_id: str, value: str):
+        for gram in self._text_grams(value):
+            self.postings.setdefault(gram, set()).add(record_id)
+
+    def _unindex_value(self, record_id: str, value: str):
+        for gram in self._text_grams(value):
+            ids = self.postings.get(gram)
+            if ids is not None:
+                ids.discard(record_id)
+                if not ids:
+                    del self.postings[gram]
+
+    def search(self, query: str) -> Set[str]:
+        """文本中包含全部关键词（不区分大小写）的记录编号"""
+        keywords = query.lower().split()
+        if not keywords:
+            return set()
+        with self._lock:
+            candidates = None
+            for keyword in keywords:
+                for term in _text_terms(keyword) or [keyword]:
+                    grams = _grams(term, 2) or {term}
+                    for gram in sorted(grams, key=lambda g: len(self.postings.get(g, ()))):
+                        ids = self.postings.get(gram)
+                        if not ids:
+                            return set()
+                        candidates = set(ids) if candidates is None else candidates & ids
+                        if not candidates:
+                            return set()
+            return {record_id for record_id in candidates
+                    if all(keyword in self.entries.get(record_id, '') for keyword in keywords)}
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_index(index_class, index_dir: str) -> RecordIndex:
+    """获取目录下共享的索引实例（同一进程内多个评分系统实例共用，进程退出时保存）"""
+    key = (index_class, os.path.abspath(index_dir))
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is None:
+            index = _indexes[key] = index_class(index_dir)
+            atexit.register(index.save)
+        return index
+
+
+def reset_indexes():
+    """丢弃共享的索引实例及其退出时保存的登记（不保存），之后get_index重新从文件加载（供测试使用）"""
+    with _indexes_lock:
+        for index in _indexes.values():
+            atexit.unregister(index.save)
+        _indexes.clear()
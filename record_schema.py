@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+评估记录标准格式（schema v2）
+开发人员：LIUYING
+功能：定义所有保存路径统一输出的记录格式，并将历史格式转换为标准格式
+
+v2记录结构：
+    schema_version  固定为2
+    scale_type      量表类型
+    patient_info    患者信息（name/gender/age/assessment_date等）
+    responses       各条目评分
+    score_result    评分结果（total_score/max_score/percentage/level/risk_level/interpretation等）
+    assessment_time 评估时间（ISO格式）
+    assessor        评估者
+    system_version  系统版本
+"""
+
+import json
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, List, Tuple
+
+from config import APP_VERSION
+from record_writer import DurableWriter
+
+SCHEMA_VERSION = 2
+
+# 旧格式中直接并入score_result的字段
+LEGACY_SCORE_FIELDS = ('eye_score', 'verbal_score', 'motor_score', 'balance_score', 'gait_score',
+                       'functional_status', 'prognosis')
+
+
+def _percentage(total_score, max_score) -> float:
+    """计算得分百分比"""
+    if not isinstance(total_score, (int, float)) or not isinstance(max_score, (int, float)) or max_score <= 0:
+        return 0.0
+    return round((total_score / max_score) * 100, 1)
+
+
+def _iso_time(value: str) -> str:
+    """将 'YYYY-MM-DD HH:MM:SS' 等格式统一为ISO格式"""
+    if not value:
+        return ''
+    try:
+        return datetime.fromisoformat(value.replace('Z', '+00:00')).isoformat()
+    except ValueError:
+        return value
+
+
+def anonymous_patient_info(assessment_date: str = '') -> Dict[str, Any]:
+    """未录入患者信息的量表（如NIHSS、GCS、mRS）使用的默认患者信息"""
+    return {'name': '匿名患者', 'gender': '未知', 'age': '未知', 'assessment_date': assessment_date}
+
+
+def build_record(scale_type: str, patient_info: Dict, responses: Dict, score_result: Dict,
+                 assessment_time: str = None, assessor: str = None) -> Dict[str, Any]:
+    """构建v2格式的评估记录"""
+    score_result = dict(score_result)
+    if 'percentage' not in score_result:
+        score_result['percentage'] = _percentage(score_result.get('total_score'), score_result.get('max_score'))
+    score_result.setdefault('level', '')
+    score_result.setdefault('risk_level', '低')
+    score_result.setdefault('interpretation', '')
+
+    return {
+        'schema_version': SCHEMA_VERSION,
+        'scale_type': scale_type,
+        'patient_info': dict(patient_info),
+        'responses': dict(responses),
+        'score_result': score_result,
+        'assessment_time': assessment_time or datetime.now().isoformat(),
+        'assessor': assessor or patient_info.get('assessor') or 'Unknown',
+        'system_version': APP_VERSION
+    }
+
+
+def is_canonical(data: Dict) -> bool:
+    """是否已是v2格式"""
+    return isinstance(data, dict) and data.get('schema_version') == SCHEMA_VERSION
+
+
+def detect_shape(data: Dict) -> str:
+    """识别记录的原始格式，用于迁移报告"""
+    if is_canonical(data):
+        return 'v2'
+    if 'scores' in data and 'timestamp' in data:
+        return 'scores/timestamp'
+    if 'scale_name' in data and 'patient_info' not in data:
+        return 'scale_name/assessment_date'
+    if 'score_result' in data:
+        return 'scale_type/score_result'
+    if 'scale_type' in data:
+        return 'scale_type/patient_info'
+    return 'unknown'
+
+
+def to_canonical(data: Dict) -> Dict[str, Any]:
+    """将任意历史格式的记录转换为v2格式（v2记录原样返回）"""
+    if is_canonical(data):
+        return data
+
+    # 患者信息
+    if 'patient_info' in data:
+        patient_info = data['patient_info']
+    else:
+        patient_info = anonymous_patient_info(data.get('assessment_date', ''))
+        patient_info['name'] = data.get('patient_name', patient_info['name'])
+        patient_info['gender'] = data.get('gender', patient_info['gender'])
+        patient_info['age'] = data.get('age', patient_info['age'])
+
+    # 各条目评分：responses / scores（MMSE、HAMD、HAMA）/ domain_scores（CDR）/ item_scores（Berg）
+    responses = (data.get('responses') or data.get('scores') or data.get('domain_scores')
+                 or data.get('item_scores') or {})
+
+    # 评分结果：评分系统保存的记录已包含完整的score_result
+    if isinstance(data.get('score_result'), dict) and data['score_result']:
+        score_result = dict(data['score_result'])
+    else:
+        total_score = data.get('total_score', data.get('score', 0))
+        score_result = {
+            'total_score': total_score,
+            'max_score': data.get('max_score', 0),
+            'level': data.get('severity') or data.get('severity_level') or data.get('level', ''),
+            'risk_level': data.get('risk_level', '低'),
+            'interpretation': data.get('interpretation', '')
+        }
+    for field in LEGACY_SCORE_FIELDS:
+        if field in data and field not in score_result:
+            score_result[field] = data[field]
+
+    assessment_time = data.get('assessment_time') or data.get('timestamp') or data.get('assessment_date', '')
+
+    record = build_record(
+        data.get('scale_type') or data.get('scale_name', ''),
+        patient_info,
+        responses,
+        score_result,
+        assessment_time=_iso_time(assessment_time),
+        assessor=data.get('assessor') or patient_info.get('assessor') or 'Unknown'
+    )
+    record['system_version'] = data.get('system_version', record['system_version'])
+    return record
+
+
+def _migrate_chunk(paths: List[str], dry_run: bool) -> List[Tuple]:
+    """将一组文件原地改写为v2格式（在进程池中执行），整组完成后统一fsync
+
+    返回 (路径, 原格式, 状态, 错误信息) 列表，状态为 'current' / 'converted' / 'error'
+    """
+    writer = DurableWriter('batched', batch_records=len(paths) + 1)
+    results = []
+    for path in paths:
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            shape = detect_shape(data)
+            if shape == 'v2':
+                results.append((path, shape, 'current', None))
+                continue
+            record = to_canonical(data)
+            if not dry_run:
+                writer.write(path, record)
+            results.append((path, shape, 'converted', None))
+        except Exception as e:
+            results.append((path, 'unknown', 'error', str(e)))
+    writer.sync_pending()
+    return results
+
+
+def migrate_files(paths: List[str], dry_run: bool = False, workers: int = 0,
+                  chunk_size: int = 256) -> Dict[str, Any]:
+    """并行迁移一批文件，返回报告：各原格式数量、已转换/已是v2/出错的文件"""
+    chunks = [paths[i:i + chunk_size] for i in range(0, len(paths), chunk_size)]
+    if workers > 1 and len(chunks) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            chunk_results = list(pool.map(_migrate_chunk, chunks, [dry_run] * len(chunks)))
+    else:
+        chunk_results = [_migrate_chunk(chunk, dry_run) for chunk in chunks]
+
+    report = {'shapes': {}, 'converted': [], 'current': [], 'errors': []}
+    for chunk in chunk_results:
+        for path, shape, status, error in chunk:
+            report['shapes'][shape] = report['shapes'].get(shape, 0) + 1
+            if status == 'error':
+                report['errors'].append((path, error))
+            else:
+                report[status].append(path)
+    return report
@@ -0,0 +1,314 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+评估结果后台写入模块
+开发人员：LIUYING
+功能：原子写入（临时文件+替换）与可选持久化模式；
+      量表保存操作交由共享的后台线程批量写入，避免阻塞界面主线程
+"""
+
+import atexit
+import functools
+import itertools
+import json
+import os
+import queue
+import tempfile
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from config import DURABILITY_MODE, DURABILITY_BATCH_RECORDS, DURABILITY_BATCH_MS
+
+DURABILITY_MODES = ('strict', 'batched', 'relaxed')
+
+# 写入完成回调：callback(实际文件路径或记录编号, 错误信息或None)
+SaveCallback = Callable[[str, Optional[str]], None]
+
+_STOP = object()
+
+# 后台直接写入文件成功的累计条数，供索引判断是否需要与存储重新对齐
+# （submit_record交由存储保存的记录已由保存函数自行更新索引，不计入）
+_writes_completed = 0
+
+
+def writes_completed() -> int:
+    """后台写入线程已直接写入文件的记录数"""
+    return _writes_completed
+
+
+def _fsync_directory(directory: str):
+    """同步目录项（使重命名持久化）；Windows不支持对目录fsync，直接跳过"""
+    if os.name == 'nt':
+        return
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _link_exclusive(tmp_path: str, path: str):
+    """把写好的临时文件原子地放到path，path已存在时抛出FileExistsError
+
+    用硬链接实现（目标存在时失败）；文件系统不支持硬链接时先以O_EXCL占用文件名，再替换为临时文件。
+    """
+    try:
+        os.link(tmp_path, path)
+    except FileExistsError:
+        raise
+    except OSError:
+        os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+        os.replace(tmp_path, path)
+    else:
+        os.remove(tmp_path)
+
+
+class DurableWriter:
+    """原子JSON写入器
+
+    每次写入都先写同目录下的临时文件，再用os.replace替换目标文件，
+    因此读取方不会看到写了一半的JSON。持久化模式：
+    - strict：每条记录写入后fsync文件及目录
+    - batched：累计batch_records条或超过batch_ms毫秒后统一fsync
+    - relaxed：不主动fsync，由操作系统决定落盘时机
+    """
+
+    def __init__(self, mode: str = 'strict', batch_records: int = 32, batch_ms: int = 200):
+        if mode not in DURABILITY_MODES:
+            raise ValueError(f"未知的持久化模式：{mode}")
+        self.mode = mode
+        self.batch_records = max(batch_records, 1)
+        self.batch_ms = batch_ms
+        self._pending = []
+        self._pending_since = None
+        self._lock = threading.Lock()
+
+    def write(self, path: str, data: Dict, indent: Optional[int] = 2, exclusive: bool = False):
+        """原子写入一个JSON文件
+
+        exclusive为True时只创建新文件：目标已存在则抛出FileExistsError，不覆盖（用于生成不重复的文件名）。
+        """
+        directory = os.path.dirname(path) or '.'
+        os.makedirs(directory, exist_ok=True)
+
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, indent=indent)
+                if self.mode == 'strict':
+                    f.flush()
+                    os.fsync(f.fileno())
+            if exclusive:
+                _link_exclusive(tmp_path, path)
+            else:
+                os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        if self.mode == 'strict':
+            _fsync_directory(directory)
+        elif self.mode == 'batched':
+            self._add_pending(path)
+
+    def remove(self, path: str):
+        """删除一个文件，并按持久化模式同步所在目录（strict立即同步，batched随下一批同步）"""
+        os.remove(path)
+        directory = os.path.dirname(path) or '.'
+        if self.mode == 'strict':
+            _fsync_directory(directory)
+        elif self.mode == 'batched':
+            self._add_pending(directory)
+
+    def _add_pending(self, path: str):
+        """记下待批量同步的文件或目录，累计满batch_records条时立即同步"""
+        with self._lock:
+            if not self._pending:
+                self._pending_since = time.monotonic()
+            self._pending.append(path)
+            due = len(self._pending) >= self.batch_records
+        if due:
+            self.sync_pending()
+
+    def write_new(self, path: str, data: Dict, indent: Optional[int] = 2) -> str:
+        """原子写入一个新文件，返回实际文件路径
+
+        目标已存在时不覆盖，依次改用 <文件名>_1.json、<文件名>_2.json … 直到独占创建成功。
+        """
+        base, ext = os.path.splitext(path)
+        for counter in itertools.count(1):
+            try:
+                self.write(path, data, indent, exclusive=True)
+                return path
+            except FileExistsError:
+                path = f"{base}_{counter}{ext}"
+
+    def seconds_until_sync(self) -> Optional[float]:
+        """距离下一次批量fsync的剩余秒数；没有待同步文件时返回None"""
+        with self._lock:
+            if not self._pending:
+                return None
+            elapsed = time.monotonic() - self._pending_since
+        return max(self.batch_ms / 1000.0 - elapsed, 0.0)
+
+    def sync_pending(self):
+        """对累计的文件及其目录（删除文件时为所在目录）统一fsync"""
+        with self._lock:
+            paths, self._pending = self._pending, []
+            self._pending_since = None
+
+        directories = set()
+        for path in paths:
+            if os.path.isdir(path):
+                directories.add(path)
+                continue
+            try:
+                with open(path, 'rb') as f:
+                    os.fsync(f.fileno())
+                directories.add(os.path.dirname(path) or '.')
+            except OSError as e:
+                print(f"同步文件 {path} 时出错: {e}")
+        for directory in directories:
+            try:
+                _fsync_directory(directory)
+            except OSError as e:
+                print(f"同步目录 {directory} 时出错: {e}")
+
+
+_durable_writer = None
+
+
+def get_durable_writer() -> DurableWriter:
+    """获取按配置创建的共享原子写入器（进程退出时同步剩余文件）"""
+    global _durable_writer
+    if _durable_writer is None:
+        _durable_writer = DurableWriter(DURABILITY_MODE, DURABILITY_BATCH_RECORDS, DURABILITY_BATCH_MS)
+        atexit.register(_durable_writer.sync_pending)
+    return _durable_writer
+
+
+class WriteBehindWriter:
+    """后台写入线程：有界队列 + 批量写入，完成回调在主线程中分发"""
+
+    def __init__(self, max_queue: int = 256, batch_size: int = 32, durable_writer: DurableWriter = None):
+        self.batch_size = batch_size
+        self.durable_writer = durable_writer or get_durable_writer()
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._completed = queue.Queue()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name='record-writer', daemon=True)
+        self._thread.start()
+
+    def submit(self, path: str, data: Dict, callback: SaveCallback = None):
+        """提交一条写入任务；队列已满时阻塞等待（背压）
+
+        只创建新文件：path已存在（如同一秒内保存两次）时改用加 _1、_2 … 后缀的文件名，实际路径经回调报告。
+        """
+        self._put((functools.partial(self.durable_writer.write_new, path, data), path, True, callback))
+
+    def submit_record(self, save: Callable[[Dict], str], record: Dict, callback: SaveCallback = None):
+        """提交一条交由存储保存的记录：在写入线程中调用save(record)（如ScoringSystem.save_record，
+        写入所配置的存储引擎并更新索引），回调报告返回的记录编号"""
+        self._put((functools.partial(save, record), '', False, callback))
+
+    def _put(self, task: Tuple):
+        if self._closed:
+            raise RuntimeError("后台写入线程已关闭")
+        self._queue.put(task)
+
+    def _write_batch(self, batch: List[Tuple]):
+        """写入一批任务，并记录每个任务的结果"""
+        global _writes_completed
+        for write, path, counted, callback in batch:
+            try:
+                path = write()
+                if counted:
+                    _writes_completed += 1
+                error = None
+            except Exception as e:
+                error = str(e)
+            if callback:
+                self._completed.put((callback, path, error))
+
+    def _run(self):
+        """写入线程主循环：阻塞取第一条，再尽量取满一批；批量模式下到期时统一fsync"""
+        while True:
+            try:
+                item = self._queue.get(timeout=self.durable_writer.seconds_until_sync())
+            except queue.Empty:
+                self.durable_writer.sync_pending()
+                continue
+            if item is _STOP:
+                self.durable_writer.sync_pending()
+                self._queue.task_done()
+                return
+
+            batch = [item]
+            stop = False
+            while len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stop = True
+                    break
+                batch.append(item)
+
+            try:
+                self._write_batch(batch)
+            finally:
+                for _ in range(len(batch) + (1 if stop else 0)):
+                    self._queue.task_done()
+            if stop:
+                self.durable_writer.sync_pending()
+                return
+
+    def dispatch_completed(self) -> int:
+        """在调用线程（界面主线程）中执行已完成任务的回调，返回执行数量"""
+        count = 0
+        while True:
+            try:
+                callback, path, error = self._completed.get_nowait()
+            except queue.Empty:
+                return count
+            try:
+                callback(path, error)
+            except Exception as e:
+                print(f"保存回调执行出错: {e}")
+            count += 1
+
+    def flush(self):
+        """等待队列中的所有任务写入完成"""
+        self._queue.join()
+
+    def close(self):
+        """写完剩余任务后停止写入线程（可重复调用）"""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(_STOP)
+        self._thread.join()
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_writer() -> WriteBehindWriter:
+    """获取共享的后台写入线程（首次调用时启动，进程退出时自动写完队列）"""
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = WriteBehindWriter()
+            atexit.register(_writer.close)
+        return _writer
+
+
+def shutdown_writer():
+    """关闭共享写入线程，确保队列中的记录全部落盘"""
+    with _writer_lock:
+        if _writer is not None:
+            _writer.close()
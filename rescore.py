@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+重新评分
+开发人员：LIUYING
+功能：按当前评分规则（scale_registry）重新计算已保存记录的score_result，
+      并行处理、原子写回，并汇总分级或风险等级发生变化的记录
+
+历史记录多数只保存了总分和严重程度，风险等级在格式转换时一律填为“低”，维度分析为空；
+有条目得分的记录按条目重新评分，只有总分的记录按总分重新分级。
+"""
+
+import itertools
+import json
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from record_schema import to_canonical
+from record_writer import DurableWriter
+from scale_catalog import canonical_scale_id
+from scoring_engine import (align_items, get_definition, registered_scales, score_scale, score_total,
+                            total_score)
+
+# 重新评分后用于比较变化的字段
+COMPARED_FIELDS = ('total_score', 'level', 'risk_level')
+
+
+def _infer_options(definition: Dict, responses: Dict[str, Any], old_result: Dict) -> Dict[str, bool]:
+    """推断保存时使用的校正选项：原记录注明了校正，或原总分恰好等于未校正总分加校正分"""
+    adjustments = definition.get('adjustments', ())
+    if not adjustments:
+        return {}
+    applied = old_result.get('adjustments') or []
+    plain = total_score(definition['id'], responses)
+    options = {}
+    for adjustment in adjustments:
+        options[adjustment['option']] = (adjustment['description'] in applied
+                                         or old_result.get('total_score') == plain + adjustment['add'])
+    return options
+
+
+def rescore_record(record: Dict) -> Tuple[Optional[Dict], str]:
+    """重新计算一条v2记录的score_result
+
+    返回 (新score_result, 说明)；量表未登记评分规则或没有可用的得分时返回 (None, 原因)。
+    原score_result中评分规则不涉及的字段（如备注）保留。
+    """
+    scale_id = canonical_scale_id(record.get('scale_type', ''))
+    if scale_id not in registered_scales():
+        return None, f"量表未登记评分规则：{record.get('scale_type', '')}"
+    definition = get_definition(scale_id)
+    old_result = record.get('score_result') or {}
+
+    responses = align_items(definition, record.get('responses') or {})
+    if responses:
+        new_result = score_scale(scale_id, responses, **_infer_options(definition, responses, old_result))
+        basis = 'responses'
+    elif isinstance(old_result.get('total_score'), (int, float)):
+        new_result = score_total(scale_id, old_result['total_score'])
+        basis = 'total'
+    else:
+        return None, "没有条目得分或总分"
+
+    merged = dict(old_result)
+    merged.update(new_result)
+    return merged, basis
+
+
+def _rescore_one(record_id: str, data: Dict) -> Tuple[Tuple, Optional[Dict]]:
+    """重新评分一条（可能是历史格式的）记录
+
+    返回 ((记录编号, 状态, 量表, 原值, 新值, 说明), 需写回的v2记录或None)；状态为 'changed' / 'updated' /
+    'unchanged' / 'skipped' / 'error'，原值、新值为 COMPARED_FIELDS 对应的元组。
+    """
+    try:
+        record = to_canonical(data)
+        scale_type = record.get('scale_type', '')
+        new_result, note = rescore_record(record)
+        if new_result is None:
+            return (record_id, 'skipped', scale_type, None, None, note), None
+
+        old_result = record.get('score_result') or {}
+        old_values = tuple(old_result.get(field) for field in COMPARED_FIELDS)
+        new_values = tuple(new_result.get(field) for field in COMPARED_FIELDS)
+        if new_result == old_result and record is data:
+            return (record_id, 'unchanged', scale_type, old_values, new_values, note), None
+        status = 'changed' if new_values != old_values else 'updated'
+        return (record_id, status, scale_type, old_values, new_values, note), dict(record, score_result=new_result)
+    except Exception as e:
+        return (record_id, 'error', '', None, None, str(e)), None
+
+
+def _rescore_chunk(paths: List[str], dry_run: bool) -> List[Tuple]:
+    """重新评分一组文件（在进程池中执行），整组完成后统一fsync
+
+    返回 (路径, 状态, 量表, 原值, 新值, 说明) 列表（见_rescore_one）。
+    """
+    writer = DurableWriter('batched', batch_records=len(paths) + 1)
+    results = []
+    for path in paths:
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            result, new_record = _rescore_one(path, data)
+            if new_record is not None and not dry_run:
+                writer.write(path, new_record)
+            results.append(result)
+        except Exception as e:
+            results.append((path, 'error', '', None, None, str(e)))
+    writer.sync_pending()
+    return results
+
+
+def _rescore_items(items: List[Tuple[str, Dict]]) -> List[Tuple[Tuple, Optional[Dict]]]:
+    """重新评分一组 (记录编号, 记录)（在进程池中执行），写回由调用方在主进程中完成"""
+    return [_rescore_one(record_id, record) for record_id, record in items]
+
+
+def _build_report(results: Iterable[Tuple]) -> Dict[str, Any]:
+    """汇总 (记录编号, 状态, 量表, 原值, 新值, 说明) 为报告（格式见rescore_files）"""
+    report = {'changed': [], 'updated': [], 'unchanged': [], 'skipped': [], 'errors': [],
+              'transitions': Counter()}
+    risk = COMPARED_FIELDS.index('risk_level')
+    for record_id, status, scale_type, old_values, new_values, note in results:
+        if status == 'changed':
+            report['changed'].append((record_id, scale_type, old_values, new_values))
+            if old_values[risk] != new_values[risk]:
+                report['transitions'][(scale_type, old_values[risk], new_values[risk])] += 1
+        elif status in ('updated', 'unchanged'):
+            report[status].append(record_id)
+        elif status == 'skipped':
+            report['skipped'].append((record_id, note))
+        else:
+            report['errors'].append((record_id, note))
+    return report
+
+
+def rescore_files(paths: List[str], dry_run: bool = False, workers: int = 0,
+                  chunk_size: int = 256) -> Dict[str, Any]:
+    """并行重新评分一批文件，返回报告
+
+    changed    总分、分级或风险等级有变化的记录：(路径, 量表, 原值, 新值)
+    updated    分级不变、仅补全其他字段（百分比、建议、维度分析等）的文件
+    unchanged  已与当前规则一致的文件
+    skipped    无法重新评分的文件：(路径, 原因)
+    errors     出错的文件：(路径, 错误信息)
+    transitions  风险等级变化统计：{(量表, 原风险等级, 新风险等级): 记录数}
+    """
+    chunks = [paths[i:i + chunk_size] for i in range(0, len(paths), chunk_size)]
+    if workers > 1 and len(chunks) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            chunk_results = list(pool.map(_rescore_chunk, chunks, [dry_run] * len(chunks)))
+    else:
+        chunk_results = [_rescore_chunk(chunk, dry_run) for chunk in chunks]
+    return _build_report(result for chunk in chunk_results for result in chunk)
+
+
+def rescore_store(store, dry_run: bool = False, workers: int = 0, chunk_size: int = 256) -> Dict[str, Any]:
+    """重新评分存储中的全部记录（任一存储引擎），有变化的记录经store.replace写回，记录编号不变
+
+    按块读取记录（store.iter_items），workers大于1时在进程池中评分；遍历结束后再逐条写回，
+    避免边遍历边修改（如SQLite游标未读完时更新同一张表）。报告格式同rescore_files，其中的路径为记录编号。
+    """
+    results = []
+    writes = {}
+    items = store.iter_items()
+    pool = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    try:
+        while True:
+            block = list(itertools.islice(items, chunk_size * max(workers, 1)))
+            if not block:
+                break
+            chunks = [block[i:i + chunk_size] for i in range(0, len(block), chunk_size)]
+            chunk_results = pool.map(_rescore_items, chunks) if pool and len(chunks) > 1 \
+                else map(_rescore_items, chunks)
+            for chunk in chunk_results:
+                for result, new_record in chunk:
+                    results.append(result)
+                    if new_record is not None:
+                        writes[result[0]] = new_record
+    finally:
+        if pool:
+            pool.shutdown()
+
+    if not dry_run:
+        for i, result in enumerate(results):
+            new_record = writes.get(result[0])
+            if new_record is None:
+                continue
+            try:
+                error = None if store.replace(result[0], new_record) else "记录已不存在"
+            except Exception as e:
+                error = str(e)
+            if error:
+                results[i] = result[:1] + ('error', result[2], None, None, error)
+    return _build_report(results)
@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+保存的视图
+开发人员：LIUYING
+功能：各病区常用的固定筛选条件（如“本周高/极高风险的卒中量表”）保存为视图，
+      视图的记录编号集合随保存、删除增量维护，打开视图无需重新查询
+"""
+
+import json
+import os
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Set
+
+from assessment_query import QUERY_FIELDS
+from assessment_store import to_time_bound
+from config import SAVED_VIEWS_PATH
+from record_index import RecordIndex, is_pinyin_query, pinyin_keys, record_text, to_epoch, to_number
+from scale_catalog import same_scale
+
+# 视图条件：组合查询的全部条件，另加 days（最近N天，含今天，打开视图时按当前日期计算）；
+# scale_type、risk_level、level、gender、assessor 可为列表，表示满足其一即可
+VIEW_FIELDS = QUERY_FIELDS + ('days',)
+CHOICE_FIELDS = ('risk_level', 'level', 'gender', 'assessor')
+
+
+def _choices(value) -> List[str]:
+    return [str(item) for item in value] if isinstance(value, (list, tuple)) else [str(value)]
+
+
+def _in_range(value, low, high) -> bool:
+    """数值是否在 [low, high] 内（未设置的一端不限）"""
+    if low is None and high is None:
+        return True
+    number = to_number(value)
+    if number is None:
+        return False
+    return (low is None or number >= float(low)) and (high is None or number <= float(high))
+
+
+def view_matches(filters: Dict[str, Any], record: Dict) -> bool:
+    """单条记录是否满足视图条件（days除外，打开视图时再按评估时间筛选）"""
+    patient_info = record.get('patient_info', {})
+    score_result = record.get('score_result', {})
+
+    if filters.get('scale_type') and not any(same_scale(record.get('scale_type', ''), scale)
+                                             for scale in _choices(filters['scale_type'])):
+        return False
+
+    values = {
+        'risk_level': score_result.get('risk_level'),
+        'level': score_result.get('level'),
+        'gender': patient_info.get('gender'),
+        'assessor': record.get('assessor'),
+    }
+    for key in CHOICE_FIELDS:
+        if filters.get(key) and str(values[key] or '') not in _choices(filters[key]):
+            return False
+
+    if not _in_range(score_result.get('total_score'), filters.get('score_min'), filters.get('score_max')):
+        return False
+    if not _in_range(patient_info.get('age'), filters.get('age_min'), filters.get('age_max')):
+        return False
+
+    since, until = filters.get('since'), filters.get('until')
+    if since or until:
+        epoch = to_epoch(record.get('assessment_time', ''))
+        if epoch is None:
+            return False
+        if since and epoch < to_epoch(since):
+            return False
+        if until and epoch >= to_epoch(until):
+            return False
+
+    keyword = (filters.get('patient') or '').strip().lower()
+    if keyword:
+        name = str(patient_info.get('name', '') or '')
+        if keyword not in name.lower() and not (
+                is_pinyin_query(keyword) and any(key.startswith(keyword) for key in pinyin_keys(name))):
+            return False
+
+    text = (filters.get('text') or '').lower().split()
+    if text:
+        content = record_text(record)
+        if not all(keyword in content for keyword in text):
+            return False
+    return True
+
+
+def normalize_view_filters(filters: Dict[str, Any]) -> Dict[str, Any]:
+    """检查并整理视图条件：去掉空条件，时间转换为字符串以便保存"""
+    unknown = set(filters) - set(VIEW_FIELDS)
+    if unknown:
+        raise ValueError(f"未知的视图条件：{', '.join(sorted(unknown))}")
+    normalized = {}
+    for key, value in filters.items():
+        if value is None or value == '' or value == []:
+            continue
+        if key in ('since', 'until'):
+            value = to_time_bound(value)
+            if to_epoch(value) is None:
+                raise ValueError(f"无法解析的时间条件：{value}")
+        elif isinstance(value, tuple):
+            value = list(value)
+        normalized[key] = value
+    return normalized
+
+
+class SavedViews(RecordIndex):
+    """视图索引：持久化 {记录编号: [评估时间戳, 满足条件的视图名称列表]}
+
+    视图定义保存在数据目录（SAVED_VIEWS_PATH）；索引文件同时记录生成时所用的定义，
+    启动时定义有变化的视图（包括新定义的视图）会对已有记录重新计算一次。
+    """
+
+    name = 'saved_views'
+
+    def __init__(self, index_dir: str, definitions_path: str = SAVED_VIEWS_PATH):
+        self.definitions_path = definitions_path
+        self.definitions = self._read_definitions()
+        self.stale = set(self.definitions)
+        super().__init__(index_dir)
+
+    # ---------- 视图定义 ----------
+
+    def _read_definitions(self) -> Dict[str, Dict]:
+        if not os.path.exists(self.definitions_path):
+            return {}
+        try:
+            with open(self.definitions_path, 'r', encoding='utf-8') as f:
+                return json.load(f).get('views', {})
+        except Exception as e:
+            print(f"读取视图定义时出错: {e}")
+            return {}
+
+    def _write_definitions(self):
+        directory = os.path.dirname(self.definitions_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = self.definitions_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'views': self.definitions}, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.definitions_path)
+
+    def define(self, view_name: str, filters: Dict[str, Any]):
+        """新建或修改视图（需调用refresh对已有记录计算）"""
+        view_name = view_name.strip()
+        if not view_name:
+            raise ValueError("视图名称不能为空")
+        filters = normalize_view_filters(filters)
+        with self._lock:
+            self.definitions[view_name] = filters
+            self.stale.add(view_name)
+            self._write_definitions()
+
+    def remove_view(self, view_name: str) -> bool:
+        """删除视图"""
+        with self._lock:
+            if self.definitions.pop(view_name, None) is None:
+                return False
+            self.members.pop(view_name, None)
+            self.stale.discard(view_name)
+            self._write_definitions()
+            self.dirty = True
+            return True
+
+    # ---------- 索引维护 ----------
+
+    def _reset(self):
+        self.members = {}  # 视图名称 -> 记录编号集合
+
+    def _dump_state(self) -> Dict:
+        return {'definitions': {view_name: filters for view_name, filters in self.definitions.items()
+                                if view_name not in self.stale}}
+
+    def _load_state(self, data: Dict):
+        computed = data.get('definitions', {})
+        self.stale = {view_name for view_name, filters in self.definitions.items()
+                      if computed.get(view_name) != filters}
+
+    def extract(self, record: Dict) -> List:
+        return [to_epoch(record.get('assessment_time', '')),
+                sorted(view_name for view_name, filters in self.definitions.items() if view_matches(filters, record))]
+
+    def _index_value(self, record_id: str, value: List):
+        for view_name in value[1]:
+            self.members.setdefault(view_name, set()).add(record_id)
+
+    def _unindex_value(self, record_id: str, value: List):
+        for view_name in value[1]:
+            ids = self.members.get(view_name)
+            if ids is not None:
+                ids.discard(record_id)
+
+    def refresh(self, store) -> int:
+        """对定义有变化的视图重新计算已有记录，返回重新计算的视图数"""
+        with self._lock:
+            if not self.stale:
+                return 0
+            count = len(self.stale)
+            for record_id in list(self.entries):
+                record = store.get(record_id)
+                if record:
+                    self._add(record_id, record, self.versions.get(record_id))
+            self.stale.clear()
+            self.save()
+            return count
+
+    # ---------- 查询 ----------
+
+    def view_ids(self, view_name: str, now: datetime = None) -> Optional[Set[str]]:
+        """视图当前的记录编号；视图不存在时返回None"""
+        with self._lock:
+            filters = self.definitions.get(view_name)
+            if filters is None:
+                return None
+            record_ids = set(self.members.get(view_name, ()))
+            days = filters.get('days')
+            if days:
+                today = (now or datetime.now()).replace(hour=0, minute=0, second=0, microsecond=0)
+                since = (today - timedelta(days=int(days) - 1)).timestamp()
+                record_ids = {record_id for record_id in record_ids
+                              if (self.entries[record_id][0] or 0) >= since}
+            return record_ids
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+量表目录
+开发人员：LIUYING
+功能：集中定义系统支持的量表（主界面的量表列表即来源于此），
+      并把记录中各种写法的量表名称（如 HAMD-17、UPDRS-III、Berg平衡量表）归一为标准量表编号
+"""
+
+from typing import Callable, Dict, List, Optional
+
+# 按分类排列的量表；id为标准量表编号
+SCALES_BY_CATEGORY = {
+    'cognitive': [
+        {'name': 'MMSE', 'id': 'mmse', 'full_name': '简易精神状态检查量表', 'items': 30, 'available': True},
+        {'name': 'MoCA', 'id': 'moca', 'full_name': '蒙特利尔认知评估量表', 'items': 30, 'available': True},
+        {'name': 'CDR', 'id': 'cdr', 'full_name': '临床痴呆评定量表', 'items': 6, 'available': True}
+    ],
+    'emotion': [
+        {'name': 'HAMD', 'id': 'hamd', 'full_name': '汉密尔顿抑郁量表', 'items': 17, 'available': True},
+        {'name': 'HAMA', 'id': 'hama', 'full_name': '汉密尔顿焦虑量表', 'items': 14, 'available': True},
+        {'name': 'SDS', 'id': 'sds', 'full_name': '抑郁自评量表', 'items': 20, 'available': True}
+    ],
+    'motor': [
+        {'name': 'UPDRS', 'id': 'updrs', 'full_name': '统一帕金森病评定量表', 'items': 42, 'available': True},
+        {'name': 'Berg', 'id': 'berg', 'full_name': 'Berg平衡量表', 'items': 14, 'available': True},
+        {'name': 'Tinetti', 'id': 'tinetti', 'full_name': 'Tinetti步态与平衡评估', 'items': 28, 'available': True}
+    ],
+    'severity': [
+        {'name': 'NIHSS', 'id': 'nihss', 'full_name': '美国国立卫生研究院卒中量表', 'items': 15, 'available': True},
+        {'name': 'GCS', 'id': 'gcs', 'full_name': '格拉斯哥昏迷量表', 'items': 3, 'available': True},
+        {'name': 'mRS', 'id': 'mrs', 'full_name': '改良Rankin量表', 'items': 7, 'available': True}
+    ]
+}
+
+# 名称、全称之外的其他写法（各量表模块及历史记录中实际出现过的名称）
+EXTRA_ALIASES = {
+    'hamd': ['HAMD-17', 'HAMD17', 'HDRS'],
+    'updrs': ['UPDRS-III', 'MDS-UPDRS'],
+    'berg': ['BBS'],
+    'tinetti': ['Tinetti步态与平衡评估量表', 'POMA'],
+    'mrs': ['Rankin'],
+}
+
+
+def all_scales() -> List[Dict]:
+    """全部量表（按分类顺序）"""
+    return [scale for scales in SCALES_BY_CATEGORY.values() for scale in scales]
+
+
+def _alias_key(name: str) -> str:
+    """别名比较键：不区分大小写，忽略空格、连字符和下划线"""
+    return ''.join(c for c in str(name).lower() if c not in ' -_')
+
+
+def _build_aliases() -> Dict[str, str]:
+    aliases = {}
+    for scale in all_scales():
+        for name in [scale['id'], scale['name'], scale['full_name']] + EXTRA_ALIASES.get(scale['id'], []):
+            aliases[_alias_key(name)] = scale['id']
+    return aliases
+
+
+ALIASES = _build_aliases()
+
+
+def canonical_scale_id(name: str) -> Optional[str]:
+    """把量表名称归一为标准量表编号；无法识别时返回None
+
+    先按别名精确匹配，再去掉版本后缀（如 -17、-III）重试。
+    """
+    if not name:
+        return None
+    key = _alias_key(name)
+    if key in ALIASES:
+        return ALIASES[key]
+    base = _alias_key(str(name).replace('_', '-').split('-')[0])
+    return ALIASES.get(base)
+
+
+def same_scale(record_scale: str, wanted: str) -> bool:
+    """记录的量表是否为所查询的量表；无法识别的名称退回前缀匹配"""
+    wanted_id = canonical_scale_id(wanted)
+    if wanted_id is None:
+        return str(record_scale or '').startswith(wanted)
+    return canonical_scale_id(record_scale) == wanted_id
+
+
+def scale_matcher(wanted: str) -> Callable[[str], bool]:
+    """返回判断记录量表是否为所查询量表的函数（同same_scale），按量表名称缓存结果，供逐条筛选大量记录"""
+    cache = {}
+
+    def matches(record_scale: str) -> bool:
+        if record_scale not in cache:
+            cache[record_scale] = same_scale(record_scale, wanted)
+        return cache[record_scale]
+    return matches
@@ -0,0 +1,329 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+量表评分规则登记
+开发人员：LIUYING
+功能：以数据形式描述各量表的条目取值范围、总分计算方式、分级阈值、风险等级、
+      评估建议及维度划分，由scoring_engine统一计算，界面、批量工具与重新评分共用同一套规则
+
+每个量表的定义（键为scale_catalog中的标准量表编号）：
+    scale_type     保存记录时使用的量表类型
+    max_score      总分上限
+    items          条目的标准顺序（批量评分时得分矩阵的列顺序）
+    item_range     条目默认取值范围 (最小, 最大)
+    item_ranges    个别条目的取值范围
+    item_caps      计入总分时的条目上限
+    reverse_items  反向计分条目（按 最小+最大-原值 计分）
+    aggregate      总分计算方式：sum（求和，默认）或 cdr（记忆优先规则）
+    multiplier     原始分乘以该系数后取整（如SDS标准分）
+    adjustments    可选校正：option为评分时传入的选项名，为真时加add分（不超过max_score）
+    bands          分级，按min从高到低排列，取第一个总分不低于min的分级；
+                   分级中的level、interpretation、risk_level、recommendations写入评分结果，
+                   fields中的字段同样写入评分结果，color供界面显示
+    subscores      分项得分：结果字段名 -> 条目列表
+    domains        维度：名称 -> {items, max_score(缺省为条目数×条目最高分), description}
+    domain_key     维度分析在评分结果中的字段名
+    domain_bands   维度分级：(百分比下限, 分级) 按下限从高到低排列
+    domain_field   维度分级在维度结果中的字段名
+"""
+
+from typing import Dict, List
+
+# 各量表界面沿用的四级配色
+COLORS_4 = ('#28A745', '#FFC107', '#FD7E14', '#DC3545')
+BALANCE_COLORS = ('#27AE60', '#F39C12', '#E67E22', '#E74C3C')
+
+# 维度分级：按百分比评价（分数越高越好 / 症状越重分数越高）
+FUNCTION_DOMAIN_BANDS = [(80, "正常"), (60, "轻度受损"), (40, "中度受损"), (0, "重度受损")]
+SYMPTOM_DOMAIN_BANDS = [(75, "重度"), (50, "中度"), (25, "轻度"), (0, "轻微")]
+
+
+def _keys(prefix: str, count: int, start: int = 0) -> List[str]:
+    return [f"{prefix}{i}" for i in range(start, start + count)]
+
+
+SCALE_DEFINITIONS: Dict[str, Dict] = {
+    'mmse': {
+        'scale_type': 'MMSE',
+        'items': [str(i) for i in range(1, 31)],
+        'max_score': 30,
+        # 条目编号1-30（逐项计分）或界面的分类_序号（如 0_0、2_0）
+        'item_range': (0, 1),
+        'item_ranges': {'2_0': (0, 3), '3_0': (0, 5), '4_0': (0, 3), '5_3': (0, 3)},
+        'item_caps': {'5_3': 3},
+        'bands': [
+            {'min': 27, 'level': "正常", 'interpretation': "认知功能正常", 'risk_level': "低",
+             'color': COLORS_4[0],
+             'recommendations': ["继续保持良好的生活习惯", "定期进行认知功能评估", "保持社交活动和智力活动"]},
+            {'min': 24, 'level': "轻度认知障碍", 'interpretation': "可能存在轻度认知功能下降，建议进一步评估",
+             'risk_level': "中", 'color': COLORS_4[1],
+             'recommendations': ["建议进行详细的神经心理学评估", "加强认知训练和智力活动",
+                                 "定期随访，监测认知功能变化", "保持健康的生活方式"]},
+            {'min': 18, 'level': "中度认知障碍", 'interpretation': "存在明显认知功能障碍，建议医学干预",
+             'risk_level': "高", 'color': COLORS_4[2],
+             'recommendations': ["建议神经科专科就诊", "进行脑影像学检查", "考虑药物治疗", "加强日常生活能力训练"]},
+            {'min': 0, 'level': "重度认知障碍", 'interpretation': "存在严重认知功能障碍，需要立即医学干预",
+             'risk_level': "极高", 'color': COLORS_4[3],
+             'recommendations': ["立即神经科专科就诊", "全面的医学评估和检查", "制定个体化治疗方案", "家属护理指导和支持"]},
+        ],
+        'domains': {
+            '定向力': {'items': [str(i) for i in range(1, 11)] + _keys('0_', 5) + _keys('1_', 5), 'max_score': 10},
+            '记忆力': {'items': ['11', '12', '13', '2_0'], 'max_score': 3},
+            '注意力和计算': {'items': ['14', '15', '16', '17', '18', '3_0'], 'max_score': 5},
+            '回忆': {'items': ['19', '20', '21', '4_0'], 'max_score': 3},
+            '语言': {'items': [str(i) for i in range(22, 31)] + _keys('5_', 7), 'max_score': 9},
+        },
+        'domain_key': 'domain_analysis',
+        'domain_bands': FUNCTION_DOMAIN_BANDS,
+        'domain_field': 'level',
+    },
+    'moca': {
+        'scale_type': 'MoCA',
+        'items': ['连线测试', '立方体复制', '钟表绘制', '动物命名', '词语记忆', '数字广度', '警觉性',
+                  '连续减7', '语句重复', '语言流畅性', '相似性', '自由回忆', '时间定向', '地点定向'],
+        'max_score': 30,
+        'item_range': (0, 1),
+        'item_ranges': {'钟表绘制': (0, 3), '动物命名': (0, 3), '词语记忆': (0, 0), '数字广度': (0, 2),
+                        '连续减7': (0, 3), '语句重复': (0, 2), '相似性': (0, 2), '自由回忆': (0, 5),
+                        '时间定向': (0, 4), '地点定向': (0, 2)},
+        'adjustments': [{'option': 'low_education', 'add': 1, 'description': "受教育年限≤12年加1分"}],
+        'bands': [
+            {'min': 26, 'level': "认知功能正常", 'interpretation': "认知功能正常", 'risk_level': "低",
+             'color': '#28A745'},
+            {'min': 22, 'level': "轻度认知障碍", 'interpretation': "存在轻度认知障碍，建议进一步评估",
+             'risk_level': "中", 'color': '#FFC107'},
+            {'min': 17, 'level': "中度认知障碍", 'interpretation': "存在中度认知障碍，建议专科就诊",
+             'risk_level': "高", 'color': '#FF6B35'},
+            {'min': 0, 'level': "重度认知障碍", 'interpretation': "存在重度认知障碍，需要医学干预",
+             'risk_level': "极高", 'color': '#DC3545'},
+        ],
+    },
+    'cdr': {
+        'scale_type': 'CDR',
+        'items': ['记忆', '定向', '判断和解决问题', '社区事务', '家庭和爱好', '个人护理'],
+        'max_score': 3,
+        # 依次为记忆、定向、判断和解决问题、社区事务、家庭和爱好、个人护理（或界面的 domain_0 ~ domain_5）
+        'item_range': (0, 3),
+        'aggregate': 'cdr',
+        'memory_items': ['记忆', 'domain_0'],
+        'bands': [
+            {'min': 3, 'level': "重度痴呆", 'interpretation': "严重认知功能障碍，需要全面护理", 'risk_level': "极高",
+             'color': '#E74C3C',
+             'recommendations': ["全面护理和生活支持", "症状性治疗", "舒适护理和生活质量维护", "家属心理支持"]},
+            {'min': 2, 'level': "中度痴呆", 'interpretation': "严重认知功能障碍，需要较多帮助", 'risk_level': "极高",
+             'color': '#E74C3C',
+             'recommendations': ["调整药物治疗方案", "加强日常生活护理", "行为和心理症状管理", "考虑日间照料服务"]},
+            {'min': 1, 'level': "轻度痴呆", 'interpretation': "明显的认知功能障碍，影响日常生活", 'risk_level': "高",
+             'color': '#E74C3C',
+             'recommendations': ["开始药物治疗（如胆碱酯酶抑制剂）", "制定个性化的护理计划", "家属教育和支持",
+                                 "安全评估和环境改造"]},
+            {'min': 0.5, 'level': "可疑痴呆", 'interpretation': "轻微认知障碍，需要密切观察", 'risk_level': "中",
+             'color': '#27AE60',
+             'recommendations': ["建议进一步神经心理学评估", "定期随访监测认知变化", "加强认知训练和康复",
+                                 "评估和治疗可逆性因素"]},
+            {'min': 0, 'level': "正常", 'interpretation': "无痴呆症状", 'risk_level': "低", 'color': '#27AE60',
+             'recommendations': ["继续保持健康的生活方式", "定期进行认知功能检查", "保持社交活动和智力刺激"]},
+        ],
+    },
+    'hamd': {
+        'scale_type': 'HAMD-17',
+        'items': [str(i) for i in range(1, 18)],
+        'max_score': 52,
+        # 条目编号1-17；睡眠（4-6）、胃肠道、一般躯体、性症状、体重减轻、自知力为0-2分，其余0-4分
+        'item_range': (0, 4),
+        'item_ranges': {item: (0, 2) for item in ['4', '5', '6', '12', '13', '14', '16', '17']},
+        'bands': [
+            {'min': 24, 'level': "重度抑郁", 'interpretation': "存在重度抑郁症状，需要立即专业干预", 'risk_level': "极高",
+             'color': COLORS_4[3],
+             'recommendations': ["立即神经科急诊就诊", "评估自杀风险", "考虑住院治疗", "24小时监护和支持"]},
+            {'min': 18, 'level': "中度抑郁", 'interpretation': "存在中度抑郁症状，建议专业治疗", 'risk_level': "高",
+             'color': COLORS_4[2],
+             'recommendations': ["建议神经科专科就诊", "考虑药物治疗结合心理治疗", "密切监测症状变化", "家属支持和理解"]},
+            {'min': 8, 'level': "轻度抑郁", 'interpretation': "存在轻度抑郁症状，建议关注情绪变化", 'risk_level': "中",
+             'color': COLORS_4[1],
+             'recommendations': ["建议心理咨询或心理治疗", "加强社会支持系统", "规律作息，适度运动", "定期随访评估"]},
+            {'min': 0, 'level': "无抑郁", 'interpretation': "无明显抑郁症状", 'risk_level': "低", 'color': COLORS_4[0],
+             'recommendations': ["保持良好的心理状态", "定期进行情绪自我评估", "维持健康的生活方式"]},
+        ],
+        'domains': {
+            '情绪症状': {'items': ['1', '2', '3'], 'description': '抑郁情绪、罪恶感、自杀观念'},
+            '认知症状': {'items': ['9', '10', '15'], 'description': '激越、精神性焦虑、疑病'},
+            '躯体症状': {'items': ['4', '5', '6', '11', '12', '13'], 'description': '睡眠障碍、食欲、体重、躯体症状'},
+            '精神运动症状': {'items': ['8', '14'], 'description': '精神运动性迟滞、工作和活动'},
+            '其他症状': {'items': ['7', '16', '17'], 'description': '性症状、自知力、日夜变化'},
+        },
+        'domain_key': 'symptom_analysis',
+        'domain_bands': SYMPTOM_DOMAIN_BANDS,
+        'domain_field': 'severity',
+    },
+    'hama': {
+        'scale_type': 'HAMA',
+        'items': [str(i) for i in range(14)],
+        'max_score': 56,
+        'item_range': (0, 4),
+        'bands': [
+            {'min': 21, 'level': "重度焦虑", 'interpretation': "存在重度焦虑症状，需要专业治疗", 'risk_level': "极高",
+             'color': COLORS_4[3]},
+            {'min': 15, 'level': "中度焦虑", 'interpretation': "存在中度焦虑症状，建议专业评估", 'risk_level': "高",
+             'color': COLORS_4[2]},
+            {'min': 7, 'level': "轻度焦虑", 'interpretation': "可能存在轻度焦虑症状", 'risk_level': "中",
+             'color': COLORS_4[1]},
+            {'min': 0, 'level': "无焦虑", 'interpretation': "无明显焦虑症状", 'risk_level': "低", 'color': COLORS_4[0]},
+        ],
+    },
+    'sds': {
+        'scale_type': 'SDS',
+        'items': [str(i) for i in range(1, 21)],
+        'max_score': 100,
+        # 20个条目按1-4计分，标准分 = 原始分 × 1.25 取整
+        'item_range': (1, 4),
+        'reverse_items': ['2', '5', '6', '11', '12', '14', '16', '17', '18', '20'],
+        'multiplier': 1.25,
+        'bands': [
+            {'min': 73, 'level': "重度抑郁", 'interpretation': "存在重度抑郁症状，需要专业干预", 'risk_level': "极高",
+             'color': COLORS_4[3]},
+            {'min': 63, 'level': "中度抑郁", 'interpretation': "存在中度抑郁症状，建议专业治疗", 'risk_level': "高",
+             'color': COLORS_4[2]},
+            {'min': 53, 'level': "轻度抑郁", 'interpretation': "存在轻度抑郁症状，建议关注情绪变化", 'risk_level': "中",
+             'color': COLORS_4[1]},
+            {'min': 0, 'level': "无抑郁", 'interpretation': "无明显抑郁症状", 'risk_level': "低", 'color': COLORS_4[0]},
+        ],
+    },
+    'updrs': {
+        'scale_type': 'UPDRS-III',
+        'items': [str(i) for i in range(1, 15)],
+        'max_score': 56,
+        # 条目编号1-14
+        'item_range': (0, 4),
+        'bands': [
+            {'min': 51, 'level': "重度", 'interpretation': "运动症状严重，严重影响日常生活", 'risk_level': "极高",
+             'color': COLORS_4[3],
+             'recommendations': ["立即神经科专科就诊", "评估手术治疗适应症", "全面护理支持", "家属培训和支持"]},
+            {'min': 34, 'level': "中重度", 'interpretation': "运动症状较重，对日常生活影响较大", 'risk_level': "高",
+             'color': COLORS_4[2],
+             'recommendations': ["神经科专科调整治疗", "考虑深部脑刺激术评估", "全面康复治疗", "日常生活辅助设备"]},
+            {'min': 18, 'level': "中度", 'interpretation': "运动症状明显，对日常生活有一定影响", 'risk_level': "中",
+             'color': COLORS_4[1],
+             'recommendations': ["调整药物治疗方案", "加强康复训练", "职业治疗评估", "家属护理指导"]},
+            {'min': 0, 'level': "轻度", 'interpretation': "运动症状轻微，对日常生活影响较小", 'risk_level': "低",
+             'color': COLORS_4[0],
+             'recommendations': ["继续规律服药", "适度运动和物理治疗", "定期神经科随访", "保持积极的生活态度"]},
+        ],
+        'domains': {
+            '言语和面部表情': {'items': ['1', '2'], 'description': '言语清晰度和面部表情'},
+            '肌肉僵硬': {'items': ['3', '4', '5'], 'description': '颈部、上肢、下肢僵硬'},
+            '手部功能': {'items': ['6', '7', '8'], 'description': '手指敲击、手部动作、快速交替动作'},
+            '下肢功能': {'items': ['9'], 'description': '腿部敏捷性'},
+            '姿势和步态': {'items': ['10', '11', '12', '13'], 'description': '起立、姿势、步态、姿势稳定性'},
+            '整体运动': {'items': ['14'], 'description': '整体运动迟缓'},
+        },
+        'domain_key': 'motor_analysis',
+        'domain_bands': SYMPTOM_DOMAIN_BANDS,
+        'domain_field': 'severity',
+    },
+    'berg': {
+        'scale_type': 'Berg',
+        'items': ['坐到站', '独立站立', '无支撑坐立', '站到坐', '转移', '闭眼独立站立', '双脚并拢站立',
+                  '站立时向前伸手', '站立时从地面拾起物体', '站立时转身看后面', '转身360度', '站立时交替踏步',
+                  '无支撑单脚站立', '前后脚站立'],
+        'max_score': 56,
+        'item_range': (0, 4),
+        'bands': [
+            {'min': 56, 'level': "无跌倒风险", 'risk_level': "低", 'color': BALANCE_COLORS[0],
+             'interpretation': "根据Berg平衡量表评分，患者的平衡功能处于无跌倒风险水平。",
+             'recommendations': ["平衡功能良好，继续保持", "可进行常规体育活动", "定期进行平衡功能评估"]},
+            {'min': 54, 'level': "低跌倒风险", 'risk_level': "低", 'color': BALANCE_COLORS[1],
+             'interpretation': "根据Berg平衡量表评分，患者的平衡功能处于低跌倒风险水平。",
+             'recommendations': ["平衡功能较好，需要注意安全", "建议进行平衡训练", "避免在不平整地面行走"]},
+            {'min': 46, 'level': "中等跌倒风险", 'risk_level': "中", 'color': BALANCE_COLORS[2],
+             'interpretation': "根据Berg平衡量表评分，患者的平衡功能处于中等跌倒风险水平。",
+             'recommendations': ["需要进行平衡康复训练", "使用辅助器具（如手杖）", "改善居家环境安全", "定期随访评估"]},
+            {'min': 0, 'level': "高跌倒风险", 'risk_level': "高", 'color': BALANCE_COLORS[3],
+             'interpretation': "根据Berg平衡量表评分，患者的平衡功能处于高跌倒风险水平。",
+             'recommendations': ["需要密切监护和帮助", "必须使用辅助器具", "进行专业康复治疗", "全面评估跌倒风险因素",
+                                 "考虑物理治疗介入"]},
+        ],
+    },
+    'tinetti': {
+        'scale_type': 'Tinetti',
+        'items': _keys('balance_', 9) + _keys('gait_', 8),
+        'max_score': 28,
+        # 界面选项：坐位平衡、闭眼、步态启动、步态对称性、连续性、步态宽度为0-1分，转身360度为0-3分，其余0-2分
+        'item_range': (0, 2),
+        'item_ranges': dict({item: (0, 1) for item in ['balance_0', 'balance_6', 'gait_0', 'gait_3', 'gait_4',
+                                                       'gait_7']}, balance_7=(0, 3)),
+        'subscores': {'balance_score': _keys('balance_', 9), 'gait_score': _keys('gait_', 8)},
+        'bands': [
+            {'min': 24, 'level': "低跌倒风险", 'risk_level': "低", 'color': '#27AE60',
+             'interpretation': "平衡和步态功能良好",
+             'recommendations': ["平衡和步态功能良好", "继续保持活动水平", "定期进行功能评估"]},
+            {'min': 19, 'level': "中等跌倒风险", 'risk_level': "中", 'color': '#F39C12',
+             'interpretation': "平衡和步态功能下降，存在跌倒风险",
+             'recommendations': ["需要进行平衡和步态训练", "考虑使用辅助器具", "改善环境安全", "定期随访评估"]},
+            {'min': 0, 'level': "高跌倒风险", 'risk_level': "高", 'color': '#E74C3C',
+             'interpretation': "平衡和步态功能明显受损，跌倒风险高",
+             'recommendations': ["需要密切监护", "必须使用辅助器具", "进行专业康复治疗", "全面跌倒风险评估",
+                                 "考虑物理治疗介入"]},
+        ],
+    },
+    'nihss': {
+        'scale_type': 'NIHSS',
+        'items': ['1a', '1b', '1c', '2', '3', '4', '5a', '5b', '6a', '6b', '7', '8', '9', '10', '11'],
+        'max_score': 42,
+        # 1b、1c、2、7、8、10、11为0-2分；1a、3、4、9为0-3分；上下肢运动（5a-6b）为0-4分
+        'item_range': (0, 2),
+        'item_ranges': dict({item: (0, 3) for item in ['1a', '3', '4', '9']},
+                            **{item: (0, 4) for item in ['5a', '5b', '6a', '6b']}),
+        'bands': [
+            {'min': 21, 'level': "重度卒中", 'interpretation': "重度神经功能缺损", 'risk_level': "极高",
+             'color': COLORS_4[3]},
+            {'min': 16, 'level': "中到重度卒中", 'interpretation': "中到重度神经功能缺损", 'risk_level': "高",
+             'color': COLORS_4[2]},
+            {'min': 5, 'level': "轻到中度卒中", 'interpretation': "轻到中度神经功能缺损", 'risk_level': "中",
+             'color': COLORS_4[1]},
+            {'min': 1, 'level': "轻微卒中", 'interpretation': "轻微神经功能缺损", 'risk_level': "低",
+             'color': COLORS_4[0]},
+            {'min': 0, 'level': "无卒中症状", 'interpretation': "无神经功能缺损", 'risk_level': "低",
+             'color': COLORS_4[0]},
+        ],
+    },
+    'gcs': {
+        'scale_type': 'GCS',
+        'items': ['eye', 'verbal', 'motor'],
+        'max_score': 15,
+        'item_range': (1, 6),
+        'item_ranges': {'eye': (1, 4), 'verbal': (1, 5), 'motor': (1, 6)},
+        'subscores': {'eye_score': ['eye'], 'verbal_score': ['verbal'], 'motor_score': ['motor']},
+        'bands': [
+            {'min': 13, 'level': "轻度意识障碍", 'interpretation': "轻度脑损伤", 'risk_level': "低",
+             'color': COLORS_4[0]},
+            {'min': 9, 'level': "中度意识障碍", 'interpretation': "中度脑损伤", 'risk_level': "高",
+             'color': COLORS_4[2]},
+            {'min': 3, 'level': "重度意识障碍", 'interpretation': "重度脑损伤/昏迷", 'risk_level': "极高",
+             'color': COLORS_4[3]},
+            {'min': 0, 'level': "评分异常", 'interpretation': "请检查评分", 'risk_level': "低", 'color': COLORS_4[1]},
+        ],
+    },
+    'mrs': {
+        'scale_type': 'mRS',
+        'items': ['mrs_score'],
+        'max_score': 6,
+        'item_range': (0, 6),
+        'bands': [
+            {'min': 6, 'level': "死亡", 'interpretation': "患者死亡", 'risk_level': "极高", 'color': COLORS_4[3],
+             'fields': {'functional_status': "患者死亡", 'prognosis': "最差结局"}},
+            {'min': 5, 'level': "重度残疾", 'interpretation': "完全依赖他人", 'risk_level': "极高", 'color': COLORS_4[3],
+             'fields': {'functional_status': "完全依赖他人", 'prognosis': "预后差"}},
+            {'min': 4, 'level': "中重度残疾", 'interpretation': "重度功能受限", 'risk_level': "高", 'color': COLORS_4[2],
+             'fields': {'functional_status': "重度功能受限", 'prognosis': "预后较差"}},
+            {'min': 3, 'level': "中度残疾", 'interpretation': "中度功能受限", 'risk_level': "中", 'color': COLORS_4[1],
+             'fields': {'functional_status': "中度功能受限", 'prognosis': "预后一般"}},
+            {'min': 2, 'level': "轻度残疾", 'interpretation': "轻度功能受限", 'risk_level': "低", 'color': COLORS_4[0],
+             'fields': {'functional_status': "轻度功能受限", 'prognosis': "预后较好"}},
+            {'min': 1, 'level': "无明显残疾", 'interpretation': "轻微症状但功能完全", 'risk_level': "低",
+             'color': COLORS_4[0], 'fields': {'functional_status': "轻微症状但功能完全", 'prognosis': "预后良好"}},
+            {'min': 0, 'level': "无症状", 'interpretation': "完全正常", 'risk_level': "低", 'color': COLORS_4[0],
+             'fields': {'functional_status': "完全正常", 'prognosis': "预后极佳"}},
+        ],
+    },
+}
@@ -9,7 +9,8 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
 from datetime import datetime
-import json
+from record_schema import build_record
+from scoring_engine import classify, score_scale, total_score as total_score_of
 
 class CognitiveScales:
     def __init__(self, parent, main_app):
@@ -18,6 +19,13 @@ class CognitiveScales:
         self.current_scale = None
         self.current_responses = {}
         
+    def _report_save(self, record_id, error):
+        """后台保存完成后提示保存结果（在界面主线程中调用）"""
+        if error:
+            messagebox.showerror("错误", f"保存失败：{error}")
+        else:
+            messagebox.showinfo("成功", f"评估结果已保存，记录编号：{record_id}")
+        
     def show_mmse_assessment(self):
         """显示MMSE评估界面"""
         self.current_scale = 'MMSE'
@@ -276,31 +284,7 @@ class CognitiveScales:
         
     def calculate_mmse_score(self):
         """计算MMSE总分"""
-        total_score = 0
-        
-        # 定向力（时间）- 5分
-        for i in range(5):
-            total_score += self.mmse_vars[f"0_{i}"].get()
-            
-        # 定向力（地点）- 5分
-        for i in range(5):
-            total_score += self.mmse_vars[f"1_{i}"].get()
-            
-        # 即刻记忆 - 3分
-        total_score += self.mmse_vars["2_0"].get()
-        
-        # 注意力和计算力 - 5分
-        total_score += self.mmse_vars["3_0"].get()
-        
-        # 延迟回忆 - 3分
-        total_score += self.mmse_vars["4_0"].get()
-        
-        # 语言能力 - 9分
-        for i in range(7):
-            if i == 3:  # 三步指令最高3分
-                total_score += min(self.mmse_vars[f"5_{i}"].get(), 3)
-            else:
-                total_score += self.mmse_vars[f"5_{i}"].get()
+        total_score = total_score_of('mmse', {var: val.get() for var, val in self.mmse_vars.items()})
                 
         # 更新显示
         self.score_label.config(text=f"总分：{total_score} / 30")
@@ -312,18 +296,9 @@ class CognitiveScales:
         
     def show_mmse_interpretation(self, score):
         """显示MMSE评分解释"""
-        if score >= 27:
-            interpretation = "正常认知功能"
-            color = "#28A745"  # 绿色
-        elif score >= 24:
-            interpretation = "轻度认知功能障碍"
-            color = "#FFC107"  # 黄色
-        elif score >= 18:
-            interpretation = "中度认知功能障碍"
-            color = "#FD7E14"  # 橙色
-        else:
-            interpretation = "重度认知功能障碍"
-            color = "#DC3545"  # 红色
+        band = classify('mmse', score)
+        interpretation = band['level']
+        color = band['color']
             
         # 创建解释窗口
         interpretation_window = tk.Toplevel(self.parent)
@@ -385,35 +360,27 @@ class CognitiveScales:
             return
             
         # 计算总分
-        total_score = self.calculate_mmse_score()
+        self.calculate_mmse_score()
+        responses = {var: val.get() for var, val in self.mmse_vars.items()}
         
         # 准备保存数据
-        result_data = {
-            'scale_type': 'MMSE',
-            'patient_info': {
+        result_data = build_record(
+            'MMSE',
+            {
                 'name': self.name_var.get(),
                 'age': self.age_var.get(),
                 'gender': self.gender_var.get(),
                 'education': self.education_var.get(),
                 'assessment_date': self.date_var.get()
             },
-            'scores': {var: val.get() for var, val in self.mmse_vars.items()},
-            'total_score': total_score,
-            'max_score': 30,
-            'timestamp': datetime.now().isoformat()
-        }
+            responses,
+            score_scale('mmse', responses)
+        )
         
         # 保存到文件
         try:
-            import os
-            if not os.path.exists('results'):
-                os.makedirs('results')
-                
-            filename = f"results/MMSE_{self.name_var.get()}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-            with open(filename, 'w', encoding='utf-8') as f:
-                json.dump(result_data, f, ensure_ascii=False, indent=2)
-                
-            messagebox.showinfo("成功", f"评估结果已保存到：{filename}")
+            # 交由后台线程保存到所配置的存储，保存完成后再提示结果
+            self.main_app.save_record(result_data, self._report_save)
             
         except Exception as e:
             messagebox.showerror("错误", f"保存失败：{str(e)}")
@@ -616,35 +583,31 @@ class CognitiveScales:
             messagebox.showwarning("警告", "请先完成评估")
             return
             
-        total_score = sum(var.get() for var in self.moca_responses.values())
+        total_score = total_score_of('moca', self.get_moca_responses())
         self.show_moca_interpretation(total_score)
         
+    def get_moca_responses(self):
+        """MoCA各条目得分"""
+        return {name: var.get() for name, var in self.moca_responses.items()}
+        
     def show_moca_interpretation(self, score):
         """显示MoCA结果解释"""
         # 教育程度校正
         education_correction = messagebox.askyesno("教育程度校正", 
                                                   "患者受教育年限是否≤12年？\n如果是，总分需要加1分")
         
+        self.moca_low_education = education_correction
         if education_correction:
-            corrected_score = score + 1
+            corrected_score = total_score_of('moca', self.get_moca_responses(), low_education=True)
             correction_text = f"原始得分：{score}分\n校正后得分：{corrected_score}分（教育程度校正+1分）"
         else:
             corrected_score = score
             correction_text = f"得分：{score}分"
             
         # 结果解释
-        if corrected_score >= 26:
-            interpretation = "认知功能正常"
-            color = "#28A745"
-        elif corrected_score >= 22:
-            interpretation = "轻度认知障碍"
-            color = "#FFC107"
-        elif corrected_score >= 17:
-            interpretation = "中度认知障碍"
-            color = "#FF6B35"
-        else:
-            interpretation = "重度认知障碍"
-            color = "#DC3545"
+        band = classify('moca', corrected_score)
+        interpretation = band['level']
+        color = band['color']
             
         # 创建结果窗口
         result_window = tk.Toplevel(self.parent)
@@ -715,28 +678,18 @@ class CognitiveScales:
             'education': self.patient_education_var.get()
         }
         
-        # 计算得分
-        total_score = sum(var.get() for var in self.moca_responses.values())
+        # 计算得分（已在查看结果时确认教育程度校正的，按校正后得分保存）
+        responses = self.get_moca_responses()
+        score_result = score_scale('moca', responses,
+                                   low_education=getattr(self, 'moca_low_education', False))
         
         # 保存数据
-        result_data = {
-            'scale_type': 'MoCA',
-            'patient_info': patient_info,
-            'responses': {name: var.get() for name, var in self.moca_responses.items()},
-            'total_score': total_score,
-            'assessment_date': datetime.now().isoformat()
-        }
+        result_data = build_record('MoCA', patient_info, responses, score_result)
         
         # 保存到文件
         try:
-            import os
-            os.makedirs('results', exist_ok=True)
-            
-            filename = f"results/MoCA_{patient_info['name']}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-            with open(filename, 'w', encoding='utf-8') as f:
-                json.dump(result_data, f, ensure_ascii=False, indent=2)
-                
-            messagebox.showinfo("成功", f"评估结果已保存到：{filename}")
+            # 交由后台线程保存到所配置的存储，保存完成后再提示结果
+            self.main_app.save_record(result_data, self._report_save)
         except Exception as e:
             messagebox.showerror("错误", f"保存失败：{str(e)}")
             
@@ -953,26 +906,14 @@ class CognitiveScales:
         """计算CDR评分"""
         try:
             # 检查是否所有领域都已评分
-            scores = []
             for var_name, var in self.cdr_vars.items():
                 score = var.get()
                 if score == 0 and var_name not in ['domain_0', 'domain_1', 'domain_2', 'domain_3', 'domain_4', 'domain_5']:
                     messagebox.showwarning("警告", "请完成所有领域的评估")
                     return
-                scores.append(score)
-            
-            # CDR总分计算规则（简化版）
-            memory_score = scores[0]  # 记忆领域
-            other_scores = scores[1:]  # 其他领域
             
-            # 如果记忆和其他至少3个领域的评分相同，则CDR等于该评分
-            if other_scores.count(memory_score) >= 3:
-                cdr_score = memory_score
-            else:
-                # 否则使用多数规则
-                from collections import Counter
-                score_counts = Counter(scores)
-                cdr_score = score_counts.most_common(1)[0][0]
+            # CDR总分计算规则（记忆优先，见评分规则登记）
+            cdr_score = total_score_of('cdr', {var_name: var.get() for var_name, var in self.cdr_vars.items()})
             
             # 显示结果解释
             self.show_cdr_interpretation(cdr_score)
@@ -983,59 +924,7 @@ class CognitiveScales:
     def show_cdr_interpretation(self, cdr_score):
         """显示CDR评分解释"""
         # 评分解释
-        interpretations = {
-            0: {
-                'level': '正常',
-                'description': '无痴呆症状',
-                'recommendations': [
-                    '继续保持健康的生活方式',
-                    '定期进行认知功能检查',
-                    '保持社交活动和智力刺激'
-                ]
-            },
-            0.5: {
-                'level': '可疑痴呆',
-                'description': '轻微认知障碍，需要密切观察',
-                'recommendations': [
-                    '建议进一步神经心理学评估',
-                    '定期随访监测认知变化',
-                    '加强认知训练和康复',
-                    '评估和治疗可逆性因素'
-                ]
-            },
-            1: {
-                'level': '轻度痴呆',
-                'description': '明显的认知功能障碍，影响日常生活',
-                'recommendations': [
-                    '开始药物治疗（如胆碱酯酶抑制剂）',
-                    '制定个性化的护理计划',
-                    '家属教育和支持',
-                    '安全评估和环境改造'
-                ]
-            },
-            2: {
-                'level': '中度痴呆',
-                'description': '严重认知功能障碍，需要较多帮助',
-                'recommendations': [
-                    '调整药物治疗方案',
-                    '加强日常生活护理',
-                    '行为和心理症状管理',
-                    '考虑日间照料服务'
-                ]
-            },
-            3: {
-                'level': '重度痴呆',
-                'description': '严重认知功能障碍，需要全面护理',
-                'recommendations': [
-                    '全面护理和生活支持',
-                    '症状性治疗',
-                    '舒适护理和生活质量维护',
-                    '家属心理支持'
-                ]
-            }
-        }
-        
-        interpretation = interpretations.get(cdr_score, interpretations[0])
+        band = classify('cdr', cdr_score)
         
         # 创建结果窗口
         result_window = tk.Toplevel(self.parent)
@@ -1062,11 +951,11 @@ class CognitiveScales:
         score_frame = ttk.LabelFrame(main_frame, text="评分结果", padding=15)
         score_frame.pack(fill='x', pady=(0, 15))
         
-        score_text = f"CDR总分：{cdr_score}\n严重程度：{interpretation['level']}"
+        score_text = f"CDR总分：{cdr_score}\n严重程度：{band['level']}"
         score_label = ttk.Label(score_frame,
                                text=score_text,
                                font=('Microsoft YaHei', 12, 'bold'),
-                               foreground='#E74C3C' if cdr_score >= 1 else '#27AE60')
+                               foreground=band['color'])
         score_label.pack()
         
         # 结果解释
@@ -1074,7 +963,7 @@ class CognitiveScales:
         interp_frame.pack(fill='both', expand=True, pady=(0, 15))
         
         interp_label = ttk.Label(interp_frame,
-                                text=interpretation['description'],
+                                text=band['interpretation'],
                                 font=('Microsoft YaHei', 11),
                                 wraplength=500)
         interp_label.pack(anchor='w', pady=(0, 10))
@@ -1085,7 +974,7 @@ class CognitiveScales:
                              font=('Microsoft YaHei', 11, 'bold'))
         rec_label.pack(anchor='w')
         
-        for i, rec in enumerate(interpretation['recommendations'], 1):
+        for i, rec in enumerate(band['recommendations'], 1):
             rec_text = ttk.Label(interp_frame,
                                text=f"{i}. {rec}",
                                font=('Microsoft YaHei', 10),
@@ -1116,41 +1005,11 @@ class CognitiveScales:
             for i, (var_name, var) in enumerate(self.cdr_vars.items()):
                 domain_scores[domain_names[i]] = var.get()
             
-            # 计算总分
-            scores = list(domain_scores.values())
-            memory_score = scores[0]
-            other_scores = scores[1:]
-            
-            if other_scores.count(memory_score) >= 3:
-                total_score = memory_score
-            else:
-                from collections import Counter
-                score_counts = Counter(scores)
-                total_score = score_counts.most_common(1)[0][0]
-            
             # 保存数据
-            result_data = {
-                'scale_type': 'CDR',
-                'scale_name': '临床痴呆评定量表',
-                'patient_info': patient_info,
-                'assessment_date': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-                'domain_scores': domain_scores,
-                'total_score': total_score,
-                'severity_level': {
-                    0: '正常',
-                    0.5: '可疑痴呆', 
-                    1: '轻度痴呆',
-                    2: '中度痴呆',
-                    3: '重度痴呆'
-                }.get(total_score, '未知')
-            }
+            result_data = build_record('CDR', patient_info, domain_scores, score_scale('cdr', domain_scores))
             
-            # 调用主应用的保存方法
-            if hasattr(self.main_app, 'data_manager'):
-                self.main_app.data_manager.save_assessment_result(result_data)
-                messagebox.showinfo("成功", "CDR评估结果已保存")
-            else:
-                messagebox.showwarning("警告", "数据管理器不可用，无法保存结果")
+            # 交由后台线程保存到所配置的存储，保存完成后再提示结果
+            self.main_app.save_record(result_data, self._report_save)
                 
         except Exception as e:
             messagebox.showerror("错误", f"保存失败：{str(e)}")
@@ -9,7 +9,8 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
 from datetime import datetime
-import json
+from record_schema import build_record
+from scoring_engine import classify, score_scale, total_score as total_score_of
 
 class EmotionScales:
     def __init__(self, parent, main_app):
@@ -18,6 +19,13 @@ class EmotionScales:
         self.current_scale = None
         self.current_responses = {}
         
+    def _report_save(self, record_id, error):
+        """后台保存完成后提示保存结果（在界面主线程中调用）"""
+        if error:
+            messagebox.showerror("错误", f"保存失败：{error}")
+        else:
+            messagebox.showinfo("成功", f"评估结果已保存，记录编号：{record_id}")
+        
     def show_hamd_assessment(self):
         """显示HAMD评估界面"""
         self.current_scale = 'HAMD'
@@ -371,7 +379,7 @@ class EmotionScales:
         
     def calculate_hamd_score(self):
         """计算HAMD总分"""
-        total_score = sum(var.get() for var in self.hamd_vars.values())
+        total_score = total_score_of('hamd', self.get_hamd_responses())
         
         # 更新显示
         self.score_label.config(text=f"总分：{total_score} / 52")
@@ -381,24 +389,16 @@ class EmotionScales:
         
         return total_score
         
+    def get_hamd_responses(self):
+        """HAMD各条目得分，条目编号从1开始（与症状维度的条目编号一致）"""
+        return {str(i + 1): var.get() for i, var in self.hamd_vars.items()}
+        
     def show_hamd_interpretation(self, score):
         """显示HAMD评分解释"""
-        if score <= 7:
-            interpretation = "正常"
-            color = "#28A745"  # 绿色
-            detail = "无抑郁症状或症状极轻微"
-        elif score <= 17:
-            interpretation = "轻度抑郁"
-            color = "#FFC107"  # 黄色
-            detail = "可能存在轻度抑郁症状，建议进一步评估"
-        elif score <= 23:
-            interpretation = "中度抑郁"
-            color = "#FD7E14"  # 橙色
-            detail = "存在中度抑郁症状，建议专业治疗"
-        else:
-            interpretation = "重度抑郁"
-            color = "#DC3545"  # 红色
-            detail = "存在重度抑郁症状，需要立即专业干预"
+        band = classify('hamd', score)
+        interpretation = band['level']
+        color = band['color']
+        detail = band['interpretation']
             
         # 创建解释窗口
         interpretation_window = tk.Toplevel(self.parent)
@@ -467,35 +467,27 @@ class EmotionScales:
             return
             
         # 计算总分
-        total_score = self.calculate_hamd_score()
+        self.calculate_hamd_score()
+        responses = self.get_hamd_responses()
         
         # 准备保存数据
-        result_data = {
-            'scale_type': 'HAMD-17',
-            'patient_info': {
+        result_data = build_record(
+            'HAMD-17',
+            {
                 'name': self.name_var.get(),
                 'age': self.age_var.get(),
                 'gender': self.gender_var.get(),
                 'assessment_date': self.date_var.get(),
                 'assessor': self.assessor_var.get()
             },
-            'scores': {str(i): var.get() for i, var in self.hamd_vars.items()},
-            'total_score': total_score,
-            'max_score': 52,
-            'timestamp': datetime.now().isoformat()
-        }
+            responses,
+            score_scale('hamd', responses)
+        )
         
         # 保存到文件
         try:
-            import os
-            if not os.path.exists('results'):
-                os.makedirs('results')
-                
-            filename = f"results/HAMD_{self.name_var.get()}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-            with open(filename, 'w', encoding='utf-8') as f:
-                json.dump(result_data, f, ensure_ascii=False, indent=2)
-                
-            messagebox.showinfo("成功", f"评估结果已保存到：{filename}")
+            # 交由后台线程保存到所配置的存储，保存完成后再提示结果
+            self.main_app.save_record(result_data, self._report_save)
             
         except Exception as e:
             messagebox.showerror("错误", f"保存失败：{str(e)}")
@@ -703,7 +695,7 @@ class EmotionScales:
         
     def calculate_hama_score(self):
         """计算HAMA总分"""
-        total_score = sum(var.get() for var in self.hama_vars.values())
+        total_score = total_score_of('hama', {str(i): var.get() for i, var in self.hama_vars.items()})
         
         # 更新显示
         self.hama_score_label.config(text=f"总分：{total_score} / 56")
@@ -715,22 +707,10 @@ class EmotionScales:
         
     def show_hama_interpretation(self, score):
         """显示HAMA评分解释"""
-        if score <= 6:
-            interpretation = "无焦虑"
-            color = "#28A745"  # 绿色
-            detail = "无明显焦虑症状"
-        elif score <= 14:
-            interpretation = "轻度焦虑"
-            color = "#FFC107"  # 黄色
-            detail = "可能存在轻度焦虑症状"
-        elif score <= 20:
-            interpretation = "中度焦虑"
-            color = "#FD7E14"  # 橙色
-            detail = "存在中度焦虑症状，建议专业评估"
-        else:
-            interpretation = "重度焦虑"
-            color = "#DC3545"  # 红色
-            detail = "存在重度焦虑症状，需要专业治疗"
+        band = classify('hama', score)
+        interpretation = band['level']
+        color = band['color']
+        detail = band['interpretation']
             
         # 创建解释窗口
         interpretation_window = tk.Toplevel(self.parent)
@@ -797,35 +777,27 @@ class EmotionScales:
             return
             
         # 计算总分
-        total_score = self.calculate_hama_score()
+        self.calculate_hama_score()
+        responses = {str(i): var.get() for i, var in self.hama_vars.items()}
         
         # 准备保存数据
-        result_data = {
-            'scale_type': 'HAMA',
-            'patient_info': {
+        result_data = build_record(
+            'HAMA',
+            {
                 'name': self.name_var.get(),
                 'age': self.age_var.get(),
                 'gender': self.gender_var.get(),
                 'assessment_date': self.date_var.get(),
                 'assessor': self.assessor_var.get()
             },
-            'scores': {str(i): var.get() for i, var in self.hama_vars.items()},
-            'total_score': total_score,
-            'max_score': 56,
-            'timestamp': datetime.now().isoformat()
-        }
+            responses,
+            score_scale('hama', responses)
+        )
         
         # 保存到文件
         try:
-            import os
-            if not os.path.exists('results'):
-                os.makedirs('results')
-                
-            filename = f"results/HAMA_{self.name_var.get()}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-            with open(filename, 'w', encoding='utf-8') as f:
-                json.dump(result_data, f, ensure_ascii=False, indent=2)
-                
-            messagebox.showinfo("成功", f"评估结果已保存到：{filename}")
+            # 交由后台线程保存到所配置的存储，保存完成后再提示结果
+            self.main_app.save_record(result_data, self._report_save)
             
         except Exception as e:
             messagebox.showerror("错误", f"保存失败：{str(e)}")
@@ -9,7 +9,8 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
 from datetime import datetime
-import json
+from record_schema import build_record
+from scoring_engine import classify, score_scale, total_score as total_score_of
 
 class MotorScales:
     def __init__(self, parent, main_app):
@@ -18,6 +19,13 @@ class MotorScales:
         self.current_scale = None
         self.current_responses = {}
         
+    def _report_save(self, record_id, error):
+        """后台保存完成后提示保存结果（在界面主线程中调用）"""
+        if error:
+            messagebox.showerror("错误", f"保存失败：{error}")
+        else:
+            messagebox.showinfo("成功", f"评估结果已保存，记录编号：{record_id}")
+        
     def show_updrs_assessment(self):
         """显示UPDRS评估界面"""
         self.current_scale = 'UPDRS'
@@ -286,7 +294,7 @@ class MotorScales:
                 return
         
         # 计算总分
-        total_score = sum(var.get() for var in self.updrs_vars.values())
+        total_score = total_score_of('updrs', {str(k): v.get() for k, v in self.updrs_vars.items()})
         
         # 显示结果
         self.show_updrs_interpretation(total_score)
@@ -294,22 +302,10 @@ class MotorScales:
     def show_updrs_interpretation(self, score):
         """显示UPDRS评分解释"""
         # 评分解释
-        if score <= 17:
-            severity = "轻度"
-            interpretation = "运动症状轻微，对日常生活影响较小"
-            color = "#28a745"  # 绿色
-        elif score <= 33:
-            severity = "中度"
-            interpretation = "运动症状明显，对日常生活有一定影响"
-            color = "#ffc107"  # 黄色
-        elif score <= 50:
-            severity = "中重度"
-            interpretation = "运动症状较重，对日常生活影响较大"
-            color = "#fd7e14"  # 橙色
-        else:
-            severity = "重度"
-            interpretation = "运动症状严重，严重影响日常生活"
-            color = "#dc3545"  # 红色
+        band = classify('updrs', score)
+        severity = band['level']
+        interpretation = band['interpretation']
+        color = band['color']
             
         # 创建结果窗口
         result_window = tk.Toplevel(self.parent)
@@ -395,39 +391,26 @@ UPDRS-III评分标准：
             messagebox.showwarning("提示", "请先完成评估")
             return
             
-        # 计算总分
-        total_score = sum(var.get() for var in self.updrs_vars.values())
+        responses = {str(k): v.get() for k, v in self.updrs_vars.items()}
         
         # 准备保存数据
-        result_data = {
-            'scale_type': 'UPDRS-III',
-            'patient_info': {
+        result_data = build_record(
+            'UPDRS-III',
+            {
                 'name': self.name_var.get(),
                 'gender': self.gender_var.get(),
                 'age': self.age_var.get(),
                 'duration': self.duration_var.get(),
                 'assessment_date': self.date_var.get()
             },
-            'responses': {str(k): v.get() for k, v in self.updrs_vars.items()},
-            'total_score': total_score,
-            'max_score': 56,
-            'assessment_time': datetime.now().isoformat(),
-            'assessor': 'LIUYING'
-        }
-        
-        # 保存到文件
+            responses,
+            score_scale('updrs', responses),
+            assessor='LIUYING'
+        )
+        
         try:
-            import os
-            data_dir = 'data'
-            if not os.path.exists(data_dir):
-                os.makedirs(data_dir)
-                
-            filename = f"{data_dir}/UPDRS_{self.name_var.get()}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-            
-            with open(filename, 'w', encoding='utf-8') as f:
-                json.dump(result_data, f, ensure_ascii=False, indent=2)
-                
-            messagebox.showinfo("成功", f"评估结果已保存到：{filename}")
+            # 交由后台线程保存到所配置的存储，保存完成后再提示结果
+            self.main_app.save_record(result_data, self._report_save)
             
         except Exception as e:
             messagebox.showerror("错误", f"保存失败：{str(e)}")
@@ -741,7 +724,6 @@ UPDRS-III评分标准：
         """计算Berg平衡量表评分"""
         try:
             # 检查是否所有项目都已评分
-            total_score = 0
             for var_name, var in self.berg_vars.items():
                 score = var.get()
                 if score == 0 and var_name in [f"item_{i}" for i in range(14)]:
@@ -749,7 +731,7 @@ UPDRS-III评分标准：
                     if not any(var.get() == j for j in range(5)):
                         messagebox.showwarning("警告", "请完成所有项目的评估")
                         return
-                total_score += score
+            total_score = total_score_of('berg', {name: var.get() for name, var in self.berg_vars.items()})
             
             # 显示结果解释
             self.show_berg_interpretation(total_score)
@@ -760,41 +742,10 @@ UPDRS-III评分标准：
     def show_berg_interpretation(self, total_score):
         """显示Berg平衡量表评分解释"""
         # 评分解释
-        if total_score >= 56:
-            risk_level = "无跌倒风险"
-            risk_color = "#27AE60"
-            recommendations = [
-                "平衡功能良好，继续保持",
-                "可进行常规体育活动",
-                "定期进行平衡功能评估"
-            ]
-        elif total_score >= 54:
-            risk_level = "低跌倒风险"
-            risk_color = "#F39C12"
-            recommendations = [
-                "平衡功能较好，需要注意安全",
-                "建议进行平衡训练",
-                "避免在不平整地面行走"
-            ]
-        elif total_score >= 46:
-            risk_level = "中等跌倒风险"
-            risk_color = "#E67E22"
-            recommendations = [
-                "需要进行平衡康复训练",
-                "使用辅助器具（如手杖）",
-                "改善居家环境安全",
-                "定期随访评估"
-            ]
-        else:
-            risk_level = "高跌倒风险"
-            risk_color = "#E74C3C"
-            recommendations = [
-                "需要密切监护和帮助",
-                "必须使用辅助器具",
-                "进行专业康复治疗",
-                "全面评估跌倒风险因素",
-                "考虑物理治疗介入"
-            ]
+        band = classify('berg', total_score)
+        risk_level = band['level']
+        risk_color = band['color']
+        recommendations = band['recommendations']
         
         # 创建结果窗口
         result_window = tk.Toplevel(self.parent)
@@ -832,7 +783,7 @@ UPDRS-III评分标准：
         interp_frame = ttk.LabelFrame(main_frame, text="评估解释", padding=15)
         interp_frame.pack(fill='both', expand=True, pady=(0, 15))
         
-        interp_text = f"根据Berg平衡量表评分，患者的平衡功能处于{risk_level}水平。"
+        interp_text = band['interpretation']
         interp_label = ttk.Label(interp_frame,
                                 text=interp_text,
                                 font=('Microsoft YaHei', 11),
@@ -870,7 +821,6 @@ UPDRS-III评分标准：
             
             # 获取评估结果
             item_scores = {}
-            total_score = 0
             
             berg_item_names = [
                 '坐到站', '独立站立', '无支撑坐立', '站到坐', '转移',
@@ -881,36 +831,12 @@ UPDRS-III评分标准：
             for i, (var_name, var) in enumerate(self.berg_vars.items()):
                 score = var.get()
                 item_scores[berg_item_names[i]] = score
-                total_score += score
-            
-            # 确定跌倒风险等级
-            if total_score >= 56:
-                risk_level = "无跌倒风险"
-            elif total_score >= 54:
-                risk_level = "低跌倒风险"
-            elif total_score >= 46:
-                risk_level = "中等跌倒风险"
-            else:
-                risk_level = "高跌倒风险"
             
             # 保存数据
-            result_data = {
-                'scale_type': 'Berg',
-                'scale_name': 'Berg平衡量表',
-                'patient_info': patient_info,
-                'assessment_date': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-                'item_scores': item_scores,
-                'total_score': total_score,
-                'max_score': 56,
-                'risk_level': risk_level
-            }
+            result_data = build_record('Berg', patient_info, item_scores, score_scale('berg', item_scores))
             
-            # 调用主应用的保存方法
-            if hasattr(self.main_app, 'data_manager'):
-                self.main_app.data_manager.save_assessment_result(result_data)
-                messagebox.showinfo("成功", "Berg平衡量表评估结果已保存")
-            else:
-                messagebox.showwarning("警告", "数据管理器不可用，无法保存结果")
+            # 交由后台线程保存到所配置的存储，保存完成后再提示结果
+            self.main_app.save_record(result_data, self._report_save)
                 
         except Exception as e:
             messagebox.showerror("错误", f"保存失败：{str(e)}")
@@ -1222,21 +1148,10 @@ UPDRS-III评分标准：
     def calculate_tinetti_score(self):
         """计算Tinetti评分"""
         try:
-            # 计算平衡测试分数
-            balance_score = 0
-            for i in range(9):  # 9个平衡测试项目
-                var_name = f"balance_{i}"
-                if var_name in self.tinetti_vars:
-                    balance_score += self.tinetti_vars[var_name].get()
-            
-            # 计算步态测试分数
-            gait_score = 0
-            for i in range(8):  # 8个步态测试项目
-                var_name = f"gait_{i}"
-                if var_name in self.tinetti_vars:
-                    gait_score += self.tinetti_vars[var_name].get()
-            
-            total_score = balance_score + gait_score
+            score_result = score_scale('tinetti', {name: var.get() for name, var in self.tinetti_vars.items()})
+            total_score = score_result['total_score']
+            balance_score = score_result['balance_score']
+            gait_score = score_result['gait_score']
             
             # 显示结果解释
             self.show_tinetti_interpretation(total_score, balance_score, gait_score)
@@ -1247,33 +1162,10 @@ UPDRS-III评分标准：
     def show_tinetti_interpretation(self, total_score, balance_score, gait_score):
         """显示Tinetti评分解释"""
         # 评分解释
-        if total_score >= 24:
-            risk_level = "低跌倒风险"
-            risk_color = "#27AE60"
-            recommendations = [
-                "平衡和步态功能良好",
-                "继续保持活动水平",
-                "定期进行功能评估"
-            ]
-        elif total_score >= 19:
-            risk_level = "中等跌倒风险"
-            risk_color = "#F39C12"
-            recommendations = [
-                "需要进行平衡和步态训练",
-                "考虑使用辅助器具",
-                "改善环境安全",
-                "定期随访评估"
-            ]
-        else:
-            risk_level = "高跌倒风险"
-            risk_color = "#E74C3C"
-            recommendations = [
-                "需要密切监护",
-                "必须使用辅助器具",
-                "进行专业康复治疗",
-                "全面跌倒风险评估",
-                "考虑物理治疗介入"
-            ]
+        band = classify('tinetti', total_score)
+        risk_level = band['level']
+        risk_color = band['color']
+        recommendations = band['recommendations']
         
         # 创建结果窗口
         result_window = tk.Toplevel(self.parent)
@@ -1347,49 +1239,12 @@ UPDRS-III评分标准：
                 'gender': getattr(self, 'gender_var', tk.StringVar()).get()
             }
             
-            # 计算分数
-            balance_score = 0
-            gait_score = 0
-            
-            for i in range(9):  # 平衡测试
-                var_name = f"balance_{i}"
-                if var_name in self.tinetti_vars:
-                    balance_score += self.tinetti_vars[var_name].get()
-            
-            for i in range(8):  # 步态测试
-                var_name = f"gait_{i}"
-                if var_name in self.tinetti_vars:
-                    gait_score += self.tinetti_vars[var_name].get()
-            
-            total_score = balance_score + gait_score
-            
-            # 确定跌倒风险等级
-            if total_score >= 24:
-                risk_level = "低跌倒风险"
-            elif total_score >= 19:
-                risk_level = "中等跌倒风险"
-            else:
-                risk_level = "高跌倒风险"
-            
-            # 保存数据
-            result_data = {
-                'scale_type': 'Tinetti',
-                'scale_name': 'Tinetti步态与平衡评估量表',
-                'patient_info': patient_info,
-                'assessment_date': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-                'balance_score': balance_score,
-                'gait_score': gait_score,
-                'total_score': total_score,
-                'max_score': 28,
-                'risk_level': risk_level
-            }
+            # 计算分数并保存数据
+            responses = {name: var.get() for name, var in self.tinetti_vars.items()}
+            result_data = build_record('Tinetti', patient_info, responses, score_scale('tinetti', responses))
             
-            # 调用主应用的保存方法
-            if hasattr(self.main_app, 'data_manager'):
-                self.main_app.data_manager.save_assessment_result(result_data)
-                messagebox.showinfo("成功", "Tinetti评估结果已保存")
-            else:
-                messagebox.showwarning("警告", "数据管理器不可用，无法保存结果")
+            # 交由后台线程保存到所配置的存储，保存完成后再提示结果
+            self.main_app.save_record(result_data, self._report_save)
                 
         except Exception as e:
             messagebox.showerror("错误", f"保存失败：{str(e)}")
@@ -9,7 +9,8 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
 from datetime import datetime
-import json
+from record_schema import anonymous_patient_info, build_record
+from scoring_engine import classify, score_scale, total_score as total_score_of
 
 class SeverityScales:
     def __init__(self, parent, main_app):
@@ -18,6 +19,13 @@ class SeverityScales:
         self.current_scale = None
         self.current_responses = {}
         
+    def _report_save(self, record_id, error):
+        """后台保存完成后提示保存结果（在界面主线程中调用）"""
+        if error:
+            messagebox.showerror("错误", f"保存结果时出错：{error}")
+        else:
+            messagebox.showinfo("成功", f"评估结果已保存，记录编号：{record_id}")
+        
     def show_nihss_assessment(self):
         """显示NIHSS评估界面"""
         self.current_scale = 'NIHSS'
@@ -273,33 +281,25 @@ class SeverityScales:
                 messagebox.showwarning("警告", f"请完成所有评估项目的评分")
                 return
         
-        # 计算总分
-        total_score = sum(var.get() for var in self.nihss_vars.values())
-        
         # 保存当前回答
         self.current_responses = {item_id: var.get() for item_id, var in self.nihss_vars.items()}
         
+        # 计算总分
+        total_score = total_score_of('nihss', self.current_responses)
+        
         # 显示结果
         self.show_nihss_interpretation(total_score)
         
     def show_nihss_interpretation(self, total_score):
         """显示NIHSS结果解释"""
         # 确定严重程度
-        if total_score == 0:
-            severity = "无卒中症状"
-            interpretation = "无神经功能缺损"
-        elif 1 <= total_score <= 4:
-            severity = "轻微卒中"
-            interpretation = "轻微神经功能缺损"
-        elif 5 <= total_score <= 15:
-            severity = "轻到中度卒中"
-            interpretation = "轻到中度神经功能缺损"
-        elif 16 <= total_score <= 20:
-            severity = "中到重度卒中"
-            interpretation = "中到重度神经功能缺损"
-        elif total_score >= 21:
-            severity = "重度卒中"
-            interpretation = "重度神经功能缺损"
+        band = classify('nihss', total_score)
+        severity = band['level']
+        interpretation = band['interpretation']
+        
+        # 记下本次回答与评分，保存时不受之后重置或切换量表的影响
+        responses = dict(self.current_responses)
+        score_result = score_scale('nihss', responses)
         
         # 创建结果窗口
         result_window = tk.Toplevel(self.parent)
@@ -369,7 +369,7 @@ NIHSS评分说明：
         
         # 保存结果按钮
         save_btn = ttk.Button(button_frame, text="保存结果",
-                             command=lambda: self.save_nihss_result(total_score, severity))
+                             command=lambda: self.save_nihss_result(responses, score_result))
         save_btn.pack(side='left')
         
         # 关闭按钮
@@ -377,32 +377,15 @@ NIHSS评分说明：
                               command=result_window.destroy)
         close_btn.pack(side='right')
         
-    def save_nihss_result(self, total_score, severity):
-        """保存NIHSS评估结果"""
+    def save_nihss_result(self, responses, score_result):
+        """保存NIHSS评估结果（结果窗口打开时的回答与评分）"""
         try:
             # 创建结果数据
-            result_data = {
-                'scale_name': 'NIHSS',
-                'scale_full_name': '美国国立卫生研究院卒中量表',
-                'assessment_date': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-                'total_score': total_score,
-                'max_score': 42,
-                'severity': severity,
-                'responses': self.current_responses
-            }
-            
-            # 保存到文件
-            import os
-            results_dir = 'results'
-            os.makedirs(results_dir, exist_ok=True)
-            
-            filename = f"NIHSS_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-            filepath = os.path.join(results_dir, filename)
+            result_data = build_record('NIHSS', anonymous_patient_info(datetime.now().strftime('%Y-%m-%d')),
+                                       responses, score_result)
             
-            with open(filepath, 'w', encoding='utf-8') as f:
-                json.dump(result_data, f, ensure_ascii=False, indent=2)
-            
-            messagebox.showinfo("成功", f"评估结果已保存到：{filepath}")
+            # 交由后台线程保存到所配置的存储，保存完成后再提示结果
+            self.main_app.save_record(result_data, self._report_save)
             
         except Exception as e:
             messagebox.showerror("错误", f"保存结果时出错：{str(e)}")
@@ -555,37 +538,33 @@ NIHSS评分说明：
                 messagebox.showwarning("警告", f"请完成所有评估项目的评分")
                 return
         
-        # 计算总分和各项分数
-        eye_score = self.gcs_vars['eye'].get()
-        verbal_score = self.gcs_vars['verbal'].get()
-        motor_score = self.gcs_vars['motor'].get()
-        total_score = eye_score + verbal_score + motor_score
-        
         # 保存当前回答
         self.current_responses = {
-            'eye': eye_score,
-            'verbal': verbal_score,
-            'motor': motor_score
+            'eye': self.gcs_vars['eye'].get(),
+            'verbal': self.gcs_vars['verbal'].get(),
+            'motor': self.gcs_vars['motor'].get()
         }
         
+        # 计算总分和各项分数
+        score_result = score_scale('gcs', self.current_responses)
+        total_score = score_result['total_score']
+        eye_score = score_result['eye_score']
+        verbal_score = score_result['verbal_score']
+        motor_score = score_result['motor_score']
+        
         # 显示结果
         self.show_gcs_interpretation(total_score, eye_score, verbal_score, motor_score)
         
     def show_gcs_interpretation(self, total_score, eye_score, verbal_score, motor_score):
         """显示GCS结果解释"""
         # 确定严重程度
-        if total_score >= 13:
-            severity = "轻度意识障碍"
-            interpretation = "轻度脑损伤"
-        elif 9 <= total_score <= 12:
-            severity = "中度意识障碍"
-            interpretation = "中度脑损伤"
-        elif 3 <= total_score <= 8:
-            severity = "重度意识障碍"
-            interpretation = "重度脑损伤/昏迷"
-        else:
-            severity = "评分异常"
-            interpretation = "请检查评分"
+        band = classify('gcs', total_score)
+        severity = band['level']
+        interpretation = band['interpretation']
+        
+        # 记下本次回答与评分，保存时不受之后重置或切换量表的影响
+        responses = dict(self.current_responses)
+        score_result = score_scale('gcs', responses)
         
         # 创建结果窗口
         result_window = tk.Toplevel(self.parent)
@@ -662,7 +641,7 @@ GCS评分说明：
         
         # 保存结果按钮
         save_btn = ttk.Button(button_frame, text="保存结果",
-                             command=lambda: self.save_gcs_result(total_score, eye_score, verbal_score, motor_score, severity))
+                             command=lambda: self.save_gcs_result(responses, score_result))
         save_btn.pack(side='left')
         
         # 关闭按钮
@@ -670,35 +649,15 @@ GCS评分说明：
                               command=result_window.destroy)
         close_btn.pack(side='right')
         
-    def save_gcs_result(self, total_score, eye_score, verbal_score, motor_score, severity):
-        """保存GCS评估结果"""
+    def save_gcs_result(self, responses, score_result):
+        """保存GCS评估结果（结果窗口打开时的回答与评分）"""
         try:
             # 创建结果数据
-            result_data = {
-                'scale_name': 'GCS',
-                'scale_full_name': '格拉斯哥昏迷量表',
-                'assessment_date': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-                'total_score': total_score,
-                'max_score': 15,
-                'eye_score': eye_score,
-                'verbal_score': verbal_score,
-                'motor_score': motor_score,
-                'severity': severity,
-                'responses': self.current_responses
-            }
-            
-            # 保存到文件
-            import os
-            results_dir = 'results'
-            os.makedirs(results_dir, exist_ok=True)
-            
-            filename = f"GCS_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-            filepath = os.path.join(results_dir, filename)
+            result_data = build_record('GCS', anonymous_patient_info(datetime.now().strftime('%Y-%m-%d')),
+                                       responses, score_result)
             
-            with open(filepath, 'w', encoding='utf-8') as f:
-                json.dump(result_data, f, ensure_ascii=False, indent=2)
-            
-            messagebox.showinfo("成功", f"评估结果已保存到：{filepath}")
+            # 交由后台线程保存到所配置的存储，保存完成后再提示结果
+            self.main_app.save_record(result_data, self._report_save)
             
         except Exception as e:
             messagebox.showerror("错误", f"保存结果时出错：{str(e)}")
@@ -839,17 +798,14 @@ GCS评分说明：
     def show_mrs_interpretation(self, score):
         """显示mRS结果解释"""
         # 确定功能状态和预后
-        score_descriptions = {
-            0: ("无症状", "完全正常", "预后极佳"),
-            1: ("无明显残疾", "轻微症状但功能完全", "预后良好"),
-            2: ("轻度残疾", "轻度功能受限", "预后较好"),
-            3: ("中度残疾", "中度功能受限", "预后一般"),
-            4: ("中重度残疾", "重度功能受限", "预后较差"),
-            5: ("重度残疾", "完全依赖他人", "预后差"),
-            6: ("死亡", "患者死亡", "最差结局")
-        }
+        band = classify('mrs', score)
+        severity = band['level']
+        functional_status = band['fields']['functional_status']
+        prognosis = band['fields']['prognosis']
         
-        severity, functional_status, prognosis = score_descriptions.get(score, ("未知", "未知", "未知"))
+        # 记下本次回答与评分，保存时不受之后重置或切换量表的影响
+        responses = dict(self.current_responses)
+        score_result = score_scale('mrs', responses)
         
         # 创建结果窗口
         result_window = tk.Toplevel(self.parent)
@@ -929,7 +885,7 @@ mRS评分说明：
         
         # 保存结果按钮
         save_btn = ttk.Button(button_frame, text="保存结果",
-                             command=lambda: self.save_mrs_result(score, severity, functional_status, prognosis))
+                             command=lambda: self.save_mrs_result(responses, score_result))
         save_btn.pack(side='left')
         
         # 关闭按钮
@@ -937,34 +893,15 @@ mRS评分说明：
                               command=result_window.destroy)
         close_btn.pack(side='right')
         
-    def save_mrs_result(self, score, severity, functional_status, prognosis):
-        """保存mRS评估结果"""
+    def save_mrs_result(self, responses, score_result):
+        """保存mRS评估结果（结果窗口打开时的回答与评分）"""
         try:
             # 创建结果数据
-            result_data = {
-                'scale_name': 'mRS',
-                'scale_full_name': '改良Rankin量表',
-                'assessment_date': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-                'score': score,
-                'max_score': 6,
-                'severity': severity,
-                'functional_status': functional_status,
-                'prognosis': prognosis,
-                'responses': self.current_responses
-            }
-            
-            # 保存到文件
-            import os
-            results_dir = 'results'
-            os.makedirs(results_dir, exist_ok=True)
-            
-            filename = f"mRS_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-            filepath = os.path.join(results_dir, filename)
-            
-            with open(filepath, 'w', encoding='utf-8') as f:
-                json.dump(result_data, f, ensure_ascii=False, indent=2)
+            result_data = build_record('mRS', anonymous_patient_info(datetime.now().strftime('%Y-%m-%d')),
+                                       responses, score_result)
             
-            messagebox.showinfo("成功", f"评估结果已保存到：{filepath}")
+            # 交由后台线程保存到所配置的存储，保存完成后再提示结果
+            self.main_app.save_record(result_data, self._report_save)
             
         except Exception as e:
             messagebox.showerror("错误", f"保存结果时出错：{str(e)}")
@@ -0,0 +1,394 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+通用评分引擎
+开发人员：LIUYING
+功能：按scale_registry中的量表定义校验条目、计算总分、确定分级并生成完整的评分结果，
+      各量表界面、评分系统及批量工具共用，不再各自维护分级判断；
+      批量评分（score_matrix）对 N×条目 的得分矩阵整体计算
+"""
+
+import bisect
+from collections import Counter
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from scale_catalog import canonical_scale_id
+from scale_registry import SCALE_DEFINITIONS
+
+# 分级中写入评分结果的字段
+BAND_RESULT_FIELDS = ('level', 'interpretation', 'risk_level')
+
+_compiled = {}
+
+
+def _compile(scale_id: str, definition: Dict) -> Dict:
+    """预先整理量表定义：分级按下限升序排列以便二分查找；
+    维度与分项编译为条目列上的0/1矩阵（列为标准条目，再加维度中出现的其他写法，如MMSE界面的 0_0）"""
+    bands = sorted(definition['bands'], key=lambda band: band['min'])
+    compiled = dict(definition)
+    compiled['id'] = scale_id
+    compiled['bands'] = bands
+    compiled['band_mins'] = [band['min'] for band in bands]
+    compiled['domain_bands'] = sorted(definition.get('domain_bands', ()))
+    compiled['domain_band_mins'] = np.array([low for low, _ in compiled['domain_bands']], dtype=float)
+
+    columns = list(definition['items'])
+    for group in list(definition.get('domains', {}).values()) + [
+            {'items': items} for items in definition.get('subscores', {}).values()]:
+        columns.extend(item for item in group['items'] if item not in columns)
+    compiled['item_columns'] = tuple(columns)
+    compiled['column_of'] = {item: pos for pos, item in enumerate(columns)}
+    compiled['plan'] = _matrix_plan(compiled, compiled['item_columns'])
+    return compiled
+
+
+def get_definition(scale: str) -> Dict:
+    """量表定义（scale可为标准编号或记录中的任一写法）；无法识别或未登记时抛出ValueError"""
+    scale_id = canonical_scale_id(scale)
+    if scale_id not in SCALE_DEFINITIONS:
+        raise ValueError(f"未登记评分规则的量表：{scale}")
+    if scale_id not in _compiled:
+        _compiled[scale_id] = _compile(scale_id, SCALE_DEFINITIONS[scale_id])
+    return _compiled[scale_id]
+
+
+def item_range(definition: Dict, item: str) -> Tuple[float, float]:
+    """条目的取值范围"""
+    return definition.get('item_ranges', {}).get(str(item), definition['item_range'])
+
+
+def align_items(definition: Dict, responses: Dict[str, Any]) -> Dict[str, Any]:
+    """条目编号对齐：早期界面按0起编号保存（如HAMD的0-16），标准编号从1开始时整体加1"""
+    keys = [str(key) for key in responses]
+    items = definition['items']
+    if (keys and all(key.isdigit() for key in keys) and '0' in keys and '0' not in items
+            and all(str(int(key) + 1) in items for key in keys)):
+        return {str(int(key) + 1): value for key, value in responses.items()}
+    return responses
+
+
+def validate_responses(scale: str, responses: Dict[str, Any]) -> Dict[str, float]:
+    """校验条目得分并转换为数值；未作答（None）的条目忽略，超出范围或无法识别时抛出ValueError"""
+    definition = get_definition(scale)
+    values = {}
+    for item, value in responses.items():
+        if value is None or value == '':
+            continue
+        try:
+            number = float(value)
+        except (TypeError, ValueError):
+            raise ValueError(f"{definition['scale_type']} 第{item}项得分无效：{value}")
+        low, high = item_range(definition, item)
+        if not low <= number <= high:
+            raise ValueError(f"{definition['scale_type']} 第{item}项得分{value}超出范围（{low:g}-{high:g}）")
+        values[str(item)] = int(number) if number.is_integer() else number
+    return values
+
+
+def _item_score(definition: Dict, item: str, value: float) -> float:
+    """条目计入总分的得分（反向计分、单项上限）"""
+    if item in definition.get('reverse_items', ()):
+        low, high = item_range(definition, item)
+        value = low + high - value
+    cap = definition.get('item_caps', {}).get(item)
+    return min(value, cap) if cap is not None else value
+
+
+def _cdr_global(definition: Dict, values: Dict[str, float]) -> float:
+    """CDR总体评分：其余领域中至少3个与记忆相同时取记忆得分，否则取各领域中出现最多的得分"""
+    memory_item = next((item for item in definition['memory_items'] if item in values), None)
+    if memory_item is None:
+        return 0
+    memory = values[memory_item]
+    others = [value for item, value in values.items() if item != memory_item]
+    if others.count(memory) >= 3:
+        return memory
+    return Counter(values.values()).most_common(1)[0][0]
+
+
+def _round(value: float):
+    value = float(value)
+    return int(value) if value.is_integer() else round(value, 1)
+
+
+def _total(definition: Dict, values: Dict[str, float], options: Dict[str, Any]) -> float:
+    if definition.get('aggregate') == 'cdr':
+        total = _cdr_global(definition, values)
+    else:
+        total = sum(_item_score(definition, item, value) for item, value in values.items())
+    if definition.get('multiplier'):
+        total = int(total * definition['multiplier'])
+    for adjustment in definition.get('adjustments', ()):
+        if options.get(adjustment['option']):
+            total += adjustment['add']
+    return _round(min(total, definition['max_score']))
+
+
+def total_score(scale: str, responses: Dict[str, Any], **options) -> float:
+    """按量表定义计算总分（options为量表定义中adjustments所用的选项，如MoCA的low_education）"""
+    return _total(get_definition(scale), validate_responses(scale, responses), options)
+
+
+def classify(scale: str, score: float) -> Dict:
+    """总分所属的分级（含level、interpretation、risk_level、color等）"""
+    definition = get_definition(scale)
+    pos = bisect.bisect_right(definition['band_mins'], score) - 1
+    return definition['bands'][max(pos, 0)]
+
+
+def analyze_domains(scale: str, responses: Dict[str, Any]) -> Dict[str, Dict]:
+    """各维度得分、百分比与分级；量表未定义维度时返回空字典"""
+    definition = get_definition(scale)
+    values = validate_responses(scale, responses)
+    return _analyze_domains(definition, values)
+
+
+def _dense(definition: Dict, values: Dict[str, float]) -> np.ndarray:
+    """条目得分字典转换为按item_columns排列的向量（未作答及不在列中的条目为0）"""
+    column_of = definition['column_of']
+    vector = np.zeros(len(column_of))
+    for item, value in values.items():
+        pos = column_of.get(item)
+        if pos is not None:
+            vector[pos] = value
+    return vector
+
+
+def _analyze_domains(definition: Dict, values: Dict[str, float]) -> Dict[str, Dict]:
+    plan = definition['plan']
+    if not plan['domain_names']:
+        return {}
+    vector = _dense(definition, values)
+    answered = np.array([item in values for item in definition['item_columns']])
+    item_scores = np.where(plan['reverse'] & answered, plan['low'] + plan['high'] - vector, vector)
+    scores = np.minimum(item_scores, plan['cap']) @ plan['domain_matrix']
+    percentages = [round((score / max_score) * 100, 1) for score, max_score in zip(scores, plan['domain_max'])]
+    levels = np.maximum(np.searchsorted(definition['domain_band_mins'], percentages, side='right') - 1, 0)
+
+    field = definition.get('domain_field', 'level')
+    results = {}
+    for pos, domain_name in enumerate(plan['domain_names']):
+        domain = definition['domains'][domain_name]
+        result = {
+            'score': _round(scores[pos]),
+            'max_score': _round(plan['domain_max'][pos]),
+            'percentage': percentages[pos],
+            field: definition['domain_bands'][levels[pos]][1]
+        }
+        if 'description' in domain:
+            result['description'] = domain['description']
+        results[domain_name] = result
+    return results
+
+
+def _band_result(definition: Dict, total: float) -> Dict[str, Any]:
+    """总分对应的评分结果：总分、满分、百分比及分级中的各字段"""
+    band = classify(definition['id'], total)
+    result = {
+        'total_score': total,
+        'max_score': definition['max_score'],
+        'percentage': round((total / definition['max_score']) * 100, 1)
+    }
+    for field in BAND_RESULT_FIELDS:
+        result[field] = band[field]
+    result.update(band.get('fields', {}))
+    result['recommendations'] = list(band.get('recommendations', ()))
+    return result
+
+
+def score_total(scale: str, total: float) -> Dict[str, Any]:
+    """只有总分（没有条目得分）时的评分结果，如只保存了总分的历史记录"""
+    definition = get_definition(scale)
+    total = _round(float(total))
+    if not 0 <= total <= definition['max_score']:
+        raise ValueError(f"{definition['scale_type']} 总分{total}超出范围（0-{definition['max_score']}）")
+    return _band_result(definition, total)
+
+
+def score_scale(scale: str, responses: Dict[str, Any], **options) -> Dict[str, Any]:
+    """计算完整的评分结果：总分、满分、百分比、分级、解释、风险等级、建议，
+    以及量表定义中的分项得分与维度分析"""
+    definition = get_definition(scale)
+    values = validate_responses(scale, responses)
+    result = _band_result(definition, _total(definition, values, options))
+
+    plan = definition['plan']
+    if plan['subscore_names']:
+        subscores = _dense(definition, values) @ plan['subscore_matrix']
+        for field, score in zip(plan['subscore_names'], subscores):
+            result[field] = _round(score)
+    if definition.get('domains'):
+        result[definition['domain_key']] = _analyze_domains(definition, values)
+    applied = [adjustment['description'] for adjustment in definition.get('adjustments', ())
+               if options.get(adjustment['option'])]
+    if applied:
+        result['adjustments'] = applied
+    return result
+
+
+def registered_scales() -> List[str]:
+    """已登记评分规则的标准量表编号"""
+    return list(SCALE_DEFINITIONS)
+
+
+def scale_type_of(scale: str) -> Optional[str]:
+    """保存记录时使用的量表类型；未登记时返回None"""
+    try:
+        return get_definition(scale)['scale_type']
+    except ValueError:
+        return None
+
+
+# ---------- 批量评分 ----------
+
+_matrix_plans = {}
+
+
+def _matrix_plan(definition: Dict, items: Tuple[str, ...]) -> Dict:
+    """按列顺序预先生成批量评分所需的数组：取值范围、反向计分、单项上限、分项与维度的条目矩阵"""
+    key = (definition['id'], items)
+    if key in _matrix_plans:
+        return _matrix_plans[key]
+
+    ranges = np.array([item_range(definition, item) for item in items], dtype=float).reshape(-1, 2)
+    reverse = set(definition.get('reverse_items', ()))
+    caps = definition.get('item_caps', {})
+    column = {item: pos for pos, item in enumerate(items)}
+
+    def membership(groups: Dict[str, List[str]]) -> np.ndarray:
+        """条目 × 分组 的0/1矩阵（不在列中的条目忽略）"""
+        matrix = np.zeros((len(items), len(groups)))
+        for pos, group_items in enumerate(groups.values()):
+            for item in group_items:
+                if item in column:
+                    matrix[column[item], pos] = 1
+        return matrix
+
+    domains = definition.get('domains', {})
+    plan = {
+        'low': ranges[:, 0],
+        'high': ranges[:, 1],
+        'reverse': np.array([item in reverse for item in items], dtype=bool),
+        'cap': np.array([caps.get(item, np.inf) for item in items], dtype=float),
+        'subscore_names': list(definition.get('subscores', {})),
+        'subscore_matrix': membership(definition.get('subscores', {})),
+        'domain_names': list(domains),
+        'domain_matrix': membership({name: domain['items'] for name, domain in domains.items()}),
+        'domain_max': np.array([domain.get('max_score') or len(domain['items']) * definition['item_range'][1]
+                                for domain in domains.values()], dtype=float),
+        'memory_column': next((column[item] for item in definition.get('memory_items', ()) if item in column),
+                              None),
+    }
+    _matrix_plans[key] = plan
+    return plan
+
+
+def _check_matrix(definition: Dict, items: Sequence[str], matrix: np.ndarray, plan: Dict):
+    """校验得分矩阵（NaN表示未作答）；超出范围时指出第一处错误"""
+    bad = ~np.isnan(matrix) & ((matrix < plan['low']) | (matrix > plan['high']))
+    if bad.any():
+        row, col = np.argwhere(bad)[0]
+        raise ValueError(f"{definition['scale_type']} 第{row + 1}组第{items[col]}项得分{matrix[row, col]:g}"
+                         f"超出范围（{plan['low'][col]:g}-{plan['high'][col]:g}）")
+
+
+def _cdr_global_matrix(values: np.ndarray, memory_column: Optional[int]) -> np.ndarray:
+    """批量CDR总体评分，规则同_cdr_global（出现次数相同时取最先出现的得分）"""
+    if memory_column is None:
+        return np.zeros(len(values))
+    memory = values[:, memory_column]
+    others = np.delete(values, memory_column, axis=1)
+    same_as_memory = (others == memory[:, None]).sum(axis=1) >= 3
+
+    candidates = np.unique(values[~np.isnan(values)])
+    if len(candidates) == 0:
+        return np.zeros(len(values))
+    hits = values[:, :, None] == candidates[None, None, :]          # N × 条目 × 候选得分
+    counts = hits.sum(axis=1)
+    first = np.where(hits.any(axis=1), hits.argmax(axis=1), values.shape[1])
+    mode = candidates[np.argmax(counts * (values.shape[1] + 1) - first, axis=1)]
+    return np.where(same_as_memory, memory, mode)
+
+
+def score_matrix(scale: str, responses_matrix, items: Sequence[str] = None, **options) -> pd.DataFrame:
+    """批量评分：responses_matrix为 N×条目 的得分矩阵（列顺序默认为量表定义的items，NaN表示未作答），
+    返回每组一行的DataFrame：总分、满分、百分比、分级、风险等级，以及分项得分与各维度得分。
+
+    options与score_scale相同，可为单个值或长度为N的数组（如每组各自的low_education）。
+    """
+    definition = get_definition(scale)
+    items = tuple(str(item) for item in (items or definition['items']))
+    matrix = np.asarray(responses_matrix, dtype=float)
+    if matrix.ndim == 1:
+        matrix = matrix.reshape(1, -1)
+    if matrix.shape[1] != len(items):
+        raise ValueError(f"{definition['scale_type']} 得分矩阵应有{len(items)}列，实际为{matrix.shape[1]}列")
+    plan = _matrix_plan(definition, items)
+    _check_matrix(definition, items, matrix, plan)
+
+    values = np.nan_to_num(matrix)
+    item_scores = np.where(plan['reverse'], plan['low'] + plan['high'] - values, values)
+    item_scores = np.where(np.isnan(matrix), 0, np.minimum(item_scores, plan['cap']))
+
+    if definition.get('aggregate') == 'cdr':
+        totals = _cdr_global_matrix(np.where(np.isnan(matrix), np.nan, values), plan['memory_column'])
+    else:
+        totals = item_scores.sum(axis=1)
+    if definition.get('multiplier'):
+        totals = np.floor(totals * definition['multiplier'])
+    for adjustment in definition.get('adjustments', ()):
+        if adjustment['option'] in options:
+            flags = np.broadcast_to(np.asarray(options[adjustment['option']], dtype=bool), totals.shape)
+            totals = totals + adjustment['add'] * flags
+    totals = np.minimum(totals, definition['max_score'])
+
+    bands = definition['bands']
+    band_pos = np.maximum(np.searchsorted(definition['band_mins'], totals, side='right') - 1, 0)
+
+    result = pd.DataFrame({
+        'total_score': totals,
+        'max_score': definition['max_score'],
+        'percentage': np.round(totals / definition['max_score'] * 100, 1),
+        'level': np.array([band['level'] for band in bands], dtype=object)[band_pos],
+        'risk_level': np.array([band['risk_level'] for band in bands], dtype=object)[band_pos],
+    })
+    if plan['subscore_names']:
+        result[plan['subscore_names']] = values @ plan['subscore_matrix']
+    if plan['domain_names']:
+        result[plan['domain_names']] = item_scores @ plan['domain_matrix']
+    for column in ['total_score'] + plan['subscore_names'] + plan['domain_names']:
+        if np.all(np.mod(result[column], 1) == 0):
+            result[column] = result[column].astype(int)
+    return result
+
+
+def responses_to_matrix(scale: str, responses_list: Sequence[Dict[str, Any]],
+                        items: Sequence[str] = None) -> np.ndarray:
+    """把多组条目得分字典转换为得分矩阵（缺少的条目为NaN）"""
+    definition = get_definition(scale)
+    items = [str(item) for item in (items or definition['items'])]
+    matrix = np.full((len(responses_list), len(items)), np.nan)
+    for row, responses in enumerate(responses_list):
+        for col, item in enumerate(items):
+            value = responses.get(item)
+            if value is not None and value != '':
+                matrix[row, col] = float(value)
+    return matrix
+
+
+def domain_table(scale: str, responses_list: Sequence[Dict[str, Any]]) -> pd.DataFrame:
+    """多条记录的分项与维度得分（统计、导出用），每条记录一行；量表没有维度或分项时没有列
+
+    条目按编译好的条目列一次转换为矩阵，维度得分为一次矩阵乘法。
+    """
+    definition = get_definition(scale)
+    plan = definition['plan']
+    columns = plan['subscore_names'] + plan['domain_names']
+    if not columns or not responses_list:
+        return pd.DataFrame(index=range(len(responses_list)), columns=columns)
+    aligned = [align_items(definition, responses) for responses in responses_list]
+    matrix = responses_to_matrix(scale, aligned, definition['item_columns'])
+    return score_matrix(scale, matrix, definition['item_columns'])[columns]
@@ -8,467 +8,439 @@
 
 import json
 import os
+import threading
 from datetime import datetime
-from typing import Dict, List, Tuple, Any
+from typing import Dict, List, Tuple, Any, Iterator, Optional, Set
 import pandas as pd
 import numpy as np
+from config import (DATA_DIR, RESULTS_DIR, STORAGE_ENGINE, SQLITE_DB_PATH, SCAN_MANIFEST_PATH,
+                    JSON_LAYOUT, LOAD_WORKERS, LOAD_EXECUTOR, LOAD_CHUNK_SIZE, SEGMENT_DIR,
+                    SEGMENT_MAX_BYTES, SEGMENT_COMPACT_INTERVAL, ANALYTICS_ARCHIVE_PATH, INDEX_DIR,
+                    QUERY_CACHE_SIZE)
+from analytics_archive import AnalyticsArchive
+from assessment_store import create_store, to_time_bound
+from assessment_query import QueryEngine
+from record_index import (AgeIndex, AssessorIndex, FullTextIndex, GenderIndex, PatientNameIndex,
+                          PinyinNameIndex, RiskLevelIndex, ScaleCatalogIndex, SeverityLevelIndex, TimeIndex,
+                          TotalScoreIndex, get_index, is_pinyin_query, to_epoch)
+from patient_registry import PatientRegistry
+from query_cache import QueryCache, bump_data_version
+from saved_views import SavedViews
+from record_writer import DurableWriter, writes_completed
+from record_schema import build_record, to_canonical
+from scale_catalog import canonical_scale_id, same_scale
+from scoring_engine import domain_table, registered_scales, score_matrix, score_scale
 
 class ScoringSystem:
     """自动化评分计算系统"""
     
-    def __init__(self):
-        self.data_dir = 'data'
+    def __init__(self, storage_engine: str = None, load_workers: int = None, durability: str = None):
+        self.data_dir = DATA_DIR
         self.ensure_data_directory()
         
+        # 存储引擎：json / sqlite / segments；durability可单独指定持久化模式（如批量导入时使用relaxed）
+        self.storage_engine = storage_engine or STORAGE_ENGINE
+        writer = DurableWriter(durability) if durability else None
+        self.store = create_store(self.storage_engine, self.data_dir, [RESULTS_DIR],
+                                  self._normalize_data_format, SQLITE_DB_PATH, SCAN_MANIFEST_PATH, JSON_LAYOUT,
+                                  writer=writer, segment_dir=SEGMENT_DIR, segment_max_bytes=SEGMENT_MAX_BYTES,
+                                  compact_interval=SEGMENT_COMPACT_INTERVAL,
+                                  workers=LOAD_WORKERS if load_workers is None else load_workers,
+                                  executor=LOAD_EXECUTOR, chunk_size=LOAD_CHUNK_SIZE)
+        
+        # 与存储并行维护的列式分析归档（记录编号随引擎不同，各引擎使用独立的归档文件）
+        self.archive = AnalyticsArchive(f"{ANALYTICS_ARCHIVE_PATH}_{self.storage_engine}")
+        
+        # 二级索引（记录编号随引擎不同，各引擎使用独立的索引目录）
+        index_dir = os.path.join(INDEX_DIR, self.storage_engine)
+        self.name_index = get_index(PatientNameIndex, index_dir)
+        self.pinyin_index = get_index(PinyinNameIndex, index_dir)
+        self.time_index = get_index(TimeIndex, index_dir)
+        self.scale_index = get_index(ScaleCatalogIndex, index_dir)
+        self.risk_index = get_index(RiskLevelIndex, index_dir)
+        self.level_index = get_index(SeverityLevelIndex, index_dir)
+        self.gender_index = get_index(GenderIndex, index_dir)
+        self.assessor_index = get_index(AssessorIndex, index_dir)
+        self.score_index = get_index(TotalScoreIndex, index_dir)
+        self.age_index = get_index(AgeIndex, index_dir)
+        self.patient_registry = get_index(PatientRegistry, index_dir)
+        self.text_index = get_index(FullTextIndex, index_dir)
+        self.saved_views = get_index(SavedViews, index_dir)
+        self.indexes = [self.name_index, self.pinyin_index, self.time_index, self.scale_index,
+                        self.risk_index, self.level_index, self.gender_index, self.assessor_index,
+                        self.score_index, self.age_index, self.patient_registry, self.text_index,
+                        self.saved_views]
+        self.query_engine = QueryEngine(self)
+        self._synced_token = None
+        self._sync_lock = threading.RLock()
+        
+        # 查询结果缓存（数据版本随保存、删除递增，存储变化标志随外部增删变化，旧结果不再命中）
+        self.query_cache = QueryCache(QUERY_CACHE_SIZE, self.store.change_token)
+        
+    def close(self):
+        """保存索引、同步批量模式下尚未落盘的文件并关闭存储（如SQLite连接）；界面退出或命令行工具结束时调用
+
+        分段日志存储按目录在进程内共享，这里只同步，进程退出时统一关闭。
+        """
+        for index in self.indexes:
+            index.save()
+        writer = getattr(self.store, 'writer', None)
+        if writer is not None:
+            writer.sync_pending()
+        if self.storage_engine == 'segments':
+            self.store.sync()
+        elif hasattr(self.store, 'close'):
+            self.store.close()
+        
     def ensure_data_directory(self):
         """确保数据目录存在"""
         if not os.path.exists(self.data_dir):
             os.makedirs(self.data_dir)
             
-    def calculate_mmse_score(self, responses: Dict[str, int]) -> Dict[str, Any]:
-        """计算MMSE得分"""
-        total_score = sum(responses.values())
-        max_score = 30
-        
-        # 认知功能分级
-        if total_score >= 27:
-            level = "正常"
-            interpretation = "认知功能正常"
-            risk_level = "低"
-        elif total_score >= 24:
-            level = "轻度认知障碍"
-            interpretation = "可能存在轻度认知功能下降，建议进一步评估"
-            risk_level = "中"
-        elif total_score >= 18:
-            level = "中度认知障碍"
-            interpretation = "存在明显认知功能障碍，建议医学干预"
-            risk_level = "高"
-        else:
-            level = "重度认知障碍"
-            interpretation = "存在严重认知功能障碍，需要立即医学干预"
-            risk_level = "极高"
-            
-        # 各维度分析
-        domain_analysis = self._analyze_mmse_domains(responses)
-        
-        return {
-            'total_score': total_score,
-            'max_score': max_score,
-            'percentage': round((total_score / max_score) * 100, 1),
-            'level': level,
-            'interpretation': interpretation,
-            'risk_level': risk_level,
-            'domain_analysis': domain_analysis,
-            'recommendations': self._get_mmse_recommendations(level)
-        }
+    def calculate_score(self, scale_type: str, responses: Dict[str, Any], **options) -> Dict[str, Any]:
+        """按评分规则登记计算任一量表的评分结果（options如MoCA的low_education）"""
+        return score_scale(scale_type, responses, **options)
         
-    def _analyze_mmse_domains(self, responses: Dict[str, int]) -> Dict[str, Dict]:
-        """分析MMSE各认知域得分"""
-        domains = {
-            '定向力': {'items': [1, 2, 3, 4, 5, 6, 7, 8, 9, 10], 'max_score': 10},
-            '记忆力': {'items': [11, 12, 13], 'max_score': 3},
-            '注意力和计算': {'items': [14, 15, 16, 17, 18], 'max_score': 5},
-            '回忆': {'items': [19, 20, 21], 'max_score': 3},
-            '语言': {'items': [22, 23, 24, 25, 26, 27, 28, 29, 30], 'max_score': 9}
-        }
+    def score_batch(self, scale_type: str, responses_matrix, items: List[str] = None, **options) -> pd.DataFrame:
+        """批量评分：N×条目 的得分矩阵（列顺序默认为评分规则登记中的条目顺序），
+        返回每组的总分、百分比、分级、风险等级及分项/维度得分"""
+        return score_matrix(scale_type, responses_matrix, items, **options)
         
-        domain_results = {}
-        for domain_name, domain_info in domains.items():
-            domain_score = sum(responses.get(str(item), 0) for item in domain_info['items'])
-            domain_percentage = round((domain_score / domain_info['max_score']) * 100, 1)
-            
-            if domain_percentage >= 80:
-                domain_level = "正常"
-            elif domain_percentage >= 60:
-                domain_level = "轻度受损"
-            elif domain_percentage >= 40:
-                domain_level = "中度受损"
-            else:
-                domain_level = "重度受损"
+    def domain_scores(self, scale_types: List[str], responses_list: List[Dict]) -> List[Dict[str, Any]]:
+        """多条记录的分项与维度得分（统计、导出用），按量表分组批量计算
+        
+        返回与输入对应的 {维度或分项名称: 得分} 列表；量表未登记评分规则、没有维度或条目得分有误时为空字典。
+        """
+        results = [{} for _ in responses_list]
+        groups = {}
+        for pos, scale_type in enumerate(scale_types):
+            scale_id = canonical_scale_id(scale_type)
+            if scale_id in registered_scales():
+                groups.setdefault(scale_id, []).append(pos)
                 
-            domain_results[domain_name] = {
-                'score': domain_score,
-                'max_score': domain_info['max_score'],
-                'percentage': domain_percentage,
-                'level': domain_level
-            }
-            
-        return domain_results
-        
-    def _get_mmse_recommendations(self, level: str) -> List[str]:
-        """获取MMSE评估建议"""
-        recommendations = {
-            "正常": [
-                "继续保持良好的生活习惯",
-                "定期进行认知功能评估",
-                "保持社交活动和智力活动"
-            ],
-            "轻度认知障碍": [
-                "建议进行详细的神经心理学评估",
-                "加强认知训练和智力活动",
-                "定期随访，监测认知功能变化",
-                "保持健康的生活方式"
-            ],
-            "中度认知障碍": [
-                "建议神经科专科就诊",
-                "进行脑影像学检查",
-                "考虑药物治疗",
-                "加强日常生活能力训练"
-            ],
-            "重度认知障碍": [
-                "立即神经科专科就诊",
-                "全面的医学评估和检查",
-                "制定个体化治疗方案",
-                "家属护理指导和支持"
-            ]
-        }
-        return recommendations.get(level, [])
+        for scale_id, positions in groups.items():
+            try:
+                table = domain_table(scale_id, [responses_list[pos] for pos in positions])
+            except ValueError:
+                # 个别记录的条目得分超出范围时逐条计算，跳过有误的记录
+                table = None
+            if table is not None:
+                for pos, row in zip(positions, table.to_dict('records')):
+                    results[pos] = row
+                continue
+            for pos in positions:
+                try:
+                    results[pos] = domain_table(scale_id, [responses_list[pos]]).to_dict('records')[0]
+                except ValueError as e:
+                    print(f"计算维度得分时出错: {e}")
+        return results
+        
+    def calculate_mmse_score(self, responses: Dict[str, int]) -> Dict[str, Any]:
+        """计算MMSE得分"""
+        return score_scale('mmse', responses)
         
     def calculate_hamd_score(self, responses: Dict[str, int]) -> Dict[str, Any]:
         """计算HAMD得分"""
-        total_score = sum(responses.values())
-        max_score = 52  # HAMD-17最高分
-        
-        # 抑郁严重程度分级
-        if total_score < 8:
-            level = "无抑郁"
-            interpretation = "无明显抑郁症状"
-            risk_level = "低"
-        elif total_score < 17:
-            level = "轻度抑郁"
-            interpretation = "存在轻度抑郁症状，建议关注情绪变化"
-            risk_level = "中"
-        elif total_score < 24:
-            level = "中度抑郁"
-            interpretation = "存在中度抑郁症状，建议专业治疗"
-            risk_level = "高"
-        else:
-            level = "重度抑郁"
-            interpretation = "存在重度抑郁症状，需要立即专业干预"
-            risk_level = "极高"
-            
-        # 症状维度分析
-        symptom_analysis = self._analyze_hamd_symptoms(responses)
-        
-        return {
-            'total_score': total_score,
-            'max_score': max_score,
-            'percentage': round((total_score / max_score) * 100, 1),
-            'level': level,
-            'interpretation': interpretation,
-            'risk_level': risk_level,
-            'symptom_analysis': symptom_analysis,
-            'recommendations': self._get_hamd_recommendations(level)
-        }
-        
-    def _analyze_hamd_symptoms(self, responses: Dict[str, int]) -> Dict[str, Dict]:
-        """分析HAMD症状维度"""
-        symptom_groups = {
-            '情绪症状': {'items': [1, 2, 3], 'description': '抑郁情绪、罪恶感、自杀观念'},
-            '认知症状': {'items': [9, 10, 15], 'description': '激越、精神性焦虑、疑病'},
-            '躯体症状': {'items': [4, 5, 6, 11, 12, 13], 'description': '睡眠障碍、食欲、体重、躯体症状'},
-            '精神运动症状': {'items': [8, 14], 'description': '精神运动性迟滞、工作和活动'},
-            '其他症状': {'items': [7, 16, 17], 'description': '性症状、自知力、日夜变化'}
-        }
-        
-        symptom_results = {}
-        for group_name, group_info in symptom_groups.items():
-            group_score = sum(responses.get(str(item), 0) for item in group_info['items'])
-            max_possible = len(group_info['items']) * 4  # 每项最高4分
-            group_percentage = round((group_score / max_possible) * 100, 1)
-            
-            if group_percentage < 25:
-                severity = "轻微"
-            elif group_percentage < 50:
-                severity = "轻度"
-            elif group_percentage < 75:
-                severity = "中度"
-            else:
-                severity = "重度"
-                
-            symptom_results[group_name] = {
-                'score': group_score,
-                'max_score': max_possible,
-                'percentage': group_percentage,
-                'severity': severity,
-                'description': group_info['description']
-            }
-            
-        return symptom_results
-        
-    def _get_hamd_recommendations(self, level: str) -> List[str]:
-        """获取HAMD评估建议"""
-        recommendations = {
-            "无抑郁": [
-                "保持良好的心理状态",
-                "定期进行情绪自我评估",
-                "维持健康的生活方式"
-            ],
-            "轻度抑郁": [
-                "建议心理咨询或心理治疗",
-                "加强社会支持系统",
-                "规律作息，适度运动",
-                "定期随访评估"
-            ],
-            "中度抑郁": [
-                "建议神经科专科就诊",
-                "考虑药物治疗结合心理治疗",
-                "密切监测症状变化",
-                "家属支持和理解"
-            ],
-            "重度抑郁": [
-                "立即神经科急诊就诊",
-                "评估自杀风险",
-                "考虑住院治疗",
-                "24小时监护和支持"
-            ]
-        }
-        return recommendations.get(level, [])
+        return score_scale('hamd', responses)
         
     def calculate_updrs_score(self, responses: Dict[str, int]) -> Dict[str, Any]:
         """计算UPDRS得分"""
-        total_score = sum(responses.values())
-        max_score = 56  # UPDRS-III最高分
-        
-        # 运动症状严重程度分级
-        if total_score <= 17:
-            level = "轻度"
-            interpretation = "运动症状轻微，对日常生活影响较小"
-            risk_level = "低"
-        elif total_score <= 33:
-            level = "中度"
-            interpretation = "运动症状明显，对日常生活有一定影响"
-            risk_level = "中"
-        elif total_score <= 50:
-            level = "中重度"
-            interpretation = "运动症状较重，对日常生活影响较大"
-            risk_level = "高"
-        else:
-            level = "重度"
-            interpretation = "运动症状严重，严重影响日常生活"
-            risk_level = "极高"
-            
-        # 运动功能维度分析
-        motor_analysis = self._analyze_updrs_domains(responses)
-        
-        return {
-            'total_score': total_score,
-            'max_score': max_score,
-            'percentage': round((total_score / max_score) * 100, 1),
-            'level': level,
-            'interpretation': interpretation,
-            'risk_level': risk_level,
-            'motor_analysis': motor_analysis,
-            'recommendations': self._get_updrs_recommendations(level)
-        }
-        
-    def _analyze_updrs_domains(self, responses: Dict[str, int]) -> Dict[str, Dict]:
-        """分析UPDRS运动功能域"""
-        motor_domains = {
-            '言语和面部表情': {'items': [1, 2], 'description': '言语清晰度和面部表情'},
-            '肌肉僵硬': {'items': [3, 4, 5], 'description': '颈部、上肢、下肢僵硬'},
-            '手部功能': {'items': [6, 7, 8], 'description': '手指敲击、手部动作、快速交替动作'},
-            '下肢功能': {'items': [9], 'description': '腿部敏捷性'},
-            '姿势和步态': {'items': [10, 11, 12, 13], 'description': '起立、姿势、步态、姿势稳定性'},
-            '整体运动': {'items': [14], 'description': '整体运动迟缓'}
-        }
-        
-        domain_results = {}
-        for domain_name, domain_info in motor_domains.items():
-            domain_score = sum(responses.get(str(item), 0) for item in domain_info['items'])
-            max_possible = len(domain_info['items']) * 4  # 每项最高4分
-            domain_percentage = round((domain_score / max_possible) * 100, 1)
-            
-            if domain_percentage < 25:
-                severity = "轻微"
-            elif domain_percentage < 50:
-                severity = "轻度"
-            elif domain_percentage < 75:
-                severity = "中度"
-            else:
-                severity = "重度"
-                
-            domain_results[domain_name] = {
-                'score': domain_score,
-                'max_score': max_possible,
-                'percentage': domain_percentage,
-                'severity': severity,
-                'description': domain_info['description']
-            }
-            
-        return domain_results
-        
-    def _get_updrs_recommendations(self, level: str) -> List[str]:
-        """获取UPDRS评估建议"""
-        recommendations = {
-            "轻度": [
-                "继续规律服药",
-                "适度运动和物理治疗",
-                "定期神经科随访",
-                "保持积极的生活态度"
-            ],
-            "中度": [
-                "调整药物治疗方案",
-                "加强康复训练",
-                "职业治疗评估",
-                "家属护理指导"
-            ],
-            "中重度": [
-                "神经科专科调整治疗",
-                "考虑深部脑刺激术评估",
-                "全面康复治疗",
-                "日常生活辅助设备"
-            ],
-            "重度": [
-                "立即神经科专科就诊",
-                "评估手术治疗适应症",
-                "全面护理支持",
-                "家属培训和支持"
-            ]
-        }
-        return recommendations.get(level, [])
+        return score_scale('updrs', responses)
         
     def save_assessment_result(self, scale_type: str, patient_info: Dict, 
                              responses: Dict, score_result: Dict) -> str:
         """保存评估结果"""
-        result_data = {
-            'scale_type': scale_type,
-            'patient_info': patient_info,
-            'responses': responses,
-            'score_result': score_result,
-            'assessment_time': datetime.now().isoformat(),
-            'assessor': 'LIUYING',
-            'system_version': '1.0.0'
-        }
+        result_data = build_record(scale_type, patient_info, responses, score_result, assessor='LIUYING')
+        return self.save_record(result_data)
         
-        # 生成文件名
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        patient_name = patient_info.get('name', 'Unknown')
-        filename = f"{self.data_dir}/{scale_type}_{patient_name}_{timestamp}.json"
+    def save_record(self, record: Dict) -> str:
+        """保存一条已构建好的v2记录（如命令行批量评分的结果），同时更新索引与分析归档
         
-        # 保存文件
-        with open(filename, 'w', encoding='utf-8') as f:
-            json.dump(result_data, f, ensure_ascii=False, indent=2)
-            
-        return filename
+        索引的变化追加到各索引的变更日志；进程异常退出时尚未写出的条目由下次启动后的首次完整对齐补回（见sync_indexes）。
+        """
+        with self._sync_lock:
+            in_sync = self._in_sync()
+            record_id = self.store.save(record)
+            bump_data_version()
+            for index in self.indexes:
+                index.add(record_id, record)
+            self._after_own_write(in_sync)
+        try:
+            self.archive.append(record_id, record)
+        except Exception as e:
+            print(f"更新分析归档时出错: {e}")
+        return record_id
+        
+    def get_assessment_result(self, record_id: str) -> Optional[Dict]:
+        """按记录编号取评估结果"""
+        return self.store.get(record_id)
+        
+    def delete_assessment_result(self, record_id: str) -> bool:
+        """删除评估结果，并同步更新索引与分析归档"""
+        with self._sync_lock:
+            in_sync = self._in_sync()
+            if not self.store.delete(record_id):
+                return False
+            bump_data_version()
+            for index in self.indexes:
+                index.remove([record_id])
+            self._after_own_write(in_sync)
+        try:
+            self.archive.remove([record_id])
+        except Exception as e:
+            print(f"更新分析归档时出错: {e}")
+        return True
         
-    def load_assessment_results(self, scale_type: str = None) -> List[Dict]:
-        """加载评估结果"""
-        results = []
+    def sync_indexes(self, force: bool = False):
+        """使索引与存储对齐
         
-        # 检查多个数据目录
-        data_dirs = [self.data_dir, 'results']
+        外部程序（如复制到results/的JSON文件）可能增删或修改记录，这些变化不经过save_record。
+        每个实例首次调用总是完整对齐：按记录版本（store.record_versions）比较，只读取新增或修改过的记录。
+        之后只有存储变化标志（store.change_token）或后台写入线程的完成计数变化时才再次对齐；
+        force为True时先让存储完整扫描（包括原地修改的JSON文件）。对齐产生的变化只追加到各索引的变更日志。
+        """
+        with self._sync_lock:
+            if force:
+                self.store.refresh()
+            token = self._sync_token()
+            if not force and token == self._synced_token:
+                return
+            versions = self.store.record_versions()
+            while True:
+                for index in self.indexes:
+                    index.sync(self.store, versions)
+                # 对齐过程中存储自身的写入（如JSON存储写出扫描清单）也会改变变化标志；
+                # 标志变化而记录版本不变时沿用新标志，否则按新的版本再对齐一次
+                after = self._sync_token()
+                if after == token:
+                    break
+                current = self.store.record_versions()
+                token = after
+                if current == versions:
+                    break
+                versions = current
+            self._synced_token = token
         
-        for data_dir in data_dirs:
-            if not os.path.exists(data_dir):
+    def _sync_token(self) -> tuple:
+        """索引对齐的依据：存储变化标志与后台写入线程的完成计数"""
+        return (self.store.change_token(), writes_completed())
+        
+    def _in_sync(self) -> bool:
+        """索引是否已与存储对齐（之后没有外部变化）"""
+        return self._synced_token is not None and self._sync_token() == self._synced_token
+        
+    def _after_own_write(self, in_sync: bool):
+        """本实例保存、删除后索引已直接更新：写入前已对齐时沿用新的变化标志，下次查询不必逐条比较版本"""
+        if in_sync:
+            self._synced_token = self._sync_token()
+        
+    def refresh(self):
+        """完整刷新（界面的刷新按钮）：清空查询缓存，让存储重新扫描（包括原地修改的文件）并与索引对齐"""
+        self.query_cache.clear()
+        self.sync_indexes(force=True)
+        
+    def search_patient_records(self, keyword: str, exact: bool = False) -> Set[str]:
+        """按患者姓名查找记录编号
+        
+        exact为False时为不区分大小写的子串匹配；关键字只含字母时同时按拼音/首字母前缀匹配（如 zhangsan、zs）。
+        """
+        self.sync_indexes()
+        if exact:
+            return self.name_index.exact(keyword)
+        record_ids = self.name_index.search(keyword)
+        if is_pinyin_query(keyword):
+            record_ids |= self.pinyin_index.search(keyword)
+        return record_ids
+        
+    def find_patients(self, name: str, gender: str = None) -> List[Dict[str, Any]]:
+        """按姓名查找登记的患者，返回 {patient_id, name, gender, birth_year} 列表"""
+        self.sync_indexes()
+        return [dict(self.patient_registry.patient(patient_id), patient_id=patient_id)
+                for patient_id in self.patient_registry.find(name, gender)]
+        
+    def get_patient_timeline(self, patient_id: str, descending: bool = False) -> List[Tuple[str, Dict]]:
+        """患者的全部评估，按评估时间排序的 (记录编号, 记录) 列表（由患者登记直接取得记录编号）"""
+        self.sync_indexes()
+        items = []
+        for record_id in self.patient_registry.timeline(patient_id, descending):
+            record = self.store.get(record_id)
+            if record:
+                items.append((record_id, record))
+        return items
+        
+    def suggest_patient_names(self, keyword: str, limit: int = 10) -> List[str]:
+        """姓名输入框的候选患者姓名（姓名子串或拼音前缀匹配）"""
+        keyword = keyword.strip()
+        if not keyword:
+            return []
+        self.sync_indexes()
+        names = {self.name_index.display_names[name] for name in self.name_index.matching_names(keyword)}
+        if is_pinyin_query(keyword):
+            names |= self.pinyin_index.matching_names(keyword, limit)
+        return sorted(names)[:limit]
+        
+    def query_assessments(self, limit: int = None, **filters) -> List[Tuple[str, Dict]]:
+        """组合条件查询，返回按评估时间倒序的 (记录编号, 记录) 列表；条件见 assessment_query.QUERY_FIELDS"""
+        return list(self.query_cache.get_or_compute(
+            'query', dict(filters, limit=limit),
+            lambda: self.query_engine.search(limit=limit, **filters)))
+        
+    def query_page(self, filters: Dict[str, Any] = None, sort_key: str = 'assessment_time', after: tuple = None,
+                   page_size: int = 50, descending: bool = True) -> Tuple[List[Tuple[str, Dict]], Optional[tuple]]:
+        """键集分页查询，返回 (本页的 (记录编号, 记录) 列表, 下一页游标)；游标为None表示已到最后一页
+        
+        filters同query_assessments，sort_key可为 assessment_time / total_score / age，
+        after传入上一页返回的游标。每次只读取一页记录。
+        """
+        items, cursor = self.query_cache.get_or_compute(
+            'page', dict(filters or {}, sort_key=sort_key, after=after, page_size=page_size, descending=descending),
+            lambda: self.query_engine.page(filters, sort_key, after, page_size, descending))
+        return list(items), cursor
+        
+    def query_cache_stats(self) -> Dict[str, Any]:
+        """查询结果缓存的命中次数、未命中次数、命中率与缓存条数"""
+        return self.query_cache.stats()
+        
+    def explain_query(self, **filters) -> str:
+        """说明组合查询使用的索引及每一步的候选数量"""
+        return self.query_engine.explain(**filters)
+        
+    def saved_view_names(self) -> List[str]:
+        """已保存的视图名称"""
+        return sorted(self.saved_views.definitions)
+        
+    def save_view(self, view_name: str, filters: Dict[str, Any]):
+        """保存视图（条件同query_assessments，另可用days表示最近N天），并对已有记录计算一次"""
+        self.saved_views.define(view_name, filters)
+        self.sync_indexes()
+        self.saved_views.refresh(self.store)
+        self.saved_views.save()
+        
+    def delete_saved_view(self, view_name: str) -> bool:
+        """删除视图"""
+        deleted = self.saved_views.remove_view(view_name)
+        self.saved_views.save()
+        return deleted
+        
+    def open_saved_view(self, view_name: str) -> List[Tuple[str, Dict]]:
+        """打开视图，返回按评估时间倒序的 (记录编号, 记录) 列表；视图的记录编号集合已随保存、删除维护"""
+        self.sync_indexes()
+        if self.saved_views.refresh(self.store):
+            self.saved_views.save()
+        record_ids = self.saved_views.view_ids(view_name)
+        if record_ids is None:
+            raise ValueError(f"视图不存在：{view_name}")
+        times = self.time_index.entries
+        items = []
+        for record_id in sorted(record_ids, key=lambda record_id: times.get(record_id) or 0, reverse=True):
+            record = self.store.get(record_id)
+            if record:
+                items.append((record_id, record))
+        return items
+        
+    def get_assessment_items(self, record_ids, scale_type: str = None) -> List[Tuple[str, Dict]]:
+        """按编号取评估结果，返回按评估时间倒序排列的 (记录编号, 记录) 列表；scale_type按量表目录筛选"""
+        items = []
+        for record_id in record_ids:
+            record = self.store.get(record_id)
+            if record and (not scale_type or same_scale(record.get('scale_type', ''), scale_type)):
+                items.append((record_id, record))
+        items.sort(key=lambda item: to_time_bound(item[1].get('assessment_time', '')) or '', reverse=True)
+        return items
+        
+    def load_assessment_results(self, scale_type: str = None, since=None, until=None) -> List[Dict]:
+        """加载评估结果（按评估时间倒序）；since/until含义同iter_assessment_results"""
+        def load():
+            if not scale_type and since is None and until is None:
+                return self.store.load()
+            return list(self.iter_assessment_results(scale_type, since=since, until=until))
+        return list(self.query_cache.get_or_compute(
+            'load', {'scale_type': scale_type, 'since': to_time_bound(since), 'until': to_time_bound(until)}, load))
+        
+    def iter_assessment_results(self, scale_type: str = None, patient: str = None,
+                                since=None, until=None, limit: int = None) -> Iterator[Dict]:
+        """按评估时间倒序逐条返回评估结果
+        
+        patient为患者姓名（精确匹配）；since/until可为datetime、date或时间字符串，
+        since含、until不含；limit为最多返回条数。调用方可随时停止迭代。
+        """
+        for _, record in self.iter_assessment_items(scale_type, patient, since, until, limit):
+            yield record
+        
+    def iter_assessment_items(self, scale_type: str = None, patient: str = None,
+                              since=None, until=None, limit: int = None) -> Iterator[Tuple[str, Dict]]:
+        """与iter_assessment_results相同，但逐条返回 (记录编号, 记录)，编号可用于删除等操作
+        
+        scale_type按量表目录归一（UPDRS与UPDRS-III为同一量表），指定量表或时间范围时
+        由量表目录索引和时间索引定位记录，只读取命中的记录。
+        """
+        since, until = to_time_bound(since), to_time_bound(until)
+        if not scale_type and since is None and until is None:
+            yield from self.store.iter_items(None, patient, None, None, limit)
+            return
+            
+        record_ids, _ = self.query_engine.execute(scale_type=scale_type, since=since, until=until)
+        if patient:
+            patient_ids = self.name_index.exact(patient)
+            record_ids = [record_id for record_id in record_ids if record_id in patient_ids]
+        count = 0
+        for record_id in record_ids:
+            if limit is not None and count >= limit:
+                return
+            record = self.store.get(record_id)
+            if not record:
                 continue
-                
-            for filename in os.listdir(data_dir):
-                if filename.endswith('.json'):
-                    if scale_type and not filename.startswith(scale_type):
-                        continue
-                        
-                    try:
-                        with open(os.path.join(data_dir, filename), 'r', encoding='utf-8') as f:
-                            data = json.load(f)
-                            
-                            # 统一数据格式
-                            normalized_data = self._normalize_data_format(data)
-                            if normalized_data:
-                                results.append(normalized_data)
-                                
-                    except Exception as e:
-                        print(f"加载文件 {filename} 时出错: {e}")
-                        
-        # 按评估时间排序
-        results.sort(key=lambda x: x.get('assessment_time', ''), reverse=True)
-        return results
+            count += 1
+            yield record_id, record
         
-    def _normalize_data_format(self, data: Dict) -> Dict:
-        """统一数据格式"""
+    def get_analytics_dataframe(self, sync: bool = True) -> pd.DataFrame:
+        """以DataFrame返回列式分析归档（每条评估一行，条目评分为 resp_<条目> 列）
+        
+        sync为True时先与存储对齐，补入外部程序写入的记录；为False时只读取归档文件。
+        """
+        if sync:
+            self.archive.sync(self.store)
+        return self.archive.to_dataframe()
+        
+    @staticmethod
+    def _normalize_data_format(data: Dict) -> Dict:
+        """统一数据格式：v2记录直接返回，历史格式转换为v2"""
         try:
-            # 处理不同的数据格式
-            normalized = {
-                'scale_type': data.get('scale_type') or data.get('scale_name', ''),
-                'patient_info': {},
-                'responses': data.get('responses') or data.get('scores', {}),  # 修复：支持scores字段
-                'score_result': {},
-                'assessment_time': data.get('assessment_time') or data.get('assessment_date') or data.get('timestamp', ''),  # 修复：支持timestamp字段
-                'assessor': data.get('assessor', 'Unknown')
-            }
-            
-            # 处理患者信息
-            if 'patient_info' in data:
-                normalized['patient_info'] = data['patient_info']
-            else:
-                # 从其他字段推断患者信息
-                normalized['patient_info'] = {
-                    'name': data.get('patient_name', '匿名患者'),
-                    'gender': data.get('gender', '未知'),
-                    'age': data.get('age', '未知'),
-                    'assessment_date': data.get('assessment_date', '')
-                }
-            
-            # 处理评分结果
-            normalized['score_result'] = {
-                'total_score': data.get('total_score', 0),
-                'max_score': data.get('max_score', 0),
-                'level': data.get('severity') or data.get('level', ''),
-                'risk_level': data.get('risk_level', '低'),
-                'interpretation': data.get('interpretation', ''),
-                'percentage': round((data.get('total_score', 0) / max(data.get('max_score', 1), 1)) * 100, 1)
-            }
-            
-            # 处理特殊格式（如GCS）
-            if 'eye_score' in data:
-                normalized['score_result'].update({
-                    'eye_score': data.get('eye_score'),
-                    'verbal_score': data.get('verbal_score'),
-                    'motor_score': data.get('motor_score')
-                })
-            
-            return normalized
-            
+            return to_canonical(data)
         except Exception as e:
             print(f"数据格式化错误: {e}")
             return None
         
     def generate_summary_report(self, patient_name: str = None) -> Dict[str, Any]:
         """生成汇总报告"""
-        all_results = self.load_assessment_results()
-        
-        if patient_name:
-            all_results = [r for r in all_results 
-                          if r.get('patient_info', {}).get('name') == patient_name]
-            
-        if not all_results:
-            return {'error': '未找到评估结果'}
-            
-        # 统计信息
         summary = {
-            'total_assessments': len(all_results),
+            'total_assessments': 0,
             'scale_types': {},
             'assessment_timeline': [],
             'risk_distribution': {'低': 0, '中': 0, '高': 0, '极高': 0}
         }
         
-        for result in all_results:
-            scale_type = result.get('scale_type', 'Unknown')
+        # 只读取汇总所需字段，SQLite引擎下直接走索引列
+        for row in self.store.iter_summary_rows(patient_name):
+            summary['total_assessments'] += 1
+            scale_type = row['scale_type']
             summary['scale_types'][scale_type] = summary['scale_types'].get(scale_type, 0) + 1
             
             # 时间线
             summary['assessment_timeline'].append({
-                'date': result.get('assessment_time', ''),
+                'date': row['assessment_time'],
                 'scale_type': scale_type,
-                'score': result.get('score_result', {}).get('total_score', 0),
-                'level': result.get('score_result', {}).get('level', '')
+                'score': row['total_score'],
+                'level': row['level']
             })
             
             # 风险分布
-            risk_level = result.get('score_result', {}).get('risk_level', '低')
-            if risk_level in summary['risk_distribution']:
-                summary['risk_distribution'][risk_level] += 1
+            if row['risk_level'] in summary['risk_distribution']:
+                summary['risk_distribution'][row['risk_level']] += 1
                 
+        if not summary['total_assessments']:
+            return {'error': '未找到评估结果'}
+            
         return summary
         
     def export_to_excel(self, filename: str = None) -> str:
@@ -476,14 +448,11 @@ class ScoringSystem:
         if not filename:
             filename = f"神经内科量表评估报告_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
             
-        all_results = self.load_assessment_results()
-        
-        if not all_results:
-            raise ValueError("没有可导出的数据")
-            
-        # 准备数据
+        # 逐条生成导出行，不保留完整记录列表（维度得分只需条目得分，最后按量表批量计算）
         export_data = []
-        for result in all_results:
+        scale_types = []
+        responses_list = []
+        for result in self.iter_assessment_results():
             patient_info = result.get('patient_info', {})
             score_result = result.get('score_result', {})
             
@@ -501,6 +470,14 @@ class ScoringSystem:
                 '解释': score_result.get('interpretation', ''),
                 '评估者': result.get('assessor', '')
             })
+            scale_types.append(result.get('scale_type', ''))
+            responses_list.append(result.get('responses', {}))
+            
+        if not export_data:
+            raise ValueError("没有可导出的数据")
+            
+        for row, scores in zip(export_data, self.domain_scores(scale_types, responses_list)):
+            row.update(scores)
             
         # 创建DataFrame并导出
         df = pd.DataFrame(export_data)
@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+"""
+测试公共设置
+开发人员：LIUYING
+功能：把项目根目录加入导入路径，并提供构造评估记录、切换到临时工作目录的fixture
+"""
+
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from record_schema import build_record, to_canonical  # noqa: E402
+from record_writer import DurableWriter  # noqa: E402
+
+
+def make_record(scale_type: str = 'MMSE', name: str = '张三', total_score: float = 25,
+                assessment_time: str = '2025-08-20T10:00:00', **score_fields):
+    """构造一条v2评估记录"""
+    score_result = dict({'total_score': total_score, 'max_score': 30, 'level': '正常', 'risk_level': '低'},
+                        **score_fields)
+    return build_record(scale_type, {'name': name, 'gender': '男', 'age': 70}, {'1': 1}, score_result,
+                        assessment_time=assessment_time, assessor='LIUYING')
+
+
+def normalize(data):
+    """存储使用的格式化函数"""
+    return to_canonical(data)
+
+
+class RecordingWriter(DurableWriter):
+    """记录写入、删除了哪些文件的原子写入器（不主动fsync）"""
+
+    def __init__(self):
+        super().__init__('relaxed')
+        self.calls = []
+
+    def write(self, path, data, indent=2, exclusive=False):
+        self.calls.append(('write', path))
+        super().write(path, data, indent, exclusive)
+
+    def remove(self, path):
+        self.calls.append(('remove', path))
+        super().remove(path)
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """切换到临时目录（配置中的数据目录均为相对路径）；结束时丢弃共享的索引实例"""
+    from record_index import reset_indexes
+
+    monkeypatch.chdir(tmp_path)
+    os.makedirs('data', exist_ok=True)
+    os.makedirs('results', exist_ok=True)
+    yield tmp_path
+    reset_indexes()
@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+"""列式分析归档：增量行、删除标记与合并"""
+
+import json
+
+import pytest
+
+from analytics_archive import AnalyticsArchive, DELETED_FLAG
+from conftest import make_record
+
+
+class FakeStore:
+    """只提供record_ids()/get()的最小存储"""
+
+    def __init__(self, records):
+        self.records = records
+
+    def record_ids(self):
+        return set(self.records)
+
+    def get(self, record_id):
+        return self.records.get(record_id)
+
+
+def open_archive(tmp_path, **kwargs):
+    return AnalyticsArchive(str(tmp_path / 'archive'), file_format='npz', **kwargs)
+
+
+def _delta_lines(archive):
+    with open(archive.delta_path, 'r', encoding='utf-8') as f:
+        return [json.loads(line) for line in f]
+
+
+def test_remove_writes_tombstone_without_rewriting_base(tmp_path):
+    archive = open_archive(tmp_path)
+    archive.sync(FakeStore({'a': make_record(name='甲'), 'b': make_record(name='乙')}))
+    archive._fold()
+    base = open(archive.path, 'rb').read()
+
+    archive.remove(['a'])
+
+    assert open(archive.path, 'rb').read() == base
+    assert _delta_lines(archive) == [{'record_id': 'a', DELETED_FLAG: True}]
+    assert list(archive.to_dataframe()['patient_name']) == ['乙']
+
+
+def test_tombstones_survive_reopen_and_are_folded(tmp_path):
+    archive = open_archive(tmp_path, fold_rows=3)
+    archive.append('a', make_record(name='甲'))
+    archive.append('b', make_record(name='乙'))
+    archive.remove(['a'])          # 第3行触发合并
+
+    reopened = open_archive(tmp_path, fold_rows=3)
+    assert reopened.record_ids() == {'b'}
+    assert reopened._read_delta() == []
+
+
+def test_readded_record_after_tombstone_is_kept(tmp_path):
+    archive = open_archive(tmp_path)
+    archive.append('a', make_record(total_score=10))
+    archive.remove(['a'])
+    archive.append('a', make_record(total_score=20))
+
+    df = archive.to_dataframe()
+    assert list(df['total_score']) == [20.0]
+
+
+def test_sync_appends_differences(tmp_path):
+    archive = open_archive(tmp_path)
+    store = FakeStore({'a': make_record(name='甲'), 'b': make_record(name='乙')})
+    assert archive.sync(store) == {'added': 2, 'removed': 0}
+
+    del store.records['a']
+    store.records['c'] = make_record(name='丙')
+    assert archive.sync(store) == {'added': 1, 'removed': 1}
+    assert archive.record_ids() == {'b', 'c'}
+    assert archive.rebuild(store) == 2
+
+
+@pytest.mark.parametrize('engine', ['json', 'sqlite'])
+def test_scoring_system_uses_archive_per_engine(workdir, engine):
+    from scoring_system import ScoringSystem
+
+    system = ScoringSystem(storage_engine=engine)
+    try:
+        assert f"analytics_archive_{engine}." in system.archive.path
+    finally:
+        getattr(system.store, 'close', lambda: None)()
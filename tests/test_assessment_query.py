@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+"""组合查询：时间条件的解析与存储层的量表筛选"""
+
+import pytest
+
+from assessment_store import create_store, to_time_bound
+from conftest import make_record, normalize
+
+
+@pytest.mark.parametrize('value, expected', [
+    ('2025', '2025-01-01'),
+    ('2025-08', '2025-08-01'),
+    ('2025-8', '2025-08-01'),
+    ('2025-08-20T10:00:00', '2025-08-20 10:00:00'),
+])
+def test_partial_dates_become_first_day(value, expected):
+    assert to_time_bound(value) == expected
+
+
+@pytest.fixture
+def system(workdir):
+    from scoring_system import ScoringSystem
+
+    system = ScoringSystem(storage_engine='sqlite', durability='relaxed')
+    for when in ('2025-07-15T09:00:00', '2025-08-20T10:00:00', '2026-01-03T08:00:00'):
+        system.save_record(make_record(assessment_time=when))
+    yield system
+    system.store.close()
+
+
+def _times(items):
+    return sorted(record['assessment_time'][:7] for _, record in items)
+
+
+def test_query_with_partial_date_bounds(system):
+    assert _times(system.query_assessments(since='2025-08')) == ['2025-08', '2026-01']
+    assert _times(system.query_assessments(until='2025-08')) == ['2025-07']
+    assert _times(system.query_assessments(since='2025', until='2026')) == ['2025-07', '2025-08']
+
+
+@pytest.mark.parametrize('bound', ['since', 'until'])
+def test_unparseable_bound_raises(system, bound):
+    with pytest.raises(ValueError):
+        system.query_assessments(**{bound: '2025-13'})
+    with pytest.raises(ValueError):
+        system.query_assessments(**{bound: '八月'})
+
+
+@pytest.mark.parametrize('engine', ['json', 'sqlite', 'segments'])
+def test_store_scale_filter_uses_scale_catalog(tmp_path, engine):
+    from record_writer import DurableWriter
+
+    data_dir = str(tmp_path / 'data')
+    store = create_store(engine, data_dir, [], normalize, db_path=str(tmp_path / 'a.db'),
+                         writer=DurableWriter('relaxed'), segment_dir=str(tmp_path / 'segments'))
+    try:
+        for scale_type in ('UPDRS', 'UPDRS-III', 'MDS-UPDRS', 'MMSE', 'HAMD-17'):
+            store.save(make_record(scale_type, name=scale_type))
+
+        def scales(wanted):
+            return sorted(record['scale_type'] for _, record in store.iter_items(scale_type=wanted))
+
+        # 同一量表的不同写法均命中，而不是按名称前缀匹配
+        assert scales('UPDRS-III') == ['MDS-UPDRS', 'UPDRS', 'UPDRS-III']
+        assert scales('UPDRS') == ['MDS-UPDRS', 'UPDRS', 'UPDRS-III']
+        assert scales('HAMD') == ['HAMD-17']
+        assert scales('MoCA') == []
+        # 无法识别的名称退回前缀匹配
+        assert scales('MM') == ['MMSE']
+    finally:
+        getattr(store, 'close', lambda: None)()
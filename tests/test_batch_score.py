@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+"""命令行批量评分：--save 保存的记录数与输入行数一致"""
+
+import glob
+import json
+import os
+from datetime import datetime
+
+
+def test_save_keeps_every_row_of_the_same_second(workdir, monkeypatch):
+    import assessment_store
+    import batch_score
+
+    class FrozenDatetime(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return datetime(2025, 8, 20, 10, 0, 0)
+
+    # 同一患者、同一量表的多行在同一秒内保存
+    monkeypatch.setattr(assessment_store, 'datetime', FrozenDatetime)
+    rows = 12
+    with open('input.csv', 'w', encoding='utf-8') as f:
+        f.write('scale_type,name,1,2,3\n')
+        for i in range(rows):
+            f.write(f"MMSE,张三,{i % 2},1,1\n")
+
+    assert batch_score.main(['input.csv', '--save', '--engine', 'json', '--workers', '1',
+                             '--output', 'out.jsonl']) == 0
+
+    with open('out.jsonl', 'r', encoding='utf-8') as f:
+        record_ids = [json.loads(line)['record_id'] for line in f]
+    files = glob.glob(os.path.join('data', 'MMSE', '*', '*', '*.json'))
+    assert len(set(record_ids)) == rows
+    assert sorted(map(os.path.normpath, files)) == sorted(map(os.path.normpath, record_ids))
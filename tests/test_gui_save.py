@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+"""界面保存：量表的评估结果由后台线程经评分系统写入所配置的存储，并同时更新索引"""
+
+import os
+from datetime import datetime
+from types import SimpleNamespace
+
+from conftest import make_record
+
+
+def _save_from_gui(system, record):
+    """按量表界面的方式保存（main_app.save_record），返回 (记录编号, 错误信息)"""
+    from main import NeurologicalScaleApp
+    from record_writer import get_writer
+
+    done = []
+    app = SimpleNamespace(scoring_system=system)
+    NeurologicalScaleApp.save_record(app, record, lambda record_id, error: done.append((record_id, error)))
+    get_writer().flush()
+    get_writer().dispatch_completed()
+    assert len(done) == 1
+    return done[0]
+
+
+def _json_files(directory):
+    return [name for _, _, names in os.walk(directory) for name in names if name.endswith('.json')]
+
+
+def _record_files():
+    """平铺目录及分片目录中的JSON记录文件"""
+    from assessment_store import list_json_files
+
+    return list(list_json_files(['data', 'results'], 'data'))
+
+
+def test_gui_save_goes_to_json_shard(workdir):
+    from scoring_system import ScoringSystem
+
+    system = ScoringSystem(storage_engine='json', durability='relaxed')
+    record_id, error = _save_from_gui(system, make_record(name='张三'))
+
+    assert error is None
+    now = datetime.now()
+    assert os.path.dirname(record_id) == os.path.join('data', 'MMSE', now.strftime('%Y'), now.strftime('%m'))
+    assert _json_files('results') == []
+    assert system.search_patient_records('张三') == {record_id}
+    assert system.store.get(record_id)['patient_info']['name'] == '张三'
+
+
+def test_gui_saves_in_same_second_keep_both_records(workdir, monkeypatch):
+    import assessment_store
+    from scoring_system import ScoringSystem
+
+    class FrozenDatetime(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return datetime(2025, 8, 20, 10, 0, 0)
+
+    monkeypatch.setattr(assessment_store, 'datetime', FrozenDatetime)
+    system = ScoringSystem(storage_engine='json', durability='relaxed')
+    saved = [_save_from_gui(system, make_record(name='张三', total_score=score)) for score in (20, 28)]
+
+    assert [error for _, error in saved] == [None, None]
+    assert [os.path.basename(record_id) for record_id, _ in saved] == \
+        ['MMSE_张三_20250820_100000.json', 'MMSE_张三_20250820_100000_1.json']
+    assert [system.store.get(record_id)['score_result']['total_score'] for record_id, _ in saved] == [20, 28]
+
+
+def test_gui_save_goes_into_sqlite(workdir):
+    from scoring_system import ScoringSystem
+
+    system = ScoringSystem(storage_engine='sqlite', durability='relaxed')
+    try:
+        record_id, error = _save_from_gui(system, make_record(name='张三'))
+
+        assert error is None
+        assert _record_files() == []
+        assert system.store.get(record_id)['patient_info']['name'] == '张三'
+        assert system.search_patient_records('张三') == {record_id}
+    finally:
+        system.close()
+
+    reopened = ScoringSystem(storage_engine='sqlite', durability='relaxed')
+    try:
+        assert reopened.store.record_ids() == {record_id}
+    finally:
+        reopened.close()
+
+
+def test_gui_save_goes_into_segments(workdir):
+    from scoring_system import ScoringSystem
+
+    system = ScoringSystem(storage_engine='segments', durability='relaxed')
+    try:
+        record_id, error = _save_from_gui(system, make_record(name='张三'))
+
+        assert error is None
+        assert _record_files() == []
+        assert system.store.get(record_id)['patient_info']['name'] == '张三'
+        assert system.search_patient_records('张三') == {record_id}
+    finally:
+        system.close()
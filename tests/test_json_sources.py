@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+"""SQLite与分段日志引擎对量表模块直接写入的JSON文件的对齐：分片目录、原地修改、移动与删除"""
+
+import json
+import os
+
+import pytest
+
+from assessment_store import JSONFileStore, SegmentLogStore, SQLiteStore
+from record_writer import DurableWriter
+from conftest import make_record, normalize
+
+
+def write_json(path, record):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(record, f, ensure_ascii=False)
+
+
+@pytest.fixture(params=['sqlite', 'segments'])
+def env(request, tmp_path):
+    data_dir, results_dir = str(tmp_path / 'data'), str(tmp_path / 'results')
+    os.makedirs(data_dir)
+    os.makedirs(results_dir)
+    if request.param == 'sqlite':
+        store = SQLiteStore(str(tmp_path / 'assessments.db'), [data_dir, results_dir], normalize)
+    else:
+        store = SegmentLogStore(str(tmp_path / 'segments'), [data_dir, results_dir], normalize)
+    yield store, data_dir, results_dir
+    store.close()
+
+
+def names(store):
+    return sorted(record['patient_info']['name'] for _, record in store.iter_items())
+
+
+def test_imports_flat_and_sharded_files(env):
+    store, data_dir, results_dir = env
+    write_json(os.path.join(results_dir, 'GCS_20250820_231139.json'), make_record('GCS', '甲'))
+    write_json(os.path.join(data_dir, 'MMSE', '2025', '08', 'MMSE_乙_20250820_101010.json'), make_record(name='乙'))
+
+    assert names(store) == ['乙', '甲']
+    assert store.refresh()['imported'] == 0
+
+
+def test_in_place_edit_updates_record_on_refresh(env):
+    store, _, results_dir = env
+    path = os.path.join(results_dir, 'GCS_20250820_231139.json')
+    write_json(path, make_record('GCS', '甲', total_score=8))
+    [(record_id, _)] = list(store.iter_items())
+
+    write_json(path, make_record('GCS', '甲', total_score=13, risk_level='中'))
+    os.utime(path, ns=(1, 1))
+    assert store.refresh()['updated'] == 1
+
+    assert store.get(record_id)['score_result']['total_score'] == 13
+    assert store.record_ids() == {record_id}
+
+
+def test_moved_file_keeps_record_id(env):
+    store, data_dir, results_dir = env
+    source = os.path.join(results_dir, 'GCS_甲_20250820_231139.json')
+    write_json(source, make_record('GCS', '甲'))
+    [(record_id, _)] = list(store.iter_items())
+
+    report = JSONFileStore(data_dir, [results_dir], normalize, writer=DurableWriter('relaxed')).migrate_to_shards()
+    [(_, target)] = report['moved']
+    assert os.path.exists(target) and not os.path.exists(source)
+
+    assert store.refresh()['moved'] == 1
+    assert store.record_ids() == {record_id}
+    assert store.get(record_id)['patient_info']['name'] == '甲'
+    # 删除记录时删除的是移动后的来源文件
+    assert store.delete(record_id)
+    assert not os.path.exists(target)
+
+
+def test_relocate_sources_before_sync(env):
+    store, data_dir, results_dir = env
+    source = os.path.join(results_dir, 'GCS_甲_20250820_231139.json')
+    write_json(source, make_record('GCS', '甲'))
+    [(record_id, _)] = list(store.iter_items())
+
+    target = os.path.join(data_dir, 'GCS', '2025', '08', 'GCS_甲_20250820_231139_1.json')
+    os.makedirs(os.path.dirname(target))
+    os.replace(source, target)
+    store.relocate_sources([(source, target)])
+
+    assert store.refresh() == {'imported': 0, 'updated': 0, 'moved': 0, 'removed': 0}
+    assert store.record_ids() == {record_id}
+
+
+def test_externally_deleted_file_removes_record(env):
+    store, _, results_dir = env
+    path = os.path.join(results_dir, 'GCS_20250820_231139.json')
+    write_json(path, make_record('GCS', '甲'))
+    assert names(store) == ['甲']
+
+    os.remove(path)
+    assert names(store) == []
+    assert store.record_ids() == set()
@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+"""JSON文件存储：扫描清单（摘要 + 变更日志）与读写"""
+
+import json
+import os
+from datetime import datetime
+
+import pytest
+
+from assessment_store import JSONFileStore
+from record_writer import DurableWriter
+from conftest import make_record, normalize
+
+
+def open_store(tmp_path, **kwargs):
+    return JSONFileStore(str(tmp_path / 'data'), [str(tmp_path / 'results')], normalize,
+                         writer=DurableWriter('relaxed'), **kwargs)
+
+
+@pytest.fixture
+def store(tmp_path):
+    (tmp_path / 'data').mkdir()
+    (tmp_path / 'results').mkdir()
+    return open_store(tmp_path)
+
+
+def _manifest_files(store):
+    with open(store.manifest_path, 'r', encoding='utf-8') as f:
+        return json.load(f)['files']
+
+
+def test_manifest_keeps_summary_not_record(store):
+    record_id = store.save(make_record(name='张三', total_score=18))
+    store.refresh()
+
+    entry = store.manifest[record_id]
+    assert set(entry) == {'mtime', 'size', 'summary'}
+    assert entry['summary']['patient'] == '张三'
+    assert entry['summary']['total_score'] == 18
+    assert store.get(record_id) == make_record(name='张三', total_score=18)
+
+
+def test_changes_append_to_journal_without_rewriting_manifest(store):
+    first = store.save(make_record(name='甲'))
+    store.refresh()
+    base = open(store.manifest_path, 'rb').read()
+
+    second = store.save(make_record(name='乙', assessment_time='2025-08-21T10:00:00'))
+    store.refresh()
+    store.delete(first)
+
+    assert open(store.manifest_path, 'rb').read() == base
+    with open(store.journal_path, 'r', encoding='utf-8') as f:
+        changes = [json.loads(line) for line in f]
+    assert [(c['path'], c['entry'] is None) for c in changes] == [(second, False), (first, True)]
+
+
+def test_reopen_replays_journal_and_ignores_torn_tail(store, tmp_path):
+    kept = store.save(make_record(name='甲'))
+    store.refresh()
+    removed = store.save(make_record(name='乙'))
+    store.refresh()
+    store.delete(removed)
+    with open(store.journal_path, 'a', encoding='utf-8') as f:
+        f.write('{"path": "half')
+
+    reopened = open_store(tmp_path)
+    assert reopened.refresh() == {'hits': 1, 'misses': 0, 'removed': 0}
+    assert reopened.record_ids() == {kept}
+
+
+def test_journal_is_compacted_into_manifest(store):
+    store.JOURNAL_COMPACT_MIN = 3
+    for n in range(5):
+        store.save(make_record(name=f"患者{n}", assessment_time=f"2025-08-2{n}T10:00:00"))
+        store.refresh()
+
+    assert len(_manifest_files(store)) >= 4
+    assert store._journal_lines <= 3
+
+
+def test_iter_items_filters_on_summary(store):
+    a = store.save(make_record('MMSE', '张三', assessment_time='2025-01-05T09:00:00'))
+    b = store.save(make_record('HAMD-17', '张三', assessment_time='2025-02-01T09:00:00'))
+    c = store.save(make_record('MMSE', '李四', assessment_time='2025-03-01T09:00:00'))
+
+    assert [record_id for record_id, _ in store.iter_items()] == [c, b, a]
+    assert [record_id for record_id, _ in store.iter_items(scale_type='MMSE')] == [c, a]
+    assert [record_id for record_id, _ in store.iter_items(patient='张三', limit=1)] == [b]
+    assert [row['scale_type'] for row in store.iter_summary_rows('张三')] == ['HAMD-17', 'MMSE']
+
+
+def test_external_edit_is_rescanned(store):
+    record_id = store.save(make_record(total_score=10))
+    store.refresh()
+
+    with open(record_id, 'w', encoding='utf-8') as f:
+        json.dump(make_record(total_score=29), f, ensure_ascii=False, indent=4)
+    os.utime(record_id, ns=(1, 1))
+
+    assert store.refresh()['misses'] == 1
+    assert store.manifest[record_id]['summary']['total_score'] == 29
+
+
+def test_same_second_saves_get_distinct_files(store, monkeypatch):
+    import assessment_store
+
+    class FrozenDatetime(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return datetime(2025, 8, 20, 10, 0, 0)
+
+    monkeypatch.setattr(assessment_store, 'datetime', FrozenDatetime)
+    record_ids = [store.save(make_record(name='张三', total_score=score)) for score in range(5)]
+
+    assert len(set(record_ids)) == 5
+    assert [os.path.basename(path) for path in record_ids] == \
+        ['MMSE_张三_20250820_100000.json'] + [f"MMSE_张三_20250820_100000_{i}.json" for i in range(1, 5)]
+    assert sorted(store.get(path)['score_result']['total_score'] for path in record_ids) == list(range(5))
+
+
+def _age_dirs(root):
+    """把目录修改时间调到一小时前（视为已稳定，扫描后可按修改时间跳过）"""
+    past = int((datetime.now().timestamp() - 3600) * 10 ** 9)
+    for directory, _, _ in os.walk(root):
+        os.utime(directory, ns=(past, past))
+
+
+def _write_external(path, record):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(record, f, ensure_ascii=False)
+    # 新增文件使所在目录的修改时间变化（不依赖文件系统的时间戳精度）
+    os.utime(os.path.dirname(path), ns=(0, 10 ** 9))
+
+
+def test_unchanged_directories_are_not_relisted(store, tmp_path):
+    record_id = store.save(make_record(name='张三'))
+    store.refresh()
+    _age_dirs(tmp_path)
+    store.record_ids()
+
+    assert store.record_ids() == {record_id}
+    assert store.last_scan_stats == {'hits': 0, 'misses': 0, 'removed': 0}
+
+    external = str(tmp_path / 'results' / 'MMSE_李四_20250820_100000.json')
+    _write_external(external, make_record(name='李四'))
+    assert store.record_ids() == {record_id, external}
+    assert store.last_scan_stats == {'hits': 0, 'misses': 1, 'removed': 0}
+
+
+def test_time_bounded_scan_skips_older_shards(store, tmp_path, monkeypatch):
+    import assessment_store
+
+    saved_at = [datetime(2025, 1, 10), datetime(2025, 3, 10)]
+
+    class FrozenDatetime(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return saved_at[0]
+
+    monkeypatch.setattr(assessment_store, 'datetime', FrozenDatetime)
+    january = store.save(make_record(name='张三', assessment_time='2025-01-10T09:00:00'))
+    saved_at.pop(0)
+    march = store.save(make_record(name='李四', assessment_time='2025-03-10T09:00:00'))
+    store.refresh()
+    _age_dirs(tmp_path)
+    store.record_ids()
+
+    late = os.path.join(os.path.dirname(january), 'MMSE_王五_20250115_090000.json')
+    _write_external(late, make_record(name='王五', assessment_time='2025-01-15T09:00:00'))
+    assert [record_id for record_id, _ in store.iter_items(since='2025-03-01 00:00:00')] == [march]
+    # 一月分片未被扫描
+    assert late not in store.manifest
+
+    assert [record_id for record_id, _ in store.iter_items()] == [march, late, january]
@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+"""数据维护命令：按所选存储引擎重新评分，并更新索引与分析归档"""
+
+import json
+import os
+
+import pytest
+
+from conftest import make_record
+
+# make_record 的条目得分只有1分，保存的总分25分与之不符，重新评分后为重度认知障碍
+RESCORED_LEVEL = '重度认知障碍'
+
+
+def _close(system):
+    getattr(system.store, 'close', lambda: None)()
+
+
+@pytest.mark.parametrize('engine', ['json', 'sqlite', 'segments'])
+def test_rescore_updates_selected_engine(workdir, engine):
+    import maintenance
+    from scoring_system import ScoringSystem
+
+    system = ScoringSystem(storage_engine=engine, durability='relaxed')
+    try:
+        saved_id = system.save_record(make_record(name='张三'))
+        source = os.path.join('results', 'MMSE_李四_20250820_100000.json')
+        with open(source, 'w', encoding='utf-8') as f:
+            json.dump(make_record(name='李四'), f, ensure_ascii=False)
+        system.sync_indexes()
+        record_ids = system.store.record_ids()
+        assert len(record_ids) == 2
+
+        assert maintenance.main(['rescore', '--engine', engine, '--workers', '1']) == 0
+
+        assert system.store.record_ids() == record_ids
+        assert system.store.get(saved_id)['score_result']['level'] == RESCORED_LEVEL
+        # 由JSON文件导入的记录同时改写来源文件
+        with open(source, 'r', encoding='utf-8') as f:
+            assert json.load(f)['score_result']['level'] == RESCORED_LEVEL
+        assert {record['score_result']['level'] for record in system.store.iter_records()} == {RESCORED_LEVEL}
+    finally:
+        _close(system)
+
+    reopened = ScoringSystem(storage_engine=engine, durability='relaxed')
+    try:
+        reopened.sync_indexes()
+        assert reopened.level_index.lookup(RESCORED_LEVEL) == record_ids
+        assert set(reopened.archive.to_dataframe()['level']) == {RESCORED_LEVEL}
+        # 再次重新评分时已无变化，写回的来源文件也不会被当作修改过的文件重新导入
+        versions = reopened.store.record_versions()
+        assert maintenance.main(['rescore', '--engine', engine, '--dry-run']) == 0
+        assert reopened.store.record_versions() == versions
+    finally:
+        _close(reopened)
+
+
+def test_rescore_dry_run_leaves_records(workdir):
+    import maintenance
+    from scoring_system import ScoringSystem
+
+    system = ScoringSystem(storage_engine='sqlite', durability='relaxed')
+    try:
+        saved_id = system.save_record(make_record(name='张三'))
+        assert maintenance.main(['rescore', '--engine', 'sqlite', '--dry-run']) == 0
+        assert system.store.get(saved_id)['score_result']['level'] == '正常'
+    finally:
+        _close(system)
+
+
+@pytest.mark.parametrize('engine', ['sqlite', 'segments'])
+def test_migrate_layout_keeps_record_ids_of_selected_engine(workdir, engine):
+    import maintenance
+    from scoring_system import ScoringSystem
+
+    source = os.path.join('results', 'MMSE_李四_20250820_100000.json')
+    with open(source, 'w', encoding='utf-8') as f:
+        json.dump(make_record(name='李四'), f, ensure_ascii=False)
+    system = ScoringSystem(storage_engine=engine, durability='relaxed')
+    try:
+        record_ids = system.store.record_ids()
+        assert len(record_ids) == 1
+
+        assert maintenance.main(['migrate-layout', '--engine', engine]) == 0
+
+        assert not os.path.exists(source)
+        system.store.refresh()
+        assert system.store.record_ids() == record_ids
+        assert system.search_patient_records('李四') == record_ids
+    finally:
+        _close(system)
+
@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+"""查询结果缓存：缓存键包含存储变化标志，外部新增的记录不会被旧结果遮住"""
+
+import json
+import os
+
+import pytest
+
+from query_cache import QueryCache
+from conftest import make_record
+
+
+def test_store_token_change_invalidates_entries():
+    token = [[['data', 1]]]
+    cache = QueryCache(8, lambda: token)
+    calls = []
+    compute = lambda: calls.append(1) or len(calls)
+
+    assert cache.get_or_compute('load', {}, compute) == 1
+    assert cache.get_or_compute('load', {}, compute) == 1
+    token[0][0][1] = 2
+    assert cache.get_or_compute('load', {}, compute) == 2
+    assert cache.stats()['hits'] == 1
+
+
+def _write_external(name, stamp):
+    path = os.path.join('results', f"GCS_{name}_20250820_100000.json")
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(make_record('GCS', name), f, ensure_ascii=False)
+    # 文件系统时间戳精度有限，显式设置目录的修改时间
+    os.utime('results', ns=(stamp, stamp))
+
+
+@pytest.mark.parametrize('engine', ['json', 'sqlite', 'segments'])
+def test_external_file_appears_in_cached_queries(workdir, engine):
+    from scoring_system import ScoringSystem
+
+    system = ScoringSystem(storage_engine=engine, durability='relaxed')
+    try:
+        _write_external('李四', 10 ** 18)
+        assert len(system.query_page({})[0]) == 1
+        assert len(system.load_assessment_results()) == 1
+        assert len(system.load_assessment_results('GCS')) == 1
+
+        _write_external('王五', 10 ** 18 + 1)
+        assert len(system.query_page({})[0]) == 2
+        assert len(system.load_assessment_results()) == 2
+        assert len(system.load_assessment_results('GCS')) == 2
+    finally:
+        if engine == 'sqlite':
+            system.store.close()
@@ -0,0 +1,221 @@
+# -*- coding: utf-8 -*-
+"""二级索引：按记录版本对齐，以及评分系统发现外部新增、修改、删除的记录"""
+
+import json
+import os
+
+import pytest
+
+from record_index import PatientNameIndex
+from conftest import make_record
+
+
+class FakeStore:
+    """只提供record_versions()/get()的最小存储"""
+
+    def __init__(self):
+        self.records = {}
+        self.versions = {}
+        self.reads = []
+
+    def put(self, record_id, record, version):
+        self.records[record_id] = record
+        self.versions[record_id] = version
+
+    def record_versions(self):
+        return dict(self.versions)
+
+    def get(self, record_id):
+        self.reads.append(record_id)
+        return self.records.get(record_id)
+
+
+def test_sync_rereads_records_whose_version_changed(tmp_path):
+    store = FakeStore()
+    store.put('a', make_record(name='张三'), 1)
+    store.put('b', make_record(name='李四'), 1)
+    index = PatientNameIndex(str(tmp_path))
+    assert index.sync(store) == {'added': 2, 'updated': 0, 'removed': 0}
+
+    store.put('a', make_record(name='王五'), 2)
+    store.reads.clear()
+    assert index.sync(store) == {'added': 0, 'updated': 1, 'removed': 0}
+    assert store.reads == ['a']
+    assert index.exact('王五') == {'a'}
+    assert index.exact('张三') == set()
+
+
+def test_entries_added_without_version_adopt_store_version(tmp_path):
+    store = FakeStore()
+    store.put('a', make_record(name='张三'), [10, 200])
+    index = PatientNameIndex(str(tmp_path))
+    index.add('a', make_record(name='张三'))
+
+    assert index.sync(store) == {'added': 0, 'updated': 0, 'removed': 0}
+    assert store.reads == []
+    assert index.versions == {'a': [10, 200]}
+
+
+def test_versions_are_persisted(tmp_path):
+    store = FakeStore()
+    store.put('a', make_record(name='张三'), [10, 200])
+    index = PatientNameIndex(str(tmp_path))
+    index.sync(store)
+    index.save()
+
+    reloaded = PatientNameIndex(str(tmp_path))
+    assert reloaded.versions == {'a': [10, 200]}
+    store.reads.clear()
+    assert reloaded.sync(store) == {'added': 0, 'updated': 0, 'removed': 0}
+    assert store.reads == []
+
+
+def _write_external(path, name, stamp):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(make_record('GCS', name), f, ensure_ascii=False)
+    # 文件系统时间戳精度有限，显式设置文件与目录的修改时间
+    os.utime(path, ns=(stamp, stamp))
+    os.utime(os.path.dirname(path), ns=(stamp, stamp))
+
+
+@pytest.mark.parametrize('engine', ['json', 'sqlite', 'segments'])
+def test_scoring_system_sees_external_changes(workdir, engine):
+    from scoring_system import ScoringSystem
+
+    system = ScoringSystem(storage_engine=engine, durability='relaxed')
+    try:
+        system.save_record(make_record(name='张三'))
+        assert len(system.search_patient_records('张三')) == 1
+
+        source = os.path.join('results', 'GCS_外部_20250820_100000.json')
+        _write_external(source, '李四', 10 ** 18)
+        assert len(system.search_patient_records('李四')) == 1
+
+        # 原地修改不改变目录，显式刷新时按记录版本发现
+        _write_external(source, '王五', 10 ** 18 + 1)
+        system.sync_indexes(force=True)
+        assert len(system.search_patient_records('王五')) == 1
+        assert system.search_patient_records('李四') == set()
+
+        os.remove(source)
+        os.utime('results', ns=(10 ** 18 + 2, 10 ** 18 + 2))
+        assert system.search_patient_records('王五') == set()
+        assert len(system.search_patient_records('张三')) == 1
+    finally:
+        if engine == 'sqlite':
+            system.store.close()
+
+
+def test_refresh_picks_up_in_place_edit_in_cached_page(workdir):
+    from scoring_system import ScoringSystem
+
+    system = ScoringSystem(storage_engine='json', durability='relaxed')
+    source = os.path.join('results', 'GCS_外部_20250820_100000.json')
+    _write_external(source, '李四', 10 ** 18)
+    items, _ = system.query_page({})
+    assert [record['patient_info']['name'] for _, record in items] == ['李四']
+    assert len(system.search_patient_records('李四')) == 1
+
+    # 原地修改：目录修改时间不变，缓存与索引都不会自行发现
+    with open(source, 'w', encoding='utf-8') as f:
+        json.dump(make_record('GCS', '王五'), f, ensure_ascii=False)
+    os.utime(source, ns=(10 ** 18 + 1, 10 ** 18 + 1))
+    os.utime('results', ns=(10 ** 18, 10 ** 18))
+    assert system.search_patient_records('王五') == set()
+
+    system.refresh()
+    items, _ = system.query_page({})
+    assert [record['patient_info']['name'] for _, record in items] == ['王五']
+    items, _ = system.query_page({'patient': '王五'})
+    assert len(items) == 1
+    assert system.query_page({'patient': '李四'})[0] == []
+
+
+def test_shared_index_saves_to_its_directory_after_chdir(workdir, monkeypatch, tmp_path_factory):
+    from record_index import get_index
+
+    index = get_index(PatientNameIndex, os.path.join('data', 'indexes', 'json'))
+    index.add('a', make_record(name='张三'))
+    monkeypatch.chdir(tmp_path_factory.mktemp('elsewhere'))
+    index.save()
+
+    assert os.path.isabs(index.path)
+    assert os.path.exists(workdir / 'data' / 'indexes' / 'json' / 'patient_names.json')
+
+
+def test_changes_are_journaled_and_replayed_without_save(tmp_path):
+    index = PatientNameIndex(str(tmp_path))
+    index.add('a', make_record(name='张三'), 1)
+    index.add('b', make_record(name='李四'), 1)
+    index.save()
+    base = open(index.path, 'rb').read()
+
+    index.add('c', make_record(name='王五'), 2)
+    index.remove(['a'])
+
+    # 单次加入、移除只追加变更日志，不重写索引文件
+    assert open(index.path, 'rb').read() == base
+    with open(index.journal_path, 'r', encoding='utf-8') as f:
+        assert [json.loads(line) for line in f] == [{'id': 'c', 'value': '王五', 'version': 2},
+                                                    {'id': 'a', 'removed': True}]
+
+    reloaded = PatientNameIndex(str(tmp_path))
+    assert reloaded.entries == {'b': '李四', 'c': '王五'}
+    assert reloaded.versions == {'b': 1, 'c': 2}
+    assert reloaded.exact('张三') == set()
+
+    reloaded.save()
+    assert not os.path.exists(reloaded.journal_path)
+    assert PatientNameIndex(str(tmp_path)).entries == {'b': '李四', 'c': '王五'}
+
+
+def test_journal_is_compacted_when_long(tmp_path):
+    index = PatientNameIndex(str(tmp_path))
+    index.JOURNAL_COMPACT_MIN = 4
+    index.add('a', make_record(name='张三'))
+    assert not os.path.exists(index.journal_path)   # 索引文件不存在时直接写出
+    for i in range(5):
+        index.add(f"r{i}", make_record(name=f"患者{i}"))
+    assert index._journal_lines <= 4
+    assert PatientNameIndex(str(tmp_path)).entries == index.entries
+
+
+def test_patient_registry_state_is_journaled(tmp_path):
+    from patient_registry import PatientRegistry
+
+    registry = PatientRegistry(str(tmp_path))
+    registry.add('a', make_record(name='张三'))
+    registry.save()
+    registry.add('b', make_record(name='李四'))
+
+    reloaded = PatientRegistry(str(tmp_path))
+    assert reloaded.patients == registry.patients
+    assert reloaded.entries == registry.entries
+    assert reloaded.resolve({'name': '李四', 'gender': '男', 'age': 70}, create=False) == registry.entries['b'][0]
+
+
+@pytest.mark.parametrize('engine', ['json', 'sqlite', 'segments'])
+def test_own_writes_do_not_trigger_full_sync(workdir, engine, monkeypatch):
+    from scoring_system import ScoringSystem
+
+    system = ScoringSystem(storage_engine=engine, durability='relaxed')
+    try:
+        system.save_record(make_record(name='张三'))
+        system.sync_indexes()
+        scans = []
+        original = system.store.record_versions
+        monkeypatch.setattr(system.store, 'record_versions', lambda: scans.append(1) or original())
+
+        record_id = system.save_record(make_record(name='李四'))
+        assert system.search_patient_records('李四') == {record_id}
+        assert system.delete_assessment_result(record_id)
+        assert system.search_patient_records('李四') == set()
+        assert scans == []
+
+        # 外部新增的记录仍然按变化标志发现
+        _write_external(os.path.join('results', 'GCS_外部_20250820_100000.json'), '王五', 10 ** 18)
+        assert len(system.search_patient_records('王五')) == 1
+        assert scans == [1]
+    finally:
+        if engine == 'sqlite':
+            system.store.close()
@@ -0,0 +1,170 @@
+# -*- coding: utf-8 -*-
+"""原子写入器的持久化模式与后台写入线程"""
+
+import json
+import os
+
+import pytest
+
+import record_writer
+from record_writer import DurableWriter, WriteBehindWriter
+
+
+@pytest.fixture
+def fsyncs(monkeypatch):
+    """记录os.fsync调用次数（不实际同步）"""
+    calls = []
+    monkeypatch.setattr(record_writer.os, 'fsync', lambda fd: calls.append(fd))
+    return calls
+
+
+def _read(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def test_unknown_mode_rejected():
+    with pytest.raises(ValueError):
+        DurableWriter('sometimes')
+
+
+def test_strict_syncs_every_write(tmp_path, fsyncs):
+    writer = DurableWriter('strict')
+    writer.write(str(tmp_path / 'a.json'), {'n': 1})
+    writer.write(str(tmp_path / 'b.json'), {'n': 2})
+
+    assert _read(tmp_path / 'a.json') == {'n': 1}
+    # 每条记录同步文件和目录
+    assert len(fsyncs) == 4
+    assert writer.seconds_until_sync() is None
+
+
+def test_batched_syncs_once_per_batch(tmp_path, fsyncs):
+    writer = DurableWriter('batched', batch_records=3, batch_ms=60000)
+    writer.write(str(tmp_path / 'a.json'), {'n': 1})
+    writer.write(str(tmp_path / 'b.json'), {'n': 2})
+
+    assert fsyncs == []
+    assert 0 < writer.seconds_until_sync() <= 60
+
+    writer.write(str(tmp_path / 'c.json'), {'n': 3})
+    # 三个文件 + 一次目录同步
+    assert len(fsyncs) == 4
+    assert writer.seconds_until_sync() is None
+
+
+def test_batched_sync_pending_flushes_partial_batch(tmp_path, fsyncs):
+    writer = DurableWriter('batched', batch_records=10)
+    writer.write(str(tmp_path / 'a.json'), {'n': 1})
+    writer.sync_pending()
+
+    assert len(fsyncs) == 2
+    assert writer.seconds_until_sync() is None
+
+
+def test_relaxed_never_syncs(tmp_path, fsyncs):
+    writer = DurableWriter('relaxed')
+    for n in range(5):
+        writer.write(str(tmp_path / f"{n}.json"), {'n': n})
+    writer.sync_pending()
+
+    assert fsyncs == []
+    assert _read(tmp_path / '4.json') == {'n': 4}
+
+
+def test_failed_write_keeps_previous_file(tmp_path):
+    path = tmp_path / 'a.json'
+    writer = DurableWriter('relaxed')
+    writer.write(str(path), {'n': 1})
+
+    with pytest.raises(TypeError):
+        writer.write(str(path), {'n': object()})
+
+    assert _read(path) == {'n': 1}
+    assert os.listdir(tmp_path) == ['a.json']
+
+
+
+def test_exclusive_write_does_not_overwrite(tmp_path):
+    path = str(tmp_path / 'a.json')
+    writer = DurableWriter('relaxed')
+    writer.write(path, {'v': 1}, exclusive=True)
+
+    with pytest.raises(FileExistsError):
+        writer.write(path, {'v': 2}, exclusive=True)
+    assert _read(path) == {'v': 1}
+    assert os.listdir(tmp_path) == ['a.json']
+
+
+def test_exclusive_write_without_hard_links(tmp_path, monkeypatch):
+    def no_link(src, dst):
+        raise PermissionError("不支持硬链接")
+
+    monkeypatch.setattr(record_writer.os, 'link', no_link)
+    path = str(tmp_path / 'a.json')
+    writer = DurableWriter('relaxed')
+    writer.write(path, {'v': 1}, exclusive=True)
+
+    with pytest.raises(FileExistsError):
+        writer.write(path, {'v': 2}, exclusive=True)
+    assert _read(path) == {'v': 1}
+    assert os.listdir(tmp_path) == ['a.json']
+
+
+def test_write_new_adds_suffix_instead_of_overwriting(tmp_path):
+    path = str(tmp_path / 'a.json')
+    writer = DurableWriter('relaxed')
+
+    paths = [writer.write_new(path, {'v': v}) for v in range(3)]
+
+    assert [os.path.basename(p) for p in paths] == ['a.json', 'a_1.json', 'a_2.json']
+    assert [_read(p) for p in paths] == [{'v': 0}, {'v': 1}, {'v': 2}]
+
+
+def test_write_behind_same_path_keeps_both_and_reports_final_paths(tmp_path):
+    writer = WriteBehindWriter(durable_writer=DurableWriter('relaxed'))
+    done = []
+    path = str(tmp_path / 'MMSE_张三_20250820_100000.json')
+    try:
+        for v in range(2):
+            writer.submit(path, {'v': v}, lambda saved, error: done.append((saved, error)))
+        writer.flush()
+    finally:
+        writer.close()
+
+    assert writer.dispatch_completed() == 2
+    assert [os.path.basename(saved) for saved, _ in done] == \
+        ['MMSE_张三_20250820_100000.json', 'MMSE_张三_20250820_100000_1.json']
+    assert [_read(saved) for saved, _ in done] == [{'v': 0}, {'v': 1}]
+
+
+def test_write_behind_writes_and_reports(tmp_path):
+    writer = WriteBehindWriter(max_queue=4, batch_size=2, durable_writer=DurableWriter('batched'))
+    done = []
+    before = record_writer.writes_completed()
+    try:
+        for n in range(10):
+            writer.submit(str(tmp_path / f"{n}.json"), {'n': n}, lambda path, error: done.append((path, error)))
+        writer.submit(str(tmp_path / 'bad.json'), {'n': object()}, lambda path, error: done.append((path, error)))
+        writer.flush()
+    finally:
+        writer.close()
+
+    assert writer.dispatch_completed() == 11
+    assert [error for _, error in done[:10]] == [None] * 10
+    assert done[10][0].endswith('bad.json') and done[10][1]
+    assert record_writer.writes_completed() - before == 10
+    assert _read(tmp_path / '9.json') == {'n': 9}
+    assert not (tmp_path / 'bad.json').exists()
+
+
+def test_write_behind_close_syncs_pending_and_rejects_new_work(tmp_path, fsyncs):
+    writer = WriteBehindWriter(durable_writer=DurableWriter('batched', batch_records=100, batch_ms=60000))
+    writer.submit(str(tmp_path / 'a.json'), {'n': 1})
+    writer.close()
+    writer.close()
+
+    assert _read(tmp_path / 'a.json') == {'n': 1}
+    assert len(fsyncs) == 2
+    with pytest.raises(RuntimeError):
+        writer.submit(str(tmp_path / 'b.json'), {'n': 2})
@@ -0,0 +1,469 @@
+# -*- coding: utf-8 -*-
+"""评分引擎：与改造前各量表自行计算的结果对照，以及批量评分与逐条评分一致
+
+LEGACY中的参照实现摘自改造前的 scoring_system.py 与各量表界面（scales/*.py）；
+有意调整过的分级（HAMD总分17、Berg/Tinetti的跌倒风险写入level、MoCA校正后不超过满分）单独测试。
+"""
+
+import math
+from collections import Counter
+
+import numpy as np
+import pytest
+
+from scale_registry import SCALE_DEFINITIONS
+from scoring_engine import get_definition, item_range, score_matrix, score_scale
+
+RNG_SEED = 20250820
+SAMPLES = 200
+
+
+# ---------- 改造前的计算 ----------
+
+def _ladder(total, steps, last):
+    """按 (上限, 结果) 依次比较，total不超过上限时返回结果"""
+    for limit, result in steps:
+        if total <= limit:
+            return result
+    return last
+
+
+def legacy_mmse(responses):
+    total = sum(responses.values())
+    if total >= 27:
+        level, interpretation, risk = "正常", "认知功能正常", "低"
+    elif total >= 24:
+        level, interpretation, risk = "轻度认知障碍", "可能存在轻度认知功能下降，建议进一步评估", "中"
+    elif total >= 18:
+        level, interpretation, risk = "中度认知障碍", "存在明显认知功能障碍，建议医学干预", "高"
+    else:
+        level, interpretation, risk = "重度认知障碍", "存在严重认知功能障碍，需要立即医学干预", "极高"
+
+    domains = {
+        '定向力': ([1, 2, 3, 4, 5, 6, 7, 8, 9, 10], 10),
+        '记忆力': ([11, 12, 13], 3),
+        '注意力和计算': ([14, 15, 16, 17, 18], 5),
+        '回忆': ([19, 20, 21], 3),
+        '语言': ([22, 23, 24, 25, 26, 27, 28, 29, 30], 9)
+    }
+    domain_analysis = {}
+    for name, (items, max_score) in domains.items():
+        score = sum(responses.get(str(item), 0) for item in items)
+        percentage = round((score / max_score) * 100, 1)
+        domain_analysis[name] = {
+            'score': score, 'max_score': max_score, 'percentage': percentage,
+            'level': _ladder(-percentage, [(-80, "正常"), (-60, "轻度受损"), (-40, "中度受损")], "重度受损")
+        }
+    recommendations = {
+        "正常": ["继续保持良好的生活习惯", "定期进行认知功能评估", "保持社交活动和智力活动"],
+        "轻度认知障碍": ["建议进行详细的神经心理学评估", "加强认知训练和智力活动", "定期随访，监测认知功能变化",
+                     "保持健康的生活方式"],
+        "中度认知障碍": ["建议神经科专科就诊", "进行脑影像学检查", "考虑药物治疗", "加强日常生活能力训练"],
+        "重度认知障碍": ["立即神经科专科就诊", "全面的医学评估和检查", "制定个体化治疗方案", "家属护理指导和支持"]
+    }
+    return {'total_score': total, 'max_score': 30, 'percentage': round((total / 30) * 100, 1), 'level': level,
+            'interpretation': interpretation, 'risk_level': risk, 'domain_analysis': domain_analysis,
+            'recommendations': recommendations[level]}
+
+
+def legacy_mmse_gui_total(responses):
+    """界面按分类_序号计分，三步指令（5_3）最高3分"""
+    total = sum(responses[f"0_{i}"] for i in range(5)) + sum(responses[f"1_{i}"] for i in range(5))
+    total += responses["2_0"] + responses["3_0"] + responses["4_0"]
+    total += sum(min(responses[f"5_{i}"], 3) if i == 3 else responses[f"5_{i}"] for i in range(7))
+    return total
+
+
+def _symptom_groups(responses, groups):
+    results = {}
+    for name, (items, description) in groups.items():
+        score = sum(responses.get(str(item), 0) for item in items)
+        max_possible = len(items) * 4
+        percentage = round((score / max_possible) * 100, 1)
+        if percentage < 25:
+            severity = "轻微"
+        elif percentage < 50:
+            severity = "轻度"
+        elif percentage < 75:
+            severity = "中度"
+        else:
+            severity = "重度"
+        results[name] = {'score': score, 'max_score': max_possible, 'percentage': percentage,
+                         'severity': severity, 'description': description}
+    return results
+
+
+def legacy_hamd(responses):
+    total = sum(responses.values())
+    if total < 8:
+        level, interpretation, risk = "无抑郁", "无明显抑郁症状", "低"
+    elif total < 17:
+        level, interpretation, risk = "轻度抑郁", "存在轻度抑郁症状，建议关注情绪变化", "中"
+    elif total < 24:
+        level, interpretation, risk = "中度抑郁", "存在中度抑郁症状，建议专业治疗", "高"
+    else:
+        level, interpretation, risk = "重度抑郁", "存在重度抑郁症状，需要立即专业干预", "极高"
+    recommendations = {
+        "无抑郁": ["保持良好的心理状态", "定期进行情绪自我评估", "维持健康的生活方式"],
+        "轻度抑郁": ["建议心理咨询或心理治疗", "加强社会支持系统", "规律作息，适度运动", "定期随访评估"],
+        "中度抑郁": ["建议神经科专科就诊", "考虑药物治疗结合心理治疗", "密切监测症状变化", "家属支持和理解"],
+        "重度抑郁": ["立即神经科急诊就诊", "评估自杀风险", "考虑住院治疗", "24小时监护和支持"]
+    }
+    symptom_analysis = _symptom_groups(responses, {
+        '情绪症状': ([1, 2, 3], '抑郁情绪、罪恶感、自杀观念'),
+        '认知症状': ([9, 10, 15], '激越、精神性焦虑、疑病'),
+        '躯体症状': ([4, 5, 6, 11, 12, 13], '睡眠障碍、食欲、体重、躯体症状'),
+        '精神运动症状': ([8, 14], '精神运动性迟滞、工作和活动'),
+        '其他症状': ([7, 16, 17], '性症状、自知力、日夜变化')
+    })
+    return {'total_score': total, 'max_score': 52, 'percentage': round((total / 52) * 100, 1), 'level': level,
+            'interpretation': interpretation, 'risk_level': risk, 'symptom_analysis': symptom_analysis,
+            'recommendations': recommendations[level]}
+
+
+def legacy_hamd_gui_level(total):
+    """界面的分级（≤7、8-17、18-23、≥24），总分17时与评分系统不一致"""
+    return _ladder(total, [(7, "无抑郁"), (17, "轻度抑郁"), (23, "中度抑郁")], "重度抑郁")
+
+
+def legacy_updrs(responses):
+    total = sum(responses.values())
+    if total <= 17:
+        level, interpretation, risk = "轻度", "运动症状轻微，对日常生活影响较小", "低"
+    elif total <= 33:
+        level, interpretation, risk = "中度", "运动症状明显，对日常生活有一定影响", "中"
+    elif total <= 50:
+        level, interpretation, risk = "中重度", "运动症状较重，对日常生活影响较大", "高"
+    else:
+        level, interpretation, risk = "重度", "运动症状严重，严重影响日常生活", "极高"
+    recommendations = {
+        "轻度": ["继续规律服药", "适度运动和物理治疗", "定期神经科随访", "保持积极的生活态度"],
+        "中度": ["调整药物治疗方案", "加强康复训练", "职业治疗评估", "家属护理指导"],
+        "中重度": ["神经科专科调整治疗", "考虑深部脑刺激术评估", "全面康复治疗", "日常生活辅助设备"],
+        "重度": ["立即神经科专科就诊", "评估手术治疗适应症", "全面护理支持", "家属培训和支持"]
+    }
+    motor_analysis = _symptom_groups(responses, {
+        '言语和面部表情': ([1, 2], '言语清晰度和面部表情'),
+        '肌肉僵硬': ([3, 4, 5], '颈部、上肢、下肢僵硬'),
+        '手部功能': ([6, 7, 8], '手指敲击、手部动作、快速交替动作'),
+        '下肢功能': ([9], '腿部敏捷性'),
+        '姿势和步态': ([10, 11, 12, 13], '起立、姿势、步态、姿势稳定性'),
+        '整体运动': ([14], '整体运动迟缓')
+    })
+    return {'total_score': total, 'max_score': 56, 'percentage': round((total / 56) * 100, 1), 'level': level,
+            'interpretation': interpretation, 'risk_level': risk, 'motor_analysis': motor_analysis,
+            'recommendations': recommendations[level]}
+
+
+def legacy_moca(responses, low_education=False):
+    total = sum(responses.values()) + (1 if low_education else 0)
+    level = _ladder(-total, [(-26, "认知功能正常"), (-22, "轻度认知障碍"), (-17, "中度认知障碍")], "重度认知障碍")
+    return {'total_score': total, 'level': level}
+
+
+def legacy_cdr(responses):
+    scores = list(responses.values())
+    memory, others = scores[0], scores[1:]
+    total = memory if others.count(memory) >= 3 else Counter(scores).most_common(1)[0][0]
+    level, description = {
+        0: ('正常', '无痴呆症状'), 0.5: ('可疑痴呆', '轻微认知障碍，需要密切观察'),
+        1: ('轻度痴呆', '明显的认知功能障碍，影响日常生活'), 2: ('中度痴呆', '严重认知功能障碍，需要较多帮助'),
+        3: ('重度痴呆', '严重认知功能障碍，需要全面护理')
+    }[total]
+    return {'total_score': total, 'level': level, 'interpretation': description}
+
+
+def legacy_hama(responses):
+    total = sum(responses.values())
+    level, detail = _ladder(total, [(6, ("无焦虑", "无明显焦虑症状")), (14, ("轻度焦虑", "可能存在轻度焦虑症状")),
+                                    (20, ("中度焦虑", "存在中度焦虑症状，建议专业评估"))],
+                            ("重度焦虑", "存在重度焦虑症状，需要专业治疗"))
+    return {'total_score': total, 'level': level, 'interpretation': detail}
+
+
+def legacy_sds(responses):
+    """SDS此前没有界面实现，按量表说明计算：反向条目 5-原值，标准分 = 原始分 × 1.25 取整"""
+    reverse = {'2', '5', '6', '11', '12', '14', '16', '17', '18', '20'}
+    raw = sum(5 - value if item in reverse else value for item, value in responses.items())
+    total = int(raw * 1.25)
+    level = _ladder(total, [(52, "无抑郁"), (62, "轻度抑郁"), (72, "中度抑郁")], "重度抑郁")
+    return {'total_score': total, 'level': level}
+
+
+def legacy_berg(responses):
+    """跌倒风险原写在risk_level中"""
+    total = sum(responses.values())
+    if total >= 56:
+        risk, recommendations = "无跌倒风险", ["平衡功能良好，继续保持", "可进行常规体育活动", "定期进行平衡功能评估"]
+    elif total >= 54:
+        risk, recommendations = "低跌倒风险", ["平衡功能较好，需要注意安全", "建议进行平衡训练", "避免在不平整地面行走"]
+    elif total >= 46:
+        risk, recommendations = "中等跌倒风险", ["需要进行平衡康复训练", "使用辅助器具（如手杖）", "改善居家环境安全",
+                                            "定期随访评估"]
+    else:
+        risk, recommendations = "高跌倒风险", ["需要密切监护和帮助", "必须使用辅助器具", "进行专业康复治疗",
+                                          "全面评估跌倒风险因素", "考虑物理治疗介入"]
+    return {'total_score': total, 'max_score': 56, 'risk_level': risk, 'recommendations': recommendations,
+            'interpretation': f"根据Berg平衡量表评分，患者的平衡功能处于{risk}水平。"}
+
+
+def legacy_tinetti(responses):
+    """跌倒风险原写在risk_level中"""
+    balance = sum(responses.get(f"balance_{i}", 0) for i in range(9))
+    gait = sum(responses.get(f"gait_{i}", 0) for i in range(8))
+    total = balance + gait
+    if total >= 24:
+        risk, recommendations = "低跌倒风险", ["平衡和步态功能良好", "继续保持活动水平", "定期进行功能评估"]
+    elif total >= 19:
+        risk, recommendations = "中等跌倒风险", ["需要进行平衡和步态训练", "考虑使用辅助器具", "改善环境安全",
+                                            "定期随访评估"]
+    else:
+        risk, recommendations = "高跌倒风险", ["需要密切监护", "必须使用辅助器具", "进行专业康复治疗",
+                                          "全面跌倒风险评估", "考虑物理治疗介入"]
+    return {'total_score': total, 'max_score': 28, 'balance_score': balance, 'gait_score': gait,
+            'risk_level': risk, 'recommendations': recommendations}
+
+
+def legacy_nihss(responses):
+    total = sum(responses.values())
+    if total == 0:
+        level, interpretation = "无卒中症状", "无神经功能缺损"
+    elif total <= 4:
+        level, interpretation = "轻微卒中", "轻微神经功能缺损"
+    elif total <= 15:
+        level, interpretation = "轻到中度卒中", "轻到中度神经功能缺损"
+    elif total <= 20:
+        level, interpretation = "中到重度卒中", "中到重度神经功能缺损"
+    else:
+        level, interpretation = "重度卒中", "重度神经功能缺损"
+    return {'total_score': total, 'max_score': 42, 'level': level, 'interpretation': interpretation}
+
+
+def legacy_gcs(responses):
+    eye, verbal, motor = responses['eye'], responses['verbal'], responses['motor']
+    total = eye + verbal + motor
+    if total >= 13:
+        level, interpretation = "轻度意识障碍", "轻度脑损伤"
+    elif 9 <= total <= 12:
+        level, interpretation = "中度意识障碍", "中度脑损伤"
+    elif 3 <= total <= 8:
+        level, interpretation = "重度意识障碍", "重度脑损伤/昏迷"
+    else:
+        level, interpretation = "评分异常", "请检查评分"
+    return {'total_score': total, 'max_score': 15, 'eye_score': eye, 'verbal_score': verbal,
+            'motor_score': motor, 'level': level, 'interpretation': interpretation}
+
+
+def legacy_mrs(responses):
+    score = responses['mrs_score']
+    level, functional_status, prognosis = {
+        0: ("无症状", "完全正常", "预后极佳"), 1: ("无明显残疾", "轻微症状但功能完全", "预后良好"),
+        2: ("轻度残疾", "轻度功能受限", "预后较好"), 3: ("中度残疾", "中度功能受限", "预后一般"),
+        4: ("中重度残疾", "重度功能受限", "预后较差"), 5: ("重度残疾", "完全依赖他人", "预后差"),
+        6: ("死亡", "患者死亡", "最差结局")
+    }[score]
+    return {'total_score': score, 'max_score': 6, 'level': level, 'functional_status': functional_status,
+            'prognosis': prognosis}
+
+
+LEGACY = {
+    'mmse': legacy_mmse, 'moca': legacy_moca, 'cdr': legacy_cdr, 'hamd': legacy_hamd, 'hama': legacy_hama,
+    'sds': legacy_sds, 'updrs': legacy_updrs, 'berg': legacy_berg, 'tinetti': legacy_tinetti,
+    'nihss': legacy_nihss, 'gcs': legacy_gcs, 'mrs': legacy_mrs,
+}
+
+# CDR界面的可选得分
+CDR_VALUES = [0, 0.5, 1, 2, 3]
+
+
+# ---------- 构造条目得分 ----------
+
+def random_responses(scale_id, rng, items=None):
+    """按登记的取值范围随机生成一组整数得分"""
+    definition = get_definition(scale_id)
+    responses = {}
+    for item in items or definition['items']:
+        if scale_id == 'cdr':
+            responses[item] = CDR_VALUES[rng.integers(len(CDR_VALUES))]
+        else:
+            low, high = item_range(definition, item)
+            responses[item] = int(rng.integers(low, high + 1))
+    return responses
+
+
+def responses_with_total(scale_id, total):
+    """得分之和恰为total的一组得分（从最低分开始逐项加满）"""
+    definition = get_definition(scale_id)
+    ranges = [item_range(definition, item) for item in definition['items']]
+    remaining = total - sum(low for low, _ in ranges)
+    responses = {}
+    for item, (low, high) in zip(definition['items'], ranges):
+        add = max(0, min(high - low, remaining))
+        responses[item] = int(low + add)
+        remaining -= add
+    assert remaining == 0
+    return responses
+
+
+def boundary_totals(scale_id):
+    """各分级下限及其前一分，限于条目得分能够达到的总分"""
+    definition = get_definition(scale_id)
+    ranges = [item_range(definition, item) for item in definition['items']]
+    reachable = range(int(sum(low for low, _ in ranges)), int(sum(high for _, high in ranges)) + 1)
+    totals = set()
+    for band in definition['bands']:
+        totals.update(t for t in (band['min'] - 1, band['min']) if t in reachable)
+    return sorted(totals)
+
+
+def _samples(scale_id):
+    rng = np.random.default_rng(RNG_SEED)
+    return [random_responses(scale_id, rng) for _ in range(SAMPLES)]
+
+
+def _assert_matches_legacy(scale_id, responses, **options):
+    result = score_scale(scale_id, responses, **options)
+    expected = LEGACY[scale_id](responses, **options)
+    if scale_id in ('berg', 'tinetti'):
+        # 跌倒风险改为写入level，risk_level改为通用的 低/中/高/极高
+        expected['level'] = expected.pop('risk_level')
+    if scale_id == 'moca':
+        # 教育程度校正后不超过满分
+        expected['total_score'] = min(expected['total_score'], 30)
+    for key, value in expected.items():
+        assert result[key] == value, (scale_id, responses, key)
+    return result
+
+
+# ---------- 与改造前的结果对照 ----------
+
+def test_every_registered_scale_has_a_legacy_reference():
+    assert set(LEGACY) == set(SCALE_DEFINITIONS)
+
+
+@pytest.mark.parametrize('scale_id', sorted(set(LEGACY) - {'hamd'}))
+def test_random_responses_match_legacy(scale_id):
+    for responses in _samples(scale_id):
+        _assert_matches_legacy(scale_id, responses)
+
+
+@pytest.mark.parametrize('scale_id', sorted(set(LEGACY) - {'hamd', 'sds', 'cdr'}))
+def test_boundary_totals_match_legacy(scale_id):
+    totals = boundary_totals(scale_id)
+    assert totals
+    for total in totals:
+        _assert_matches_legacy(scale_id, responses_with_total(scale_id, total))
+
+
+def test_hamd_matches_legacy_except_total_17():
+    for responses in _samples('hamd') + [responses_with_total('hamd', t) for t in boundary_totals('hamd')]:
+        if sum(responses.values()) != 17:
+            _assert_matches_legacy('hamd', responses)
+
+
+@pytest.mark.parametrize('total, level', [(7, "无抑郁"), (8, "轻度抑郁"), (17, "轻度抑郁"), (18, "中度抑郁"),
+                                          (23, "中度抑郁"), (24, "重度抑郁")])
+def test_hamd_uses_gui_cutoffs(total, level):
+    # 评分系统原把17分判为中度，界面判为轻度；现统一为界面的分级
+    result = score_scale('hamd', responses_with_total('hamd', total))
+    assert result['level'] == level == legacy_hamd_gui_level(total)
+    if total == 17:
+        assert legacy_hamd(responses_with_total('hamd', 17))['level'] == "中度抑郁"
+
+
+@pytest.mark.parametrize('scale_id, total, level, risk', [
+    ('berg', 56, "无跌倒风险", "低"), ('berg', 55, "低跌倒风险", "低"), ('berg', 54, "低跌倒风险", "低"),
+    ('berg', 53, "中等跌倒风险", "中"), ('berg', 46, "中等跌倒风险", "中"), ('berg', 45, "高跌倒风险", "高"),
+    ('tinetti', 24, "低跌倒风险", "低"), ('tinetti', 23, "中等跌倒风险", "中"), ('tinetti', 19, "中等跌倒风险", "中"),
+    ('tinetti', 18, "高跌倒风险", "高"),
+])
+def test_fall_risk_label_moved_to_level(scale_id, total, level, risk):
+    result = score_scale(scale_id, responses_with_total(scale_id, total))
+    assert (result['level'], result['risk_level']) == (level, risk)
+
+
+def test_moca_education_adjustment_is_capped():
+    responses = responses_with_total('moca', 30)
+    assert legacy_moca(responses, low_education=True)['total_score'] == 31
+    assert score_scale('moca', responses, low_education=True)['total_score'] == 30
+    assert score_scale('moca', responses_with_total('moca', 25), low_education=True)['level'] == "认知功能正常"
+
+
+def test_mmse_gui_keys_match_gui_total():
+    rng = np.random.default_rng(RNG_SEED)
+    gui_items = [f"0_{i}" for i in range(5)] + [f"1_{i}" for i in range(5)] + ['2_0', '3_0', '4_0'] + \
+        [f"5_{i}" for i in range(7)]
+    for _ in range(SAMPLES):
+        responses = random_responses('mmse', rng, gui_items)
+        assert score_scale('mmse', responses)['total_score'] == legacy_mmse_gui_total(responses)
+
+
+@pytest.mark.parametrize('scale_id, item, value', [
+    ('nihss', '1b', 3), ('nihss', '1a', 4), ('nihss', '7', 3), ('hamd', '4', 3), ('hamd', '17', 3),
+    ('tinetti', 'balance_0', 2), ('tinetti', 'gait_7', 2),
+])
+def test_item_ranges_follow_gui_options(scale_id, item, value):
+    with pytest.raises(ValueError):
+        score_scale(scale_id, {item: value})
+    score_scale(scale_id, {item: value - 1})
+
+
+def test_gui_option_maxima_add_up_to_max_score():
+    for scale_id in ('nihss', 'hamd', 'hama', 'updrs', 'berg', 'moca'):
+        definition = get_definition(scale_id)
+        assert sum(item_range(definition, item)[1] for item in definition['items']) == definition['max_score']
+
+
+# ---------- 批量评分与逐条评分一致 ----------
+
+def _matrix_case(scale_id, rng, rows=60):
+    definition = get_definition(scale_id)
+    items = definition['items']
+    matrix = np.array([[random_responses(scale_id, rng)[item] for item in items] for _ in range(rows)], dtype=float)
+    # 约15%的条目未作答（NaN）；CDR保留记忆领域，以免出现没有记忆得分的记录
+    mask = rng.random(matrix.shape) < 0.15
+    if scale_id == 'cdr':
+        mask[:, 0] = False
+    matrix[mask] = np.nan
+    matrix[0] = np.nan if scale_id != 'cdr' else matrix[0]
+    return items, matrix
+
+
+@pytest.mark.parametrize('scale_id', sorted(SCALE_DEFINITIONS))
+def test_score_matrix_matches_score_scale(scale_id):
+    rng = np.random.default_rng(RNG_SEED)
+    items, matrix = _matrix_case(scale_id, rng)
+    definition = get_definition(scale_id)
+    table = score_matrix(scale_id, matrix)
+
+    for row, values in enumerate(matrix):
+        responses = {item: value for item, value in zip(items, values) if not math.isnan(value)}
+        expected = score_scale(scale_id, responses)
+        actual = table.iloc[row]
+        for column in ('total_score', 'max_score', 'percentage', 'level', 'risk_level'):
+            assert actual[column] == expected[column], (scale_id, row, column)
+        for field in definition.get('subscores', {}):
+            assert actual[field] == expected[field], (scale_id, row, field)
+        for domain, analysis in expected.get(definition.get('domain_key'), {}).items():
+            assert actual[domain] == analysis['score'], (scale_id, row, domain)
+
+
+def test_score_matrix_low_education_per_row():
+    responses = [responses_with_total('moca', total) for total in (24, 25, 30)]
+    matrix = np.array([[r[item] for item in get_definition('moca')['items']] for r in responses], dtype=float)
+    table = score_matrix('moca', matrix, low_education=[True, False, True])
+    assert list(table['total_score']) == [25, 25, 30]
+    assert list(table['level']) == ["轻度认知障碍", "轻度认知障碍", "认知功能正常"]
+
+
+@pytest.mark.parametrize('values, expected', [
+    ([1, 1, 1, 1, 2, 2], 1),            # 记忆与3个领域相同
+    ([0.5, 1, 1, 1, 0.5, 2], 1),        # 否则取出现最多的得分
+    ([2, 1, 1, 0.5, 0.5, 3], 1),        # 出现次数相同时取最先出现的
+    ([1, 0.5, np.nan, 1, 1, 1], 1),     # 未作答的领域不计
+])
+def test_cdr_memory_rule_matrix_and_scalar(values, expected):
+    items = get_definition('cdr')['items']
+    responses = {item: value for item, value in zip(items, values) if not math.isnan(value)}
+    assert score_scale('cdr', responses)['total_score'] == expected
+    assert score_matrix('cdr', np.array([values], dtype=float))['total_score'][0] == expected
@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+"""分段日志存储：读写、删除、整理与重新打开"""
+
+import json
+import os
+
+import pytest
+
+from assessment_store import SegmentLogStore
+from conftest import RecordingWriter, make_record, normalize
+
+
+def open_store(path, json_dirs=(), **kwargs):
+    kwargs.setdefault('max_bytes', 600)
+    return SegmentLogStore(str(path), list(json_dirs), normalize, **kwargs)
+
+
+def segment_numbers(path):
+    return sorted(int(name[4:10]) for name in os.listdir(path) if name.endswith('.jsonl'))
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = open_store(tmp_path / 'segments')
+    yield store
+    store.close()
+
+
+def test_save_get_delete_round_trip(store):
+    record_id = store.save(make_record(name='张三'))
+
+    assert store.get(record_id) == make_record(name='张三')
+    assert store.get(record_id.rpartition('#')[2]) == make_record(name='张三')
+    assert store.record_ids() == {record_id}
+    assert store.delete(record_id)
+    assert store.get(record_id) is None
+    assert not store.delete(record_id)
+    assert store.record_ids() == set()
+
+
+def test_iter_items_newest_first_with_filters(store):
+    a = store.save(make_record('MMSE', '张三', assessment_time='2025-01-05T09:00:00'))
+    b = store.save(make_record('HAMD-17', '张三', assessment_time='2025-02-01T09:00:00'))
+    c = store.save(make_record('MMSE', '李四', assessment_time='2025-03-01T09:00:00'))
+
+    assert [record_id for record_id, _ in store.iter_items()] == [c, b, a]
+    assert [record_id for record_id, _ in store.iter_items(scale_type='MMSE')] == [c, a]
+    assert [record_id for record_id, _ in store.iter_items(patient='张三')] == [b, a]
+    assert [record_id for record_id, _ in store.iter_items(since='2025-02-01', until='2025-03-01')] == [b]
+    assert [row['scale_type'] for row in store.iter_summary_rows('张三')] == ['HAMD-17', 'MMSE']
+
+
+def test_summary_rows_read_time_from_record_for_old_index_entries(store):
+    record_id = store.save(make_record(assessment_time='2025-08-20T23:48:41'))
+    # 早期的段索引项没有原始评估时间
+    del store._entries[record_id.rpartition('#')[2]]['assessment_time']
+
+    assert [row['assessment_time'] for row in store.iter_summary_rows()] == ['2025-08-20T23:48:41']
+
+
+def test_rolls_over_to_new_segments(store, tmp_path):
+    for n in range(4):
+        store.save(make_record(name=f"患者{n}"))
+
+    assert len(segment_numbers(tmp_path / 'segments')) == 4
+
+
+def test_reopen_rebuilds_and_truncates_torn_tail(tmp_path):
+    store = open_store(tmp_path / 'segments', max_bytes=1 << 20)
+    kept = store.save(make_record(name='甲'))
+    store.close()
+    with open(tmp_path / 'segments' / 'seg_000001.jsonl', 'ab') as f:
+        f.write(b'{"id": "half')
+
+    reopened = open_store(tmp_path / 'segments', max_bytes=1 << 20)
+    try:
+        assert reopened.record_ids() == {kept}
+        assert reopened.save(make_record(name='乙'))
+        assert len(reopened.record_ids()) == 2
+    finally:
+        reopened.close()
+
+
+def test_compaction_drops_deleted_records_and_survives_reopen(tmp_path):
+    path = tmp_path / 'segments'
+    store = open_store(path)
+    ids = [store.save(make_record(name=f"患者{n}")) for n in range(5)]
+    store.delete(ids[1])
+    store.delete(ids[2])
+    active = max(segment_numbers(path))
+
+    report = store.compact()
+    assert report['merged'] == 2
+    assert report['dropped_records'] == 2
+    # 整理生成的段编号大于当前段
+    assert max(segment_numbers(path)) > active
+    assert store.record_ids() == set(ids) - {ids[1], ids[2]}
+    store.close()
+
+    reopened = open_store(path)
+    try:
+        assert reopened.record_ids() == set(ids) - {ids[1], ids[2]}
+        assert reopened.get(ids[1]) is None
+        assert reopened.get(ids[0]) == make_record(name='患者0')
+        # 重新打开后编号最大的（整理生成的）段成为当前段，仍可继续追加
+        new_id = reopened.save(make_record(name='新患者'))
+        assert reopened.get(new_id) == make_record(name='新患者')
+    finally:
+        reopened.close()
+
+    again = open_store(path)
+    try:
+        assert again.record_ids() == (set(ids) - {ids[1], ids[2]}) | {new_id}
+    finally:
+        again.close()
+
+
+def test_newer_line_in_lower_segment_wins_after_compaction_and_reopen(tmp_path):
+    json_dir = tmp_path / 'results'
+    json_dir.mkdir()
+    source = json_dir / 'GCS_20250820_231139.json'
+    source.write_text(json.dumps(make_record('GCS', '甲', total_score=8)), encoding='utf-8')
+
+    path = tmp_path / 'segments'
+    store = open_store(path, [str(json_dir)], max_bytes=1000)
+    [(record_id, _)] = list(store.iter_items())
+    store.delete(store.save(make_record(name='乙')))
+    store.save(make_record(name='丙'))     # 滚动到新段，来源记录所在的段被封存
+    assert store.compact()['merged'] == 1
+    assert segment_numbers(path) == [2, 3]
+
+    # 来源文件修改后新内容追加到编号小于整理段的当前段
+    source.write_text(json.dumps(make_record('GCS', '甲', total_score=13)), encoding='utf-8')
+    os.utime(source, ns=(1, 1))
+    store.refresh()
+    assert store.get(record_id)['score_result']['total_score'] == 13
+    store.close()
+
+    reopened = open_store(path, [str(json_dir)], max_bytes=1000)
+    try:
+        assert reopened.get(record_id)['score_result']['total_score'] == 13
+    finally:
+        reopened.close()
+
+
+def test_source_files_go_through_store_writer(tmp_path):
+    json_dir = tmp_path / 'results'
+    json_dir.mkdir()
+    source = str(json_dir / 'MMSE_李四_20250820_100000.json')
+    with open(source, 'w', encoding='utf-8') as f:
+        json.dump(make_record(name='李四'), f, ensure_ascii=False)
+    writer = RecordingWriter()
+    store = open_store(tmp_path / 'segments', [str(json_dir)], writer=writer)
+    try:
+        [record_id] = store.record_ids()
+        assert store.durability == 'relaxed'
+
+        assert store.replace(record_id, make_record(name='李四', total_score=28))
+        assert store.delete(record_id)
+        assert writer.calls == [('write', source), ('remove', source)]
+        assert not os.path.exists(source)
+    finally:
+        store.close()
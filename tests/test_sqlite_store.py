@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+"""SQLite存储引擎：保存、读取、删除、遍历与JSON文件导入"""
+
+import json
+import os
+
+import pytest
+
+from assessment_store import SQLiteStore, create_store
+from record_writer import DurableWriter
+from conftest import RecordingWriter, make_record, normalize
+
+
+@pytest.fixture
+def store(tmp_path):
+    json_dir = tmp_path / 'results'
+    json_dir.mkdir()
+    store = SQLiteStore(str(tmp_path / 'assessments.db'), [str(json_dir)], normalize)
+    yield store
+    store.close()
+
+
+def test_save_get_round_trip(store):
+    record = make_record(name='李四', total_score=21)
+    record_id = store.save(record)
+
+    assert record_id.endswith('#1')
+    assert store.get(record_id) == record
+    assert store.record_ids() == {record_id}
+
+
+def test_get_missing_returns_none(store):
+    assert store.get(f"{store.db_path}#99") is None
+
+
+def test_iter_items_newest_first_with_filters(store):
+    old_id = store.save(make_record('MMSE', '张三', assessment_time='2025-01-05T09:00:00'))
+    new_id = store.save(make_record('MMSE', '李四', assessment_time='2025-03-01T09:00:00'))
+    hamd_id = store.save(make_record('HAMD-17', '张三', assessment_time='2025-02-01T09:00:00'))
+
+    assert [record_id for record_id, _ in store.iter_items()] == [new_id, hamd_id, old_id]
+    assert [record_id for record_id, _ in store.iter_items(scale_type='MMSE')] == [new_id, old_id]
+    assert [record_id for record_id, _ in store.iter_items(patient='张三')] == [hamd_id, old_id]
+    assert [record_id for record_id, _ in store.iter_items(since='2025-02-01', until='2025-03-01')] == [hamd_id]
+    assert len(list(store.iter_items(limit=2))) == 2
+
+
+def test_delete(store):
+    record_id = store.save(make_record())
+
+    assert store.delete(record_id)
+    assert store.get(record_id) is None
+    assert not store.delete(record_id)
+    assert store.record_ids() == set()
+
+
+def test_imports_json_files_once_and_delete_removes_source(store, tmp_path):
+    source = tmp_path / 'results' / 'GCS_20250820_231139.json'
+    source.write_text(json.dumps(make_record('GCS', '王五')), encoding='utf-8')
+
+    items = list(store.iter_items())
+    assert len(items) == 1
+    record_id, record = items[0]
+    assert record['patient_info']['name'] == '王五'
+    assert store.reconcile_json_files()['imported'] == 0
+
+    assert store.delete(record_id)
+    assert not source.exists()
+    assert list(store.iter_items()) == []
+
+
+def test_summary_rows_use_index_columns(store):
+    store.save(make_record('MMSE', '张三', total_score=18, risk_level='中'))
+
+    rows = list(store.iter_summary_rows('张三'))
+    assert rows == [{'scale_type': 'MMSE', 'assessment_time': '2025-08-20T10:00:00', 'total_score': 18,
+                     'level': '正常', 'risk_level': '中'}]
+    assert list(store.iter_summary_rows('李四')) == []
+
+
+@pytest.mark.parametrize('mode, level', [('strict', 2), ('batched', 1), ('relaxed', 0)])
+def test_durability_mode_sets_synchronous(tmp_path, mode, level):
+    store = create_store('sqlite', str(tmp_path), [], normalize, db_path=str(tmp_path / 'a.db'),
+                         writer=DurableWriter(mode))
+    try:
+        assert store.conn.execute('PRAGMA synchronous').fetchone()[0] == level
+    finally:
+        store.close()
+
+
+def test_reopen_keeps_records(tmp_path):
+    db_path = str(tmp_path / 'a.db')
+    store = SQLiteStore(db_path, [], normalize)
+    record_id = store.save(make_record())
+    store.close()
+
+    reopened = SQLiteStore(db_path, [], normalize)
+    try:
+        assert reopened.get(record_id) == make_record()
+        assert os.path.exists(db_path)
+    finally:
+        reopened.close()
+
+
+def test_version_increments_on_source_update_and_old_schema_is_migrated(tmp_path):
+    import sqlite3
+
+    db_path = str(tmp_path / 'old.db')
+    conn = sqlite3.connect(db_path)
+    conn.executescript(SQLiteStore.SCHEMA.replace(',\n            version INTEGER NOT NULL DEFAULT 0', ''))
+    conn.close()
+
+    json_dir = tmp_path / 'results'
+    json_dir.mkdir()
+    source = json_dir / 'GCS_20250820_231139.json'
+    source.write_text(json.dumps(make_record('GCS', '王五', total_score=8)), encoding='utf-8')
+    store = SQLiteStore(db_path, [str(json_dir)], normalize)
+    try:
+        [(record_id, version)] = store.record_versions().items()
+        token = store.change_token()
+
+        source.write_text(json.dumps(make_record('GCS', '王五', total_score=13)), encoding='utf-8')
+        os.utime(source, ns=(1, 1))
+        store.refresh()
+        assert store.record_versions() == {record_id: version + 1}
+        assert store.change_token() != token
+    finally:
+        store.close()
+
+
+def test_source_files_go_through_store_writer(tmp_path):
+    json_dir = tmp_path / 'results'
+    json_dir.mkdir()
+    source = str(json_dir / 'MMSE_李四_20250820_100000.json')
+    with open(source, 'w', encoding='utf-8') as f:
+        json.dump(make_record(name='李四'), f, ensure_ascii=False)
+    writer = RecordingWriter()
+    store = create_store('sqlite', str(tmp_path / 'data'), [str(json_dir)], normalize,
+                         db_path=str(tmp_path / 'a.db'), writer=writer)
+    try:
+        [record_id] = store.record_ids()
+        assert store.conn.execute('PRAGMA synchronous').fetchone()[0] == 0
+
+        assert store.replace(record_id, make_record(name='李四', total_score=28))
+        assert store.delete(record_id)
+        assert writer.calls == [('write', source), ('remove', source)]
+        assert not os.path.exists(source)
+    finally:
+        store.close()
+
+
+def test_scoring_system_close_closes_connection(workdir):
+    import sqlite3
+
+    from scoring_system import ScoringSystem
+
+    system = ScoringSystem(storage_engine='sqlite', durability='relaxed')
+    system.save_record(make_record())
+    system.close()
+
+    with pytest.raises(sqlite3.ProgrammingError):
+        system.store.conn.execute('SELECT 1')
@@ -0,0 +1,27 @@
+# -*- coding: utf-8 -*-
+"""汇总报告：时间线中的评估时间保持记录中的原始写法"""
+
+import pytest
+
+from conftest import make_record
+
+
+@pytest.mark.parametrize('engine', ['json', 'sqlite', 'segments'])
+def test_timeline_keeps_iso_assessment_time(workdir, engine):
+    from scoring_system import ScoringSystem
+
+    system = ScoringSystem(storage_engine=engine, durability='relaxed')
+    try:
+        system.save_record(make_record(name='张三', assessment_time='2025-08-20T23:48:41'))
+        system.save_record(make_record('GCS', name='张三', total_score=13, assessment_time='2025-08-21T08:00:00'))
+        system.save_record(make_record(name='李四', assessment_time='2025-08-22T09:30:00'))
+
+        report = system.generate_summary_report('张三')
+    finally:
+        system.close()
+
+    assert report['total_assessments'] == 2
+    assert [(item['date'], item['scale_type'], item['score']) for item in report['assessment_timeline']] == [
+        ('2025-08-21T08:00:00', 'GCS', 13),
+        ('2025-08-20T23:48:41', 'MMSE', 25),
+    ]